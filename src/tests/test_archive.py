@@ -0,0 +1,69 @@
+import os
+
+from vacancies.vacancies.archive import ResponseArchive, read_segment
+
+
+def records(count: int, start: int = 0) -> list:
+    return [
+        {
+            "url": f"https://api.hh.ru/vacancies/{number}",
+            "fetched_at": float(number),
+            "callback": "parse_detail",
+            "cb_kwargs": {},
+            "body": "{}",
+        }
+        for number in range(start, start + count)
+    ]
+
+
+def test_read_segment(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    archive = ResponseArchive(str(tmp_path), buffer_size=2)
+    for record in records(5):
+        archive.write(record)
+    archive.close()
+
+    (segment,) = [name for name in os.listdir(tmp_path) if name.endswith(".gz")]
+
+    assert list(read_segment(str(tmp_path / segment))) == records(5)
+
+
+def test_truncated_member_is_skipped(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    archive = ResponseArchive(str(tmp_path), buffer_size=3)
+    for record in records(3):
+        archive.write(record)
+    archive.flush()
+    (segment,) = [name for name in os.listdir(tmp_path) if name.endswith(".gz")]
+    path = tmp_path / segment
+    complete = path.stat().st_size
+    for record in records(3, start=3):
+        archive.write(record)
+    archive.close()
+
+    # аварийная остановка во время дозаписи второго члена gzip
+    with open(path, "r+b") as file:
+        file.truncate(complete + (path.stat().st_size - complete) // 2)
+
+    assert list(read_segment(str(path))) == records(3)
+
+
+def test_new_run_starts_new_segment(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    archive = ResponseArchive(str(tmp_path), buffer_size=3)
+    for record in records(3):
+        archive.write(record)
+    archive.close()
+    (crashed,) = archive.segments()
+    # аварийная остановка во время дозаписи члена gzip
+    with open(crashed, "ab") as file:
+        file.write(b"\x1f\x8b\x08\x00")
+
+    archive = ResponseArchive(str(tmp_path), buffer_size=2)
+    for record in records(4, start=3):
+        archive.write(record)
+    archive.close()
+
+    assert archive.segments()[0] == crashed
+    assert [
+        record for segment in archive.segments() for record in read_segment(segment)
+    ] == records(7)
+    (record,) = ResponseArchive(str(tmp_path)).read("5")
+    assert record == records(1, start=5)[0]
@@ -0,0 +1,65 @@
+from vacancies.vacancies.changes import (
+    FIELD_HASHES_FIELD,
+    HASH_FIELD,
+    ContentHashes,
+    content_hash,
+    diff,
+    field_hashes,
+)
+from vacancies.vacancies.items import DERIVED_FIELDS
+
+
+def test_field_hashes_ignore_key_order_and_service_fields() -> None:
+    first = field_hashes({"id": "1", "salary": {"from": 1, "to": 2}})
+    second = field_hashes(
+        {
+            "_id": "object",
+            "salary": {"to": 2, "from": 1},
+            "id": "1",
+            HASH_FIELD: "hash",
+            FIELD_HASHES_FIELD: {"id": "hash"},
+        }
+    )
+
+    assert first == second
+    assert set(first) == {"id", "salary"}
+
+
+def test_content_hash_depends_on_values() -> None:
+    hashes = field_hashes({"id": "1", "name": "Python developer"})
+
+    assert content_hash(hashes) == content_hash(dict(reversed(hashes.items())))
+    assert content_hash(hashes) != content_hash(
+        field_hashes({"id": "1", "name": "Data scientist"})
+    )
+
+
+def test_diff() -> None:
+    previous = field_hashes({"id": "1", "name": "Developer", "archived": False})
+    document = {"id": "1", "name": "Python developer", "schedule": "remote"}
+
+    changed, removed = diff(document, field_hashes(document), previous)
+
+    assert changed == {"name": "Python developer", "schedule": "remote"}
+    assert removed == {"archived": ""}
+
+
+def test_derived_fields_are_not_api_fields() -> None:
+    # производные поля не участвуют в хэше содержимого
+    assert {"salary_rub", "duplicate_cluster", "description_tokens"} <= set(
+        DERIVED_FIELDS
+    )
+    assert "id" not in DERIVED_FIELDS
+
+
+def test_content_hashes_evict_least_recently_used() -> None:
+    hashes = ContentHashes(size=2)
+    hashes.update([("1", "a"), ("2", "b")])
+
+    assert hashes.get("1") == "a"
+    hashes.put("3", "c")
+
+    assert len(hashes) == 2
+    assert hashes.get("2") is None
+    assert hashes.get("1") == "a"
+    assert hashes.get("3") == "c"
@@ -0,0 +1,107 @@
+from typing import Iterator, List
+
+import pytest
+
+from vacancies.vacancies import duplicates
+from vacancies.vacancies.duplicates import (
+    NUM_PERM,
+    DuplicateIndex,
+    MinHash,
+    Signature,
+    shingles,
+    similarity,
+)
+
+TEXT = "ищем разработчика python для работы над сервисами машинного обучения".split()
+
+
+def variant(base: Signature, changed: int, offset: int = 1) -> Signature:
+    # сигнатура, отличающаяся от исходной первыми changed значениями
+    return tuple(
+        value + offset if i < changed else value for i, value in enumerate(base)
+    )
+
+
+@pytest.fixture
+def index(tmp_path) -> Iterator[DuplicateIndex]:  # type: ignore[no-untyped-def]
+    index = DuplicateIndex(str(tmp_path / "duplicates.sqlite"), threshold=0.8)
+    yield index
+    index.close()
+
+
+def test_shingles() -> None:
+    assert shingles([]) == []
+    assert len(shingles(["python"])) == 1
+    assert len(shingles(TEXT)) == len(TEXT) - 2
+    assert shingles(TEXT) == shingles(list(TEXT))
+
+
+def test_similar_texts_have_similar_signatures() -> None:
+    minhash = MinHash()
+    first = minhash.signature(shingles(TEXT))
+    second = minhash.signature(shingles(TEXT + ["удаленно"]))
+    other = minhash.signature(shingles("требуется водитель погрузчика".split()))
+
+    assert len(first) == NUM_PERM
+    assert similarity(first, first) == 1.0
+    assert similarity(first, second) > 0.6
+    assert similarity(first, other) < 0.2
+
+
+def test_signatures_without_numpy(monkeypatch: pytest.MonkeyPatch) -> None:
+    minhash = MinHash()
+    batch = [shingles(TEXT), shingles(TEXT[:4])]
+    expected = minhash.signatures(batch)
+
+    monkeypatch.setattr(duplicates, "np", None)
+
+    assert minhash.signatures(batch) == expected
+
+
+def test_add_finds_duplicates(index: DuplicateIndex) -> None:
+    base = tuple(range(NUM_PERM))
+
+    assert index.add("1", base) == ("1", {})
+    assert index.add("2", variant(base, 8)) == ("1", {})
+    assert index.add("3", variant(base, 100)) == ("3", {})
+    # повторное добавление той же сигнатуры не изменяет индекс
+    assert index.add("2", variant(base, 8)) == ("1", {})
+
+    assert index.members("1") == ["1", "2"]
+    assert index.cluster("3") == "3"
+    assert index.largest() == [("1", 2)]
+    assert len(index) == 3
+
+
+def test_cluster_is_relabeled_when_anchor_leaves(index: DuplicateIndex) -> None:
+    base = tuple(range(NUM_PERM))
+    other = tuple(range(1000, 1000 + NUM_PERM))
+    index.add("a", base)
+    index.add("b", variant(base, 8))
+    index.add("c", variant(base, 4, offset=2))
+    index.add("x", other)
+
+    # вакансия "a" изменилась и стала дубликатом "x"
+    cluster, relabeled = index.add("a", variant(other, 4))
+
+    assert cluster == "x"
+    assert relabeled == {"b": "b", "c": "b"}
+    assert index.members("a") == []
+    assert index.members("b") == ["b", "c"]
+    assert index.members("x") == ["a", "x"]
+
+
+def test_rebuild(index: DuplicateIndex) -> None:
+    base = tuple(range(NUM_PERM))
+    entries: List = [
+        ("1", base),
+        ("2", tuple(range(500, 500 + NUM_PERM))),
+        ("3", variant(base, 8)),
+    ]
+
+    clusters = index.rebuild(entries)
+
+    assert clusters == {"1": "1", "2": "2", "3": "1"}
+    assert index.members("1") == ["1", "3"]
+    # после пересборки индекс продолжает пополняться
+    assert index.add("4", variant(base, 4)) == ("1", {})
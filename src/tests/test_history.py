@@ -0,0 +1,113 @@
+from typing import Any, Dict, List, Optional
+
+from vacancies.vacancies.history import (
+    VacancyHistory,
+    changed_entry,
+    created_entry,
+    revert,
+)
+
+
+class Collection:
+    """
+    Коллекция в памяти с поиском по равенству полей.
+    """
+
+    def __init__(self, documents: List[Dict[str, Any]]) -> None:
+        self.documents = documents
+
+    def _matches(self, document: Dict[str, Any], query: Dict[str, Any]) -> bool:
+        for name, condition in query.items():
+            if isinstance(condition, dict):
+                if not document[name] > condition["$gt"]:
+                    return False
+            elif document.get(name) != condition:
+                return False
+        return True
+
+    def find_one(
+        self, query: Dict[str, Any], projection: Dict[str, bool]
+    ) -> Optional[Dict[str, Any]]:
+        for document in self.documents:
+            if self._matches(document, query):
+                return {
+                    name: value
+                    for name, value in document.items()
+                    if projection.get(name, True)
+                }
+        return None
+
+    def find(
+        self, query: Dict[str, Any], projection: Dict[str, bool], sort: Any
+    ) -> List[Dict[str, Any]]:
+        found = [
+            document for document in self.documents if self._matches(document, query)
+        ]
+        return sorted(found, key=lambda document: document["at"], reverse=True)
+
+
+def test_changed_entry_and_revert() -> None:
+    stored = {"id": "1", "name": "Developer", "archived": False}
+    document = {"id": "1", "name": "Python developer", "schedule": "remote"}
+
+    entry = changed_entry("1", 100, stored, document)
+
+    assert entry["previous"] == {"name": "Developer", "archived": False}
+    assert entry["added"] == ["schedule"]
+    assert revert(document, entry) == stored
+
+
+def test_changed_entry_contains_api_fields_only() -> None:
+    stored = {"id": "1", "name": "Developer", "salary_rub": 100000}
+    document = {"id": "1", "name": "Python developer", "salary_rub": 120000}
+
+    entry = changed_entry("1", 100, stored, document)
+    assert entry["previous"] == {"name": "Developer"}
+
+    entry = changed_entry("1", 100, stored, document, ["name", "salary_rub"])
+    assert entry["previous"] == {"name": "Developer"}
+
+
+def test_unchanged_entry_does_not_affect_versions() -> None:
+    # запись истории без записанного изменения вакансии восстанавливает ту же версию
+    stored = {"id": "1", "name": "Developer"}
+    entry = changed_entry("1", 100, stored, {"id": "1", "name": "Python developer"})
+
+    assert revert(stored, entry) == stored
+
+
+def test_vacancy_history() -> None:
+    vacancies = Collection(
+        [
+            {
+                "_id": "object",
+                "id": "1",
+                "name": "Python developer",
+                "salary": 200,
+                "salary_rub": 200,
+                "content_hash": "hash",
+            }
+        ]
+    )
+    history = Collection(
+        [
+            created_entry("1", 100),
+            {"vacancy_id": "1", "at": 200, "previous": {"salary": 100}, "added": []},
+            {
+                "vacancy_id": "1",
+                "at": 300,
+                "previous": {"name": "Developer"},
+                "added": [],
+            },
+        ]
+    )
+    vacancy_history = VacancyHistory(vacancies, history)  # type: ignore[arg-type]
+
+    assert vacancy_history.at("1", 50) is None
+    assert vacancy_history.at("1", 250) == {
+        "id": "1",
+        "name": "Developer",
+        "salary": 200,
+    }
+    assert [at for at, _ in vacancy_history.versions("1")] == [100, 200, 300]
+    assert vacancy_history.field("1", "salary") == [(100, 100), (200, 200)]
@@ -0,0 +1,144 @@
+import time
+from email.utils import formatdate
+from typing import Iterator
+
+import pytest
+from scrapy import Spider
+from scrapy.http import Request, Response
+from scrapy.settings import Settings
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from vacancies.vacancies.httpcache import (
+    DETAIL,
+    LIST,
+    REFERENCE,
+    ApiCacheMiddleware,
+    ApiCachePolicy,
+    SQLiteCacheStorage,
+    endpoint_class,
+)
+
+API_URL = "https://api.hh.ru"
+DAY = 24 * 60 * 60
+
+
+def response(url: str, age: float = 0.0, **headers: str) -> Response:
+    return Response(
+        url,
+        headers={"Date": formatdate(time.time() - age, usegmt=True), **headers},
+        body=b'{"id": "1"}',
+    )
+
+
+@pytest.fixture
+def settings(tmp_path) -> Settings:  # type: ignore[no-untyped-def]
+    return Settings(
+        {
+            "HTTPCACHE_ENABLED": True,
+            "HTTPCACHE_DIR": str(tmp_path / "httpcache"),
+            "HTTPCACHE_STORAGE": "vacancies.vacancies.httpcache.SQLiteCacheStorage",
+            "HTTPCACHE_POLICY": "vacancies.vacancies.httpcache.ApiCachePolicy",
+            "HTTPCACHE_DETAIL_TTL": DAY,
+            "HTTPCACHE_EXPIRATION_SECS": 7 * DAY,
+            "REQUEST_FINGERPRINTER_IMPLEMENTATION": "2.7",
+        }
+    )
+
+
+@pytest.fixture
+def spider() -> Spider:
+    return Spider(name="vacancies")
+
+
+@pytest.fixture
+def storage(settings: Settings, spider: Spider) -> Iterator[SQLiteCacheStorage]:
+    storage = SQLiteCacheStorage(settings)
+    storage.open_spider(spider)
+    yield storage
+    storage.close_spider(spider)
+
+
+def test_endpoint_class() -> None:
+    assert endpoint_class(f"{API_URL}/areas") == REFERENCE
+    assert endpoint_class(f"{API_URL}/vacancies/123") == DETAIL
+    assert endpoint_class(f"{API_URL}/vacancies?area=1") == LIST
+
+
+def test_detail_ttl_bounds_published_at(settings: Settings) -> None:
+    policy = ApiCachePolicy(settings)
+    url = f"{API_URL}/vacancies/1"
+    request = Request(url, meta={"published_at": "2022-11-20T10:00:00+0300"})
+
+    assert policy.is_cached_response_fresh(response(url, age=60), request)
+    # дата публикации совпадает, но срок хранения вакансии истек
+    assert not policy.is_cached_response_fresh(
+        response(url, age=2 * DAY, ETag='"v1"'), request
+    )
+    assert request.headers["If-None-Match"] == b'"v1"'
+
+
+def test_changed_published_at_is_not_retrieved(
+    storage: SQLiteCacheStorage, spider: Spider
+) -> None:
+    url = f"{API_URL}/vacancies/1"
+    stored = Request(url, meta={"published_at": "2022-11-20T10:00:00+0300"})
+    storage.store_response(spider, stored, response(url))
+
+    assert storage.retrieve_response(spider, stored) is not None
+    changed = Request(url, meta={"published_at": "2022-11-21T10:00:00+0300"})
+    assert storage.retrieve_response(spider, changed) is None
+
+
+def test_expired_responses_are_pruned(
+    settings: Settings, storage: SQLiteCacheStorage, spider: Spider
+) -> None:
+    old, recent = Request(f"{API_URL}/vacancies/1"), Request(f"{API_URL}/vacancies/2")
+    storage.store_response(spider, old, response(old.url))
+    storage.store_response(spider, recent, response(recent.url))
+    storage.commit()
+    assert storage._connection is not None
+    storage._connection.execute(
+        "UPDATE responses SET stored_at = ? WHERE url = ?",
+        (time.time() - 8 * DAY, old.url),
+    )
+    storage._connection.commit()
+
+    # устаревший ответ не используется и до удаления
+    assert storage.retrieve_response(spider, old) is None
+
+    reopened = SQLiteCacheStorage(settings)
+    reopened.open_spider(spider)
+    assert reopened._connection is not None
+    urls = [url for url, in reopened._connection.execute("SELECT url FROM responses")]
+    assert urls == [recent.url]
+    reopened.close_spider(spider)
+
+
+def test_not_modified_refreshes_stored_response(
+    settings: Settings, spider: Spider
+) -> None:
+    crawler = get_crawler(Spider, settings.copy_to_dict())
+    stats = MemoryStatsCollector(crawler)
+    middleware = ApiCacheMiddleware(settings, stats)
+    middleware.spider_opened(spider)
+    url = f"{API_URL}/vacancies?area=1"
+    middleware.storage.store_response(
+        spider, Request(url), response(url, age=2 * DAY, ETag='"v1"')
+    )
+
+    request = Request(url)
+    assert middleware.process_request(request, spider) is None
+    assert request.headers["If-None-Match"] == b'"v1"'
+
+    not_modified = Response(url, status=304, headers={"ETag": '"v2"'})
+    result = middleware.process_response(request, not_modified, spider)
+
+    assert result.status == 200
+    assert stats.get_value("httpcache/revalidate") == 1
+    # сохраненный ответ снова актуален, повторный запрос не отправляется
+    cached = middleware.process_request(Request(url), spider)
+    assert cached is not None
+    assert cached.headers["ETag"] == b'"v2"'
+
+    middleware.spider_closed(spider)
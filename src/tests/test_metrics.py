@@ -0,0 +1,30 @@
+from vacancies.vacancies.metrics import PARSE_CPU, CrawlMetrics
+
+
+def test_snapshot_resets_samples() -> None:
+    metrics = CrawlMetrics()
+    metrics.sample(queue_depth=3)
+    metrics.sample(queue_depth=5)
+
+    assert [sample["queue_depth"] for sample in metrics.snapshot()["samples"]] == [
+        3,
+        5,
+    ]
+    assert metrics.snapshot()["samples"] == []
+
+
+def test_prometheus_keeps_last_sample_after_snapshot() -> None:
+    metrics = CrawlMetrics()
+    metrics.observe("parse_detail", PARSE_CPU, 2.0)
+
+    assert "vacancies_queue_depth" not in metrics.prometheus()
+
+    metrics.sample(queue_depth=5, memory_mb=100)
+    metrics.snapshot()
+    exposition = metrics.prometheus()
+
+    # gauge выводится и после очистки временного ряда снимком
+    assert "vacancies_queue_depth 5\n" in exposition
+    assert "vacancies_memory_mb 100\n" in exposition
+    labels = '{callback="parse_detail"}'
+    assert f"vacancies_callback_{PARSE_CPU}_count{labels} 1" in exposition
@@ -0,0 +1,89 @@
+import os
+from typing import Any, Dict, List
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from scipy import sparse
+from scipy.sparse.linalg import lsqr
+
+from vacancies.vacancies.analysis.model import FeatureStore, ridge
+
+
+def vacancy(vacancy_id: str, name: str, salary: int) -> Dict[str, Any]:
+    return {
+        "id": vacancy_id,
+        "name": name,
+        "published_at": "2022-11-20T10:00:00+0300",
+        "description_tokens": ["python", "сервис"],
+        "salary_rub": {"from": salary, "to": None},
+        "area": {"id": "1"},
+        "key_skills": [{"name": "Python"}],
+    }
+
+
+def export(directory: str, documents: List[Dict[str, Any]]) -> None:
+    os.makedirs(directory, exist_ok=True)
+    pq.write_table(
+        pa.Table.from_pylist(documents), os.path.join(directory, "part-0.parquet")
+    )
+
+
+def test_warm_start_matches_cold_fit() -> None:
+    generator = np.random.default_rng(1)
+    matrix = sparse.random(200, 30, density=0.2, format="csr", random_state=1)
+    values = generator.normal(size=200)
+    start = generator.normal(size=30)
+
+    cold, _ = ridge(matrix, values, alpha=0.5, iterations=1000)
+    warm, _ = ridge(matrix, values, alpha=0.5, iterations=1000, start=start)
+
+    assert np.allclose(warm, cold, atol=1e-5)
+    # lsqr с x0 решает другую задачу: регуляризуется отклонение от x0
+    proximal = lsqr(matrix, values, damp=np.sqrt(0.5), iter_lim=1000, x0=start)[0]
+    assert not np.allclose(proximal, cold, atol=1e-3)
+
+
+def test_feature_store_drops_removed_and_compacts(
+    tmp_path,  # type: ignore[no-untyped-def]
+) -> None:
+    directory = str(tmp_path / "export")
+    store = FeatureStore(str(tmp_path / "cache"), n_features=64)
+    export(
+        directory,
+        [
+            vacancy("1", "Python developer", 100000),
+            vacancy("2", "Data scientist", 150000),
+            vacancy("3", "Analyst", 90000),
+        ],
+    )
+
+    assert store.update(directory) == 3
+    assert store.update(directory) == 0
+
+    # вакансия 1 изменилась, вакансии 3 больше нет в выгрузке
+    export(
+        directory,
+        [
+            vacancy("1", "Senior Python developer", 200000),
+            vacancy("2", "Data scientist", 150000),
+        ],
+    )
+
+    assert store.update(directory) == 1
+
+    _, _, targets, ids = store.load()
+    assert sorted(zip(ids, targets)) == [("1", 200000.0), ("2", 150000.0)]
+    assert store.chunks == ["chunk-00000.npz", "chunk-00001.npz"]
+    with np.load(os.path.join(store.directory, store.chunks[0])) as chunk:
+        assert list(chunk["ids"]) == ["2"]
+
+    # после удаления всех вакансий первой части она удаляется
+    export(directory, [vacancy("1", "Senior Python developer", 200000)])
+    assert store.update(directory) == 0
+    assert store.chunks == ["chunk-00001.npz"]
+    assert not os.path.exists(os.path.join(store.directory, "chunk-00000.npz"))
+
+    reopened = FeatureStore(str(tmp_path / "cache"), n_features=64)
+    assert list(reopened.load()[3]) == ["1"]
+    assert reopened.version == store.version
@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs, urlparse
+
+from vacancies.vacancies.partition import QueryPartitioner, query_url
+
+NOW = datetime(2022, 12, 1, tzinfo=timezone.utc)
+
+
+def test_query_url() -> None:
+    url = query_url({"area": "1"}, page=3)
+
+    assert urlparse(url).path == "/vacancies"
+    assert parse_qs(urlparse(url).query) == {
+        "area": ["1"],
+        "per_page": ["100"],
+        "page": ["3"],
+    }
+    assert "page" not in parse_qs(urlparse(query_url({"area": "1"})).query)
+
+
+def test_split_by_date_halves() -> None:
+    partitioner = QueryPartitioner()
+
+    first, second = partitioner.split({"area": "1"}, now=NOW)
+
+    assert first["date_from"] == "2022-11-01T00:00:00+0000"
+    assert first["date_to"] == second["date_from"] == "2022-11-16T00:00:00+0000"
+    assert second["date_to"] == "2022-12-01T00:00:00+0000"
+
+
+def test_split_by_roles_after_min_window() -> None:
+    partitioner = QueryPartitioner(min_window=timedelta(hours=1))
+    partitioner.roles = ["96", "104"]
+    query = {
+        "area": "1",
+        "date_from": "2022-11-30T10:00:00+0000",
+        "date_to": "2022-11-30T11:00:00+0000",
+    }
+
+    queries = partitioner.split(query)
+
+    assert [item["professional_role"] for item in queries] == ["96", "104"]
+    assert partitioner.split(queries[0]) == []
+
+
+def test_initial_without_splits() -> None:
+    assert QueryPartitioner().initial("1", "2022-11-20") == [
+        {"area": "1", "date_from": "2022-11-20"}
+    ]
+
+
+def test_initial_uses_learned_window() -> None:
+    partitioner = QueryPartitioner()
+    partitioner.learn(
+        {
+            "area": "1",
+            "date_from": "2022-11-30T00:00:00+0000",
+            "date_to": "2022-12-01T00:00:00+0000",
+        }
+    )
+
+    queries = partitioner.initial("1", now=NOW)
+
+    assert len(queries) == 30
+    assert all("professional_role" not in query for query in queries)
+    assert queries[-1]["date_to"] == "2022-12-01T00:00:00+0000"
+
+
+def test_initial_splits_only_overflowed_windows_by_roles() -> None:
+    partitioner = QueryPartitioner(min_window=timedelta(days=1))
+    partitioner.roles = ["96", "104", "165"]
+    for role in partitioner.roles:
+        partitioner.learn(
+            {
+                "area": "1",
+                "date_from": "2022-11-30T00:00:00+0000",
+                "date_to": "2022-12-01T00:00:00+0000",
+                "professional_role": role,
+            }
+        )
+
+    queries = partitioner.initial("1", now=NOW)
+
+    with_roles = [query for query in queries if "professional_role" in query]
+    assert len(queries) == 29 + 3
+    assert {query["date_from"] for query in with_roles} == {"2022-11-30T00:00:00+0000"}
+
+
+def test_expired_role_windows_are_dropped() -> None:
+    partitioner = QueryPartitioner(min_window=timedelta(days=1))
+    partitioner.roles = ["96"]
+    partitioner.learn(
+        {
+            "area": "1",
+            "date_from": "2022-10-01T00:00:00+0000",
+            "date_to": "2022-10-02T00:00:00+0000",
+            "professional_role": "96",
+        }
+    )
+
+    queries = partitioner.initial("1", now=NOW)
+
+    assert all("professional_role" not in query for query in queries)
+    assert partitioner.role_windows == {"1": []}
+
+
+def test_save_and_load(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    path = str(tmp_path / "partitions.json")
+    partitioner = QueryPartitioner(path)
+    partitioner.roles = ["96"]
+    partitioner.learn(
+        {
+            "area": "1",
+            "date_from": "2022-11-30T00:00:00+0000",
+            "date_to": "2022-12-01T00:00:00+0000",
+            "professional_role": "96",
+        }
+    )
+    partitioner.save()
+
+    loaded = QueryPartitioner(path)
+
+    assert loaded.splits == {"1": {"window": 86400}}
+    assert loaded.roles == ["96"]
+    assert loaded.role_windows == partitioner.role_windows
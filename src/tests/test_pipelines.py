@@ -0,0 +1,84 @@
+from typing import Any, List
+
+import pytest
+from pymongo import ReplaceOne, UpdateOne
+from scrapy import Spider
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+from twisted.internet import defer
+
+from vacancies.vacancies import storage
+from vacancies.vacancies.changes import ContentHashes
+from vacancies.vacancies.pipelines import MongoDBPipeline
+from vacancies.vacancies.storage import BulkWriter
+
+
+class Result:
+    upserted_count = 0
+    modified_count = 0
+
+
+class Collection:
+    """
+    Коллекция, запоминающая записанные пакеты.
+    """
+
+    def __init__(self) -> None:
+        self.batches: List[List[Any]] = []
+
+    def bulk_write(self, operations: List[Any], ordered: bool = True) -> Result:
+        self.batches.append(list(operations))
+
+        return Result()
+
+
+@pytest.fixture
+def writes(monkeypatch: pytest.MonkeyPatch) -> List[defer.Deferred]:
+    # запись пакетов не завершается, пока не сработают отложенные результаты
+    writes: List[defer.Deferred] = []
+
+    def deferred_write(function: Any, *args: Any) -> defer.Deferred:
+        deferred: defer.Deferred = defer.Deferred()
+        deferred.addCallback(lambda _: function(*args))
+        writes.append(deferred)
+        return deferred
+
+    monkeypatch.setattr(storage.threads, "deferToThread", deferred_write)
+
+    return writes
+
+
+def test_relabel_waits_for_pending_write(writes: List[defer.Deferred]) -> None:
+    spider = Spider(name="vacancies")
+    stats = MemoryStatsCollector(get_crawler(Spider))
+    stats.open_spider(spider)
+    collection = Collection()
+    pipeline = MongoDBPipeline("mongodb://localhost", "items", stats)
+    pipeline.hashes = ContentHashes()
+    pipeline.writer = BulkWriter(
+        collection, stats=stats, spider=spider, batch_size=1, flush_interval=0  # type: ignore
+    )
+    # вакансия не сохранялась
+    pipeline._prefetched["1"] = None
+
+    pipeline.process_item(
+        {"id": "1", "name": "Developer", "duplicate_cluster": "1"}, spider
+    )
+    pipeline.relabel({"1": "2", "3": "2"}, spider)
+
+    # кластер сохраненной вакансии изменяется сразу,
+    # кластер вакансии с неподтвержденной записью – после подтверждения
+    assert len(writes) == 2
+    for write in writes[:2]:
+        write.callback(None)
+    assert len(writes) == 3
+    writes[2].callback(None)
+
+    operations = [operation for batch in collection.batches for operation in batch]
+    assert [type(operation) for operation in operations] == [
+        ReplaceOne,
+        UpdateOne,
+        UpdateOne,
+    ]
+    assert [operation._filter["id"] for operation in operations] == ["1", "3", "1"]
+    assert "1" not in pipeline._writing
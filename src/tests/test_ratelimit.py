@@ -0,0 +1,126 @@
+import pytest
+
+from vacancies.vacancies.ratelimit import TokenBucket, parse_retry_after
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (None, None),
+        (b"", None),
+        (b"120", 120.0),
+        (b" 5 ", 5.0),
+        (b"Thu, 01 Dec 2022 00:01:00 GMT", 60.0),
+        (b"Thu, 01 Dec 2022 00:00:00 GMT", 0.0),
+        (b"Wed, 30 Nov 2022 23:00:00 GMT", 0.0),
+        (b"soon", None),
+    ],
+)
+def test_parse_retry_after(value: bytes, expected: float) -> None:
+    # 2022-12-01 00:00:00 UTC
+    assert parse_retry_after(value, now=1669852800.0) == expected
+
+
+def test_burst_then_rate() -> None:
+    clock = Clock()
+    bucket = TokenBucket(max_rate=2.0, burst=2.0, clock=clock)
+
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    # следующие токены резервируются в будущем с интервалом 1 / rate
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+
+    clock.now = 10.0
+    assert bucket.reserve() == 0.0
+
+
+def test_backoff_slows_down_and_pauses() -> None:
+    clock = Clock()
+    bucket = TokenBucket(
+        max_rate=4.0, burst=4.0, min_rate=1.0, backoff_delay=5.0, clock=clock
+    )
+
+    assert bucket.backoff() == 5.0
+    assert bucket.rate == 2.0
+    # токены начинают накапливаться только после окончания паузы
+    assert bucket.reserve() == pytest.approx(5.0 + 1 / 2.0)
+
+    # пауза растет экспоненциально, скорость не опускается ниже минимальной
+    clock.now = 6.0
+    assert bucket.backoff() == 10.0
+    clock.now = 20.0
+    assert bucket.backoff() == 20.0
+    assert bucket.rate == 1.0
+
+
+def test_simultaneous_rejections_are_one_backoff() -> None:
+    clock = Clock()
+    bucket = TokenBucket(max_rate=4.0, burst=4.0, backoff_delay=5.0, clock=clock)
+
+    # ответы на запросы, отправленные до паузы, только продлевают ее
+    assert [bucket.backoff() for _ in range(16)] == [5.0] * 16
+    assert bucket.rate == 2.0
+    assert bucket.backoffs == 1
+
+    clock.now = 1.0
+    assert bucket.backoff(retry_after=30.0) == 30.0
+    assert bucket.paused_until == 31.0
+    assert bucket.rate == 2.0
+    assert bucket.reserve() == pytest.approx(30.0 + 1 / 2.0)
+
+
+def test_backoff_respects_retry_after() -> None:
+    clock = Clock()
+    bucket = TokenBucket(
+        max_rate=1.0, backoff_delay=1.0, max_backoff_delay=2.0, clock=clock
+    )
+
+    assert bucket.backoff(retry_after=30.0) == 30.0
+    assert bucket.paused_until == 30.0
+
+
+def test_recovery_after_successes() -> None:
+    clock = Clock()
+    bucket = TokenBucket(
+        max_rate=4.0, recovery_step=1.0, recovery_window=3, clock=clock
+    )
+    bucket.backoff()
+    clock.now = 10.0
+    bucket.backoff()
+    assert bucket.rate == 1.0
+
+    for _ in range(3):
+        bucket.success()
+    assert bucket.rate == 2.0
+    assert bucket.backoffs == 0
+
+    for _ in range(6):
+        bucket.success()
+    assert bucket.rate == 4.0
+
+
+def test_rate_recovers_under_rare_rejections() -> None:
+    clock = Clock()
+    bucket = TokenBucket(max_rate=4.0, burst=4.0, min_rate=0.2, clock=clock)
+    rates = []
+
+    # каждый 50-й ответ (2 %) – отказ
+    for number in range(1, 5001):
+        clock.now += bucket.reserve()
+        if number % 50:
+            bucket.success()
+        else:
+            rates.append(bucket.rate)
+            bucket.backoff(retry_after=1.0)
+
+    # между отказами скорость возвращается к максимальной
+    assert rates == [4.0] * 100
@@ -0,0 +1,108 @@
+import math
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pytest
+
+from vacancies.vacancies.salary import CurrencyRates, normalize, normalize_columns
+
+# зарплата, дата публикации и период оплаты
+CASES: List[Any] = [
+    ({"from": 100000, "to": 150000, "currency": "RUR", "gross": False}, "2022-11-01"),
+    ({"from": 100000, "to": None, "currency": "RUB", "gross": True}, "2022-11-01"),
+    ({"from": None, "to": 3000, "currency": "USD", "gross": False}, "2022-10-15"),
+    ({"from": 2000, "to": 3000, "currency": "USD", "gross": True}, "2022-11-20"),
+    ({"from": 2000, "to": 3000, "currency": "EUR", "gross": False}, "2022-09-01"),
+    ({"from": 500, "to": None, "currency": "KZT", "gross": False}, "2022-11-20"),
+    ({"from": 1000, "to": 2000, "currency": "XXX", "gross": False}, "2022-11-20"),
+    ({"from": 0, "to": None, "currency": "RUR", "gross": False}, "2022-11-20"),
+    (
+        {"from": 1500, "to": 2000, "currency": "RUR", "gross": False, "mode": "HOUR"},
+        "2022-11-20",
+    ),
+]
+
+
+@pytest.fixture
+def rates(tmp_path) -> CurrencyRates:  # type: ignore[no-untyped-def]
+    rates = CurrencyRates(str(tmp_path / "rates.json"))
+    rates.record(
+        [{"code": "USD", "rate": 0.016}, {"code": "EUR", "rate": 0.015}],
+        date(2022, 10, 1),
+    )
+    rates.record(
+        [
+            {"code": "USD", "rate": 0.0165},
+            {"code": "EUR", "rate": 0.016},
+            {"code": "KZT", "rate": 7.6},
+        ],
+        date(2022, 11, 15),
+    )
+
+    return rates
+
+
+def test_rates_at(rates: CurrencyRates) -> None:
+    # для дат до первого сохраненного курса используется самый ранний курс
+    assert rates.at("2022-09-01")["USD"] == 0.016
+    assert rates.at("2022-11-15T10:00:00+0300")["USD"] == 0.0165
+    assert "KZT" not in rates.at("2022-11-14")
+
+
+def test_normalize() -> None:
+    assert normalize({"from": 1000, "to": None, "currency": "USD"}, {"USD": 0.02}) == {
+        "from": 50000.0,
+        "to": None,
+    }
+    assert normalize({"from": 100000, "currency": "RUR", "gross": True}, {}) == {
+        "from": 87000.0,
+        "to": None,
+    }
+    assert normalize({"from": 1000, "currency": "USD"}, {}) is None
+    assert normalize(None, {}) is None
+
+
+def test_normalize_columns_matches_normalize(rates: CurrencyRates) -> None:
+    salaries = [salary for salary, _ in CASES]
+    days = [day for _, day in CASES]
+    modes = [salary.get("mode") for salary in salaries]
+
+    salary_from, salary_to = normalize_columns(
+        [
+            salary["from"] if salary["from"] is not None else np.nan
+            for salary in salaries
+        ],
+        [salary["to"] if salary["to"] is not None else np.nan for salary in salaries],
+        [salary["currency"] for salary in salaries],
+        [salary["gross"] for salary in salaries],
+        np.array(days, dtype="datetime64[D]"),
+        rates,
+        modes,
+    )
+
+    for row, (salary, day) in enumerate(CASES):
+        expected: Optional[Dict[str, Optional[float]]] = normalize(
+            salary, rates.at(day), salary.get("mode")
+        )
+        for key, values in (("from", salary_from), ("to", salary_to)):
+            value = expected[key] if expected is not None else None
+            if value is None:
+                assert math.isnan(values[row]), (row, key)
+            else:
+                assert values[row] == pytest.approx(value), (row, key)
+
+
+def test_normalize_columns_without_rates(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    salary_from, salary_to = normalize_columns(
+        [100000.0, 1000.0],
+        [np.nan, np.nan],
+        ["RUR", "USD"],
+        [False, False],
+        ["2022-11-01", "2022-11-01"],
+        CurrencyRates(str(tmp_path / "missing.json")),
+    )
+
+    assert salary_from[0] == 100000.0
+    assert math.isnan(salary_from[1])
+    assert np.isnan(salary_to).all()
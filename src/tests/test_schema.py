@@ -0,0 +1,72 @@
+from collections import Counter
+from typing import Any, Dict, Iterator, List
+
+import pytest
+from pymongo import IndexModel
+from pymongo.errors import DuplicateKeyError
+
+from vacancies.vacancies.schema import (
+    VACANCIES_INDEXES,
+    IndexSpec,
+    check_indexes,
+    ensure_indexes,
+)
+
+
+class Collection:
+    """
+    Коллекция с индексами, хранящая документы в памяти.
+    """
+
+    def __init__(self, documents: List[Dict[str, Any]]) -> None:
+        self.documents = documents
+        self.indexes: Dict[str, Dict[str, Any]] = {"_id_": {"key": [("_id", 1)]}}
+
+    def index_information(self) -> Dict[str, Dict[str, Any]]:
+        return dict(self.indexes)
+
+    def drop_index(self, name: str) -> None:
+        del self.indexes[name]
+
+    def create_indexes(self, models: List[IndexModel]) -> None:
+        for model in models:
+            document = model.document
+            self.indexes[document["name"]] = {
+                "key": list(document["key"].items()),
+                "unique": document.get("unique", False),
+            }
+
+    def aggregate(
+        self, pipeline: List[Dict[str, Any]], allowDiskUse: bool = False
+    ) -> Iterator[Dict[str, Any]]:
+        keys = [key[1:] for key in pipeline[0]["$group"]["_id"]]
+        counts = Counter(
+            tuple(document.get(key) for key in keys) for document in self.documents
+        )
+        for values, count in counts.items():
+            if count > 1:
+                yield {"_id": list(values), "count": count}
+
+
+def test_ensure_indexes_creates_missing() -> None:
+    collection = Collection([{"id": "1"}, {"id": "2"}])
+
+    drift = ensure_indexes(collection, VACANCIES_INDEXES)
+
+    assert len(drift.missing) == len(VACANCIES_INDEXES)
+    assert not check_indexes(collection, VACANCIES_INDEXES)
+
+
+def test_duplicates_keep_mismatched_index() -> None:
+    collection = Collection([{"id": "1"}, {"id": "1"}])
+    collection.create_indexes([IndexSpec(keys=(("id", 1),)).to_model()])
+
+    with pytest.raises(DuplicateKeyError):
+        ensure_indexes(collection, VACANCIES_INDEXES[:1])
+
+    # неуникальный индекс остается, пока не удалены повторы
+    assert collection.indexes["id_1"] == {"key": [("id", 1)], "unique": False}
+
+    collection.documents.pop()
+    assert ensure_indexes(collection, VACANCIES_INDEXES[:1]).mismatched
+    assert collection.indexes["id_1"]["unique"] is True
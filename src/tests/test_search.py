@@ -0,0 +1,94 @@
+from typing import Any, Dict, Iterator, List
+
+import pytest
+
+from vacancies.vacancies.search import AREA, ROLE, SKILL, SearchIndex
+
+
+def vacancy(vacancy_id: str, name: str, **fields: Any) -> Dict[str, Any]:
+    return {
+        "id": vacancy_id,
+        "name": name,
+        "area": {"id": "1"},
+        "professional_roles": [{"id": "96"}],
+        "experience": {"id": "between1And3"},
+        "key_skills": [{"name": "Python"}],
+        "description_tokens": ["сервис", "машинный", "обучение"],
+        "published_at": f"2022-11-{10 + int(vacancy_id):02d}T10:00:00+0300",
+        **fields,
+    }
+
+
+VACANCIES: List[Dict[str, Any]] = [
+    vacancy("1", "Python разработчик"),
+    vacancy(
+        "2",
+        "Data scientist",
+        area={"id": "2"},
+        professional_roles=[{"id": "165"}],
+        key_skills=[{"name": "Python"}, {"name": "SQL"}],
+    ),
+    vacancy(
+        "3",
+        "Водитель погрузчика",
+        area={"id": "2"},
+        professional_roles=[{"id": "21"}],
+        key_skills=[],
+        description_tokens=["склад"],
+    ),
+]
+
+
+@pytest.fixture
+def index(tmp_path) -> Iterator[SearchIndex]:  # type: ignore[no-untyped-def]
+    index = SearchIndex(str(tmp_path / "search.sqlite"), buffer_size=2)
+    yield index
+    index.close()
+
+
+def test_add_reports_full_buffer(index: SearchIndex) -> None:
+    assert index.add(VACANCIES[0]) is False
+    assert index.add(VACANCIES[1]) is True
+
+    index.commit()
+
+    assert len(index) == 2
+
+
+def test_search(index: SearchIndex) -> None:
+    for document in VACANCIES:
+        index.add(document)
+
+    # слова запроса приводятся к леммам
+    assert index.search("разработчики").ids == ["1"]
+    assert sorted(index.search("python").ids) == ["1", "2"]
+    assert index.search(skills=["sql"]).ids == ["2"]
+    assert index.search(areas=["2"], roles=["21"]).ids == ["3"]
+    # без текста вакансии упорядочены по дате публикации
+    assert index.search().ids == ["3", "2", "1"]
+
+    result = index.search(areas=["2"], facets=(AREA, ROLE, SKILL))
+    assert result.total == 2
+    assert result.facets[AREA] == [("2", 2)]
+    assert sorted(result.facets[ROLE]) == [("165", 1), ("21", 1)]
+    assert sorted(result.facets[SKILL]) == [("Python", 1), ("SQL", 1)]
+
+
+def test_changed_vacancy_is_reindexed(index: SearchIndex) -> None:
+    index.add(VACANCIES[0])
+    index.commit()
+
+    index.add(vacancy("1", "Python разработчик", key_skills=[{"name": "Django"}]))
+    index.commit()
+
+    assert len(index) == 1
+    assert index.search(skills=["django"]).ids == ["1"]
+    assert index.search(skills=["python"]).ids == []
+
+
+def test_rebuild(index: SearchIndex) -> None:
+    index.add(vacancy("9", "Устаревшая вакансия"))
+
+    assert index.rebuild(VACANCIES, batch_size=2) == 3
+    assert len(index) == 3
+    assert index.search("погрузчик").ids == ["3"]
@@ -0,0 +1,89 @@
+from typing import Iterator
+
+import pytest
+
+from vacancies.vacancies.sharding import (
+    DONE,
+    LEASED,
+    PENDING,
+    ShardLeases,
+    SQLiteShardLeases,
+)
+
+RUN = "2022-11-20"
+
+
+@pytest.fixture
+def leases(tmp_path) -> Iterator[SQLiteShardLeases]:  # type: ignore[no-untyped-def]
+    leases = SQLiteShardLeases(str(tmp_path / "shards.sqlite"))
+    yield leases
+    leases.close()
+
+
+def test_shard_leases_is_abstract() -> None:
+    with pytest.raises(TypeError):
+        ShardLeases()  # type: ignore[abstract]
+
+
+def test_seed_and_claim(leases: SQLiteShardLeases) -> None:
+    assert leases.seed(RUN, ["1", "2", "3"]) == 3
+    # повторная запись не изменяет существующие шарды
+    assert leases.seed(RUN, ["1", "2", "3", "4"]) == 1
+
+    first = leases.claim(RUN, "first", ttl=60, count=3)
+    second = leases.claim(RUN, "second", ttl=60, count=3)
+
+    assert len(first) == 3
+    assert len(second) == 1
+    assert not set(first) & set(second)
+    assert leases.claim(RUN, "third", ttl=60) == []
+    assert leases.progress(RUN) == {PENDING: 0, LEASED: 4, DONE: 0}
+
+
+def test_expired_lease_is_claimed_again(leases: SQLiteShardLeases) -> None:
+    leases.seed(RUN, ["1", "2"])
+    leases.claim(RUN, "first", ttl=-1, count=2)
+
+    assert leases.renew(RUN, "first", ttl=60) == 2
+    assert leases.claim(RUN, "second", ttl=60) == []
+
+    # аренда остановившегося процесса истекает
+    leases.renew(RUN, "first", ttl=-1)
+    assert len(leases.claim(RUN, "second", ttl=60, count=2)) == 2
+    assert leases.renew(RUN, "first", ttl=60) == 0
+
+
+def test_complete_and_release(leases: SQLiteShardLeases) -> None:
+    leases.seed(RUN, ["1", "2", "3"])
+    claimed = leases.claim(RUN, "first", ttl=60, count=2)
+
+    leases.complete(RUN, "first", claimed[:1])
+    # шарды другого процесса не отмечаются
+    leases.complete(RUN, "second", claimed[1:])
+    leases.release(RUN, "first")
+
+    assert leases.progress(RUN) == {PENDING: 2, LEASED: 0, DONE: 1}
+    assert claimed[0] not in leases.claim(RUN, "second", ttl=60, count=3)
+
+
+def test_claim_vacancies(leases: SQLiteShardLeases) -> None:
+    assert leases.claim_vacancies(RUN, "1", []) == []
+    assert leases.claim_vacancies(RUN, "1", ["10", "11"]) == ["10", "11"]
+    assert leases.claim_vacancies(RUN, "2", ["11", "12"]) == ["12"]
+    # при повторной обработке шарда его вакансии снова доступны
+    assert leases.claim_vacancies(RUN, "1", ["10", "11", "12"]) == ["10", "11"]
+    assert leases.claim_vacancies("other", "2", ["10"]) == ["10"]
+
+    leases.finish(RUN)
+
+    assert leases.claim_vacancies(RUN, "2", ["10"]) == ["10"]
+
+
+def test_reset(leases: SQLiteShardLeases) -> None:
+    leases.seed(RUN, ["1", "2"])
+    leases.claim_vacancies(RUN, "1", ["10"])
+
+    leases.reset(RUN)
+
+    assert leases.progress(RUN) == {PENDING: 0, LEASED: 0, DONE: 0}
+    assert leases.claim_vacancies(RUN, "2", ["10"]) == ["10"]
@@ -0,0 +1,258 @@
+from typing import Any, List, Optional
+
+import pytest
+from pymongo import InsertOne
+from pymongo.errors import AutoReconnect, BulkWriteError
+from scrapy import Spider
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+from twisted.internet import defer
+
+from vacancies.vacancies import storage
+from vacancies.vacancies.storage import BulkWriter
+
+
+class Result:
+    upserted_count = 0
+    modified_count = 0
+
+    def __init__(self, operations: List[Any]) -> None:
+        self.inserted_count = len(operations)
+
+
+class Collection:
+    """
+    Коллекция, запоминающая записанные пакеты.
+    """
+
+    def __init__(self, error: Optional[Exception] = None) -> None:
+        self.batches: List[List[Any]] = []
+        self.error = error
+
+    def bulk_write(self, operations: List[Any], ordered: bool = True) -> Result:
+        assert ordered is False
+        if self.error is not None:
+            raise self.error
+        self.batches.append(list(operations))
+
+        return Result(operations)
+
+
+@pytest.fixture(autouse=True)
+def synchronous_threads(monkeypatch: pytest.MonkeyPatch) -> None:
+    # запись выполняется сразу, без пула потоков реактора
+    monkeypatch.setattr(
+        storage.threads,
+        "deferToThread",
+        lambda function, *args: defer.maybeDeferred(function, *args),
+    )
+
+
+@pytest.fixture
+def spider() -> Spider:
+    return Spider(name="vacancies")
+
+
+@pytest.fixture
+def stats(spider: Spider) -> MemoryStatsCollector:
+    stats = MemoryStatsCollector(get_crawler(Spider))
+    stats.open_spider(spider)
+
+    return stats
+
+
+def writer(
+    collection: Collection, stats: MemoryStatsCollector, spider: Spider, **kwargs: Any
+) -> BulkWriter:
+    return BulkWriter(
+        collection, stats=stats, spider=spider, flush_interval=0, **kwargs  # type: ignore
+    )
+
+
+def test_buffers_until_batch_size(stats: MemoryStatsCollector, spider: Spider) -> None:
+    collection = Collection()
+    bulk = writer(collection, stats, spider, batch_size=3)
+
+    assert bulk.add(InsertOne({"id": 1})) is None
+    assert bulk.add(InsertOne({"id": 2})) is None
+    assert collection.batches == []
+
+    assert bulk.add(InsertOne({"id": 3})) is not None
+    assert [len(batch) for batch in collection.batches] == [3]
+    assert stats.get_value("mongodb/batches") == 1
+
+
+def test_close_flushes_remainder(stats: MemoryStatsCollector, spider: Spider) -> None:
+    collection = Collection()
+    bulk = writer(collection, stats, spider, batch_size=10)
+    for number in range(4):
+        bulk.add(InsertOne({"id": number}))
+
+    closed = bulk.close()
+
+    assert closed.called
+    assert [len(batch) for batch in collection.batches] == [4]
+
+
+def test_flush_of_empty_buffer(stats: MemoryStatsCollector, spider: Spider) -> None:
+    bulk = writer(Collection(), stats, spider)
+
+    assert bulk.flush() is None
+    assert bulk.close().called
+
+
+def test_pending_batches_are_limited(
+    stats: MemoryStatsCollector, spider: Spider, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # запись пакетов не завершается, пока не сработают отложенные результаты
+    writes: List[defer.Deferred] = []
+
+    def deferred_write(function: Any, *args: Any) -> defer.Deferred:
+        deferred: defer.Deferred = defer.Deferred()
+        deferred.addCallback(lambda _: function(*args))
+        writes.append(deferred)
+        return deferred
+
+    monkeypatch.setattr(storage.threads, "deferToThread", deferred_write)
+    collection = Collection()
+    bulk = writer(collection, stats, spider, batch_size=1, max_pending=1)
+
+    first = bulk.add(InsertOne({"id": 1}))
+    second = bulk.add(InsertOne({"id": 2}))
+
+    assert first is not None and first.called
+    assert second is not None and not second.called
+    assert len(writes) == 1
+
+    writes[0].callback(None)
+
+    assert second.called
+    assert len(writes) == 2
+    writes[1].callback(None)
+    assert [len(batch) for batch in collection.batches] == [1, 1]
+
+
+def test_write_errors_are_counted(stats: MemoryStatsCollector, spider: Spider) -> None:
+    error = BulkWriteError({"writeErrors": [{"index": 0}, {"index": 2}]})
+    bulk = writer(Collection(error), stats, spider, batch_size=3)
+    for number in range(3):
+        bulk.add(InsertOne({"id": number}))
+
+    assert stats.get_value("mongodb/batches") == 1
+    assert stats.get_value("mongodb/write_errors") == 2
+
+
+def test_failed_batch_is_counted(stats: MemoryStatsCollector, spider: Spider) -> None:
+    bulk = writer(
+        Collection(AutoReconnect("connection lost")),
+        stats,
+        spider,
+        batch_size=2,
+        stats_prefix="mongodb/history",
+    )
+    bulk.add(InsertOne({"id": 1}))
+    bulk.add(InsertOne({"id": 2}))
+
+    assert bulk.close().called
+    assert stats.get_value("mongodb/history/batch_errors") == 1
+    assert stats.get_value("mongodb/history/write_errors") == 2
+
+
+def test_acknowledges_written_operations(
+    stats: MemoryStatsCollector, spider: Spider
+) -> None:
+    acknowledged: List[int] = []
+    bulk = writer(Collection(), stats, spider, batch_size=2)
+
+    bulk.add(InsertOne({"id": 1}), lambda: acknowledged.append(1))
+    assert acknowledged == []
+    bulk.add(InsertOne({"id": 2}), lambda: acknowledged.append(2))
+
+    assert acknowledged == [1, 2]
+
+
+def test_failed_operations_are_not_acknowledged(
+    stats: MemoryStatsCollector, spider: Spider
+) -> None:
+    acknowledged: List[int] = []
+    error = BulkWriteError({"writeErrors": [{"index": 1}]})
+    bulk = writer(Collection(error), stats, spider, batch_size=3)
+    for number in range(3):
+        bulk.add(InsertOne({"id": number}), lambda n=number: acknowledged.append(n))
+
+    assert acknowledged == [0, 2]
+
+    bulk = writer(Collection(AutoReconnect("lost")), stats, spider, batch_size=1)
+    bulk.add(InsertOne({"id": 3}), lambda: acknowledged.append(3))
+
+    assert acknowledged == [0, 2]
+
+
+def test_callback_error_does_not_stop_batch(
+    stats: MemoryStatsCollector, spider: Spider
+) -> None:
+    acknowledged: List[int] = []
+    failed: List[int] = []
+
+    def broken() -> None:
+        raise ValueError("broken callback")
+
+    bulk = writer(Collection(), stats, spider, batch_size=3)
+    bulk.add(InsertOne({"id": 0}), broken)
+    bulk.add(InsertOne({"id": 1}), lambda: acknowledged.append(1))
+    written = bulk.add(InsertOne({"id": 2}), lambda: acknowledged.append(2))
+
+    assert acknowledged == [1, 2]
+    assert written is not None and written.called
+
+    bulk = writer(Collection(AutoReconnect("lost")), stats, spider, batch_size=2)
+    bulk.add(InsertOne({"id": 3}), None, broken)
+    bulk.add(InsertOne({"id": 4}), None, lambda: failed.append(4))
+
+    assert failed == [4]
+    assert bulk.close().called
+
+
+def test_failed_operations_are_reported(
+    stats: MemoryStatsCollector, spider: Spider
+) -> None:
+    failed: List[int] = []
+    error = BulkWriteError({"writeErrors": [{"index": 1}]})
+    bulk = writer(Collection(error), stats, spider, batch_size=2)
+    for number in range(2):
+        bulk.add(InsertOne({"id": number}), None, lambda n=number: failed.append(n))
+
+    assert failed == [1]
+
+    bulk = writer(Collection(AutoReconnect("lost")), stats, spider, batch_size=2)
+    for number in range(2, 4):
+        bulk.add(InsertOne({"id": number}), None, lambda n=number: failed.append(n))
+
+    assert failed == [1, 2, 3]
+
+
+def test_drain_waits_for_pending_batches(
+    stats: MemoryStatsCollector, spider: Spider, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    writes: List[defer.Deferred] = []
+
+    def deferred_write(function: Any, *args: Any) -> defer.Deferred:
+        deferred: defer.Deferred = defer.Deferred()
+        deferred.addCallback(lambda _: function(*args))
+        writes.append(deferred)
+        return deferred
+
+    monkeypatch.setattr(storage.threads, "deferToThread", deferred_write)
+    collection = Collection()
+    bulk = writer(collection, stats, spider, batch_size=2, max_pending=2)
+    for number in range(3):
+        bulk.add(InsertOne({"id": number}))
+
+    drained: List[Any] = []
+    bulk.drain().addCallback(drained.append)
+
+    assert drained == []
+    for write in writes:
+        write.callback(None)
+    assert len(drained) == 1
+    assert [len(batch) for batch in collection.batches] == [2, 1]
@@ -0,0 +1,311 @@
+import math
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+
+# поля вакансии, от которых зависят агрегаты
+AGGREGATED_FIELDS = ("key_skills", "salary", "salary_rub", "area", "professional_roles")
+# коды рубля в справочнике валют
+RUBLES = ("RUR", "RUB")
+# виды агрегатов: навык, регион, профессиональная роль
+SKILL, AREA, ROLE = "skill", "area", "role"
+
+# относительная точность квантилей зарплаты
+SKETCH_ACCURACY = 0.01
+GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+
+
+def bucket(value: float) -> int:
+    """
+    Номер корзины логарифмической гистограммы для значения.
+
+    Границы корзин растут в геометрической прогрессии, поэтому любое значение
+    восстанавливается по номеру корзины с относительной ошибкой не более
+    ``SKETCH_ACCURACY`` (как в DDSketch).
+
+    :param value: Положительное значение.
+    :return:
+    """
+
+    return int(math.ceil(math.log(value) / _LOG_GAMMA))
+
+
+def bucket_value(index: int) -> float:
+    """
+    Значение, соответствующее корзине гистограммы.
+
+    :param index: Номер корзины.
+    :return:
+    """
+
+    return 2 * GAMMA**index / (GAMMA + 1)
+
+
+def quantiles(
+    buckets: Dict[str, int], levels: Iterable[float]
+) -> List[Optional[float]]:
+    """
+    Квантили по гистограмме зарплат.
+
+    :param buckets: Гистограмма "номер корзины" – "количество".
+    :param levels: Уровни квантилей (от 0 до 1).
+    :return: Значения квантилей (None, если гистограмма пуста).
+    """
+
+    counts = sorted(
+        (int(index), count) for index, count in buckets.items() if count > 0
+    )
+    total = sum(count for _, count in counts)
+    result: List[Optional[float]] = []
+    for level in levels:
+        if not total:
+            result.append(None)
+            continue
+
+        rank = level * (total - 1)
+        seen = 0
+        for index, count in counts:
+            seen += count
+            if seen > rank:
+                result.append(round(bucket_value(index), 2))
+                break
+
+    return result
+
+
+def salary_value(document: Dict[str, Any]) -> Optional[float]:
+    """
+    Зарплата вакансии для гистограмм: середина вилки (или ее граница).
+
+    Используется зарплата в рублях "на руки" за месяц (``salary_rub``,
+    см. ``SalaryPipeline``); у вакансий без нее – зарплата в рублях как есть.
+
+    :param document: Документ вакансии.
+    :return:
+    """
+
+    salary = document.get("salary_rub")
+    raw = document.get("salary")
+    if salary is None and isinstance(raw, dict) and raw.get("currency") in RUBLES:
+        salary = raw
+    if not isinstance(salary, dict):
+        return None
+
+    bounds = [
+        value
+        for value in (salary.get("from"), salary.get("to"))
+        if isinstance(value, (int, float)) and value > 0
+    ]
+
+    return sum(bounds) / len(bounds) if bounds else None
+
+
+def field_key(name: str) -> str:
+    """
+    Экранирование названия навыка для использования в пути поля MongoDB.
+
+    :param name: Название навыка.
+    :return:
+    """
+
+    key = name.replace(".", "．")
+
+    return f"＄{key[1:]}" if key.startswith("$") else key
+
+
+def skill_name(key: str) -> str:
+    """
+    Название навыка по экранированному ключу (обратное ``field_key``).
+
+    :param key: Ключ поля.
+    :return:
+    """
+
+    name = key.replace("．", ".")
+
+    return f"${name[1:]}" if name.startswith("＄") else name
+
+
+def contributions(
+    document: Dict[str, Any]
+) -> Iterable[Tuple[str, str, Dict[str, int]]]:
+    """
+    Вклад вакансии в агрегаты.
+
+    :param document: Документ вакансии (достаточно полей ``AGGREGATED_FIELDS``).
+    :return: Тройки "вид агрегата" – "ключ" – "приращения полей".
+    """
+
+    skills = sorted(
+        {
+            skill["name"]
+            for skill in document.get("key_skills") or []
+            if isinstance(skill, dict) and skill.get("name")
+        }
+    )
+    value = salary_value(document)
+    salary: Dict[str, int] = {f"salary.{bucket(value)}": 1} if value is not None else {}
+
+    for name in skills:
+        fields = {"count": 1, **salary}
+        for other in skills:
+            if other != name:
+                fields[f"cooccurrence.{field_key(other)}"] = 1
+        yield SKILL, name, fields
+
+    area = (document.get("area") or {}).get("id")
+    if area is not None:
+        yield AREA, str(area), {"count": 1, **salary}
+
+    roles = {
+        str(role["id"])
+        for role in document.get("professional_roles") or []
+        if isinstance(role, dict) and role.get("id") is not None
+    }
+    for role in sorted(roles):
+        yield ROLE, role, {"count": 1, **salary}
+
+
+class AggregatesBuffer:
+    """
+    Накопление изменений агрегатов между записями пакетов.
+
+    Приращения одного агрегата от разных вакансий складываются, поэтому
+    в пакет записи попадает одна операция ``$inc`` на агрегат.
+    """
+
+    def __init__(self) -> None:
+        self._changes: Dict[str, Counter] = defaultdict(Counter)
+        self.vacancies = 0
+
+    def __len__(self) -> int:
+        return len(self._changes)
+
+    def add(self, document: Dict[str, Any], sign: int = 1) -> None:
+        """
+        Учет вакансии в агрегатах.
+
+        :param document: Документ вакансии.
+        :param sign: 1 – добавление вакансии, -1 – удаление ее предыдущей версии.
+        :return:
+        """
+
+        for kind, key, fields in contributions(document):
+            changes = self._changes[f"{kind}:{key}"]
+            for path, value in fields.items():
+                changes[path] += sign * value
+        self.vacancies += 1
+
+    def operations(self) -> List[UpdateOne]:
+        """
+        Операции записи накопленных изменений (буфер очищается).
+
+        :return:
+        """
+
+        operations = []
+        for identifier, changes in self._changes.items():
+            increments = {path: value for path, value in changes.items() if value}
+            if not increments:
+                continue
+            kind, key = identifier.split(":", 1)
+            operations.append(
+                UpdateOne(
+                    {"_id": identifier},
+                    {"$inc": increments, "$setOnInsert": {"kind": kind, "key": key}},
+                    upsert=True,
+                )
+            )
+        self._changes.clear()
+        self.vacancies = 0
+
+        return operations
+
+
+class Aggregates:
+    """
+    Запросы к агрегатам навыков, регионов и профессиональных ролей.
+
+    Агрегат – документ коллекции с идентификатором ``<вид>:<ключ>``:
+    количество вакансий (``count``), гистограмма зарплат (``salary``)
+    и для навыков – количество совместных упоминаний с другими навыками
+    (``cooccurrence``, строка разреженной матрицы).
+    """
+
+    def __init__(self, collection: Collection) -> None:
+        """
+        :param collection: Коллекция агрегатов.
+        """
+
+        self.collection = collection
+
+    def get(self, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Агрегат по виду и ключу.
+
+        :param kind: Вид агрегата (``skill``, ``area``, ``role``).
+        :param key: Название навыка или идентификатор региона (роли).
+        :return:
+        """
+
+        return self.collection.find_one({"_id": f"{kind}:{key}"})
+
+    def top(self, kind: str, limit: int = 20) -> List[Tuple[str, int]]:
+        """
+        Самые частые значения (например, навыки).
+
+        :param kind: Вид агрегата.
+        :param limit: Количество значений.
+        :return: Пары "ключ" – "количество вакансий".
+        """
+
+        cursor = self.collection.find(
+            {"kind": kind},
+            {"key": True, "count": True},
+            sort=[("count", -1)],
+            limit=limit,
+        )
+
+        return [(document["key"], document["count"]) for document in cursor]
+
+    def cooccurring(self, skill: str, limit: int = 20) -> List[Tuple[str, int]]:
+        """
+        Навыки, чаще всего упоминаемые вместе с навыком.
+
+        :param skill: Название навыка.
+        :param limit: Количество навыков.
+        :return: Пары "навык" – "количество совместных упоминаний".
+        """
+
+        document = self.collection.find_one(
+            {"_id": f"{SKILL}:{skill}"}, {"cooccurrence": True}
+        )
+        row = (document or {}).get("cooccurrence") or {}
+        pairs = sorted(
+            ((skill_name(key), count) for key, count in row.items() if count > 0),
+            key=lambda pair: (-pair[1], pair[0]),
+        )
+
+        return pairs[:limit]
+
+    def salary(
+        self, kind: str, key: str, levels: Iterable[float] = (0.1, 0.25, 0.5, 0.75, 0.9)
+    ) -> Dict[float, Optional[float]]:
+        """
+        Квантили зарплаты вакансий с навыком, в регионе или с ролью.
+
+        :param kind: Вид агрегата.
+        :param key: Ключ агрегата.
+        :param levels: Уровни квантилей.
+        :return: Словарь "уровень" – "зарплата".
+        """
+
+        levels = list(levels)
+        document = self.collection.find_one({"_id": f"{kind}:{key}"}, {"salary": True})
+
+        return dict(
+            zip(levels, quantiles((document or {}).get("salary") or {}, levels))
+        )
@@ -0,0 +1,3 @@
+# This package contains data preparation for the machine learning part of the project
+#
+# Modules depend on the optional "analysis" dependencies (pandas, pyarrow, scipy).
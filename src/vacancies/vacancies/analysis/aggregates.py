@@ -0,0 +1,206 @@
+"""
+Пересборка коллекции агрегатов (``MONGODB_AGGREGATES_COLLECTION``) с нуля.
+
+Коллекция вакансий читается один раз, навыки, регионы и профессиональные роли
+вакансий собираются в разреженные матрицы "вакансия – значение". Количества
+вакансий – суммы столбцов, совместные упоминания навыков – произведение
+``X.T @ X``, гистограммы зарплат – количества пар "значение – корзина".
+Документы записываются во временную коллекцию, которая затем атомарно
+заменяет коллекцию агрегатов::
+
+    scrapy aggregates --rebuild
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pymongo.collection import Collection
+
+from vacancies.vacancies.aggregates import (
+    AGGREGATED_FIELDS,
+    AREA,
+    GAMMA,
+    ROLE,
+    SKILL,
+    field_key,
+    salary_value,
+)
+from vacancies.vacancies.schema import AGGREGATES_INDEXES, ensure_indexes
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # pragma: no cover
+    sparse = None
+
+
+class _Indicators:
+    """
+    Построение разреженной матрицы "вакансия – значение" по строкам.
+    """
+
+    def __init__(self) -> None:
+        self.labels: Dict[str, int] = {}
+        self.indices: List[int] = []
+        self.indptr: List[int] = [0]
+
+    def add(self, values: List[str]) -> None:
+        for value in set(values):
+            self.indices.append(self.labels.setdefault(value, len(self.labels)))
+        self.indptr.append(len(self.indices))
+
+    def matrix(self) -> "sparse.csr_matrix":
+        indices = np.asarray(self.indices, dtype=np.int32)
+        return sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.int64), indices, self.indptr),
+            shape=(len(self.indptr) - 1, len(self.labels)),
+        )
+
+    def keys(self) -> List[str]:
+        return sorted(self.labels, key=self.labels.__getitem__)
+
+
+def _rows(matrix: "sparse.csr_matrix") -> Iterator[Tuple["np.ndarray", "np.ndarray"]]:
+    """
+    Ненулевые элементы строк разреженной матрицы.
+
+    :param matrix: Матрица CSR.
+    :return: Пары "номера столбцов" – "значения" для каждой строки.
+    """
+
+    indptr, indices, data = matrix.indptr, matrix.indices, matrix.data
+    for row in range(matrix.shape[0]):
+        start, end = indptr[row], indptr[row + 1]
+        yield indices[start:end], data[start:end]
+
+
+def _histograms(
+    indicators: "sparse.csr_matrix", buckets: "np.ndarray"
+) -> Tuple["sparse.csr_matrix", int]:
+    """
+    Гистограммы зарплат значений.
+
+    :param indicators: Матрица "вакансия – значение".
+    :param buckets: Номера корзин зарплат вакансий (пропуск – минимальное int64).
+    :return: Матрица "значение – корзина" и номер корзины первого столбца.
+    """
+
+    has_salary = buckets != np.iinfo(np.int64).min
+    coo = indicators[has_salary].tocoo()
+    columns = buckets[has_salary][coo.row]
+    offset = int(columns.min()) if len(columns) else 0
+    width = int(columns.max()) - offset + 1 if len(columns) else 0
+    histograms = sparse.csr_matrix(
+        (np.ones(len(columns), dtype=np.int64), (coo.col, columns - offset)),
+        shape=(indicators.shape[1], width),
+    )
+
+    return histograms, offset
+
+
+def build(vacancies: Collection, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+    """
+    Вычисление документов агрегатов по коллекции вакансий.
+
+    :param vacancies: Коллекция вакансий.
+    :param batch_size: Количество документов в одном пакете курсора MongoDB.
+    :return: Документы коллекции агрегатов.
+    """
+
+    skills, areas, roles = _Indicators(), _Indicators(), _Indicators()
+    salaries: List[float] = []
+    projection = {"_id": False, **{name: True for name in AGGREGATED_FIELDS}}
+    for vacancy in vacancies.find({}, projection, batch_size=batch_size):
+        skills.add(
+            [
+                skill["name"]
+                for skill in vacancy.get("key_skills") or []
+                if isinstance(skill, dict) and skill.get("name")
+            ]
+        )
+        area = (vacancy.get("area") or {}).get("id")
+        areas.add([str(area)] if area is not None else [])
+        roles.add(
+            [
+                str(role["id"])
+                for role in vacancy.get("professional_roles") or []
+                if isinstance(role, dict) and role.get("id") is not None
+            ]
+        )
+        value = salary_value(vacancy)
+        salaries.append(value if value is not None else np.nan)
+
+    values = np.asarray(salaries, dtype=np.float64)
+    buckets = np.full(len(values), np.iinfo(np.int64).min, dtype=np.int64)
+    known = ~np.isnan(values)
+    buckets[known] = np.ceil(np.log(values[known]) / np.log(GAMMA)).astype(np.int64)
+
+    matrix = skills.matrix()
+    cooccurrence = (matrix.T @ matrix).tocsr()
+    cooccurrence.setdiag(0)
+    cooccurrence.eliminate_zeros()
+
+    for kind, indicators in ((SKILL, skills), (AREA, areas), (ROLE, roles)):
+        matrix = indicators.matrix()
+        keys = indicators.keys()
+        counts = np.asarray(matrix.sum(axis=0)).ravel()
+        histograms, offset = _histograms(matrix, buckets)
+        related = _rows(cooccurrence) if kind == SKILL else None
+        for key, count, (columns, numbers) in zip(keys, counts, _rows(histograms)):
+            document: Dict[str, Any] = {
+                "_id": f"{kind}:{key}",
+                "kind": kind,
+                "key": key,
+                "count": int(count),
+                "salary": {
+                    str(int(column) + offset): int(number)
+                    for column, number in zip(columns, numbers)
+                },
+            }
+            if related is not None:
+                others, together = next(related)
+                document["cooccurrence"] = {
+                    field_key(keys[other]): int(number)
+                    for other, number in zip(others, together)
+                }
+            yield document
+
+
+def rebuild(
+    vacancies: Collection,
+    aggregates: Collection,
+    batch_size: int = 1000,
+    write_size: Optional[int] = None,
+) -> int:
+    """
+    Пересборка коллекции агрегатов.
+
+    :param vacancies: Коллекция вакансий.
+    :param aggregates: Коллекция агрегатов (заменяется целиком).
+    :param batch_size: Количество документов в одном пакете курсора MongoDB.
+    :param write_size: Количество документов в одной вставке.
+    :return: Количество агрегатов.
+    """
+
+    write_size = write_size or batch_size
+    temporary = aggregates.database[f"{aggregates.name}_rebuild"]
+    temporary.drop()
+
+    written = 0
+    documents: List[Dict[str, Any]] = []
+    for document in build(vacancies, batch_size):
+        documents.append(document)
+        if len(documents) >= write_size:
+            temporary.insert_many(documents, ordered=False)
+            written += len(documents)
+            documents = []
+    if documents:
+        temporary.insert_many(documents, ordered=False)
+        written += len(documents)
+
+    if not written:
+        aggregates.drop()
+        return 0
+
+    ensure_indexes(temporary, AGGREGATES_INDEXES)
+    temporary.rename(aggregates.name, dropTarget=True)
+
+    return written
@@ -0,0 +1,482 @@
+"""
+Загрузка выгрузки вакансий ``data/raw/dump_ml_data_vacancies.csv`` (DVC).
+
+Файл CSV читается частями с явной схемой типов: значения справочников
+(регион, опыт работы, график, тип занятости и т.п.) преобразуются в категории,
+даты и зарплата разбираются один раз. Результат сохраняется в кэш – файл
+Arrow IPC без сжатия, который при повторной загрузке отображается в память
+(``memory_map``). Кэш привязан к md5 файла из ``.dvc``, поэтому новая версия
+выгрузки собирается заново::
+
+    python -m vacancies.vacancies.analysis.dump data/raw/dump_ml_data_vacancies.csv
+"""
+import argparse
+import ast
+import hashlib
+import json
+import os
+import re
+import resource
+import shutil
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from vacancies.vacancies.items import VacancyItem
+from vacancies.vacancies.mapping import NUMBER, Reference
+
+try:
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+except ImportError:  # pragma: no cover
+    pd = None
+
+# путь к выгрузке и директория кэша относительно корня репозитория
+DUMP_PATH = os.path.join("data", "raw", "dump_ml_data_vacancies.csv")
+CACHE_DIR = os.path.join("data", "cache")
+
+# поля, значения которых – объекты справочников: сохраняются категориями
+CATEGORY_FIELDS = tuple(
+    name for name, spec in VacancyItem.fields.items() if isinstance(spec, Reference)
+)
+DATE_FIELDS = ("published_at", "created_at", "initial_created_at")
+BOOL_FIELDS = tuple(name for name, spec in VacancyItem.fields.items() if spec is bool)
+NUMBER_FIELDS = tuple(
+    name for name, spec in VacancyItem.fields.items() if spec is NUMBER
+)
+# зарплата разбирается на отдельные столбцы
+SALARY_COLUMNS = ("salary_from", "salary_to", "salary_currency", "salary_gross")
+
+# файлы кэша в директории версии выгрузки
+DATA_FILE = "vacancies.arrow"
+CATEGORIES_FILE = "categories.json"
+LABELS_FILE = "labels.json"
+
+
+def dvc_md5(path: str) -> Optional[str]:
+    """
+    Получение md5 файла из соседнего файла ``.dvc``.
+
+    :param path: Путь к файлу, отслеживаемому DVC.
+    :return: md5 или None, если файла ``.dvc`` нет.
+    """
+
+    try:
+        with open(f"{path}.dvc", encoding="utf-8") as file:
+            match = re.search(r"md5:\s*([0-9a-f]{32})", file.read())
+    except FileNotFoundError:
+        return None
+
+    return match.group(1) if match else None
+
+
+def file_md5(path: str, block_size: int = 1 << 20) -> str:
+    """
+    Вычисление md5 файла.
+
+    :param path: Путь к файлу.
+    :param block_size: Размер блока чтения.
+    :return:
+    """
+
+    digest = hashlib.md5()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=65536)
+def parse_object(text: str) -> Any:
+    """
+    Разбор вложенного объекта, записанного в ячейку CSV.
+
+    Объекты записываются в JSON или в представлении Python (``repr``), поэтому
+    пробуются оба формата. Результат кэшируется: значения справочников
+    и зарплаты многократно повторяются.
+
+    :param text: Значение ячейки.
+    :return: Объект или None, если значение не удалось разобрать.
+    """
+
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return None
+
+
+def category_value(text: Any) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Значение категории из ячейки с объектом справочника.
+
+    Категория определяется идентификатором: названия значений справочников
+    могут меняться и совпадать (например, одноименные населенные пункты
+    в разных регионах).
+
+    :param text: Значение ячейки (объект ``{"id": ..., "name": ...}`` или строка).
+    :return: Идентификатор значения (или название, если идентификатора нет)
+        и название значения.
+    """
+
+    if not isinstance(text, str) or not text:
+        return None, None
+    if text[0] not in "{[":
+        return text, None
+
+    value = parse_object(text)
+    if isinstance(value, dict):
+        key = value.get("id", value.get("name"))
+        name = value.get("name")
+        return (
+            str(key) if key is not None else None,
+            str(name) if name is not None else None,
+        )
+
+    return text, None
+
+
+class Categories:
+    """
+    Словари категорий, общие для всех частей файла.
+
+    Значения кодируются номерами в порядке появления, поэтому коды
+    разных частей согласованы и не требуют объединения словарей.
+    Значениями категорий справочников служат идентификаторы, а названия
+    хранятся отдельно как подписи (последнее встреченное название).
+    """
+
+    def __init__(
+        self,
+        values: Optional[Dict[str, List[str]]] = None,
+        labels: Optional[Dict[str, Dict[str, str]]] = None,
+    ) -> None:
+        """
+        :param values: Сохраненные значения категорий по столбцам.
+        :param labels: Сохраненные названия значений по столбцам.
+        """
+
+        self.values: Dict[str, List[str]] = values or {}
+        self.labels: Dict[str, Dict[str, str]] = labels or {}
+        self._codes: Dict[str, Dict[str, int]] = {
+            column: {value: code for code, value in enumerate(items)}
+            for column, items in self.values.items()
+        }
+
+    def encode(
+        self, column: str, values: Any, labels: Optional[List[Optional[str]]] = None
+    ) -> Any:
+        """
+        Кодирование значений столбца.
+
+        :param column: Название столбца.
+        :param values: Значения (None – пропуск).
+        :param labels: Названия значений (в том же порядке).
+        :return: Массив кодов ``int32`` (-1 – пропуск).
+        """
+
+        if labels is not None:
+            names = self.labels.setdefault(column, {})
+            names.update(
+                (value, label)
+                for value, label in zip(values, labels)
+                if value is not None and label is not None
+            )
+
+        codes = self._codes.setdefault(column, {})
+        items = self.values.setdefault(column, [])
+        result = np.empty(len(values), dtype=np.int32)
+        for position, value in enumerate(values):
+            if value is None or value != value:
+                result[position] = -1
+                continue
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(items)
+                items.append(value)
+            result[position] = code
+
+        return result
+
+
+class DumpLoader:
+    """
+    Загрузчик выгрузки вакансий с кэшем в формате Arrow.
+    """
+
+    def __init__(
+        self,
+        path: str = DUMP_PATH,
+        cache_dir: str = CACHE_DIR,
+        chunk_size: int = 50000,
+    ) -> None:
+        """
+        :param path: Путь к файлу CSV.
+        :param cache_dir: Директория кэша.
+        :param chunk_size: Количество строк в одной части при чтении CSV.
+        """
+
+        if pd is None:
+            raise RuntimeError("pandas and pyarrow are required to load the dump.")
+
+        self.path = path
+        self.cache_dir = cache_dir
+        self.chunk_size = chunk_size
+        self._key: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        """
+        Ключ версии выгрузки: md5 из файла ``.dvc`` или вычисленный по файлу.
+
+        :return:
+        """
+
+        if self._key is None:
+            self._key = dvc_md5(self.path) or file_md5(self.path)
+
+        return self._key
+
+    @property
+    def cache_path(self) -> str:
+        return os.path.join(self.cache_dir, self.key)
+
+    def load(self, columns: Optional[List[str]] = None) -> Any:
+        """
+        Загрузка выгрузки (из кэша, если он уже собран).
+
+        Строковые столбцы остаются в буферах Arrow, отображенных в память,
+        категории восстанавливаются по кодам без копирования значений.
+        Категории справочников – идентификаторы значений, их названия
+        доступны в ``frame.attrs["labels"]`` (столбец – идентификатор – название).
+
+        :param columns: Загружаемые столбцы (по умолчанию – все).
+        :return: ``pandas.DataFrame``.
+        """
+
+        directory = self.cache_path
+        if not all(
+            os.path.exists(os.path.join(directory, name))
+            for name in (DATA_FILE, LABELS_FILE)
+        ):
+            # кэш отсутствует или собран до перехода на идентификаторы категорий
+            self.build()
+
+        with open(os.path.join(directory, CATEGORIES_FILE), encoding="utf-8") as file:
+            categories: Dict[str, List[str]] = json.load(file)
+        with open(os.path.join(directory, LABELS_FILE), encoding="utf-8") as file:
+            labels: Dict[str, Dict[str, str]] = json.load(file)
+        source = pa.memory_map(os.path.join(directory, DATA_FILE))
+        table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(columns)
+
+        frame = table.to_pandas(types_mapper=_pandas_type, self_destruct=True)
+        for column, values in categories.items():
+            if column in frame:
+                frame[column] = pd.Categorical.from_codes(
+                    frame[column].to_numpy(), categories=values
+                )
+        frame.attrs["labels"] = {
+            column: names for column, names in labels.items() if column in frame
+        }
+
+        return frame
+
+    def build(self) -> str:
+        """
+        Сборка кэша из файла CSV.
+
+        Файл читается частями по ``chunk_size`` строк, каждая часть
+        записывается в файл Arrow отдельным пакетом, поэтому объем памяти
+        не зависит от размера файла. Кэш записывается во временную директорию
+        и переименовывается после завершения.
+
+        :return: Путь к директории кэша.
+        """
+
+        directory = self.cache_path
+        temporary = f"{directory}.tmp"
+        shutil.rmtree(temporary, ignore_errors=True)
+        os.makedirs(temporary)
+
+        header = pd.read_csv(self.path, nrows=0).columns.tolist()
+        schema = self._schema(header)
+        categories = Categories()
+        with pa.OSFile(os.path.join(temporary, DATA_FILE), "wb") as sink:
+            with pa.ipc.new_file(sink, schema) as writer:
+                for chunk in self._chunks():
+                    writer.write_batch(self._transform(chunk, schema, categories))
+        with open(
+            os.path.join(temporary, CATEGORIES_FILE), "w", encoding="utf-8"
+        ) as file:
+            json.dump(categories.values, file, ensure_ascii=False)
+        with open(os.path.join(temporary, LABELS_FILE), "w", encoding="utf-8") as file:
+            json.dump(categories.labels, file, ensure_ascii=False)
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(temporary, directory)
+
+        return directory
+
+    def _chunks(self) -> Iterator[Any]:
+        # все столбцы читаются строками, типы назначаются при преобразовании
+        return iter(
+            pd.read_csv(
+                self.path,
+                dtype=str,
+                chunksize=self.chunk_size,
+                keep_default_na=False,
+                na_values=[""],
+            )
+        )
+
+    @staticmethod
+    def _schema(header: List[str]) -> Any:
+        """
+        Схема кэша по заголовку файла CSV.
+
+        :param header: Названия столбцов.
+        :return:
+        """
+
+        fields = []
+        for name in header:
+            base = name.split(".")[0]
+            if name == "id":
+                fields.append((name, pa.int64()))
+            elif name == "salary":
+                fields.extend(
+                    [
+                        ("salary_from", pa.float64()),
+                        ("salary_to", pa.float64()),
+                        ("salary_currency", pa.int32()),
+                        ("salary_gross", pa.bool_()),
+                    ]
+                )
+            elif base in CATEGORY_FIELDS:
+                fields.append((name, pa.int32()))
+            elif name in DATE_FIELDS:
+                fields.append((name, pa.timestamp("ns", tz="UTC")))
+            elif name in BOOL_FIELDS:
+                fields.append((name, pa.bool_()))
+            elif name in NUMBER_FIELDS:
+                fields.append((name, pa.float64()))
+            elif name.startswith("Unnamed:"):
+                # индекс DataFrame, сохраненный вместе с выгрузкой
+                continue
+            else:
+                fields.append((name, pa.string()))
+
+        return pa.schema(fields)
+
+    @staticmethod
+    def _transform(chunk: Any, schema: Any, categories: Categories) -> Any:
+        """
+        Преобразование части файла CSV к схеме кэша.
+
+        :param chunk: Часть файла (все значения – строки).
+        :param schema: Схема кэша.
+        :param categories: Словари категорий.
+        :return: ``pyarrow.RecordBatch``.
+        """
+
+        arrays = []
+        salary = (
+            [
+                parse_object(text) if isinstance(text, str) else None
+                for text in chunk["salary"]
+            ]
+            if "salary" in chunk
+            else None
+        )
+        for field in schema:
+            name, kind = field.name, field.type
+            if name in SALARY_COLUMNS and salary is not None:
+                key = name.split("_", 1)[1]
+                values = [
+                    item.get(key) if isinstance(item, dict) else None for item in salary
+                ]
+                if name == "salary_currency":
+                    arrays.append(pa.array(categories.encode(name, values)))
+                else:
+                    arrays.append(pa.array(values, type=kind, from_pandas=True))
+            elif name == "id":
+                ids = pd.to_numeric(chunk[name], errors="coerce")
+                arrays.append(pa.array(ids, type=kind, from_pandas=True))
+            elif pa.types.is_int32(kind):
+                pairs = [category_value(text) for text in chunk[name]]
+                arrays.append(
+                    pa.array(
+                        categories.encode(
+                            name,
+                            [key for key, _ in pairs],
+                            [label for _, label in pairs],
+                        )
+                    )
+                )
+            elif pa.types.is_timestamp(kind):
+                dates = pd.to_datetime(chunk[name], utc=True, errors="coerce")
+                arrays.append(pa.array(dates, type=kind, from_pandas=True))
+            elif pa.types.is_boolean(kind):
+                flags = chunk[name].map(
+                    {"True": True, "False": False, "true": True, "false": False}
+                )
+                arrays.append(pa.array(flags, type=kind, from_pandas=True))
+            elif pa.types.is_floating(kind):
+                numbers = pd.to_numeric(chunk[name], errors="coerce")
+                arrays.append(pa.array(numbers, type=kind, from_pandas=True))
+            else:
+                arrays.append(pa.array(chunk[name], type=kind, from_pandas=True))
+
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _pandas_type(kind: Any) -> Any:
+    """
+    Типы pandas для столбцов Arrow без преобразования в объекты Python.
+
+    :param kind: Тип Arrow.
+    :return:
+    """
+
+    if pa.types.is_string(kind):
+        return pd.StringDtype("pyarrow")
+    if pa.types.is_boolean(kind):
+        return pd.BooleanDtype()
+    if pa.types.is_int64(kind):
+        return pd.Int64Dtype()
+
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", nargs="?", default=DUMP_PATH, help="CSV dump")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="cache directory")
+    parser.add_argument(
+        "--chunk-size", type=int, default=50000, help="rows per CSV chunk"
+    )
+    args = parser.parse_args()
+
+    loader = DumpLoader(args.path, args.cache_dir, args.chunk_size)
+    start = time.perf_counter()
+    frame = loader.load()
+    elapsed = time.perf_counter() - start
+    # на Linux ru_maxrss указывается в килобайтах
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    print(frame.dtypes.to_string())
+    print(
+        f"Loaded {len(frame)} rows in {elapsed:.1f} s "
+        f"(peak RSS {peak_rss:.0f} MB, cache {loader.cache_path})."
+    )
+
+
+if __name__ == "__main__":
+    main()
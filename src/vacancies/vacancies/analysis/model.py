@@ -0,0 +1,937 @@
+"""
+Обучение модели предсказания зарплаты по вакансии.
+
+Признаки вакансии – TF-IDF токенов названия и описания, хэшированных
+в ``n_features`` столбцов, и индикаторы значений справочников (регион, опыт,
+график, тип занятости, профессиональные роли, навыки). Матрицы признаков
+вакансий выгрузки Parquet (``scrapy export``) сохраняются в кэш; при следующем
+запуске признаки строятся только для новых и изменившихся вакансий, а решение
+начинается с предыдущих весов (решается та же задача, что и без них)::
+
+    python -m vacancies.vacancies.analysis.model /data/vacancies.parquet \\
+        --cache-dir ../data/cache/features --model ../data/models/salary.npz
+
+Модель – гребневая регрессия логарифма зарплаты ("на руки" за месяц, см.
+``aggregates.salary_value``), решаемая ``scipy.sparse.linalg.lsqr``.
+"""
+import argparse
+import functools
+import hashlib
+import json
+import os
+import shutil
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from vacancies.vacancies import export
+from vacancies.vacancies.aggregates import salary_value
+from vacancies.vacancies.text import Lemmatizer, process, tokenize
+
+try:
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    from scipy import sparse
+    from scipy.sparse.linalg import LinearOperator, lsqr
+except ImportError:  # pragma: no cover
+    sparse = None
+
+# версия построения признаков: при ее изменении кэш собирается заново
+FEATURES_VERSION = 1
+# поля-справочники, значения которых становятся индикаторами
+CATEGORICAL_FIELDS = (
+    "area",
+    "experience",
+    "schedule",
+    "employment",
+    "professional_roles",
+    "key_skills",
+)
+# столбцы выгрузки для построения признаков
+COLUMNS = (
+    "id",
+    "name",
+    "description",
+    "description_tokens",
+    "salary",
+    "salary_rub",
+    *CATEGORICAL_FIELDS,
+)
+# столбцы выгрузки для определения изменившихся вакансий
+FINGERPRINT_COLUMNS = (
+    "id",
+    "name",
+    "published_at",
+    "description_tokens",
+    "salary",
+    "salary_rub",
+    *CATEGORICAL_FIELDS,
+)
+
+STATE_FILE = "state.json"
+# доля замененных версий вакансий в части кэша, при которой часть перезаписывается
+COMPACT_RATIO = 0.25
+# количество токенов в кэше столбцов хэширования
+TOKEN_CACHE_SIZE = 1000000
+
+
+def _value(value: Any) -> Optional[str]:
+    # значение справочника – объект с идентификатором, навык – с названием
+    if isinstance(value, dict):
+        value = value.get("id", value.get("name"))
+    if value is None or value == "":
+        return None
+
+    return str(value).lower()
+
+
+class Featurizer:
+    """
+    Построение разреженных матриц признаков вакансий.
+
+    Токены хэшируются ``crc32`` в ``n_features`` столбцов (количества токенов,
+    TF-IDF вычисляется при обучении). Значениям справочников столбцы
+    назначаются в порядке появления, поэтому матрицы, построенные раньше,
+    совпадают с новыми в общих столбцах.
+    """
+
+    def __init__(
+        self, n_features: int = 1 << 20, vocabulary: Optional[List[str]] = None
+    ) -> None:
+        """
+        :param n_features: Количество столбцов хэшированных токенов.
+        :param vocabulary: Значения справочников вида ``поле=значение``.
+        """
+
+        if sparse is None:
+            raise RuntimeError("numpy, pandas, pyarrow and scipy are required.")
+
+        self.n_features = n_features
+        self.vocabulary: List[str] = vocabulary or []
+        self._codes = {value: code for code, value in enumerate(self.vocabulary)}
+        self._columns: Dict[str, int] = {}
+        self._lemmatizer: Optional[Lemmatizer] = None
+
+    @property
+    def spec(self) -> Dict[str, Any]:
+        return {
+            "version": FEATURES_VERSION,
+            "n_features": self.n_features,
+            "fields": list(CATEGORICAL_FIELDS),
+        }
+
+    @property
+    def key(self) -> str:
+        """
+        Ключ версии признаков (директория кэша).
+
+        :return:
+        """
+
+        data = json.dumps(self.spec, sort_keys=True).encode("utf-8")
+
+        return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+    def tokens(self, document: Dict[str, Any]) -> List[str]:
+        """
+        Токены вакансии: леммы названия (с префиксом ``name:``) и описания.
+
+        :param document: Документ вакансии.
+        :return:
+        """
+
+        if self._lemmatizer is None:
+            self._lemmatizer = Lemmatizer()
+        name = [
+            f"name:{token}"
+            for token in tokenize(document.get("name") or "", self._lemmatizer)
+        ]
+        description = document.get("description_tokens")
+        if description is None:
+            description = process(document.get("description") or "")[1]
+
+        return name + list(description)
+
+    @staticmethod
+    def categories(document: Dict[str, Any]) -> List[str]:
+        """
+        Значения справочников вакансии.
+
+        :param document: Документ вакансии.
+        :return: Значения вида ``поле=значение`` (без повторов).
+        """
+
+        result = set()
+        for field in CATEGORICAL_FIELDS:
+            values = document.get(field)
+            for value in values if isinstance(values, list) else [values]:
+                value = _value(value)
+                if value is not None:
+                    result.add(f"{field}={value}")
+
+        return sorted(result)
+
+    def transform(
+        self, documents: List[Dict[str, Any]], grow: bool = True
+    ) -> Tuple["sparse.csr_matrix", "sparse.csr_matrix"]:
+        """
+        Матрицы признаков вакансий.
+
+        :param documents: Документы вакансий.
+        :param grow: Добавлять новые значения справочников (при предсказании –
+            нет, новые значения не учитываются).
+        :return: Количества хэшированных токенов и индикаторы значений
+            справочников.
+        """
+
+        columns = self._columns
+        text_indices: List[int] = []
+        text_indptr = [0]
+        indices: List[int] = []
+        indptr = [0]
+        for document in documents:
+            for token in self.tokens(document):
+                column = columns.get(token)
+                if column is None:
+                    if len(columns) >= TOKEN_CACHE_SIZE:
+                        columns.clear()
+                    column = zlib.crc32(token.encode("utf-8")) % self.n_features
+                    columns[token] = column
+                text_indices.append(column)
+            text_indptr.append(len(text_indices))
+
+            for value in self.categories(document):
+                code = self._codes.get(value)
+                if code is None:
+                    if not grow:
+                        continue
+                    code = self._codes[value] = len(self.vocabulary)
+                    self.vocabulary.append(value)
+                indices.append(code)
+            indptr.append(len(indices))
+
+        text = sparse.csr_matrix(
+            (
+                np.ones(len(text_indices), dtype=np.float32),
+                np.asarray(text_indices, dtype=np.int32),
+                np.asarray(text_indptr, dtype=np.int64),
+            ),
+            shape=(len(documents), self.n_features),
+        )
+        # повторы токена складываются в количество
+        text.sum_duplicates()
+        categories = sparse.csr_matrix(
+            (
+                np.ones(len(indices), dtype=np.float32),
+                np.asarray(indices, dtype=np.int32),
+                np.asarray(indptr, dtype=np.int64),
+            ),
+            shape=(len(documents), len(self.vocabulary)),
+        )
+
+        return text, categories
+
+
+def _resize(matrix: "sparse.csr_matrix", columns: int) -> "sparse.csr_matrix":
+    # матрица индикаторов, построенная до появления новых значений справочников
+    return sparse.csr_matrix(
+        (matrix.data, matrix.indices, matrix.indptr),
+        shape=(matrix.shape[0], columns),
+    )
+
+
+def _joined(column: Any) -> Any:
+    """
+    Соединение значений списков в строки.
+
+    :param column: ``pyarrow.ListArray`` строк или объектов справочников.
+    :return: Строки со значениями через ``|``.
+    """
+
+    values = column.flatten()
+    if pa.types.is_struct(values.type):
+        field = "id" if values.type.get_field_index("id") >= 0 else "name"
+        values = pc.struct_field(values, field)
+    # смещения среза массива начинаются не с нуля
+    offsets = pc.subtract(column.offsets, column.offsets[0])
+
+    return pc.binary_join(
+        pa.ListArray.from_arrays(offsets, pc.cast(values, pa.string())), "|"
+    )
+
+
+def fingerprints(table: Any) -> "np.ndarray":
+    """
+    Отпечатки содержимого вакансий для определения изменившихся.
+
+    Вложенные поля разворачиваются в столбцы, списки справочников
+    соединяются в строки, у токенов описания учитывается количество.
+
+    :param table: ``pyarrow.Table`` со столбцами ``FINGERPRINT_COLUMNS``.
+    :return: Массив ``uint64``.
+    """
+
+    columns = {}
+    for name in table.column_names:
+        column = table.column(name)
+        kind = column.type
+        if pa.types.is_list(kind) and name == "description_tokens":
+            columns[name] = pc.list_value_length(column)
+        elif pa.types.is_list(kind):
+            columns[name] = _joined(column.combine_chunks())
+        elif pa.types.is_struct(kind):
+            for index in range(kind.num_fields):
+                field = kind.field(index).name
+                columns[f"{name}.{field}"] = pc.struct_field(column, field)
+        else:
+            columns[name] = column
+    frame = pa.table(columns).to_pandas()
+
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy(dtype=np.uint64)
+
+
+def tfidf(counts: "sparse.csr_matrix", idf: "np.ndarray") -> "sparse.csr_matrix":
+    """
+    Векторы TF-IDF строк матрицы количеств токенов.
+
+    :param counts: Количества хэшированных токенов.
+    :param idf: Обратные документные частоты столбцов.
+    :return: Строки ``(1 + log(tf)) * idf`` единичной длины.
+    """
+
+    matrix = counts.astype(np.float32)
+    matrix.data = (1 + np.log(matrix.data)) * idf[matrix.indices].astype(np.float32)
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    norms = np.sqrt(np.bincount(rows, weights=matrix.data**2))
+    matrix.data /= norms[rows].astype(np.float32)
+
+    return matrix
+
+
+class FeatureStore:
+    """
+    Кэш матриц признаков вакансий.
+
+    Признаки хранятся частями (файлы ``npz``) вместе с идентификаторами,
+    отпечатками содержимого и зарплатами вакансий. Обновление читает
+    из выгрузки только столбцы отпечатков и строит признаки вакансий
+    с новым отпечатком, которые записываются новой частью; из нескольких
+    версий вакансии используется последняя. Список частей и значения
+    справочников записываются в ``state.json`` после каждой части.
+
+    После обновления части, в которых есть вакансии, отсутствующие в выгрузке
+    (или оставшиеся без зарплаты), или не меньше ``COMPACT_RATIO`` замененных
+    версий, перезаписываются без них; опустевшие части удаляются.
+    """
+
+    def __init__(self, cache_dir: str, n_features: int = 1 << 20) -> None:
+        """
+        :param cache_dir: Директория кэша (признаки каждой версии – в директории
+            с ключом версии).
+        :param n_features: Количество столбцов хэшированных токенов.
+        """
+
+        self.featurizer = Featurizer(n_features)
+        self.directory = os.path.join(cache_dir, self.featurizer.key)
+        self.chunks: List[str] = []
+        path = os.path.join(self.directory, STATE_FILE)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                state = json.load(file)
+            self.chunks = state["chunks"]
+            self.featurizer = Featurizer(n_features, state["vocabulary"])
+
+    def clear(self) -> None:
+        """
+        Удаление кэша версии признаков.
+
+        :return:
+        """
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.chunks = []
+        self.featurizer = Featurizer(self.featurizer.n_features)
+
+    def update(self, directory: str, batch_size: int = 50000) -> int:
+        """
+        Построение признаков новых и изменившихся вакансий выгрузки
+        и удаление из кэша вакансий, которых в выгрузке нет.
+
+        :param directory: Директория выгрузки Parquet.
+        :param batch_size: Количество вакансий в одной части кэша.
+        :return: Количество вакансий, для которых построены признаки.
+        """
+
+        dataset = export.dataset(directory)
+        names = dataset.schema.names
+        table = dataset.to_table(
+            columns=[name for name in FINGERPRINT_COLUMNS if name in names]
+        )
+        salary = [name for name in ("salary", "salary_rub") if name in names]
+        labeled = functools.reduce(
+            pc.or_, [pc.is_valid(table.column(name)) for name in salary]
+        )
+        table = table.filter(labeled)
+        ids = table.column("id").to_numpy(zero_copy_only=False).astype(str)
+        digests = fingerprints(table)
+
+        stored_ids, stored_digests = self._stored()
+        positions = pd.Index(stored_ids).get_indexer(ids)
+        known = positions >= 0
+        unchanged = np.zeros(len(ids), dtype=bool)
+        unchanged[known] = stored_digests[positions[known]] == digests[known]
+        changed = ids[~unchanged]
+        if not len(changed):
+            self._compact(ids)
+            return 0
+
+        pending = dict(zip(ids, digests))
+        documents = export.scan(
+            directory,
+            columns=[name for name in COLUMNS if name in names],
+            batch_size=batch_size,
+            filter=ds.field("id").isin(
+                pa.array(changed).cast(table.schema.field("id").type)
+            ),
+        )
+        batch: List[Dict[str, Any]] = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                self._write(batch, pending)
+                batch = []
+        if batch:
+            self._write(batch, pending)
+        self._compact(ids)
+
+        return len(changed)
+
+    def _write(self, documents: List[Dict[str, Any]], digests: Dict[str, int]) -> None:
+        """
+        Запись части кэша.
+
+        :param documents: Документы вакансий.
+        :param digests: Отпечатки вакансий по идентификаторам.
+        :return:
+        """
+
+        targets = np.array([salary_value(document) or np.nan for document in documents])
+        text, categories = self.featurizer.transform(documents)
+        ids = np.array([str(document["id"]) for document in documents])
+        # номера частей не повторяются и после удаления опустевших частей
+        number = int(self.chunks[-1][6:11]) + 1 if self.chunks else 0
+        name = f"chunk-{number:05d}.npz"
+        os.makedirs(self.directory, exist_ok=True)
+        self._save_chunk(
+            name,
+            ids=ids,
+            fingerprints=np.array([digests[key] for key in ids], dtype=np.uint64),
+            targets=targets,
+            text_data=text.data,
+            text_indices=text.indices,
+            text_indptr=text.indptr,
+            categories_indices=categories.indices,
+            categories_indptr=categories.indptr,
+        )
+
+        self.chunks.append(name)
+        self._save_state()
+
+    def _compact(self, ids: "np.ndarray") -> int:
+        """
+        Удаление из кэша вакансий, которых нет в выгрузке, и замененных версий.
+
+        :param ids: Идентификаторы вакансий с зарплатой в выгрузке.
+        :return: Количество удаленных строк.
+        """
+
+        chunk_ids = []
+        for name in self.chunks:
+            with np.load(os.path.join(self.directory, name)) as chunk:
+                chunk_ids.append(chunk["ids"])
+        if not chunk_ids:
+            return 0
+
+        all_ids = np.concatenate(chunk_ids)
+        present = pd.Series(all_ids).isin(ids).to_numpy()
+        keep = present & ~pd.Series(all_ids).duplicated(keep="last").to_numpy()
+
+        chunks, emptied = [], []
+        dropped = 0
+        # границы строк частей в общем массиве
+        bounds = np.cumsum([0] + [len(names) for names in chunk_ids])
+        for name, start, end in zip(self.chunks, bounds[:-1], bounds[1:]):
+            rows = keep[start:end]
+            removed = not present[start:end].all()
+            dead = int(end - start) - int(np.count_nonzero(rows))
+            if not dead or (not removed and dead < COMPACT_RATIO * (end - start)):
+                chunks.append(name)
+                continue
+
+            dropped += dead
+            if rows.any():
+                self._rewrite(name, rows)
+                chunks.append(name)
+            else:
+                emptied.append(name)
+
+        if dropped:
+            self.chunks = chunks
+            self._save_state()
+            for name in emptied:
+                os.remove(os.path.join(self.directory, name))
+
+        return dropped
+
+    def _rewrite(self, name: str, rows: "np.ndarray") -> None:
+        """
+        Перезапись части кэша с оставшимися строками.
+
+        :param name: Название части.
+        :param rows: Признаки оставшихся строк.
+        :return:
+        """
+
+        with np.load(os.path.join(self.directory, name)) as chunk:
+            count = len(chunk["ids"])
+            text = sparse.csr_matrix(
+                (chunk["text_data"], chunk["text_indices"], chunk["text_indptr"]),
+                shape=(count, self.featurizer.n_features),
+            )[rows]
+            indices = chunk["categories_indices"]
+            categories = sparse.csr_matrix(
+                (
+                    np.ones(len(indices), dtype=np.float32),
+                    indices,
+                    chunk["categories_indptr"],
+                ),
+                shape=(count, len(self.featurizer.vocabulary)),
+            )[rows]
+            self._save_chunk(
+                name,
+                ids=chunk["ids"][rows],
+                fingerprints=chunk["fingerprints"][rows],
+                targets=chunk["targets"][rows],
+                text_data=text.data,
+                text_indices=text.indices,
+                text_indptr=text.indptr,
+                categories_indices=categories.indices,
+                categories_indptr=categories.indptr,
+            )
+
+    def _save_chunk(self, name: str, **arrays: Any) -> None:
+        path = os.path.join(self.directory, name)
+        with open(f"{path}.tmp", "wb") as file:
+            np.savez(file, **arrays)
+        os.replace(f"{path}.tmp", path)
+
+    def _save_state(self) -> None:
+        state = {
+            "spec": self.featurizer.spec,
+            "chunks": self.chunks,
+            "vocabulary": self.featurizer.vocabulary,
+        }
+        path = os.path.join(self.directory, STATE_FILE)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(state, file, ensure_ascii=False)
+        os.replace(f"{path}.tmp", path)
+
+    def _stored(self) -> Tuple["np.ndarray", "np.ndarray"]:
+        """
+        Идентификаторы и отпечатки последних версий вакансий кэша.
+
+        :return:
+        """
+
+        ids, digests = [], []
+        for name in self.chunks:
+            with np.load(os.path.join(self.directory, name)) as chunk:
+                ids.append(chunk["ids"])
+                digests.append(chunk["fingerprints"])
+        if not ids:
+            return np.array([], dtype=str), np.array([], dtype=np.uint64)
+
+        frame = pd.DataFrame(
+            {"id": np.concatenate(ids), "fingerprint": np.concatenate(digests)}
+        ).drop_duplicates("id", keep="last")
+
+        return frame["id"].to_numpy(), frame["fingerprint"].to_numpy()
+
+    def load(
+        self,
+    ) -> Tuple["sparse.csr_matrix", "sparse.csr_matrix", "np.ndarray", "np.ndarray"]:
+        """
+        Матрицы признаков последних версий вакансий кэша.
+
+        :return: Количества токенов, индикаторы значений справочников,
+            зарплаты и идентификаторы вакансий.
+        """
+
+        n_features = self.featurizer.n_features
+        columns = len(self.featurizer.vocabulary)
+        texts, categories, targets, ids = [], [], [], []
+        for name in self.chunks:
+            with np.load(os.path.join(self.directory, name)) as chunk:
+                rows = len(chunk["ids"])
+                texts.append(
+                    sparse.csr_matrix(
+                        (
+                            chunk["text_data"],
+                            chunk["text_indices"],
+                            chunk["text_indptr"],
+                        ),
+                        shape=(rows, n_features),
+                    )
+                )
+                indices = chunk["categories_indices"]
+                categories.append(
+                    sparse.csr_matrix(
+                        (
+                            np.ones(len(indices), dtype=np.float32),
+                            indices,
+                            chunk["categories_indptr"],
+                        ),
+                        shape=(rows, columns),
+                    )
+                )
+                targets.append(chunk["targets"])
+                ids.append(chunk["ids"])
+        if not ids:
+            raise ValueError(f"No vacancies with salary in {self.directory}.")
+
+        all_ids = np.concatenate(ids)
+        # из нескольких версий вакансии используется последняя
+        latest = ~pd.Series(all_ids).duplicated(keep="last").to_numpy()
+        target = np.concatenate(targets)
+        latest &= ~np.isnan(target)
+
+        return (
+            sparse.vstack(texts, format="csr")[latest],
+            sparse.vstack(categories, format="csr")[latest],
+            target[latest],
+            all_ids[latest],
+        )
+
+    @property
+    def version(self) -> str:
+        """
+        Версия набора данных: хэш отпечатков последних версий вакансий.
+
+        :return:
+        """
+
+        ids, digests = self._stored()
+        order = np.argsort(ids)
+
+        return hashlib.blake2b(
+            digests[order].astype(np.uint64).tobytes(), digest_size=8
+        ).hexdigest()
+
+
+class SalaryModel:
+    """
+    Гребневая регрессия логарифма зарплаты по признакам вакансии.
+    """
+
+    def __init__(
+        self,
+        featurizer: Featurizer,
+        idf: "np.ndarray",
+        weights: "np.ndarray",
+        intercept: float,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        :param featurizer: Построение признаков (значения справочников
+            на момент обучения).
+        :param idf: Обратные документные частоты хэшированных токенов.
+        :param weights: Веса признаков.
+        :param intercept: Средний логарифм зарплаты.
+        :param meta: Версия набора данных, показатели качества и т.п.
+        """
+
+        self.featurizer = featurizer
+        self.idf = idf
+        self.weights = weights
+        self.intercept = intercept
+        self.meta = meta or {}
+
+    def design(
+        self, counts: "sparse.csr_matrix", categories: "sparse.csr_matrix"
+    ) -> "sparse.csr_matrix":
+        """
+        Матрица признаков модели: TF-IDF токенов и индикаторы справочников.
+
+        :param counts: Количества хэшированных токенов.
+        :param categories: Индикаторы значений справочников.
+        :return:
+        """
+
+        columns = len(self.weights) - len(self.idf)
+
+        return sparse.hstack(
+            [tfidf(counts, self.idf), _resize(categories, columns)], format="csr"
+        )
+
+    def predict(self, documents: List[Dict[str, Any]]) -> "np.ndarray":
+        """
+        Предсказание зарплаты вакансий.
+
+        :param documents: Документы вакансий.
+        :return: Зарплаты в рублях "на руки" за месяц.
+        """
+
+        counts, categories = self.featurizer.transform(documents, grow=False)
+
+        return np.exp(self.design(counts, categories) @ self.weights + self.intercept)
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        meta = {
+            **self.meta,
+            "spec": self.featurizer.spec,
+            "vocabulary": self.featurizer.vocabulary,
+            "intercept": self.intercept,
+        }
+        with open(f"{path}.tmp", "wb") as file:
+            np.savez(
+                file,
+                idf=self.idf,
+                weights=self.weights,
+                meta=np.array(json.dumps(meta, ensure_ascii=False)),
+            )
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "SalaryModel":
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            featurizer = Featurizer(
+                meta["spec"]["n_features"], list(meta.pop("vocabulary"))
+            )
+            if featurizer.spec != meta.pop("spec"):
+                raise ValueError(f"Model {path} was built by another features version.")
+
+            return cls(
+                featurizer,
+                data["idf"],
+                data["weights"],
+                float(meta.pop("intercept")),
+                meta,
+            )
+
+
+def _holdout(ids: "np.ndarray", share: float) -> "np.ndarray":
+    # отложенная выборка определяется идентификатором и не меняется между запусками
+    buckets = np.fromiter(
+        (zlib.crc32(str(value).encode("utf-8")) % 1000 for value in ids),
+        dtype=np.int64,
+        count=len(ids),
+    )
+
+    return buckets < share * 1000
+
+
+def ridge(
+    matrix: "sparse.csr_matrix",
+    values: "np.ndarray",
+    alpha: float,
+    iterations: int = 200,
+    start: Optional["np.ndarray"] = None,
+) -> Tuple["np.ndarray", int]:
+    """
+    Решение гребневой регрессии ``min ||Xw - y||² + alpha ||w||²`` методом ``lsqr``.
+
+    Начальное приближение не меняет решаемую задачу. ``lsqr`` с ``x0``
+    штрафует отклонение от начального приближения (``damp`` относится
+    к ``w - x0``), поэтому решается задача для поправки ``d = w - start``
+    с матрицей ``[X; sqrt(alpha) I]`` и правой частью
+    ``[y - X start; -sqrt(alpha) start]``, у которой тот же минимум.
+
+    :param matrix: Матрица признаков.
+    :param values: Целевые значения.
+    :param alpha: Коэффициент L2-регуляризации.
+    :param iterations: Максимальное количество итераций.
+    :param start: Начальное приближение весов.
+    :return: Веса и количество выполненных итераций.
+    """
+
+    damp = np.sqrt(alpha)
+    if start is None:
+        result = lsqr(
+            matrix, values, damp=damp, atol=1e-6, btol=1e-6, iter_lim=iterations
+        )
+        return result[0], int(result[2])
+
+    rows, columns = matrix.shape
+    operator = LinearOperator(
+        (rows + columns, columns),
+        matvec=lambda vector: np.concatenate([matrix @ vector, damp * vector]),
+        rmatvec=lambda vector: matrix.T @ vector[:rows] + damp * vector[rows:],
+        dtype=np.float64,
+    )
+    result = lsqr(
+        operator,
+        np.concatenate([values - matrix @ start, -damp * start]),
+        atol=1e-6,
+        btol=1e-6,
+        iter_lim=iterations,
+    )
+
+    return start + result[0], int(result[2])
+
+
+def train(
+    store: FeatureStore,
+    alpha: float = 1.0,
+    validation: float = 0.1,
+    iterations: int = 200,
+    previous: Optional[SalaryModel] = None,
+) -> SalaryModel:
+    """
+    Обучение модели на признаках кэша.
+
+    :param store: Кэш признаков.
+    :param alpha: Коэффициент L2-регуляризации.
+    :param validation: Доля отложенной выборки для оценки качества.
+    :param iterations: Максимальное количество итераций ``lsqr``.
+    :param previous: Предыдущая модель тех же признаков: ее веса –
+        начальное приближение (см. ``ridge``).
+    :return:
+    """
+
+    counts, categories, target, ids = store.load()
+    featurizer = store.featurizer
+    holdout = _holdout(ids, validation)
+    training = ~holdout
+    size = int(np.count_nonzero(training))
+    # документная частота токена – количество вакансий обучающей выборки,
+    # в которых он встречается
+    frequency = np.bincount(counts[training].indices, minlength=featurizer.n_features)
+    idf = np.log((1 + size) / (1 + frequency)) + 1
+    model = SalaryModel(
+        Featurizer(featurizer.n_features, list(featurizer.vocabulary)),
+        idf,
+        np.zeros(featurizer.n_features + len(featurizer.vocabulary)),
+        0.0,
+    )
+    matrix = model.design(counts[training], categories[training])
+
+    values = np.log(target[training])
+    model.intercept = float(values.mean())
+    start = None
+    if previous is not None and previous.featurizer.spec == featurizer.spec:
+        # значения справочников только добавляются, общие столбцы совпадают
+        start = np.zeros(matrix.shape[1])
+        start[: len(previous.weights)] = previous.weights[: matrix.shape[1]]
+    model.weights, performed = ridge(
+        matrix, values - model.intercept, alpha, iterations, start
+    )
+    del matrix
+
+    model.meta = {
+        "version": store.version,
+        "vacancies": size,
+        "iterations": performed,
+        "warm_start": start is not None,
+    }
+    if holdout.any():
+        predicted = np.exp(
+            model.design(counts[holdout], categories[holdout]) @ model.weights
+            + model.intercept
+        )
+        actual = target[holdout]
+        model.meta["validation"] = {
+            "vacancies": int(holdout.sum()),
+            "mae": round(float(np.mean(np.abs(predicted - actual))), 1),
+            "mape": round(float(np.median(np.abs(predicted - actual) / actual)), 4),
+        }
+
+    return model
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory", help="Parquet export directory")
+    parser.add_argument(
+        "--cache-dir",
+        default=os.path.join("data", "cache", "features"),
+        help="features cache directory",
+    )
+    parser.add_argument(
+        "--model",
+        default=os.path.join("data", "models", "salary.npz"),
+        help="model file",
+    )
+    parser.add_argument(
+        "--n-features",
+        type=int,
+        default=1 << 20,
+        help="number of hashed token columns",
+    )
+    parser.add_argument(
+        "--alpha", type=float, default=1.0, help="L2 regularization strength"
+    )
+    parser.add_argument(
+        "--validation",
+        type=float,
+        default=0.1,
+        help="share of vacancies held out for validation",
+    )
+    parser.add_argument(
+        "--iterations", type=int, default=200, help="maximum number of lsqr iterations"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=50000,
+        help="number of vacancies in one features cache chunk",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="rebuild the features cache and train from scratch",
+    )
+    args = parser.parse_args()
+
+    store = FeatureStore(args.cache_dir, args.n_features)
+    if args.full:
+        store.clear()
+
+    start = time.perf_counter()
+    added = store.update(args.directory, args.batch_size)
+    print(f"Featurized {added} vacancies in {time.perf_counter() - start:.1f} s.")
+
+    previous = None
+    if not args.full and os.path.exists(args.model):
+        try:
+            previous = SalaryModel.load(args.model)
+        except (ValueError, KeyError):
+            previous = None
+    if previous is not None and previous.meta.get("version") == store.version:
+        print("The model is up to date.")
+        return
+
+    start = time.perf_counter()
+    model = train(
+        store,
+        alpha=args.alpha,
+        validation=args.validation,
+        iterations=args.iterations,
+        previous=previous,
+    )
+    model.save(args.model)
+    print(
+        f"Trained on {model.meta['vacancies']} vacancies "
+        f"in {time.perf_counter() - start:.1f} s: "
+        f"{json.dumps(model.meta.get('validation', {}))}"
+    )
+
+
+if __name__ == "__main__":
+    main()
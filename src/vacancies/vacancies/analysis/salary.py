@@ -0,0 +1,148 @@
+"""
+Приведение зарплат выгрузок к рублям "на руки" за месяц.
+
+Столбцы зарплаты пересчитываются векторно (``normalize_columns``) по истории
+курсов валют справочника ``/dictionaries``. Выгрузку Parquet (``scrapy export``),
+сделанную до появления поля ``salary_rub``, можно дополнить на месте::
+
+    python -m vacancies.vacancies.analysis.salary /data/vacancies.parquet \\
+        --references-dir vacancies/.scrapy/references
+"""
+import argparse
+import os
+import time
+from typing import Any
+
+from vacancies.vacancies.references import ReferenceCache
+from vacancies.vacancies.salary import CurrencyRates, normalize_columns
+
+try:
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+
+
+def normalize_frame(frame: Any, rates: CurrencyRates) -> Any:
+    """
+    Добавление столбцов ``salary_rub_from`` и ``salary_rub_to`` в таблицу
+    выгрузки CSV (см. ``DumpLoader``).
+
+    :param frame: ``pandas.DataFrame`` со столбцами ``salary_from``, ``salary_to``,
+        ``salary_currency``, ``salary_gross`` и ``published_at``.
+    :param rates: История курсов валют.
+    :return: Та же таблица.
+    """
+
+    published_at = frame["published_at"]
+    if getattr(published_at.dt, "tz", None) is not None:
+        published_at = published_at.dt.tz_convert(None)
+    frame["salary_rub_from"], frame["salary_rub_to"] = normalize_columns(
+        frame["salary_from"].to_numpy(dtype=np.float64, na_value=np.nan),
+        frame["salary_to"].to_numpy(dtype=np.float64, na_value=np.nan),
+        frame["salary_currency"].astype(object).to_numpy(),
+        frame["salary_gross"].fillna(False).to_numpy(dtype=bool),
+        published_at.to_numpy(),
+        rates,
+    )
+
+    return frame
+
+
+def normalize_table(table: Any, rates: CurrencyRates) -> Any:
+    """
+    Добавление (замена) столбца ``salary_rub`` в таблице выгрузки Parquet.
+
+    :param table: ``pyarrow.Table`` со столбцами ``salary`` и ``published_at``.
+    :param rates: История курсов валют.
+    :return: Новая таблица.
+    """
+
+    salary = table.column("salary")
+    salary_from, salary_to = normalize_columns(
+        pc.struct_field(salary, "from").to_numpy(zero_copy_only=False),
+        pc.struct_field(salary, "to").to_numpy(zero_copy_only=False),
+        pc.cast(pc.struct_field(salary, "currency"), pa.string()).to_numpy(
+            zero_copy_only=False
+        ),
+        pc.fill_null(pc.struct_field(salary, "gross"), False).to_numpy(
+            zero_copy_only=False
+        ),
+        table.column("published_at").to_numpy(),
+        rates,
+    )
+    column = pa.StructArray.from_arrays(
+        [
+            pa.array(salary_from, from_pandas=True),
+            pa.array(salary_to, from_pandas=True),
+        ],
+        names=["from", "to"],
+        mask=pa.array(np.isnan(salary_from) & np.isnan(salary_to)),
+    )
+    if "salary_rub" in table.column_names:
+        return table.set_column(
+            table.column_names.index("salary_rub"), "salary_rub", column
+        )
+
+    return table.append_column("salary_rub", column)
+
+
+def normalize_export(directory: str, rates: CurrencyRates) -> int:
+    """
+    Пересчет столбца ``salary_rub`` во всех файлах выгрузки Parquet на месте.
+
+    Файлы обрабатываются по одному и заменяются атомарно.
+
+    :param directory: Директория выгрузки.
+    :param rates: История курсов валют.
+    :return: Количество строк.
+    """
+
+    rows = 0
+    for root, _, names in os.walk(directory):
+        for name in sorted(names):
+            if not name.endswith(".parquet"):
+                continue
+            path = os.path.join(root, name)
+            source = pq.ParquetFile(path)
+            row_group_size = (
+                source.metadata.row_group(0).num_rows
+                if source.metadata.num_row_groups
+                else None
+            )
+            table = normalize_table(source.read(), rates)
+            pq.write_table(
+                table,
+                f"{path}.tmp",
+                row_group_size=row_group_size,
+                compression="zstd",
+            )
+            os.replace(f"{path}.tmp", path)
+            rows += table.num_rows
+
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory", help="Parquet export directory")
+    parser.add_argument(
+        "--references-dir",
+        default=os.path.join("vacancies", ".scrapy", "references"),
+        help="references cache directory with the currency rates history",
+    )
+    args = parser.parse_args()
+
+    rates = ReferenceCache(args.references_dir).currency_rates()
+    if not rates:
+        parser.error(f"No currency rates in {args.references_dir}.")
+
+    start = time.perf_counter()
+    rows = normalize_export(args.directory, rates)
+    print(f"Normalized {rows} salaries in {time.perf_counter() - start:.1f} s.")
+
+
+if __name__ == "__main__":
+    main()
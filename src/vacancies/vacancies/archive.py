@@ -0,0 +1,245 @@
+import glob
+import gzip
+import json
+import os
+import re
+import sqlite3
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# ссылка на детальную информацию о вакансии
+VACANCY_URL_RE = re.compile(r"/vacancies/(\d+)")
+# шаблон названия файла сегмента архива (номер сегмента и идентификатор процесса)
+SEGMENT_PATTERN = "segment-{:06d}-{}.jsonl.gz"
+# номер сегмента в названии файла
+SEGMENT_NUMBER_RE = re.compile(r"segment-(\d+)")
+
+
+def vacancy_id_from_url(url: str) -> Optional[str]:
+    """
+    Получение идентификатора вакансии из ссылки на детальную информацию.
+
+    :param url: Ссылка запроса.
+    :return:
+    """
+
+    match = VACANCY_URL_RE.search(url)
+
+    return match.group(1) if match else None
+
+
+class ResponseArchive:
+    """
+    Архив ответов api.hh.ru в сжатых сегментах JSONL с дозаписью.
+
+    Записи накапливаются в буфере и дописываются в текущий сегмент отдельным
+    членом gzip. Каждый запуск пишет в новые сегменты с идентификатором процесса
+    в названии: незавершенный при аварийной остановке член gzip остается в конце
+    сегмента прежнего запуска, а параллельные процессы не дописывают общий файл.
+    Индекс в файле SQLite связывает идентификатор вакансии и время загрузки
+    со смещением члена gzip в сегменте.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int = 256 * 1024 * 1024,
+        buffer_size: int = 500,
+    ) -> None:
+        """
+        :param directory: Директория архива.
+        :param segment_size: Размер сегмента (в байтах), после которого начинается новый.
+        :param buffer_size: Количество записей в одном члене gzip.
+        """
+
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_size = segment_size
+        self.buffer_size = buffer_size
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._index = sqlite3.connect(os.path.join(directory, "index.sqlite"))
+        self._index.execute(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                vacancy_id TEXT,
+                fetched_at REAL NOT NULL,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL
+            )
+            """
+        )
+        self._index.execute(
+            "CREATE INDEX IF NOT EXISTS records_vacancy ON records (vacancy_id, fetched_at)"
+        )
+        self._index.commit()
+
+        # запись начинается с нового сегмента, следующего за последним
+        numbers = [
+            int(match.group(1))
+            for match in map(SEGMENT_NUMBER_RE.search, self.segments())
+            if match
+        ]
+        self._segment = max(numbers, default=0) + 1
+
+    def segments(self) -> List[str]:
+        """
+        Пути к файлам сегментов архива в порядке записи.
+
+        :return:
+        """
+
+        return sorted(glob.glob(os.path.join(self.directory, "segment-*.jsonl.gz")))
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """
+        Добавление записи в архив.
+
+        :param record: Запись с полями ``url``, ``fetched_at``, ``callback``,
+            ``cb_kwargs`` и ``body``.
+        :return:
+        """
+
+        self._buffer.append(record)
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Запись буфера в текущий сегмент.
+
+        :return:
+        """
+
+        if not self._buffer:
+            return None
+
+        path = self._segment_path()
+        if os.path.exists(path) and os.path.getsize(path) >= self.segment_size:
+            self._segment += 1
+            path = self._segment_path()
+
+        lines = "".join(
+            json.dumps(record, ensure_ascii=False) + "\n" for record in self._buffer
+        )
+        data = gzip.compress(lines.encode("utf-8"))
+        with open(path, "ab") as file:
+            file.write(data)
+            file.flush()
+            # смещение после записи: при дозаписи (O_APPEND) позиция до записи
+            # может устареть
+            offset = file.tell() - len(data)
+
+        segment = os.path.basename(path)
+        with self._index:
+            self._index.executemany(
+                "INSERT INTO records VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        vacancy_id_from_url(record["url"]),
+                        record["fetched_at"],
+                        segment,
+                        offset,
+                    )
+                    for record in self._buffer
+                ],
+            )
+        self._buffer = []
+
+        return None
+
+    def _segment_path(self) -> str:
+        return os.path.join(
+            self.directory, SEGMENT_PATTERN.format(self._segment, os.getpid())
+        )
+
+    def close(self) -> None:
+        self.flush()
+        self._index.close()
+
+    def lookup(self, vacancy_id: str) -> List[Tuple[float, str, int]]:
+        """
+        Поиск загрузок вакансии в архиве.
+
+        :param vacancy_id: Идентификатор вакансии.
+        :return: Время загрузки, сегмент и смещение члена gzip, по возрастанию времени.
+        """
+
+        cursor = self._index.execute(
+            "SELECT fetched_at, segment, offset FROM records "
+            "WHERE vacancy_id = ? ORDER BY fetched_at",
+            (vacancy_id,),
+        )
+
+        return list(cursor)
+
+    def read(self, vacancy_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        Чтение всех сохраненных ответов о вакансии.
+
+        :param vacancy_id: Идентификатор вакансии.
+        :return:
+        """
+
+        for fetched_at, segment, offset in self.lookup(vacancy_id):
+            for record in read_member(os.path.join(self.directory, segment), offset):
+                if (
+                    record["fetched_at"] == fetched_at
+                    and vacancy_id_from_url(record["url"]) == vacancy_id
+                ):
+                    yield record
+
+
+def read_member(path: str, offset: int) -> Iterator[Dict[str, Any]]:
+    """
+    Чтение записей одного члена gzip сегмента.
+
+    :param path: Путь к файлу сегмента.
+    :param offset: Смещение члена gzip в файле.
+    :return:
+    """
+
+    decompressor = zlib.decompressobj(wbits=31)
+    chunks = []
+    with open(path, "rb") as file:
+        file.seek(offset)
+        while not decompressor.eof:
+            chunk = file.read(1024 * 1024)
+            if not chunk:
+                break
+            chunks.append(decompressor.decompress(chunk))
+
+    for line in b"".join(chunks).splitlines():
+        yield json.loads(line)
+
+
+def read_segment(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Последовательное чтение всех записей сегмента.
+
+    Читаются только полностью записанные члены gzip: незавершенный последний
+    член (аварийная остановка во время дозаписи) пропускается.
+
+    :param path: Путь к файлу сегмента.
+    :return:
+    """
+
+    with open(path, "rb") as file:
+        decompressor = zlib.decompressobj(wbits=31)
+        member: List[bytes] = []
+        data = b""
+        while True:
+            data = data or file.read(1024 * 1024)
+            if not data:
+                break
+            try:
+                member.append(decompressor.decompress(data))
+            except zlib.error:
+                break
+            data = b""
+            if decompressor.eof:
+                for line in b"".join(member).splitlines():
+                    yield json.loads(line)
+                data = decompressor.unused_data
+                decompressor = zlib.decompressobj(wbits=31)
+                member = []
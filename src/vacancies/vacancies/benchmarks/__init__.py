@@ -0,0 +1,4 @@
+# This package contains performance benchmarks of the crawler hot paths
+#
+# Run a benchmark as a module from the "src" directory, for example:
+#     python -m vacancies.vacancies.benchmarks.json_decode .scrapy/archive
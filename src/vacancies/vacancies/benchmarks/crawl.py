@@ -0,0 +1,380 @@
+"""
+Измерение производительности парсинга на локальной замене api.hh.ru.
+
+Запускает сервер ``mock_api`` в отдельном процессе и паук ``VacanciesSpider``
+с настройками проекта, направленный на этот сервер. Если адрес MongoDB
+не задан, вакансии сохраняются в ее замену в памяти процесса (``memory_store``).
+Результат – количество запросов и вакансий в секунду, пиковый объем памяти
+процесса и задержка записи пакетов::
+
+    python -m vacancies.vacancies.benchmarks.crawl --vacancies 20000 --latency 0.05
+
+С параметром ``--shards N`` регионы распределяются между N процессами паука
+через таблицу аренд SQLite, а отчет строится по суммарной статистике процессов.
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Generator, Iterator, List
+from unittest import mock
+
+from scrapy.crawler import CrawlerProcess
+from scrapy.utils.project import get_project_settings
+from twisted.internet import defer, reactor
+
+from vacancies.vacancies.benchmarks.memory_store import MemoryClient
+from vacancies.vacancies.spiders.vacancies import VacanciesSpider
+
+
+def free_port() -> int:
+    """
+    Получение свободного TCP-порта.
+
+    :return:
+    """
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port: int = sock.getsockname()[1]
+
+    return port
+
+
+@contextlib.contextmanager
+def mock_server(port: int, options: List[str], timeout: float = 60.0) -> Iterator[str]:
+    """
+    Запуск локальной замены api.hh.ru в отдельном процессе.
+
+    :param port: Порт сервера.
+    :param options: Параметры командной строки ``mock_api``.
+    :param timeout: Время ожидания запуска сервера (в секундах).
+    :return: Адрес сервера.
+    """
+
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "vacancies.vacancies.benchmarks.mock_api",
+            "--port",
+            str(port),
+            *options,
+        ],
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError("Mock API server exited unexpectedly.")
+            with contextlib.suppress(OSError):
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            if time.monotonic() > deadline:
+                raise RuntimeError("Mock API server did not start in time.")
+            time.sleep(0.1)
+
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.wait()
+
+
+@contextlib.contextmanager
+def mongodb(uri: str) -> Iterator[str]:
+    """
+    Подключение к MongoDB или к ее замене в памяти процесса.
+
+    :param uri: Адрес MongoDB; если не задан, используется ``MemoryClient``.
+    :return: Адрес MongoDB для настроек паука.
+    """
+
+    if uri:
+        yield uri
+        return
+
+    with mock.patch("pymongo.MongoClient", MemoryClient):
+        yield "mongodb://localhost:27017"
+
+
+def run_crawl(
+    settings: Dict[str, Any], passes: int = 1, sharded: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Запуск паука и получение статистики парсинга.
+
+    :param settings: Настройки, переопределяющие настройки проекта.
+    :param passes: Количество последовательных запусков паука (повторные
+        запуски обрабатывают уже сохраненные вакансии).
+    :param sharded: Распределенный парсинг (у каждого запуска свой
+        идентификатор в таблице аренд).
+    :return: Статистика каждого запуска.
+    """
+
+    os.environ.setdefault("SCRAPY_SETTINGS_MODULE", "vacancies.vacancies.settings")
+    project_settings = get_project_settings()
+    project_settings.setdict(settings, priority="cmdline")
+
+    process = CrawlerProcess(project_settings, install_root_handler=False)
+    crawlers = []
+
+    @defer.inlineCallbacks
+    def crawl() -> Generator[defer.Deferred, Any, None]:
+        for number in range(passes):
+            crawler = process.create_crawler(VacanciesSpider)
+            crawlers.append(crawler)
+            if sharded:
+                yield process.crawl(crawler, shards="1", run=f"benchmark-{number}")
+            else:
+                yield process.crawl(crawler)
+
+    finished: defer.Deferred = crawl()
+    finished.addBoth(lambda _: reactor.stop())  # type: ignore[attr-defined]
+    process.start(stop_after_crawl=False)
+
+    return [dict(crawler.stats.get_stats()) for crawler in crawlers]
+
+
+def crawl_shard(
+    settings: Dict[str, Any], mongodb_uri: str, passes: int = 1
+) -> Dict[str, Any]:
+    """
+    Распределенный парсинг в отдельном процессе.
+
+    :param settings: Настройки, переопределяющие настройки проекта.
+    :param mongodb_uri: Адрес MongoDB (пустой – замена в памяти процесса).
+    :param passes: Количество последовательных запусков паука.
+    :return: Статистика последнего запуска.
+    """
+
+    with mongodb(mongodb_uri) as uri:
+        return run_crawl({**settings, "MONGODB_URI": uri}, passes, sharded=True)[-1]
+
+
+def merge_stats(stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Суммирование статистики процессов распределенного парсинга.
+
+    :param stats: Статистика процессов.
+    :return:
+    """
+
+    merged: Dict[str, Any] = {}
+    for values in stats:
+        for key, value in values.items():
+            if key not in merged:
+                merged[key] = value
+            elif key == "start_time":
+                merged[key] = min(merged[key], value)
+            elif key == "finish_time" or key.endswith("_max_ms"):
+                merged[key] = max(merged[key], value)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                merged[key] += value
+
+    return merged
+
+
+def report(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Формирование отчета по статистике парсинга.
+
+    :param stats: Статистика Scrapy.
+    :return:
+    """
+
+    elapsed = (stats["finish_time"] - stats["start_time"]).total_seconds()
+    requests = stats.get("downloader/request_count", 0)
+    items = stats.get("item_scraped_count", 0)
+    batches = stats.get("mongodb/batches", 0)
+    # на Linux ru_maxrss указывается в килобайтах (для процессов распределенного
+    # парсинга – максимум по завершенным дочерним процессам)
+    peak_rss = (
+        max(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        )
+        / 1024
+    )
+
+    return {
+        "finish_reason": stats.get("finish_reason"),
+        "elapsed_s": round(elapsed, 2),
+        "requests": requests,
+        "items": items,
+        "requests_per_s": round(requests / elapsed, 1),
+        "items_per_s": round(items / elapsed, 1),
+        "peak_rss_mb": round(peak_rss, 1),
+        "pipeline_batches": batches,
+        "pipeline_batch_latency_avg_ms": round(
+            stats.get("mongodb/batch_latency_total_ms", 0) / batches, 1
+        )
+        if batches
+        else None,
+        "pipeline_batch_latency_max_ms": stats.get("mongodb/batch_latency_max_ms"),
+        "items_new": stats.get("mongodb/items/new", 0),
+        "items_changed": stats.get("mongodb/items/changed", 0),
+        "items_skipped": stats.get("mongodb/items/skipped", 0),
+        "aggregates_batches": stats.get("mongodb/aggregates/batches", 0),
+        "texts_processed": stats.get("text/processed", 0),
+        "texts_cached": stats.get("text/cached", 0),
+        "duplicates_found": stats.get("duplicates/found", 0),
+        "shards_duplicates": stats.get("shards/duplicates", 0),
+        "search_indexed": stats.get("search/indexed", 0),
+        "httpcache_hits": stats.get("httpcache/hit", 0),
+        "httpcache_revalidated": stats.get("httpcache/revalidate", 0),
+        "partition_splits": stats.get("partition/splits", 0),
+        "ratelimit_backoffs": stats.get("ratelimit/backoffs", 0),
+        "errors": {
+            key: value
+            for key, value in stats.items()
+            if key.startswith("downloader/response_status_count/")
+            and not key.endswith("/200")
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--vacancies", type=int, default=10000, help="number of vacancies"
+    )
+    parser.add_argument("--areas", type=int, default=80, help="number of areas")
+    parser.add_argument(
+        "--description-size",
+        type=int,
+        default=4000,
+        help="average vacancy description size, in characters",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="mean response latency, in seconds"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="share of 500 responses"
+    )
+    parser.add_argument(
+        "--throttle-rate", type=float, default=0.0, help="share of 429 responses"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument(
+        "--concurrency", type=int, default=16, help="CONCURRENT_REQUESTS setting"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=10000.0, help="RATELIMIT_RATE setting"
+    )
+    parser.add_argument(
+        "--mongodb-uri",
+        default="",
+        help="MongoDB to store vacancies in (default: in-memory stand-in)",
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="additional spider setting (may be repeated)",
+    )
+    parser.add_argument(
+        "--passes",
+        type=int,
+        default=1,
+        help="number of crawls of the same data (the report is for the last one)",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="number of spider processes sharing the areas through leases",
+    )
+    parser.add_argument("--output", help="file to write the JSON report to")
+    args = parser.parse_args()
+
+    server_options = [
+        f"--vacancies={args.vacancies}",
+        f"--areas={args.areas}",
+        f"--description-size={args.description_size}",
+        f"--latency={args.latency}",
+        f"--error-rate={args.error_rate}",
+        f"--throttle-rate={args.throttle_rate}",
+        f"--seed={args.seed}",
+    ]
+    with tempfile.TemporaryDirectory() as directory, mongodb(
+        args.mongodb_uri
+    ) as mongodb_uri, mock_server(free_port(), server_options) as api_url:
+        settings: Dict[str, Any] = {
+            "HH_API_URL": api_url,
+            "MONGODB_URI": mongodb_uri,
+            "MONGODB_DATABASE": "benchmark",
+            "PARTITIONS_CACHE_FILE": os.path.join(directory, "partitions.json"),
+            "CRAWL_STATE_FILE": os.path.join(directory, "crawl_state.sqlite"),
+            "ARCHIVE_DIR": os.path.join(directory, "archive"),
+            "REFERENCES_DIR": os.path.join(directory, "references"),
+            "TEXT_CACHE_FILE": os.path.join(directory, "text_cache.sqlite"),
+            "DUPLICATES_FILE": os.path.join(directory, "duplicates.sqlite"),
+            "SEARCH_FILE": os.path.join(directory, "search.sqlite"),
+            "SCHEDULER_OVERFLOW_FILE": os.path.join(directory, "overflow.sqlite"),
+            "SHARDS_FILE": os.path.join(directory, "shards.sqlite"),
+            # повторный проход измеряет инкрементальный парсинг, а не кэш HTTP
+            # (включается через --set HTTPCACHE_ENABLED=True)
+            "HTTPCACHE_ENABLED": False,
+            "HTTPCACHE_DIR": os.path.join(directory, "httpcache"),
+            "METRICS_FILE": os.path.join(directory, "metrics.jsonl"),
+            "METRICS_PROFILE_FILE": os.path.join(directory, "profile.pstats"),
+            "CONCURRENT_REQUESTS": args.concurrency,
+            "CONCURRENT_REQUESTS_PER_DOMAIN": args.concurrency,
+            "RATELIMIT_RATE": args.rate,
+            "RATELIMIT_BURST": args.concurrency,
+            "RATELIMIT_BACKOFF_DELAY": 1.0,
+            "RETRY_TIMES": 5,
+            "TELNETCONSOLE_ENABLED": False,
+            "LOG_LEVEL": "WARNING",
+        }
+        for option in args.set:
+            name, _, value = option.partition("=")
+            settings[name] = value
+        # переменные окружения имеют приоритет над настройками подключения
+        os.environ.pop("MONGODB_URI", None)
+        os.environ.pop("MONGODB_DATABASE", None)
+
+        if args.shards > 1:
+            settings["CRAWL_STATE_ENABLED"] = False
+            settings["DUPLICATES_BUFFER_SIZE"] = 1
+            with ProcessPoolExecutor(
+                args.shards, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        crawl_shard,
+                        {
+                            **settings,
+                            "SCHEDULER_OVERFLOW_FILE": os.path.join(
+                                directory, f"overflow-{number}.sqlite"
+                            ),
+                        },
+                        args.mongodb_uri,
+                        max(1, args.passes),
+                    )
+                    for number in range(args.shards)
+                ]
+                stats = [future.result() for future in futures]
+            result = report(merge_stats(stats))
+        else:
+            result = report(run_crawl(settings, max(1, args.passes))[-1])
+
+    text = json.dumps(result, indent=2, default=str)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text)
+
+
+if __name__ == "__main__":
+    main()
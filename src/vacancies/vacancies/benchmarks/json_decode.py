@@ -0,0 +1,103 @@
+"""
+Сравнение скорости разбора JSON на записанных ответах api.hh.ru.
+
+Источником ответов служат сегменты архива (``*.jsonl.gz``, см. ``ARCHIVE_ENABLED``)
+или отдельные файлы ``*.json``::
+
+    python -m vacancies.vacancies.benchmarks.json_decode vacancies/.scrapy/archive
+"""
+import argparse
+import glob
+import os
+import time
+from typing import Dict, Iterator, List
+
+from vacancies.vacancies.archive import read_segment
+from vacancies.vacancies.decoders import DECODERS, Decoder
+
+
+def load_payloads(paths: List[str], limit: int) -> List[bytes]:
+    """
+    Загрузка записанных ответов.
+
+    :param paths: Пути к сегментам архива, файлам JSON или директориям с ними.
+    :param limit: Максимальное количество ответов.
+    :return:
+    """
+
+    def files() -> Iterator[str]:
+        for path in paths:
+            if os.path.isdir(path):
+                yield from sorted(glob.glob(os.path.join(path, "*.jsonl.gz")))
+                yield from sorted(glob.glob(os.path.join(path, "*.json")))
+            else:
+                yield path
+
+    payloads: List[bytes] = []
+    for path in files():
+        if path.endswith(".jsonl.gz"):
+            for record in read_segment(path):
+                payloads.append(record["body"].encode("utf-8"))
+                if len(payloads) >= limit:
+                    return payloads
+        else:
+            with open(path, "rb") as file:
+                payloads.append(file.read())
+        if len(payloads) >= limit:
+            break
+
+    return payloads
+
+
+def measure(decode: Decoder, payloads: List[bytes], repeat: int) -> float:
+    """
+    Измерение лучшего времени разбора всех ответов.
+
+    :param decode: Функция разбора JSON.
+    :param payloads: Ответы.
+    :param repeat: Количество повторов.
+    :return: Время (в секундах).
+    """
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload in payloads:
+            decode(payload)
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "paths", nargs="+", help="archive segments, JSON files or directories"
+    )
+    parser.add_argument(
+        "--limit", type=int, default=10000, help="maximum number of payloads"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="number of repetitions")
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.paths, args.limit)
+    if not payloads:
+        parser.error("no payloads found")
+
+    size_mb = sum(len(payload) for payload in payloads) / 1024 / 1024
+    print(f"{len(payloads)} payloads, {size_mb:.1f} MB")
+
+    results: Dict[str, float] = {
+        name: measure(decode, payloads, args.repeat)
+        for name, decode in DECODERS.items()
+    }
+    baseline = results["json"]
+    for name, elapsed in sorted(results.items(), key=lambda item: item[1]):
+        print(
+            f"{name:>8}: {len(payloads) / elapsed:10.0f} payloads/s "
+            f"{size_mb / elapsed:8.1f} MB/s  x{baseline / elapsed:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+Замена MongoDB в памяти процесса для измерения производительности парсинга.
+
+Поддерживается подмножество API ``pymongo``, которое использует проект:
+пакетная запись (``ReplaceOne``, ``UpdateOne``, ``InsertOne``, ``DeleteOne``),
+фильтры по равенству полей, индексы и простой ``find``. Поиск документа
+по фильтру из одного поля выполняется по словарю, поэтому стоимость записи
+не растет с размером коллекции и задержка записи пакетов отражает накладные
+расходы конвейера, а не самой замены.
+"""
+import copy
+import threading
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+from pymongo import DeleteOne, InsertOne, ReplaceOne, UpdateOne
+
+Document = Dict[str, Any]
+
+
+class BulkResult(NamedTuple):
+    """
+    Результат пакетной записи (аналог ``pymongo.results.BulkWriteResult``).
+    """
+
+    inserted_count: int = 0
+    matched_count: int = 0
+    modified_count: int = 0
+    deleted_count: int = 0
+    upserted_count: int = 0
+
+
+def _get(document: Document, path: str) -> Any:
+    value: Any = document
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+
+    return value
+
+
+def _matches(document: Document, query: Document) -> bool:
+    return all(_get(document, key) == value for key, value in query.items())
+
+
+def _update(document: Document, update: Any, inserted: bool) -> Document:
+    result = dict(document)
+    for operator, fields in update.items():
+        if operator == "$set" or (operator == "$setOnInsert" and inserted):
+            result.update(copy.deepcopy(fields))
+        elif operator == "$unset":
+            for name in fields:
+                result.pop(name, None)
+        elif operator == "$inc":
+            for name, value in fields.items():
+                result[name] = result.get(name, 0) + value
+        elif operator != "$setOnInsert":
+            raise NotImplementedError(f"Update operator {operator} is not supported.")
+
+    return result
+
+
+class MemoryCollection:
+    """
+    Коллекция документов в памяти.
+    """
+
+    def __init__(self, name: str) -> None:
+        """
+        :param name: Название коллекции.
+        """
+
+        self.name = name
+        self._documents: Dict[int, Document] = {}
+        # поле – значение – ключи документов
+        self._lookup: Dict[str, Dict[Any, List[int]]] = {}
+        self._indexes: Dict[str, Dict[str, Any]] = {"_id_": {"key": [("_id", 1)]}}
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def bulk_write(self, requests: List[Any], ordered: bool = True) -> BulkResult:
+        counts = dict.fromkeys(BulkResult._fields, 0)
+        with self._lock:
+            for request in requests:
+                self._apply(request, counts)
+
+        return BulkResult(**counts)
+
+    def insert_one(self, document: Document) -> None:
+        self.bulk_write([InsertOne(document)])
+
+    def find(
+        self,
+        query: Optional[Document] = None,
+        projection: Optional[Document] = None,
+        **kwargs: Any,
+    ) -> Iterator[Document]:
+        with self._lock:
+            documents = [
+                self._documents[key] for key in self._find_keys(query or {}, many=True)
+            ]
+
+        for document in documents:
+            yield self._project(document, projection)
+
+    def find_one(
+        self, query: Optional[Document] = None, projection: Optional[Document] = None
+    ) -> Optional[Document]:
+        return next(self.find(query, projection), None)
+
+    def count_documents(self, query: Document) -> int:
+        with self._lock:
+            return len(self._find_keys(query, many=True))
+
+    def index_information(self) -> Dict[str, Dict[str, Any]]:
+        return copy.deepcopy(self._indexes)
+
+    def create_indexes(self, indexes: List[Any]) -> List[str]:
+        names = []
+        for index in indexes:
+            document = dict(index.document)
+            name = document.pop("name")
+            document["key"] = list(document["key"].items())
+            self._indexes[name] = document
+            names.append(name)
+
+        return names
+
+    def drop_index(self, name: str) -> None:
+        self._indexes.pop(name, None)
+
+    def _apply(self, request: Any, counts: Dict[str, int]) -> None:
+        # атрибуты операций pymongo не входят в публичный API, но стабильны
+        if isinstance(request, InsertOne):
+            self._insert(copy.deepcopy(request._doc))
+            counts["inserted_count"] += 1
+            return None
+
+        keys = self._find_keys(request._filter, many=False)
+        if isinstance(request, DeleteOne):
+            for key in keys:
+                self._remove(key)
+                counts["deleted_count"] += 1
+            return None
+        if not isinstance(request, (ReplaceOne, UpdateOne)):
+            raise NotImplementedError(f"{type(request).__name__} is not supported.")
+
+        if keys:
+            key = keys[0]
+            current = self._documents[key]
+            if isinstance(request, ReplaceOne):
+                document = dict(copy.deepcopy(request._doc), _id=current["_id"])
+            else:
+                document = _update(current, request._doc, inserted=False)
+            counts["matched_count"] += 1
+            if document != current:
+                self._remove(key)
+                self._insert(document, key)
+                counts["modified_count"] += 1
+        elif request._upsert:
+            document = {
+                key: value
+                for key, value in request._filter.items()
+                if not key.startswith("$")
+            }
+            if isinstance(request, ReplaceOne):
+                document.update(copy.deepcopy(request._doc))
+            else:
+                document = _update(document, request._doc, inserted=True)
+            self._insert(document)
+            counts["upserted_count"] += 1
+
+        return None
+
+    def _find_keys(self, query: Document, many: bool) -> List[int]:
+        if len(query) == 1:
+            ((field, value),) = query.items()
+            if not isinstance(value, dict):
+                keys = self._field_lookup(field).get(self._hashable(value), [])
+                return list(keys if many else keys[:1])
+            if list(value) == ["$in"]:
+                lookup = self._field_lookup(field)
+                keys = sorted(
+                    {
+                        key
+                        for item in value["$in"]
+                        for key in lookup.get(self._hashable(item), [])
+                    }
+                )
+                return keys if many else keys[:1]
+
+        keys = [
+            key
+            for key, document in self._documents.items()
+            if _matches(document, query)
+        ]
+
+        return keys if many else keys[:1]
+
+    def _field_lookup(self, field: str) -> Dict[Any, List[int]]:
+        lookup = self._lookup.get(field)
+        if lookup is None:
+            lookup = self._lookup[field] = {}
+            for key, document in self._documents.items():
+                lookup.setdefault(self._hashable(_get(document, field)), []).append(key)
+
+        return lookup
+
+    def _insert(self, document: Document, key: Optional[int] = None) -> None:
+        if key is None:
+            key, self._next_key = self._next_key, self._next_key + 1
+        document.setdefault("_id", key)
+        self._documents[key] = document
+        for field, lookup in self._lookup.items():
+            lookup.setdefault(self._hashable(_get(document, field)), []).append(key)
+
+    def _remove(self, key: int) -> None:
+        document = self._documents.pop(key)
+        for field, lookup in self._lookup.items():
+            lookup[self._hashable(_get(document, field))].remove(key)
+
+    @staticmethod
+    def _hashable(value: Any) -> Any:
+        return (
+            value
+            if isinstance(value, (str, int, float, bool, type(None)))
+            else repr(value)
+        )
+
+    @staticmethod
+    def _project(document: Document, projection: Optional[Document]) -> Document:
+        if not projection:
+            return copy.deepcopy(document)
+
+        included = {name for name, flag in projection.items() if flag}
+        if included:
+            included.add("_id")
+        result = {
+            name: copy.deepcopy(value)
+            for name, value in document.items()
+            if (name in included if included else projection.get(name, True))
+        }
+        if not projection.get("_id", True):
+            result.pop("_id", None)
+
+        return result
+
+
+class MemoryClient:
+    """
+    Клиент MongoDB в памяти процесса (аналог ``pymongo.MongoClient``).
+
+    Все клиенты процесса работают с общими данными, поэтому записанное
+    пауком доступно после закрытия клиента.
+    """
+
+    _databases: Dict[str, Dict[str, MemoryCollection]] = {}
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        pass
+
+    def __getitem__(self, name: str) -> "MemoryDatabase":
+        return MemoryDatabase(self._databases.setdefault(name, {}))
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryDatabase:
+    """
+    База данных в памяти процесса.
+    """
+
+    def __init__(self, collections: Dict[str, MemoryCollection]) -> None:
+        self._collections = collections
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(name)
+
+        return self._collections[name]
+
+    def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
+
+def stored(database: str = "benchmark") -> Dict[str, int]:
+    """
+    Количество документов в коллекциях базы данных.
+
+    :param database: Название базы данных.
+    :return:
+    """
+
+    collections: Dict[str, MemoryCollection] = MemoryClient._databases.get(database, {})
+
+    return {name: len(collection) for name, collection in collections.items()}
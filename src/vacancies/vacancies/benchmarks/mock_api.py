@@ -0,0 +1,566 @@
+"""
+Локальная замена api.hh.ru с синтетическими данными.
+
+Сервер отдает справочники ``/areas``, ``/dictionaries`` и ``/professional_roles``
+(с поддержкой ``ETag``), постраничные результаты поиска ``/vacancies``
+(с фильтрами ``area``, ``date_from``, ``date_to``, ``professional_role``
+и ограничением в 2000 результатов) и детальную информацию ``/vacancies/{id}``.
+Задержка ответов, доля ошибок и размер набора данных настраиваются::
+
+    python -m vacancies.vacancies.benchmarks.mock_api --port 8088 --vacancies 50000
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from vacancies.vacancies.incremental import DATETIME_FORMAT
+from vacancies.vacancies.partition import PER_PAGE, SEARCH_LIMIT, SEARCH_PERIOD
+
+# справочники, которые поддерживают условные запросы
+REFERENCE_PATHS = ("/areas", "/dictionaries", "/professional_roles")
+# идентификатор России в справочнике регионов
+AREA_RU_ID = 113
+# идентификатор первого региона России
+AREA_BASE_ID = 1000
+VACANCY_BASE_ID = 70000000
+
+# справочники /dictionaries (подмножество api.hh.ru)
+DICTIONARIES: Dict[str, List[Dict[str, Any]]] = {
+    "experience": [
+        {"id": "noExperience", "name": "Нет опыта"},
+        {"id": "between1And3", "name": "От 1 года до 3 лет"},
+        {"id": "between3And6", "name": "От 3 до 6 лет"},
+        {"id": "moreThan6", "name": "Более 6 лет"},
+    ],
+    "schedule": [
+        {"id": "fullDay", "name": "Полный день"},
+        {"id": "flexible", "name": "Гибкий график"},
+        {"id": "remote", "name": "Удаленная работа"},
+    ],
+    "employment": [
+        {"id": "full", "name": "Полная занятость"},
+        {"id": "part", "name": "Частичная занятость"},
+        {"id": "project", "name": "Проектная работа"},
+    ],
+    "vacancy_type": [
+        {"id": "open", "name": "Открытая"},
+        {"id": "closed", "name": "Закрытая"},
+    ],
+    "vacancy_billing_type": [
+        {"id": "standard", "name": "Стандарт"},
+        {"id": "premium", "name": "Премиум"},
+    ],
+    "currency": [
+        {"code": "RUR", "abbr": "руб.", "name": "Рубли", "default": True, "rate": 1.0},
+        {
+            "code": "USD",
+            "abbr": "USD",
+            "name": "Доллары",
+            "default": False,
+            "rate": 0.016,
+        },
+        {"code": "EUR", "abbr": "EUR", "name": "Евро", "default": False, "rate": 0.015},
+        {"code": "KZT", "abbr": "KZT", "name": "Тенге", "default": False, "rate": 7.3},
+    ],
+}
+CURRENCIES = ("RUR", "RUR", "RUR", "RUR", "USD", "EUR", "KZT")
+SKILLS = (
+    "Python",
+    "SQL",
+    "Machine Learning",
+    "Pandas",
+    "NumPy",
+    "PyTorch",
+    "TensorFlow",
+    "Scikit-learn",
+    "Docker",
+    "Git",
+    "Linux",
+    "Spark",
+    "Hadoop",
+    "MongoDB",
+    "PostgreSQL",
+    "Математическая статистика",
+    "Анализ данных",
+    "Английский язык",
+)
+WORDS = (
+    "разработка",
+    "моделей",
+    "машинного",
+    "обучения",
+    "анализ",
+    "данных",
+    "опыт",
+    "работы",
+    "команда",
+    "продукт",
+    "требования",
+    "условия",
+    "задачи",
+    "python",
+    "sql",
+    "статистика",
+)
+
+
+def _format(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime(DATETIME_FORMAT)
+
+
+def _parse(value: str) -> Optional[float]:
+    for pattern in (DATETIME_FORMAT, "%Y-%m-%d"):
+        try:
+            moment = datetime.strptime(value, pattern)
+        except ValueError:
+            continue
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.timestamp()
+
+    return None
+
+
+class Dataset:
+    """
+    Синтетический набор вакансий.
+
+    Вакансии распределены по регионам неравномерно (по закону Ципфа), поэтому
+    результаты поиска по крупным регионам превышают ограничение api.hh.ru
+    и требуют разбиения запросов. Для каждого региона время публикации хранится
+    в отсортированном массиве, детальная информация генерируется по запросу
+    детерминированно по идентификатору вакансии.
+    """
+
+    def __init__(
+        self,
+        size: int = 10000,
+        areas: int = 80,
+        roles: int = 40,
+        description_size: int = 4000,
+        seed: int = 0,
+        now: Optional[float] = None,
+    ) -> None:
+        """
+        :param size: Количество вакансий.
+        :param areas: Количество регионов России.
+        :param roles: Количество профессиональных ролей.
+        :param description_size: Средний размер описания вакансии (в символах).
+        :param seed: Начальное значение генератора случайных чисел.
+        :param now: Текущее время Unix (верхняя граница даты публикации).
+        """
+
+        self.size = size
+        self.description_size = description_size
+        self.seed = seed
+        self.now = now if now is not None else time.time()
+        self.area_ids = [str(AREA_BASE_ID + index) for index in range(areas)]
+        self.role_ids = [str(index + 1) for index in range(roles)]
+
+        rnd = random.Random(seed)
+        period = SEARCH_PERIOD.total_seconds()
+        weights = [1 / (rank + 1) for rank in range(areas)]
+        records: Dict[int, List[Tuple[float, int, int]]] = {}
+        for number, area in enumerate(rnd.choices(range(areas), weights, k=size)):
+            published = self.now - rnd.random() * period
+            role = rnd.randrange(roles)
+            records.setdefault(area, []).append((published, role, number))
+
+        # регион – отсортированные время публикации, роли и номера вакансий
+        self.index: Dict[str, Tuple[array, array, array]] = {}
+        # номер вакансии – регион, роль и время публикации
+        self.vacancy_area = array("l", [0] * size)
+        self.vacancy_role = array("l", [0] * size)
+        self.vacancy_published = array("d", [0.0] * size)
+        for area, items in records.items():
+            items.sort()
+            self.index[self.area_ids[area]] = (
+                array("d", (item[0] for item in items)),
+                array("l", (item[1] for item in items)),
+                array("l", (item[2] for item in items)),
+            )
+            for published, role, number in items:
+                self.vacancy_area[number] = area
+                self.vacancy_role[number] = role
+                self.vacancy_published[number] = published
+
+    def areas(self) -> List[Dict[str, Any]]:
+        """
+        Справочник регионов.
+
+        :return:
+        """
+
+        regions = [
+            {
+                "id": area_id,
+                "parent_id": str(AREA_RU_ID),
+                "name": f"Регион {area_id}",
+                "areas": [],
+            }
+            for area_id in self.area_ids
+        ]
+
+        return [
+            {
+                "id": str(AREA_RU_ID),
+                "parent_id": None,
+                "name": "Россия",
+                "areas": regions,
+            },
+            {"id": "5", "parent_id": None, "name": "Украина", "areas": []},
+        ]
+
+    def professional_roles(self) -> Dict[str, Any]:
+        """
+        Справочник профессиональных ролей.
+
+        :return:
+        """
+
+        roles = [
+            {"id": role_id, "name": f"Роль {role_id}"} for role_id in self.role_ids
+        ]
+
+        return {
+            "categories": [
+                {"id": str(index + 1), "name": f"Категория {index + 1}", "roles": chunk}
+                for index, chunk in enumerate(
+                    roles[start:][:10] for start in range(0, len(roles), 10)
+                )
+            ]
+        }
+
+    def search(self, params: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Поиск вакансий.
+
+        :param params: Параметры запроса.
+        :return:
+        """
+
+        per_page = min(int(params.get("per_page") or 20), PER_PAGE)
+        page = int(params.get("page") or 0)
+        date_from = _parse(params["date_from"]) if "date_from" in params else None
+        date_to = _parse(params["date_to"]) if "date_to" in params else None
+        role = params.get("professional_role")
+
+        published, roles, numbers = self.index.get(
+            params.get("area", ""), (array("d"), array("l"), array("l"))
+        )
+        lower = bisect_left(published, date_from) if date_from is not None else 0
+        upper = (
+            bisect_left(published, date_to) if date_to is not None else len(published)
+        )
+        found = [
+            numbers[position]
+            for position in range(lower, upper)
+            if role is None or str(roles[position] + 1) == role
+        ]
+        # результаты сортируются по убыванию даты публикации
+        found.reverse()
+
+        limit = min(len(found), SEARCH_LIMIT)
+        start = page * per_page
+        stop = min(start + per_page, limit)
+        items = [self.short(number) for number in found[start:stop]]
+
+        return {
+            "items": items,
+            "found": len(found),
+            "pages": math.ceil(limit / per_page),
+            "per_page": per_page,
+            "page": page,
+        }
+
+    def short(self, number: int) -> Dict[str, Any]:
+        """
+        Краткая информация о вакансии для результатов поиска.
+
+        :param number: Номер вакансии.
+        :return:
+        """
+
+        vacancy_id = str(VACANCY_BASE_ID + number)
+
+        return {
+            "id": vacancy_id,
+            "name": f"Вакансия {vacancy_id}",
+            "area": self._area(number),
+            "published_at": _format(self.vacancy_published[number]),
+            "url": f"/vacancies/{vacancy_id}",
+        }
+
+    def detail(self, vacancy_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Детальная информация о вакансии.
+
+        :param vacancy_id: Идентификатор вакансии.
+        :return: Данные вакансии или None, если вакансия не найдена.
+        """
+
+        number = int(vacancy_id) - VACANCY_BASE_ID if vacancy_id.isdigit() else -1
+        if not 0 <= number < self.size:
+            return None
+
+        rnd = random.Random(self.seed * 1_000_003 + number)
+        published = _format(self.vacancy_published[number])
+        role_id = self.role_ids[self.vacancy_role[number]]
+        salary_from = rnd.randrange(30, 400) * 1000
+        employer_id = str(rnd.randrange(1, 5000))
+        length = rnd.randint(self.description_size // 2, self.description_size * 3 // 2)
+        # средняя длина слова с пробелом – около 9 символов
+        description = " ".join(rnd.choices(WORDS, k=max(1, length // 9)))
+
+        return {
+            "id": vacancy_id,
+            "premium": False,
+            "billing_type": rnd.choice(DICTIONARIES["vacancy_billing_type"]),
+            "relations": [],
+            "name": f"Вакансия {vacancy_id}",
+            "insider_interview": None,
+            "response_letter_required": rnd.random() < 0.1,
+            "area": self._area(number),
+            "salary": rnd.choice(
+                [
+                    None,
+                    {
+                        "from": salary_from,
+                        "to": salary_from + rnd.randrange(0, 100) * 1000,
+                        "currency": rnd.choice(CURRENCIES),
+                        "gross": rnd.random() < 0.5,
+                    },
+                ]
+            ),
+            "type": DICTIONARIES["vacancy_type"][0],
+            "address": None,
+            "allow_messages": True,
+            "experience": rnd.choice(DICTIONARIES["experience"]),
+            "schedule": rnd.choice(DICTIONARIES["schedule"]),
+            "employment": rnd.choice(DICTIONARIES["employment"]),
+            "department": None,
+            "contacts": None,
+            "description": f"<p>{description}</p>",
+            "branded_description": None,
+            "vacancy_constructor_template": None,
+            "key_skills": [{"name": name} for name in rnd.sample(SKILLS, 5)],
+            "accept_handicapped": False,
+            "accept_kids": False,
+            "archived": False,
+            "response_url": None,
+            "specializations": [],
+            "professional_roles": [{"id": role_id, "name": f"Роль {role_id}"}],
+            "code": None,
+            "hidden": False,
+            "quick_responses_allowed": False,
+            "driver_license_types": [],
+            "accept_incomplete_resumes": False,
+            "employer": {
+                "id": employer_id,
+                "name": f"Работодатель {employer_id}",
+                "url": f"/employers/{employer_id}",
+                "alternate_url": None,
+                "logo_urls": None,
+                "vacancies_url": None,
+                "trusted": True,
+            },
+            "published_at": published,
+            "created_at": published,
+            "initial_created_at": published,
+            "negotiations_url": None,
+            "suitable_resumes_url": None,
+            "apply_alternate_url": None,
+            "has_test": False,
+            "test": None,
+            "alternate_url": None,
+            "working_days": [],
+            "working_time_intervals": [],
+            "working_time_modes": [],
+            "accept_temporary": False,
+            "languages": [],
+        }
+
+    def _area(self, number: int) -> Dict[str, Any]:
+        area_id = self.area_ids[self.vacancy_area[number]]
+
+        return {"id": area_id, "name": f"Регион {area_id}", "url": f"/areas/{area_id}"}
+
+
+class MockAPI:
+    """
+    Ответы на запросы к api.hh.ru данными из ``Dataset``.
+    """
+
+    def __init__(
+        self,
+        dataset: Dataset,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        """
+        :param dataset: Набор вакансий.
+        :param latency: Средняя задержка ответа (в секундах).
+        :param error_rate: Доля ответов с кодом 500.
+        :param throttle_rate: Доля ответов с кодом 429 и заголовком ``Retry-After``.
+        :param seed: Начальное значение генератора случайных чисел.
+        """
+
+        self.dataset = dataset
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.served: Counter = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def respond(
+        self, target: str, etag: Optional[str] = None
+    ) -> Tuple[int, float, bytes, Optional[str]]:
+        """
+        Формирование ответа на запрос.
+
+        Справочники отдаются с заголовком ``ETag`` и поддерживают условные запросы.
+
+        :param target: Путь и параметры запроса.
+        :param etag: Значение заголовка ``If-None-Match``.
+        :return: Код ответа, задержка (в секундах), тело ответа и ``ETag``.
+        """
+
+        with self._lock:
+            chance = self._random.random()
+            delay = self._random.uniform(0.5, 1.5) * self.latency
+
+        url = urlsplit(target)
+        path = url.path.rstrip("/")
+        result: Any
+        if chance < self.throttle_rate:
+            status, result = 429, {"errors": [{"type": "too_many_requests"}]}
+        elif chance < self.throttle_rate + self.error_rate:
+            status, result = 500, {"errors": [{"type": "internal_error"}]}
+        elif path == "/areas":
+            status, result = 200, self.dataset.areas()
+        elif path == "/professional_roles":
+            status, result = 200, self.dataset.professional_roles()
+        elif path == "/dictionaries":
+            status, result = 200, DICTIONARIES
+        elif path == "/vacancies":
+            status, result = 200, self.dataset.search(dict(parse_qsl(url.query)))
+        elif path.startswith("/vacancies/"):
+            status, result = 200, self.dataset.detail(path.rsplit("/", 1)[-1])
+        else:
+            status, result = 404, None
+        if result is None:
+            status, result = 404, {"errors": [{"type": "not_found"}]}
+
+        body = json.dumps(result, ensure_ascii=False).encode("utf-8")
+        tag = None
+        if status == 200 and path in REFERENCE_PATHS:
+            tag = f'"{hashlib.md5(body).hexdigest()}"'
+            if tag == etag:
+                status, body = 304, b""
+
+        with self._lock:
+            self.served[status] += 1
+
+        return status, delay, body, tag
+
+
+class MockAPIHandler(BaseHTTPRequestHandler):
+    """
+    Обработчик HTTP-запросов к ``MockAPI``.
+    """
+
+    # постоянные соединения, как у api.hh.ru
+    protocol_version = "HTTP/1.1"
+    api: MockAPI
+
+    def do_GET(self) -> None:
+        status, delay, body, etag = self.api.respond(
+            self.path, self.headers.get("If-None-Match")
+        )
+        if delay > 0:
+            # каждое соединение обслуживается отдельным потоком
+            time.sleep(delay)
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8088, help="port to listen on")
+    parser.add_argument(
+        "--vacancies", type=int, default=10000, help="number of vacancies"
+    )
+    parser.add_argument("--areas", type=int, default=80, help="number of areas")
+    parser.add_argument(
+        "--roles", type=int, default=40, help="number of professional roles"
+    )
+    parser.add_argument(
+        "--description-size",
+        type=int,
+        default=4000,
+        help="average vacancy description size, in characters",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="mean response latency, in seconds"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="share of 500 responses"
+    )
+    parser.add_argument(
+        "--throttle-rate", type=float, default=0.0, help="share of 429 responses"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    dataset = Dataset(
+        size=args.vacancies,
+        areas=args.areas,
+        roles=args.roles,
+        description_size=args.description_size,
+        seed=args.seed,
+    )
+    MockAPIHandler.api = MockAPI(
+        dataset,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        seed=args.seed,
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), MockAPIHandler)
+    print(f"Serving {args.vacancies} vacancies on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Responses served: {dict(MockAPIHandler.api.served)}")
+
+
+if __name__ == "__main__":
+    main()
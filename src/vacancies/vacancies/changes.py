@@ -0,0 +1,180 @@
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from pymongo.collection import Collection
+
+from vacancies.vacancies.items import DERIVED_FIELDS
+
+# поля документа с хэшем содержимого и хэшами отдельных полей
+HASH_FIELD = "content_hash"
+FIELD_HASHES_FIELD = "field_hashes"
+
+
+def field_hashes(document: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Хэши значений полей документа.
+
+    Значения сериализуются в JSON с отсортированными ключами, поэтому хэш
+    не зависит от порядка ключей во вложенных объектах.
+
+    :param document: Документ вакансии.
+    :return: Словарь "поле" – "хэш значения" (без служебных полей хэшей).
+    """
+
+    return {
+        name: hashlib.blake2b(
+            json.dumps(
+                value,
+                sort_keys=True,
+                ensure_ascii=False,
+                separators=(",", ":"),
+                default=str,
+            ).encode("utf-8"),
+            digest_size=8,
+        ).hexdigest()
+        for name, value in document.items()
+        if name not in (HASH_FIELD, FIELD_HASHES_FIELD, "_id")
+    }
+
+
+def api_field_hashes(document: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Хэши полей документа, полученных из API (без полей, добавленных при обработке).
+
+    :param document: Документ вакансии.
+    :return:
+    """
+
+    return field_hashes(
+        {name: value for name, value in document.items() if name not in DERIVED_FIELDS}
+    )
+
+
+def content_hash(hashes: Dict[str, str]) -> str:
+    """
+    Хэш содержимого документа по хэшам его полей.
+
+    :param hashes: Хэши полей документа (результат ``field_hashes``).
+    :return:
+    """
+
+    digest = hashlib.blake2b(digest_size=16)
+    for name in sorted(hashes):
+        digest.update(f"{name}:{hashes[name]};".encode("utf-8"))
+
+    return digest.hexdigest()
+
+
+def diff(
+    document: Dict[str, Any],
+    hashes: Dict[str, str],
+    previous: Dict[str, str],
+) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Изменения документа относительно сохраненной версии.
+
+    :param document: Новый документ.
+    :param hashes: Хэши полей нового документа.
+    :param previous: Хэши полей сохраненной версии.
+    :return: Значения измененных и новых полей (для ``$set``)
+        и названия удаленных полей (для ``$unset``).
+    """
+
+    changed = {
+        name: document[name]
+        for name, value in hashes.items()
+        if previous.get(name) != value
+    }
+    removed = {name: "" for name in previous if name not in hashes}
+
+    return changed, removed
+
+
+class ContentHashes:
+    """
+    Кэш хэшей содержимого сохраненных вакансий с вытеснением давно
+    не использованных записей (LRU).
+
+    Кэш хранит только хэш всего документа: этого достаточно, чтобы пропустить
+    неизмененную вакансию без обращения к базе данных. Хэши отдельных полей,
+    нужные для записи изменений, читаются из сохраненного документа.
+    """
+
+    def __init__(self, size: int = 100000) -> None:
+        """
+        :param size: Максимальное количество записей.
+        """
+
+        self.size = size
+        self._hashes: "OrderedDict[str, str]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def get(self, vacancy_id: str) -> Optional[str]:
+        """
+        Получение хэша содержимого вакансии.
+
+        :param vacancy_id: Идентификатор вакансии.
+        :return: Хэш или None, если вакансии нет в кэше.
+        """
+
+        value = self._hashes.get(vacancy_id)
+        if value is not None:
+            self._hashes.move_to_end(vacancy_id)
+
+        return value
+
+    def put(self, vacancy_id: str, value: str) -> None:
+        """
+        Сохранение хэша содержимого вакансии.
+
+        :param vacancy_id: Идентификатор вакансии.
+        :param value: Хэш содержимого.
+        :return:
+        """
+
+        self._hashes[vacancy_id] = value
+        self._hashes.move_to_end(vacancy_id)
+        while len(self._hashes) > self.size:
+            self._hashes.popitem(last=False)
+
+    def update(self, records: Iterable[Tuple[str, str]]) -> None:
+        """
+        Заполнение кэша парами "идентификатор вакансии" – "хэш содержимого".
+
+        :param records: Пары в порядке от давно использованных к недавним.
+        :return:
+        """
+
+        for vacancy_id, value in records:
+            self.put(vacancy_id, value)
+
+    def warm(self, collection: Collection) -> None:
+        """
+        Заполнение кэша хэшами последних опубликованных вакансий коллекции.
+
+        :param collection: Коллекция MongoDB с вакансиями.
+        :return:
+        """
+
+        if self.size <= 0:
+            return None
+
+        cursor = collection.find(
+            {},
+            {"_id": False, "id": True, HASH_FIELD: True},
+            sort=[("published_at", -1)],
+            limit=self.size,
+        )
+        records = [
+            (document["id"], document[HASH_FIELD])
+            for document in cursor
+            if document.get(HASH_FIELD)
+        ]
+        # последние опубликованные вакансии вытесняются последними
+        self.update(reversed(records))
+
+        return None
@@ -0,0 +1,4 @@
+# This package contains custom Scrapy commands of the project
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/commands.html#custom-project-commands
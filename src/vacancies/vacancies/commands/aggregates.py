@@ -0,0 +1,101 @@
+import time
+from argparse import ArgumentParser, Namespace
+from typing import List
+
+from pymongo.collection import Collection
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import NotConfigured, UsageError
+
+from vacancies.vacancies.aggregates import AREA, ROLE, SKILL, Aggregates
+from vacancies.vacancies.analysis import aggregates as analysis
+from vacancies.vacancies.pipelines import MongoDBPipeline
+from vacancies.vacancies.storage import connect
+
+
+class Command(ScrapyCommand):
+    """
+    Вывод агрегатов навыков, регионов и профессиональных ролей и их пересборка.
+    """
+
+    requires_project = True
+    default_settings = {"LOG_ENABLED": False}
+
+    def syntax(self) -> str:
+        return "[options]"
+
+    def short_desc(self) -> str:
+        return "Show skill, area and role aggregates or rebuild them from vacancies"
+
+    def add_options(self, parser: ArgumentParser) -> None:
+        super().add_options(parser)
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="rebuild the aggregates collection from the vacancies collection",
+        )
+        parser.add_argument(
+            "--kind",
+            choices=(SKILL, AREA, ROLE),
+            default=SKILL,
+            help="kind of aggregates to show (default: skill)",
+        )
+        parser.add_argument(
+            "--key",
+            help="show salary quantiles (and co-occurring skills) for this key",
+        )
+        parser.add_argument(
+            "--top", type=int, default=20, help="number of values to show"
+        )
+
+    def run(self, args: List[str], opts: Namespace) -> None:
+        if args:
+            raise UsageError()
+
+        collection = self.settings.get("MONGODB_AGGREGATES_COLLECTION")
+        if not collection:
+            raise UsageError("MONGODB_AGGREGATES_COLLECTION setting is empty.")
+        try:
+            client, mongodb_db = connect(self.settings)
+        except NotConfigured as exc:
+            raise UsageError(str(exc)) from exc
+
+        try:
+            if opts.rebuild:
+                self._rebuild(
+                    client[mongodb_db][MongoDBPipeline.collection],
+                    client[mongodb_db][collection],
+                )
+                return
+
+            aggregates = Aggregates(client[mongodb_db][collection])
+            if opts.key is None:
+                for key, count in aggregates.top(opts.kind, opts.top):
+                    median = aggregates.salary(opts.kind, key, (0.5,))[0.5]
+                    print(f"{key}\t{count}\t{median if median is not None else ''}")
+                return
+
+            document = aggregates.get(opts.kind, opts.key)
+            if document is None:
+                raise UsageError(f"No aggregate for {opts.kind} {opts.key}.")
+            print(f"Vacancies: {document.get('count', 0)}")
+            for level, value in aggregates.salary(opts.kind, opts.key).items():
+                print(
+                    f"Salary p{int(level * 100)}: {value if value is not None else '-'}"
+                )
+            if opts.kind == SKILL:
+                for skill, count in aggregates.cooccurring(opts.key, opts.top):
+                    print(f"{skill}\t{count}")
+        finally:
+            client.close()
+
+    @staticmethod
+    def _rebuild(vacancies: Collection, aggregates: Collection) -> None:
+        if analysis.sparse is None:
+            raise UsageError(
+                "numpy and scipy are not installed "
+                "(install the project with the analysis extra)."
+            )
+
+        start = time.perf_counter()
+        written = analysis.rebuild(vacancies, aggregates)
+        print(f"Rebuilt {written} aggregates in {time.perf_counter() - start:.1f} s.")
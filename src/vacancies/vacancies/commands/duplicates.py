@@ -0,0 +1,160 @@
+import time
+from argparse import ArgumentParser, Namespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import NotConfigured, UsageError
+from scrapy.utils.project import data_path
+
+from vacancies.vacancies.changes import (
+    FIELD_HASHES_FIELD,
+    HASH_FIELD,
+    api_field_hashes,
+    content_hash,
+)
+from vacancies.vacancies.duplicates import DuplicateIndex, MinHash, Signature, shingles
+from vacancies.vacancies.pipelines import MongoDBPipeline
+from vacancies.vacancies.storage import connect
+from vacancies.vacancies.text import html_to_text, words
+
+
+class Command(ScrapyCommand):
+    """
+    Вывод кластеров почти одинаковых вакансий и пересборка индекса дубликатов.
+    """
+
+    requires_project = True
+    default_settings = {"LOG_ENABLED": False}
+
+    def syntax(self) -> str:
+        return "[vacancy_id] [options]"
+
+    def short_desc(self) -> str:
+        return "Show near-duplicate vacancy clusters or rebuild the duplicates index"
+
+    def add_options(self, parser: ArgumentParser) -> None:
+        super().add_options(parser)
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="rebuild the index from the vacancies collection and tag clusters",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="number of vacancies processed at once with --rebuild",
+        )
+        parser.add_argument(
+            "--top", type=int, default=20, help="number of largest clusters to show"
+        )
+
+    def run(self, args: List[str], opts: Namespace) -> None:
+        if len(args) > 1:
+            raise UsageError()
+
+        index = DuplicateIndex(
+            data_path(self.settings.get("DUPLICATES_FILE", "duplicates.sqlite")),
+            threshold=self.settings.getfloat("DUPLICATES_THRESHOLD", 0.8),
+        )
+        try:
+            if opts.rebuild:
+                self._rebuild(index, opts.batch_size)
+            elif args:
+                cluster = index.cluster(args[0])
+                if cluster is None:
+                    raise UsageError(f"Vacancy {args[0]} is not in the index.")
+                for vacancy_id in index.members(cluster):
+                    print(vacancy_id)
+            else:
+                for cluster, count in index.largest(opts.top):
+                    print(f"{cluster}\t{count}")
+        finally:
+            index.close()
+
+    def _rebuild(self, index: DuplicateIndex, batch_size: int) -> None:
+        try:
+            client, mongodb_db = connect(self.settings)
+        except NotConfigured as exc:
+            raise UsageError(str(exc)) from exc
+
+        start = time.perf_counter()
+        try:
+            collection = client[mongodb_db][MongoDBPipeline.collection]
+            clusters = index.rebuild(_signatures(collection, batch_size))
+            operations: List[UpdateOne] = []
+            for document in collection.find({}, {"_id": False}, batch_size=batch_size):
+                operations.append(_tagged(document, clusters.get(document["id"])))
+                if len(operations) >= batch_size:
+                    collection.bulk_write(operations, ordered=False)
+                    operations = []
+            if operations:
+                collection.bulk_write(operations, ordered=False)
+        finally:
+            client.close()
+
+        duplicates = sum(
+            vacancy_id != cluster for vacancy_id, cluster in clusters.items()
+        )
+        print(
+            f"Indexed {len(clusters)} vacancies, found {duplicates} duplicates "
+            f"in {time.perf_counter() - start:.1f} s."
+        )
+
+
+def _tagged(document: Dict[str, Any], cluster: Optional[str]) -> UpdateOne:
+    """
+    Операция записи кластера дубликатов вакансии.
+
+    Хэши содержимого пересчитываются в том же ``$set``: в документах,
+    сохраненных до исключения полей, добавленных при обработке, из хэшей,
+    хэши зависят от кластера дубликатов.
+
+    :param document: Документ вакансии.
+    :param cluster: Кластер дубликатов (None – описание пустое).
+    :return:
+    """
+
+    values: Dict[str, Any] = {"duplicate_cluster": cluster}
+    if HASH_FIELD in document:
+        hashes = api_field_hashes(document)
+        values.update({HASH_FIELD: content_hash(hashes), FIELD_HASHES_FIELD: hashes})
+
+    return UpdateOne({"id": document["id"]}, {"$set": values})
+
+
+def _signatures(
+    collection: Collection, batch_size: int
+) -> Iterator[Tuple[str, Signature]]:
+    """
+    Сигнатуры описаний вакансий в порядке публикации.
+
+    :param collection: Коллекция вакансий.
+    :param batch_size: Количество вакансий в одном векторном вычислении сигнатур.
+    :return: Пары "идентификатор вакансии" – "сигнатура".
+    """
+
+    minhash = MinHash()
+    cursor = collection.find(
+        {},
+        {"_id": False, "id": True, "description": True, "description_tokens": True},
+        sort=[("published_at", 1)],
+        batch_size=batch_size,
+    )
+    ids: List[str] = []
+    batch: List[List[int]] = []
+    for document in cursor:
+        tokens = document.get("description_tokens")
+        if tokens is None:
+            tokens = words(html_to_text(document.get("description") or ""))
+        hashes = shingles(tokens)
+        if hashes:
+            ids.append(document["id"])
+            batch.append(hashes)
+        if len(batch) >= batch_size:
+            yield from zip(ids, minhash.signatures(batch))
+            ids, batch = [], []
+    if batch:
+        yield from zip(ids, minhash.signatures(batch))
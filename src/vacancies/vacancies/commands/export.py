@@ -0,0 +1,106 @@
+import os
+import shutil
+from argparse import ArgumentParser, Namespace
+from typing import Any, Dict, List
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import NotConfigured, UsageError
+from scrapy.utils.project import data_path
+
+from vacancies.vacancies import export
+from vacancies.vacancies.items import StoredVacancy
+from vacancies.vacancies.pipelines import MongoDBPipeline
+from vacancies.vacancies.references import ReferenceCache
+from vacancies.vacancies.storage import connect
+
+
+class Command(ScrapyCommand):
+    """
+    Выгрузка коллекции вакансий в набор файлов Parquet для машинного обучения.
+    """
+
+    requires_project = True
+    default_settings = {"LOG_ENABLED": False}
+
+    def syntax(self) -> str:
+        return "<directory> [options]"
+
+    def short_desc(self) -> str:
+        return (
+            "Export the vacancies collection to Parquet partitioned by month and region"
+        )
+
+    def add_options(self, parser: ArgumentParser) -> None:
+        super().add_options(parser)
+        parser.add_argument(
+            "--since",
+            metavar="DATE",
+            help="export vacancies published since this date (e.g. 2022-11-01)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="number of documents in one MongoDB cursor batch",
+        )
+        parser.add_argument(
+            "--row-group-size",
+            type=int,
+            default=10000,
+            help="number of rows in one Parquet row group",
+        )
+        parser.add_argument(
+            "--max-buffered-rows",
+            type=int,
+            default=50000,
+            help="maximum number of rows kept in memory",
+        )
+        parser.add_argument(
+            "--overwrite",
+            action="store_true",
+            help="remove the directory if it exists",
+        )
+
+    def run(self, args: List[str], opts: Namespace) -> None:
+        if len(args) != 1:
+            raise UsageError()
+        if export.pa is None:
+            raise UsageError(
+                "pyarrow is not installed (install the project with the export extra)."
+            )
+
+        directory = args[0]
+        if os.path.exists(directory) and os.listdir(directory):
+            if not opts.overwrite:
+                raise UsageError(
+                    f"Directory {directory} is not empty, use --overwrite."
+                )
+            shutil.rmtree(directory)
+        try:
+            client, mongodb_db = connect(self.settings)
+        except NotConfigured as exc:
+            raise UsageError(str(exc)) from exc
+
+        query: Dict[str, Any] = {}
+        if opts.since:
+            query["published_at"] = {"$gte": opts.since}
+        references = ReferenceCache(
+            data_path(self.settings.get("REFERENCES_DIR", "references"))
+        )
+        exporter = export.ParquetExporter(
+            directory,
+            StoredVacancy,
+            references=references,
+            row_group_size=opts.row_group_size,
+            max_buffered_rows=opts.max_buffered_rows,
+        )
+        try:
+            rows = exporter.export(
+                client[mongodb_db][MongoDBPipeline.collection],
+                query,
+                batch_size=opts.batch_size,
+            )
+        finally:
+            client.close()
+
+        print(f"Exported {rows} vacancies to {directory}.")
@@ -0,0 +1,77 @@
+import json
+from argparse import ArgumentParser, Namespace
+from datetime import datetime
+from typing import List
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import NotConfigured, UsageError
+
+from vacancies.vacancies.history import VacancyHistory
+from vacancies.vacancies.pipelines import MongoDBPipeline
+from vacancies.vacancies.storage import connect
+
+
+class Command(ScrapyCommand):
+    """
+    Вывод истории изменений вакансии или ее версии на момент времени.
+    """
+
+    requires_project = True
+    default_settings = {"LOG_ENABLED": False}
+
+    def syntax(self) -> str:
+        return "<vacancy_id> [options]"
+
+    def short_desc(self) -> str:
+        return "Show the change history of a vacancy or its version at a given time"
+
+    def add_options(self, parser: ArgumentParser) -> None:
+        super().add_options(parser)
+        parser.add_argument(
+            "--at",
+            metavar="DATETIME",
+            help="show the version at this time (ISO 8601, e.g. 2022-11-01T12:00)",
+        )
+        parser.add_argument(
+            "--field", help="show only the changes of this field (e.g. salary)"
+        )
+
+    def run(self, args: List[str], opts: Namespace) -> None:
+        if len(args) != 1:
+            raise UsageError()
+
+        collection = self.settings.get("MONGODB_HISTORY_COLLECTION")
+        if not collection:
+            raise UsageError("MONGODB_HISTORY_COLLECTION setting is empty.")
+        try:
+            moment = datetime.fromisoformat(opts.at).timestamp() if opts.at else None
+        except ValueError as exc:
+            raise UsageError(f"Invalid --at value: {opts.at}") from exc
+        try:
+            client, mongodb_db = connect(self.settings)
+        except NotConfigured as exc:
+            raise UsageError(str(exc)) from exc
+
+        try:
+            history = VacancyHistory(
+                client[mongodb_db][MongoDBPipeline.collection],
+                client[mongodb_db][collection],
+            )
+            vacancy_id = args[0]
+            if moment is not None:
+                result = history.at(vacancy_id, moment)
+                print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+            elif opts.field:
+                for at, value in history.field(vacancy_id, opts.field):
+                    print(
+                        f"{datetime.fromtimestamp(at).isoformat()}\t"
+                        f"{json.dumps(value, ensure_ascii=False, default=str)}"
+                    )
+            else:
+                for at, document in history.versions(vacancy_id):
+                    print(
+                        f"{datetime.fromtimestamp(at).isoformat()}\t"
+                        f"{json.dumps(document, ensure_ascii=False, default=str)}"
+                    )
+        finally:
+            client.close()
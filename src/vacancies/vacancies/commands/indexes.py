@@ -0,0 +1,108 @@
+from argparse import ArgumentParser, Namespace
+from typing import List, Tuple
+
+from pymongo.errors import DuplicateKeyError
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import NotConfigured, UsageError
+
+from vacancies.vacancies.pipelines import MongoDBPipeline
+from vacancies.vacancies.schema import (
+    AGGREGATES_INDEXES,
+    HISTORY_INDEXES,
+    VACANCIES_INDEXES,
+    IndexDrift,
+    IndexSpec,
+    check_indexes,
+    ensure_indexes,
+)
+from vacancies.vacancies.storage import connect
+
+
+class Command(ScrapyCommand):
+    """
+    Проверка индексов коллекций вакансий, истории и агрегатов на соответствие схеме.
+
+    Индексы создаются и пересоздаются только этой командой (``--apply``),
+    паук при запуске лишь проверяет их.
+    """
+
+    requires_project = True
+    default_settings = {"LOG_ENABLED": False}
+
+    def syntax(self) -> str:
+        return "[options]"
+
+    def short_desc(self) -> str:
+        return "Check the collection indexes against the declared schema"
+
+    def add_options(self, parser: ArgumentParser) -> None:
+        super().add_options(parser)
+        parser.add_argument(
+            "--apply",
+            action="store_true",
+            help="create missing indexes and recreate mismatched ones",
+        )
+        parser.add_argument(
+            "--drop-extra",
+            action="store_true",
+            help="drop indexes not declared in the schema (with --apply)",
+        )
+
+    def _schemas(self) -> List[Tuple[str, List[IndexSpec]]]:
+        """
+        Коллекции проекта и их схемы индексов.
+
+        :return: Список пар "название коллекции" – "объявленные индексы".
+        """
+
+        schemas = [(MongoDBPipeline.collection, VACANCIES_INDEXES)]
+        if self.settings.get("MONGODB_HISTORY_COLLECTION"):
+            schemas.append(
+                (self.settings.get("MONGODB_HISTORY_COLLECTION"), HISTORY_INDEXES)
+            )
+        if self.settings.get("MONGODB_AGGREGATES_COLLECTION"):
+            schemas.append(
+                (self.settings.get("MONGODB_AGGREGATES_COLLECTION"), AGGREGATES_INDEXES)
+            )
+
+        return schemas
+
+    def run(self, args: List[str], opts: Namespace) -> None:
+        try:
+            client, mongodb_db = connect(self.settings)
+        except NotConfigured as exc:
+            raise UsageError(str(exc)) from exc
+
+        try:
+            for name, schema in self._schemas():
+                collection = client[mongodb_db][name]
+                try:
+                    if opts.apply:
+                        drift = ensure_indexes(
+                            collection, schema, drop_extra=opts.drop_extra
+                        )
+                    else:
+                        drift = check_indexes(collection, schema)
+                except DuplicateKeyError as exc:
+                    # уникальный индекс нельзя построить, пока в коллекции есть дубликаты
+                    print(f"{name}: duplicate keys, unique index not built: {exc}")
+                    self.exitcode = 1
+                    continue
+                self._report(name, drift, opts.apply)
+        finally:
+            client.close()
+
+    def _report(self, name: str, drift: IndexDrift, applied: bool) -> None:
+        for spec in drift.missing:
+            print(f"{name}: missing: {spec.name} (unique={spec.unique})")
+        for spec in drift.mismatched:
+            print(f"{name}: mismatched: {spec.name} (unique={spec.unique})")
+        for index in drift.extra:
+            print(f"{name}: extra: {index}")
+
+        if not drift:
+            print(f"{name}: indexes match the schema.")
+        elif applied:
+            print(f"{name}: indexes have been reconciled with the schema.")
+        else:
+            self.exitcode = 1
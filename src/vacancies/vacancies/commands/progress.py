@@ -0,0 +1,38 @@
+import os
+from argparse import Namespace
+from typing import List
+
+from scrapy.commands import ScrapyCommand
+from scrapy.utils.project import data_path
+
+from vacancies.vacancies.frontier import CrawlState
+
+
+class Command(ScrapyCommand):
+    """
+    Вывод прогресса парсинга по регионам из хранилища состояния.
+    """
+
+    requires_project = True
+    default_settings = {"LOG_ENABLED": False}
+
+    def short_desc(self) -> str:
+        return "Show per-area progress of the current or interrupted crawl"
+
+    def run(self, args: List[str], opts: Namespace) -> None:
+        path = data_path(self.settings.get("CRAWL_STATE_FILE", "crawl_state.sqlite"))
+        if not os.path.exists(path):
+            print("No crawl state found.")
+            return
+
+        state = CrawlState(path)
+        try:
+            progress = state.progress()
+        finally:
+            state.close()
+
+        for area, (done, total) in sorted(progress.items(), key=lambda x: int(x[0])):
+            print(f"{area}\t{done}/{total}")
+        done = sum(done for done, _ in progress.values())
+        total = sum(total for _, total in progress.values())
+        print(f"total\t{done}/{total}")
@@ -0,0 +1,289 @@
+import multiprocessing
+import os
+import queue
+import sqlite3
+from argparse import ArgumentParser, Namespace
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from scrapy import Spider
+from scrapy.commands import ScrapyCommand
+from scrapy.crawler import CrawlerProcess
+from scrapy.exceptions import IgnoreRequest, NotConfigured, UsageError
+from scrapy.http import Request, TextResponse
+from scrapy.settings import Settings
+from scrapy.utils.project import data_path
+
+from vacancies.vacancies.archive import read_segment, vacancy_id_from_url
+from vacancies.vacancies.partition import PER_PAGE
+from vacancies.vacancies.signals import vacancies_listed
+from vacancies.vacancies.spiders.vacancies import VacanciesSpider
+from vacancies.vacancies.storage import connect
+
+
+def _is_latest(index: sqlite3.Connection, record: Dict[str, Any]) -> bool:
+    """
+    Проверка, что запись – последняя загрузка вакансии в архиве.
+
+    :param index: Индекс архива.
+    :param record: Запись архива.
+    :return:
+    """
+
+    vacancy_id = vacancy_id_from_url(record["url"])
+    if vacancy_id is None:
+        return True
+
+    (latest,) = index.execute(
+        "SELECT MAX(fetched_at) FROM records WHERE vacancy_id = ?", (vacancy_id,)
+    ).fetchone()
+
+    return latest is None or record["fetched_at"] >= latest
+
+
+class ReplaySpider(VacanciesSpider):
+    """
+    Паук, обрабатывающий записи архива вместо запросов к API.
+
+    Для каждой вакансии обрабатывается только последняя загрузка из архива.
+    Ответы формирует ``ReplayMiddleware``, а полученные вакансии проходят через
+    конвейеры проекта (``ITEM_PIPELINES``) так же, как при обычном парсинге.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        segments: Iterable[str] = (),
+        callback: str = "parse_detail",
+        **kwargs: Any,
+    ) -> None:
+        """
+        :param segments: Пути к файлам сегментов архива.
+        :param callback: Название метода паука, обрабатывающего ответы.
+        """
+
+        super().__init__(*args, **kwargs)
+        self.segments = list(segments)
+        self.callback = callback
+
+    def start_requests(self) -> Iterable[Request]:
+        batch: List[Dict[str, Any]] = []
+        for record in self._records():
+            batch.append(record)
+            if len(batch) >= PER_PAGE:
+                yield from self._replay(batch)
+                batch = []
+        yield from self._replay(batch)
+
+    def _records(self) -> Iterator[Dict[str, Any]]:
+        """
+        Последние загрузки из архива, обрабатываемые методом ``callback``.
+
+        :return:
+        """
+
+        for path in self.segments:
+            index = sqlite3.connect(os.path.join(os.path.dirname(path), "index.sqlite"))
+            try:
+                for record in read_segment(path):
+                    if record["callback"] == self.callback and _is_latest(
+                        index, record
+                    ):
+                        yield record
+            finally:
+                index.close()
+
+    def _replay(self, records: List[Dict[str, Any]]) -> Iterable[Request]:
+        """
+        Формирование запросов для записей архива.
+
+        Как и при обработке страницы результатов поиска, о вакансиях сообщается
+        сигналом ``vacancies_listed``, чтобы их хэши были прочитаны одним запросом.
+
+        :param records: Записи архива.
+        :return:
+        """
+
+        vacancy_ids = [
+            vacancy_id
+            for vacancy_id in map(vacancy_id_from_url, (r["url"] for r in records))
+            if vacancy_id is not None
+        ]
+        if vacancy_ids:
+            self.crawler.signals.send_catch_log(
+                vacancies_listed, vacancy_ids=vacancy_ids, spider=self
+            )
+        for record in records:
+            self.crawler.stats.inc_value("replay/responses", spider=self)
+            yield Request(
+                record["url"],
+                callback=getattr(self, self.callback),
+                cb_kwargs=record.get("cb_kwargs") or {},
+                meta={"replay_body": record["body"]},
+                dont_filter=True,
+            )
+
+
+class ReplayMiddleware:
+    """
+    Ответы на запросы из записей архива без обращения к сети.
+
+    Запросы, которых нет в архиве (например, порожденные обработкой
+    страниц результатов поиска), отбрасываются.
+    """
+
+    def process_request(self, request: Request, spider: Spider) -> TextResponse:
+        body = request.meta.get("replay_body")
+        if body is None:
+            spider.crawler.stats.inc_value("replay/ignored", spider=spider)
+            raise IgnoreRequest(f"Not in the archive: {request.url}")
+
+        return TextResponse(
+            request.url, body=body.encode("utf-8"), encoding="utf-8", request=request
+        )
+
+
+def replay_segments(
+    paths: List[str], callback: str, settings: Dict[str, Any]
+) -> Tuple[int, int]:
+    """
+    Обработка сегментов архива методом паука с сохранением вакансий через конвейеры.
+
+    Выполняется в отдельном процессе: реактор Twisted нельзя запустить повторно.
+
+    :param paths: Пути к файлам сегментов.
+    :param callback: Название метода паука, обрабатывающего ответы.
+    :param settings: Настройки проекта для повторной обработки.
+    :return: Количество обработанных ответов и сохраненных вакансий.
+    """
+
+    process = CrawlerProcess(Settings(settings))
+    crawler = process.create_crawler(ReplaySpider)
+    process.crawl(crawler, segments=paths, callback=callback)
+    process.start()
+
+    stats = crawler.stats.get_stats()
+
+    return stats.get("replay/responses", 0), stats.get("item_scraped_count", 0)
+
+
+def _replay_worker(
+    paths: List[str],
+    callback: str,
+    settings: Dict[str, Any],
+    results: multiprocessing.Queue,
+) -> None:
+    results.put((paths, replay_segments(paths, callback, settings)))
+
+
+class Command(ScrapyCommand):
+    """
+    Повторная обработка архива ответов методами паука без обращения к сети.
+    """
+
+    requires_project = True
+    default_settings = {"LOG_ENABLED": False}
+
+    def syntax(self) -> str:
+        return "[options]"
+
+    def short_desc(self) -> str:
+        return "Re-parse archived API responses with the spider callbacks, offline"
+
+    def add_options(self, parser: ArgumentParser) -> None:
+        super().add_options(parser)
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count(),
+            help="number of worker processes (default: number of CPUs)",
+        )
+        parser.add_argument(
+            "--callback",
+            default="parse_detail",
+            help="spider callback to run over the archive (default: parse_detail)",
+        )
+
+    def _replay_settings(self) -> Dict[str, Any]:
+        """
+        Настройки проекта для повторной обработки: без сети, архива и состояния.
+
+        :return:
+        """
+
+        settings = self.settings.copy_to_dict()
+        settings.update(
+            {
+                "DOWNLOADER_MIDDLEWARES": {
+                    **self.settings.getdict("DOWNLOADER_MIDDLEWARES"),
+                    "vacancies.vacancies.commands.replay.ReplayMiddleware": 1,
+                },
+                "ARCHIVE_ENABLED": False,
+                "CRAWL_STATE_ENABLED": False,
+                "HTTPCACHE_ENABLED": False,
+                "RATELIMIT_ENABLED": False,
+                "AUTOTHROTTLE_ENABLED": False,
+                "DOWNLOAD_DELAY": 0,
+                "TELNETCONSOLE_ENABLED": False,
+            }
+        )
+
+        return settings
+
+    def run(self, args: List[str], opts: Namespace) -> None:
+        directory = data_path(self.settings.get("ARCHIVE_DIR", "archive"))
+        segments = sorted(
+            os.path.join(directory, name)
+            for name in (os.listdir(directory) if os.path.isdir(directory) else [])
+            if name.endswith(".jsonl.gz")
+        )
+        if not segments:
+            raise UsageError(f"No archive segments found in {directory}.")
+        if not callable(getattr(VacanciesSpider, opts.callback, None)):
+            raise UsageError(f"Unknown spider callback: {opts.callback}.")
+
+        try:
+            client, _ = connect(self.settings)
+        except NotConfigured as exc:
+            raise UsageError(str(exc)) from exc
+        client.close()
+
+        # каждый процесс обрабатывает свою часть сегментов одним запуском паука
+        processes = max(1, opts.processes or 1)
+        groups = [
+            segments[number::processes]
+            for number in range(min(len(segments), processes))
+        ]
+        settings = self._replay_settings()
+        context = multiprocessing.get_context("spawn")
+        results: multiprocessing.Queue = context.Queue()
+        workers = [
+            context.Process(
+                target=_replay_worker, args=(group, opts.callback, settings, results)
+            )
+            for group in groups
+        ]
+        for worker in workers:
+            worker.start()
+
+        responses, stored, finished = 0, 0, 0
+        while finished < len(workers):
+            try:
+                group, (group_responses, group_stored) = results.get(timeout=1.0)
+            except queue.Empty:
+                if any(worker.is_alive() for worker in workers):
+                    continue
+                break
+            finished += 1
+            responses += group_responses
+            stored += group_stored
+            print(
+                f"{', '.join(os.path.basename(path) for path in group)}: "
+                f"{group_responses} responses, {group_stored} vacancies"
+            )
+        for worker in workers:
+            worker.join()
+
+        print(f"Total: {responses} responses, {stored} vacancies.")
+        if finished < len(workers):
+            print(f"Replay failed in {len(workers) - finished} worker processes.")
+            self.exitcode = 1
@@ -0,0 +1,216 @@
+import time
+from argparse import ArgumentParser, Namespace
+from typing import Any, Dict, Iterator, List
+
+from pymongo.collection import Collection
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import NotConfigured, UsageError
+from scrapy.utils.project import data_path
+
+from vacancies.vacancies import export
+from vacancies.vacancies.pipelines import MongoDBPipeline
+from vacancies.vacancies.references import ReferenceCache
+from vacancies.vacancies.search import (
+    AREA,
+    EXPERIENCE,
+    FACETS,
+    INDEXED_FIELDS,
+    REGION,
+    ROLE,
+    SearchIndex,
+)
+from vacancies.vacancies.storage import connect
+
+# справочники для вывода названий значений фасетов
+FACET_DICTIONARIES = {
+    AREA: "areas",
+    REGION: "areas",
+    ROLE: "professional_roles",
+    EXPERIENCE: "experience",
+}
+
+
+class Command(ScrapyCommand):
+    """
+    Поиск вакансий в локальном индексе и пересборка индекса.
+    """
+
+    requires_project = True
+    default_settings = {"LOG_ENABLED": False}
+
+    def syntax(self) -> str:
+        return "[words ...] [options]"
+
+    def short_desc(self) -> str:
+        return "Search vacancies in the local full-text index or rebuild the index"
+
+    def add_options(self, parser: ArgumentParser) -> None:
+        super().add_options(parser)
+        parser.add_argument(
+            "--area",
+            action="append",
+            default=[],
+            help="area id or name, the vacancy area or its region (repeatable)",
+        )
+        parser.add_argument(
+            "--role",
+            action="append",
+            default=[],
+            help="professional role id or name (repeatable)",
+        )
+        parser.add_argument(
+            "--experience",
+            action="append",
+            default=[],
+            help="experience id, e.g. between1And3 (repeatable)",
+        )
+        parser.add_argument(
+            "--skill",
+            action="append",
+            default=[],
+            help="key skill required in the vacancy (repeatable)",
+        )
+        parser.add_argument(
+            "--salary-min", type=float, default=None, help="minimum net monthly RUB"
+        )
+        parser.add_argument(
+            "--salary-max", type=float, default=None, help="maximum net monthly RUB"
+        )
+        parser.add_argument(
+            "--limit", type=int, default=20, help="number of vacancies to show"
+        )
+        parser.add_argument(
+            "--facets",
+            default=",".join(FACETS),
+            help="comma-separated facets to count (empty to skip)",
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="rebuild the index from the export or the vacancies collection",
+        )
+        parser.add_argument(
+            "--export",
+            metavar="DIRECTORY",
+            help="Parquet export to rebuild the index from (see scrapy export)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="number of vacancies written at once with --rebuild",
+        )
+
+    def run(self, args: List[str], opts: Namespace) -> None:
+        facets = [facet for facet in opts.facets.split(",") if facet]
+        unknown = set(facets) - set(FACETS)
+        if unknown:
+            raise UsageError(f"Unknown facets: {', '.join(sorted(unknown))}.")
+
+        references = ReferenceCache(
+            data_path(self.settings.get("REFERENCES_DIR", "references"))
+        )
+        index = SearchIndex(
+            data_path(self.settings.get("SEARCH_FILE", "search.sqlite")),
+            references=references,
+        )
+        try:
+            if opts.rebuild:
+                self._rebuild(index, opts)
+                return
+
+            result = index.search(
+                " ".join(args) or None,
+                areas=_resolve(opts.area, references.dictionary("areas")),
+                roles=_resolve(opts.role, references.dictionary("professional_roles")),
+                experience=opts.experience,
+                skills=opts.skill,
+                salary_min=opts.salary_min,
+                salary_max=opts.salary_max,
+                limit=opts.limit,
+                facets=facets,
+            )
+        finally:
+            index.close()
+
+        print(f"Found {result.total} vacancies in {result.elapsed_ms} ms.")
+        for vacancy_id in result.ids:
+            print(vacancy_id)
+        for facet, values in result.facets.items():
+            names = (
+                references.dictionary(FACET_DICTIONARIES[facet])
+                if facet in FACET_DICTIONARIES
+                else {}
+            )
+            print(f"\n{facet}:")
+            for value, count in values:
+                name = names.get(value, {}).get("name")
+                print(f"{value}\t{name}\t{count}" if name else f"{value}\t{count}")
+
+    def _rebuild(self, index: SearchIndex, opts: Namespace) -> None:
+        start = time.perf_counter()
+        if opts.export:
+            if export.pa is None:
+                raise UsageError(
+                    "pyarrow is not installed "
+                    "(install the project with the export extra)."
+                )
+            count = index.rebuild(
+                export.scan(opts.export, batch_size=opts.batch_size),
+                batch_size=opts.batch_size,
+            )
+        else:
+            try:
+                client, mongodb_db = connect(self.settings)
+            except NotConfigured as exc:
+                raise UsageError(str(exc)) from exc
+            try:
+                collection = client[mongodb_db][MongoDBPipeline.collection]
+                count = index.rebuild(
+                    _documents(collection, opts.batch_size),
+                    batch_size=opts.batch_size,
+                )
+            finally:
+                client.close()
+
+        print(f"Indexed {count} vacancies in {time.perf_counter() - start:.1f} s.")
+
+
+def _resolve(values: List[str], dictionary: Dict[str, Dict[str, Any]]) -> List[str]:
+    """
+    Идентификаторы значений справочника по идентификаторам или названиям.
+
+    :param values: Идентификаторы (без справочника – числовые) или названия
+        (без учета регистра).
+    :param dictionary: Значения справочника по идентификаторам.
+    :return:
+    """
+
+    names = {
+        str(value.get("name", "")).lower(): key for key, value in dictionary.items()
+    }
+    result = []
+    for value in values:
+        if value in dictionary or value.isdigit():
+            result.append(value)
+        elif value.lower() in names:
+            result.append(names[value.lower()])
+        else:
+            raise UsageError(f"Unknown value: {value}.")
+
+    return result
+
+
+def _documents(collection: Collection, batch_size: int) -> Iterator[Dict[str, Any]]:
+    """
+    Документы вакансий с индексируемыми полями.
+
+    :param collection: Коллекция вакансий.
+    :param batch_size: Количество документов в одном пакете курсора.
+    :return:
+    """
+
+    projection = {name: True for name in ("id", "description", *INDEXED_FIELDS)}
+    projection["_id"] = False
+
+    yield from collection.find({}, projection, batch_size=batch_size)
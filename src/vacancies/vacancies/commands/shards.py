@@ -0,0 +1,124 @@
+import os
+import subprocess
+import sys
+from argparse import ArgumentParser, Namespace
+from datetime import datetime, timezone
+from typing import List
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import NotConfigured, UsageError
+
+from vacancies.vacancies.sharding import open_leases
+
+
+class Command(ScrapyCommand):
+    """
+    Распределенный парсинг: запуск нескольких процессов паука, которые
+    захватывают регионы через таблицу аренд (``SHARDS_BACKEND``).
+    """
+
+    requires_project = True
+    default_settings = {"LOG_ENABLED": False}
+
+    def syntax(self) -> str:
+        return "[NAME=VALUE ...] [options]"
+
+    def short_desc(self) -> str:
+        return "Crawl vacancies in several processes sharded by area"
+
+    def long_desc(self) -> str:
+        return (
+            "Start several processes of the vacancies spider that lease areas of "
+            "the run from the shards table. Positional arguments are passed to the "
+            "spider (e.g. date_from=2022-11-01). To crawl on several nodes, use the "
+            "mongodb shards backend and the same --run on every node."
+        )
+
+    def add_options(self, parser: ArgumentParser) -> None:
+        super().add_options(parser)
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=None,
+            help="number of crawling processes (default: number of CPUs)",
+        )
+        parser.add_argument(
+            "--run", default=None, help="run id shared by all processes and nodes"
+        )
+        parser.add_argument(
+            "--status", action="store_true", help="show the areas progress of the run"
+        )
+        parser.add_argument(
+            "--reset", action="store_true", help="forget the areas leases of the run"
+        )
+
+    def run(self, args: List[str], opts: Namespace) -> None:
+        if any("=" not in arg for arg in args):
+            raise UsageError("Spider arguments must be given as NAME=VALUE.")
+
+        run = opts.run or datetime.now(timezone.utc).strftime("%Y-%m-%dT%H%M%S")
+        if opts.status or opts.reset:
+            if not opts.run:
+                raise UsageError("The run id (--run) is required.")
+            try:
+                leases = open_leases(self.settings)
+            except NotConfigured as exc:
+                raise UsageError(str(exc)) from exc
+            try:
+                if opts.reset:
+                    leases.reset(run)
+                for state, count in leases.progress(run).items():
+                    print(f"{state}\t{count}")
+            finally:
+                leases.close()
+            return
+
+        processes = opts.processes or os.cpu_count() or 1
+        # ограничение частоты запросов действует в каждом процессе отдельно
+        rate = self.settings.getfloat("RATELIMIT_RATE", 4.0) / processes
+        burst = max(self.settings.getfloat("RATELIMIT_BURST", 4.0) / processes, 1.0)
+        workers = []
+        for number in range(processes):
+            command = [
+                sys.executable,
+                "-m",
+                "scrapy",
+                "crawl",
+                "vacancies",
+                "-a",
+                "shards=1",
+                "-a",
+                f"run={run}",
+                # вместо продолжения по состоянию регионы повторно захватываются
+                # после истечения аренды
+                "-s",
+                "CRAWL_STATE_ENABLED=0",
+                "-s",
+                f"SCHEDULER_OVERFLOW_FILE=overflow-{number}.sqlite",
+                "-s",
+                f"RATELIMIT_RATE={rate}",
+                "-s",
+                f"RATELIMIT_BURST={burst}",
+                # индекс дубликатов записывается всеми процессами
+                "-s",
+                "DUPLICATES_BUFFER_SIZE=1",
+            ]
+            for setting in opts.set:
+                # частота запросов узла уже поделена между процессами
+                if setting.partition("=")[0] not in {
+                    "RATELIMIT_RATE",
+                    "RATELIMIT_BURST",
+                }:
+                    command.extend(["-s", setting])
+            for arg in args:
+                command.extend(["-a", arg])
+            workers.append(subprocess.Popen(command))
+
+        print(f"Run {run}: started {processes} crawling processes.")
+        codes = [worker.wait() for worker in workers]
+        failed = sum(code != 0 for code in codes)
+        if failed:
+            self.exitcode = 1
+            print(f"Run {run}: {failed} of {processes} processes failed.")
+        else:
+            print(f"Run {run}: finished.")
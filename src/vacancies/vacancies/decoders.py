@@ -0,0 +1,46 @@
+import json
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover
+    msgspec = None  # type: ignore[assignment]
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+Decoder = Callable[[bytes], Any]
+
+# доступные реализации разбора JSON в порядке предпочтения
+# (на ответах с крупными HTML-описаниями msgspec быстрее orjson)
+DECODERS: Dict[str, Decoder] = {}
+if msgspec is not None:
+    DECODERS["msgspec"] = msgspec.json.Decoder().decode
+if orjson is not None:
+    DECODERS["orjson"] = orjson.loads
+DECODERS["json"] = json.loads
+
+
+def get_decoder(name: Optional[str] = None) -> Decoder:
+    """
+    Получение функции разбора JSON.
+
+    Все реализации принимают исходные байты ответа без промежуточного
+    преобразования в строку и при ошибке разбора выбрасывают ``ValueError``.
+
+    :param name: Название реализации (``orjson``, ``msgspec``, ``json``);
+        по умолчанию – самая быстрая из установленных.
+    :return:
+    """
+
+    if not name or name == "auto":
+        return next(iter(DECODERS.values()))
+
+    if name not in DECODERS:
+        raise ValueError(
+            f"JSON decoder {name!r} is not available, installed: {', '.join(DECODERS)}."
+        )
+
+    return DECODERS[name]
@@ -0,0 +1,429 @@
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import zlib
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+
+# простое число для хэш-функций MinHash (значения хэшей шинглов – 32 бита,
+# поэтому a * h + b помещается в 64 бита без переполнения)
+PRIME = (1 << 31) - 1
+# количество хэш-функций (длина сигнатуры) и полос LSH: вакансии с коэффициентом
+# Жаккара 0.8 становятся кандидатами с вероятностью 0.95, с коэффициентом 0.5 – 0.06
+NUM_PERM = 128
+BANDS = 16
+# количество слов в шингле
+SHINGLE_SIZE = 3
+
+Signature = Tuple[int, ...]
+
+
+def shingles(tokens: Sequence[str], size: int = SHINGLE_SIZE) -> List[int]:
+    """
+    Хэши шинглов (последовательностей соседних слов) текста.
+
+    :param tokens: Слова текста.
+    :param size: Количество слов в шингле.
+    :return: Уникальные 32-битные хэши (пустой список для пустого текста).
+    """
+
+    if len(tokens) < size:
+        grams = [" ".join(tokens)] if tokens else []
+    else:
+        grams = [
+            " ".join(gram) for gram in zip(*(tokens[shift:] for shift in range(size)))
+        ]
+
+    return sorted({zlib.crc32(gram.encode("utf-8")) for gram in grams})
+
+
+class MinHash:
+    """
+    Сигнатуры MinHash множеств шинглов.
+
+    Доля совпадающих значений сигнатур двух текстов – оценка коэффициента
+    Жаккара их множеств шинглов. Хэш-функции ``(a * h + b) mod PRIME`` задаются
+    зерном, поэтому сигнатуры сопоставимы между запусками. При наличии ``numpy``
+    сигнатуры вычисляются векторно (с тем же результатом).
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1) -> None:
+        """
+        :param num_perm: Количество хэш-функций.
+        :param seed: Зерно генератора коэффициентов хэш-функций.
+        """
+
+        generator = random.Random(seed)
+        self.a = [generator.randrange(1, PRIME) for _ in range(num_perm)]
+        self.b = [generator.randrange(0, PRIME) for _ in range(num_perm)]
+
+    def signature(self, hashes: Sequence[int]) -> Signature:
+        """
+        Сигнатура множества шинглов.
+
+        :param hashes: Хэши шинглов (непустой список).
+        :return:
+        """
+
+        return self.signatures([hashes])[0]
+
+    def signatures(self, batch: Sequence[Sequence[int]]) -> List[Signature]:
+        """
+        Сигнатуры нескольких множеств шинглов.
+
+        Хэши всех множеств объединяются в один массив, минимумы по множествам
+        вычисляются ``numpy.minimum.reduceat`` для каждой хэш-функции.
+
+        :param batch: Хэши шинглов множеств (непустые списки).
+        :return:
+        """
+
+        if np is None:
+            return [
+                tuple(
+                    min((a * h + b) % PRIME for h in hashes)
+                    for a, b in zip(self.a, self.b)
+                )
+                for hashes in batch
+            ]
+
+        values = np.fromiter((h for hashes in batch for h in hashes), dtype=np.uint64)
+        offsets = np.cumsum([0] + [len(hashes) for hashes in batch[:-1]])
+        result: Any = np.empty((len(self.a), len(batch)), dtype=np.uint64)
+        for row, (a, b) in enumerate(zip(self.a, self.b)):
+            permuted = (values * np.uint64(a) + np.uint64(b)) % np.uint64(PRIME)
+            result[row] = np.minimum.reduceat(permuted, offsets)
+
+        return [tuple(column) for column in result.T.tolist()]
+
+
+def similarity(first: Signature, second: Signature) -> float:
+    """
+    Оценка коэффициента Жаккара по сигнатурам.
+
+    :param first: Сигнатура.
+    :param second: Сигнатура той же длины.
+    :return:
+    """
+
+    return sum(x == y for x, y in zip(first, second)) / len(first)
+
+
+def band_keys(signature: Signature, bands: int = BANDS) -> List[int]:
+    """
+    Ключи полос LSH: хэши частей сигнатуры.
+
+    :param signature: Сигнатура.
+    :param bands: Количество полос.
+    :return:
+    """
+
+    values = array("I", signature)
+    width = len(signature) // bands * values.itemsize
+    data = values.tobytes()
+    keys = []
+    for start in range(0, width * bands, width):
+        end = start + width
+        digest = hashlib.blake2b(data[start:end], digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "big", signed=True))
+
+    return keys
+
+
+class DuplicateIndex:
+    """
+    Индекс LSH сигнатур вакансий в файле SQLite.
+
+    Для каждой вакансии сохраняются сигнатура, кластер дубликатов и ключи полос.
+    Кандидаты в дубликаты – вакансии с совпадающим ключом хотя бы одной полосы
+    (поиск по первичному ключу, без перебора всех вакансий); дубликатом
+    считается кандидат, оценка сходства с которым не ниже порога. Новая вакансия
+    попадает в кластер наиболее похожего дубликата, иначе образует свой кластер
+    (идентификатор кластера – идентификатор первой вакансии). Если измененная
+    вакансия, по которой назван кластер, переходит в другой кластер, оставшиеся
+    вакансии переименовываются по первой из них.
+
+    Методы изменения индекса можно вызывать из разных потоков: они выполняются
+    последовательно.
+    """
+
+    # максимальное количество кандидатов из одной полосы
+    bucket_limit = 50
+
+    def __init__(
+        self,
+        path: str,
+        threshold: float = 0.8,
+        bands: int = BANDS,
+        buffer_size: int = 500,
+    ) -> None:
+        """
+        :param path: Путь к файлу базы данных.
+        :param threshold: Минимальная оценка сходства дубликатов.
+        :param bands: Количество полос LSH.
+        :param buffer_size: Количество вакансий, после которого выполняется фиксация.
+        """
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.threshold = threshold
+        self.bands = bands
+        self.buffer_size = buffer_size
+        self._pending = 0
+        self._lock = threading.Lock()
+        # индекс может использоваться несколькими процессами парсинга (шардами)
+        self._connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS signatures (
+                vacancy_id TEXT PRIMARY KEY,
+                signature BLOB NOT NULL,
+                cluster TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS signatures_cluster ON signatures (cluster);
+            CREATE TABLE IF NOT EXISTS bands (
+                band INTEGER NOT NULL,
+                key INTEGER NOT NULL,
+                vacancy_id TEXT NOT NULL,
+                PRIMARY KEY (band, key, vacancy_id)
+            ) WITHOUT ROWID;
+            """
+        )
+        self._connection.commit()
+
+    def add(self, vacancy_id: str, signature: Signature) -> Tuple[str, Dict[str, str]]:
+        """
+        Добавление (обновление) вакансии в индексе.
+
+        :param vacancy_id: Идентификатор вакансии.
+        :param signature: Сигнатура описания вакансии.
+        :return: Идентификатор кластера дубликатов и новые кластеры других вакансий,
+            переименованных из-за перехода вакансии в другой кластер.
+        """
+
+        with self._lock:
+            return self._add(vacancy_id, signature)
+
+    def _add(self, vacancy_id: str, signature: Signature) -> Tuple[str, Dict[str, str]]:
+        packed = array("I", signature).tobytes()
+        stored = self._connection.execute(
+            "SELECT signature, cluster FROM signatures WHERE vacancy_id = ?",
+            (vacancy_id,),
+        ).fetchone()
+        if stored is not None:
+            if stored[0] == packed:
+                return str(stored[1]), {}
+            self._connection.execute(
+                "DELETE FROM bands WHERE vacancy_id = ?", (vacancy_id,)
+            )
+
+        keys = band_keys(signature, self.bands)
+        cluster, best = vacancy_id, self.threshold
+        for other, other_signature, other_cluster in self._candidates(keys):
+            if other == vacancy_id:
+                continue
+            score = similarity(signature, other_signature)
+            if score >= best:
+                cluster, best = other_cluster, score
+
+        self._connection.execute(
+            "INSERT OR REPLACE INTO signatures (vacancy_id, signature, cluster) "
+            "VALUES (?, ?, ?)",
+            (vacancy_id, packed, cluster),
+        )
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO bands (band, key, vacancy_id) VALUES (?, ?, ?)",
+            ((band, key, vacancy_id) for band, key in enumerate(keys)),
+        )
+        relabeled: Dict[str, str] = {}
+        if stored is not None and stored[1] == vacancy_id and cluster != vacancy_id:
+            # кластер назван по вакансии, которая из него вышла
+            relabeled = self._relabel(vacancy_id)
+        self._pending += 1
+        if self._pending >= self.buffer_size:
+            self._commit()
+
+        return cluster, relabeled
+
+    def _relabel(self, cluster: str) -> Dict[str, str]:
+        """
+        Переименование кластера по первой из оставшихся в нем вакансий.
+
+        :param cluster: Идентификатор кластера.
+        :return: Новые кластеры вакансий.
+        """
+
+        rows = self._connection.execute(
+            "SELECT vacancy_id FROM signatures WHERE cluster = ? ORDER BY rowid",
+            (cluster,),
+        ).fetchall()
+        if not rows:
+            return {}
+
+        anchor = str(rows[0][0])
+        self._connection.execute(
+            "UPDATE signatures SET cluster = ? WHERE cluster = ?", (anchor, cluster)
+        )
+
+        return {str(vacancy_id): anchor for vacancy_id, in rows}
+
+    def _candidates(self, keys: List[int]) -> Iterable[Tuple[str, Signature, str]]:
+        seen = set()
+        for band, key in enumerate(keys):
+            rows = self._connection.execute(
+                "SELECT s.vacancy_id, s.signature, s.cluster FROM bands b "
+                "JOIN signatures s ON s.vacancy_id = b.vacancy_id "
+                "WHERE b.band = ? AND b.key = ? LIMIT ?",
+                (band, key, self.bucket_limit),
+            )
+            for vacancy_id, packed, cluster in rows:
+                if vacancy_id not in seen:
+                    seen.add(vacancy_id)
+                    yield vacancy_id, tuple(array("I", packed)), cluster
+
+    def rebuild(self, entries: Iterable[Tuple[str, Signature]]) -> Dict[str, str]:
+        """
+        Построение индекса заново по всем вакансиям (пакетный режим).
+
+        Кандидаты ищутся по полосам в памяти: каждая вакансия сравнивается
+        с первой вакансией своей корзины, пары дубликатов объединяются
+        в кластеры (система непересекающихся множеств). Идентификатор кластера –
+        идентификатор первой вакансии кластера в порядке ``entries``.
+
+        :param entries: Пары "идентификатор вакансии" – "сигнатура"
+            (например, в порядке публикации).
+        :return: Кластеры вакансий (у уникальной вакансии – ее идентификатор).
+        """
+
+        ids: List[str] = []
+        signatures: List[Signature] = []
+        parent: List[int] = []
+        buckets: Dict[Tuple[int, int], int] = {}
+        rows: List[Tuple[int, int, str]] = []
+
+        def root(index: int) -> int:
+            while parent[index] != index:
+                parent[index] = parent[parent[index]]
+                index = parent[index]
+            return index
+
+        for vacancy_id, signature in entries:
+            index = len(ids)
+            ids.append(vacancy_id)
+            signatures.append(signature)
+            parent.append(index)
+            for band, key in enumerate(band_keys(signature, self.bands)):
+                rows.append((band, key, vacancy_id))
+                first = buckets.setdefault((band, key), index)
+                if first == index:
+                    continue
+                if similarity(signature, signatures[first]) >= self.threshold:
+                    # кластер – множество с меньшим номером (первой вакансией)
+                    low, high = sorted((root(first), root(index)))
+                    parent[high] = low
+
+        clusters = [ids[root(index)] for index in range(len(ids))]
+        with self._lock:
+            self._replace(ids, signatures, clusters, rows)
+
+        return dict(zip(ids, clusters))
+
+    def _replace(
+        self,
+        ids: List[str],
+        signatures: List[Signature],
+        clusters: List[str],
+        rows: List[Tuple[int, int, str]],
+    ) -> None:
+        self._connection.execute("DELETE FROM signatures")
+        self._connection.execute("DELETE FROM bands")
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO signatures (vacancy_id, signature, cluster) "
+            "VALUES (?, ?, ?)",
+            (
+                (vacancy_id, array("I", signature).tobytes(), cluster)
+                for vacancy_id, signature, cluster in zip(ids, signatures, clusters)
+            ),
+        )
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO bands (band, key, vacancy_id) VALUES (?, ?, ?)",
+            rows,
+        )
+        self._connection.commit()
+        self._pending = 0
+
+    def cluster(self, vacancy_id: str) -> Optional[str]:
+        """
+        Кластер дубликатов вакансии.
+
+        :param vacancy_id: Идентификатор вакансии.
+        :return: Идентификатор кластера или None, если вакансии нет в индексе.
+        """
+
+        row = self._connection.execute(
+            "SELECT cluster FROM signatures WHERE vacancy_id = ?", (vacancy_id,)
+        ).fetchone()
+
+        return str(row[0]) if row is not None else None
+
+    def members(self, cluster: str) -> List[str]:
+        """
+        Вакансии кластера дубликатов.
+
+        :param cluster: Идентификатор кластера.
+        :return:
+        """
+
+        rows = self._connection.execute(
+            "SELECT vacancy_id FROM signatures WHERE cluster = ? ORDER BY vacancy_id",
+            (cluster,),
+        )
+
+        return [str(vacancy_id) for vacancy_id, in rows]
+
+    def largest(self, limit: int = 20) -> List[Tuple[str, int]]:
+        """
+        Самые большие кластеры дубликатов.
+
+        :param limit: Количество кластеров.
+        :return: Пары "кластер" – "количество вакансий".
+        """
+
+        rows = self._connection.execute(
+            "SELECT cluster, COUNT(*) FROM signatures GROUP BY cluster "
+            "HAVING COUNT(*) > 1 ORDER BY COUNT(*) DESC LIMIT ?",
+            (limit,),
+        )
+
+        return [(str(cluster), int(count)) for cluster, count in rows]
+
+    def commit(self) -> None:
+        with self._lock:
+            self._commit()
+
+    def _commit(self) -> None:
+        self._connection.commit()
+        self._pending = 0
+
+    def close(self) -> None:
+        self.commit()
+        self._connection.close()
+
+    def __len__(self) -> int:
+        (count,) = self._connection.execute(
+            "SELECT COUNT(*) FROM signatures"
+        ).fetchone()
+
+        return int(count)
@@ -0,0 +1,458 @@
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pymongo.collection import Collection
+
+from vacancies.vacancies.changes import FIELD_HASHES_FIELD, HASH_FIELD
+from vacancies.vacancies.incremental import to_timestamp
+from vacancies.vacancies.mapping import ANY, NUMBER, ListOf, Reference, Schema, Spec
+from vacancies.vacancies.references import ReferenceCache
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+
+# столбцы, по которым выгрузка разбивается на директории (в формате Hive)
+PARTITION_COLUMNS = ("published_month", "region_id")
+
+
+def _category() -> Any:
+    return pa.dictionary(pa.int32(), pa.string())
+
+
+def _id_name() -> Any:
+    return pa.struct([("id", _category()), ("name", _category())])
+
+
+def arrow_types() -> Dict[str, Any]:
+    """
+    Типы Arrow полей, описанных в схеме как ``ANY``, и полей, которые
+    хранятся в другом виде (категории, даты).
+
+    Ключ – путь к полю через точку (для элементов списков – без индекса).
+    Остальные поля ``ANY`` выгружаются строками JSON.
+
+    :return:
+    """
+
+    string = pa.string()
+    timestamp = pa.timestamp("s", tz="UTC")
+    station = [("station_name", string), ("line_name", string)]
+
+    return {
+        "salary": pa.struct(
+            [
+                ("from", pa.float64()),
+                ("to", pa.float64()),
+                ("currency", _category()),
+                ("gross", pa.bool_()),
+            ]
+        ),
+        "salary_rub": pa.struct([("from", pa.float64()), ("to", pa.float64())]),
+        "published_at": timestamp,
+        "created_at": timestamp,
+        "initial_created_at": timestamp,
+        "relations": pa.list_(string),
+        "description_tokens": pa.list_(string),
+        "driver_license_types": pa.list_(pa.struct([("id", _category())])),
+        "languages": pa.list_(
+            pa.struct(
+                [("id", _category()), ("name", _category()), ("level", _id_name())]
+            )
+        ),
+        "working_days": pa.list_(_id_name()),
+        "working_time_intervals": pa.list_(_id_name()),
+        "working_time_modes": pa.list_(_id_name()),
+        "key_skills.name": _category(),
+        "specializations.profarea_name": _category(),
+        "employer.logo_urls": pa.map_(string, string),
+        **{
+            name: string
+            for name in (
+                "code",
+                "response_url",
+                "alternate_url",
+                "apply_alternate_url",
+                "negotiations_url",
+                "suitable_resumes_url",
+                "employer.url",
+                "employer.alternate_url",
+                "employer.vacancies_url",
+                "address.city",
+                "address.street",
+                "address.building",
+                "address.description",
+                "address.raw",
+                *(f"address.metro.{name}" for name, _ in station),
+                *(f"address.metro_stations.{name}" for name, _ in station),
+            )
+        },
+    }
+
+
+def arrow_type(spec: Spec, path: str, overrides: Dict[str, Any]) -> Any:
+    """
+    Тип Arrow поля схемы.
+
+    :param spec: Описание поля в схеме.
+    :param path: Путь к полю через точку.
+    :param overrides: Типы полей по путям (результат ``arrow_types``).
+    :return:
+    """
+
+    if path in overrides:
+        return overrides[path]
+    if isinstance(spec, Schema):
+        return pa.struct(
+            [
+                (name, arrow_type(child, f"{path}.{name}", overrides))
+                for name, child in spec.fields.items()
+            ]
+        )
+    if isinstance(spec, ListOf):
+        return pa.list_(arrow_type(spec.schema, path, overrides))
+    if isinstance(spec, Reference):
+        # значения справочников – категории, восстановленные по кэшу справочников
+        return _id_name()
+    if spec is bool:
+        return pa.bool_()
+    if spec is NUMBER or spec is float:
+        return pa.float64()
+    if spec is int:
+        return pa.int64()
+
+    # строки и произвольные значения JSON
+    return pa.string()
+
+
+def arrow_schema(schema: Schema) -> Any:
+    """
+    Схема Arrow документа, описанного схемой ``mapping.Schema``.
+
+    :param schema: Схема документа.
+    :return:
+    """
+
+    overrides = arrow_types()
+
+    return pa.schema(
+        [
+            (name, arrow_type(spec, name, overrides))
+            for name, spec in schema.fields.items()
+        ]
+    )
+
+
+def _convert(value: Any, spec: Spec, kind: Any) -> Any:
+    """
+    Преобразование значения документа MongoDB к типу Arrow.
+
+    :param value: Значение.
+    :param spec: Описание поля в схеме.
+    :param kind: Тип Arrow.
+    :return:
+    """
+
+    if value is None:
+        return None
+    if pa.types.is_timestamp(kind):
+        return to_timestamp(value)
+    if pa.types.is_map(kind):
+        return list(value.items()) if isinstance(value, dict) else None
+    if isinstance(spec, Schema) and pa.types.is_struct(kind):
+        return {
+            name: _convert(value.get(name), spec.fields[name], kind.field(name).type)
+            for name in spec.fields
+        }
+    if isinstance(spec, ListOf) and pa.types.is_list(kind):
+        return [_convert(item, spec.schema, kind.value_type) for item in value]
+    if spec is ANY and (pa.types.is_string(kind) or pa.types.is_large_string(kind)):
+        return (
+            value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+        )
+
+    return value
+
+
+class ParquetExporter:
+    """
+    Потоковая выгрузка вакансий из MongoDB в набор файлов Parquet.
+
+    Вакансии читаются курсором пакетами в порядке публикации и раскладываются
+    по директориям ``published_month=YYYY-MM/region_id=N`` (регион – уровень
+    дерева регионов под страной, определяется по кэшу справочников).
+    Вложенные объекты и списки сохраняются структурами и списками Arrow,
+    значения справочников и другие категории – словарным кодированием,
+    столбцы сжимаются zstd.
+
+    Объем памяти ограничен: строки каждого раздела записываются группой строк
+    при достижении ``row_group_size``, а при превышении ``max_buffered_rows``
+    строк во всех разделах записывается самый большой раздел. Файлы разделов
+    прошедших месяцев закрываются.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        schema: Schema,
+        references: Optional[ReferenceCache] = None,
+        row_group_size: int = 10000,
+        max_buffered_rows: int = 50000,
+        compression_level: Optional[int] = None,
+    ) -> None:
+        """
+        :param directory: Директория выгрузки.
+        :param schema: Схема документов (``StoredVacancy``).
+        :param references: Кэш справочников для восстановления их значений.
+        :param row_group_size: Количество строк в группе строк Parquet.
+        :param max_buffered_rows: Максимальное количество строк в памяти.
+        :param compression_level: Уровень сжатия zstd.
+        """
+
+        if pa is None:
+            raise RuntimeError("pyarrow is required to export vacancies to Parquet.")
+
+        self.directory = directory
+        self.schema = schema
+        self.references = references
+        self.row_group_size = max(1, row_group_size)
+        self.max_buffered_rows = max(self.row_group_size, max_buffered_rows)
+        self.compression_level = compression_level
+        self.arrow_schema = arrow_schema(schema)
+
+        self._kinds = [
+            (name, spec, self.arrow_schema.field(name).type)
+            for name, spec in schema.fields.items()
+        ]
+        self._buffers: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self._buffered = 0
+        self._writers: Dict[Tuple[str, str], Any] = {}
+        self._parts: Dict[Tuple[str, str], int] = {}
+        self._regions: Dict[str, str] = {}
+        self.rows = 0
+
+    def export(
+        self,
+        collection: Collection,
+        query: Optional[Dict[str, Any]] = None,
+        batch_size: int = 1000,
+    ) -> int:
+        """
+        Выгрузка вакансий коллекции.
+
+        :param collection: Коллекция вакансий.
+        :param query: Условие отбора вакансий.
+        :param batch_size: Количество документов в пакете курсора.
+        :return: Количество выгруженных вакансий.
+        """
+
+        cursor = collection.find(
+            query or {},
+            {"_id": False, HASH_FIELD: False, FIELD_HASHES_FIELD: False},
+            sort=[("published_at", 1)],
+            batch_size=batch_size,
+        )
+        try:
+            self.write(cursor)
+        finally:
+            self.close()
+
+        return self.rows
+
+    def write(self, documents: Iterable[Dict[str, Any]]) -> None:
+        """
+        Добавление документов в выгрузку.
+
+        :param documents: Документы вакансий в порядке публикации.
+        :return:
+        """
+
+        month = None
+        for document in documents:
+            if self.references is not None:
+                document = self.references.denormalize(document, self.schema)
+            key = self._partition(document)
+            if key[0] != month:
+                # вакансии упорядочены по дате публикации: разделы прошедших
+                # месяцев больше не пополняются
+                month = key[0]
+                stale = {*self._buffers, *self._writers}
+                for previous in [other for other in stale if other[0] != month]:
+                    self._flush(previous, close=True)
+
+            self._buffers.setdefault(key, []).append(self._row(document))
+            self._buffered += 1
+            self.rows += 1
+            if len(self._buffers[key]) >= self.row_group_size:
+                self._flush(key)
+            elif self._buffered >= self.max_buffered_rows:
+                self._flush(max(self._buffers, key=lambda x: len(self._buffers[x])))
+
+    def close(self) -> None:
+        """
+        Запись оставшихся строк и закрытие файлов.
+
+        :return:
+        """
+
+        for key in list(self._buffers):
+            self._flush(key, close=True)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+    def _row(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            name: _convert(document.get(name), spec, kind)
+            for name, spec, kind in self._kinds
+        }
+
+    def _partition(self, document: Dict[str, Any]) -> Tuple[str, str]:
+        """
+        Раздел выгрузки вакансии: месяц публикации и регион.
+
+        :param document: Документ вакансии.
+        :return:
+        """
+
+        published = document.get("published_at") or ""
+        area = str((document.get("area") or {}).get("id") or "unknown")
+
+        return published[:7] or "unknown", self._region(area)
+
+    def _region(self, area: str) -> str:
+        """
+        Регион (уровень дерева под страной), к которому относится регион вакансии.
+
+        :param area: Идентификатор региона вакансии.
+        :return:
+        """
+
+        if area in self._regions:
+            return self._regions[area]
+
+        region = self.references.region(area) if self.references is not None else area
+        self._regions[area] = region
+
+        return region
+
+    def _flush(self, key: Tuple[str, str], close: bool = False) -> None:
+        """
+        Запись строк раздела группой строк Parquet.
+
+        :param key: Раздел выгрузки.
+        :param close: Закрыть файл раздела после записи.
+        :return:
+        """
+
+        rows = self._buffers.pop(key, [])
+        if rows:
+            self._buffered -= len(rows)
+            table = pa.Table.from_pylist(rows, schema=self.arrow_schema)
+            self._writer(key).write_table(table, row_group_size=len(rows))
+        if close and key in self._writers:
+            self._writers.pop(key).close()
+
+    def _writer(self, key: Tuple[str, str]) -> Any:
+        writer = self._writers.get(key)
+        if writer is None:
+            month, region = key
+            directory = os.path.join(
+                self.directory,
+                f"{PARTITION_COLUMNS[0]}={month}",
+                f"{PARTITION_COLUMNS[1]}={region}",
+            )
+            os.makedirs(directory, exist_ok=True)
+            # раздел может быть открыт повторно – каждый раз в новом файле
+            part = self._parts[key] = self._parts.get(key, -1) + 1
+            writer = self._writers[key] = pq.ParquetWriter(
+                os.path.join(directory, f"part-{part:05d}.parquet"),
+                self.arrow_schema,
+                compression="zstd",
+                compression_level=self.compression_level,
+                use_dictionary=True,
+            )
+
+        return writer
+
+
+def dataset(directory: str) -> Any:
+    """
+    Набор данных выгрузки вакансий.
+
+    Значения столбцов разделов (``PARTITION_COLUMNS``) – строки.
+
+    :param directory: Директория выгрузки.
+    :return: ``pyarrow.dataset.Dataset``.
+    """
+
+    if pa is None:
+        raise RuntimeError("pyarrow is required to load vacancies from Parquet.")
+
+    return ds.dataset(
+        directory,
+        format="parquet",
+        partitioning=ds.partitioning(
+            pa.schema([(name, pa.string()) for name in PARTITION_COLUMNS]),
+            flavor="hive",
+        ),
+    )
+
+
+def scan(
+    directory: str,
+    columns: Optional[List[str]] = None,
+    batch_size: int = 10000,
+    filter: Any = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Потоковое чтение выгрузки вакансий в виде документов.
+
+    Вложенные поля восстанавливаются словарями и списками, как в MongoDB;
+    даты – объектами ``datetime``.
+
+    :param directory: Директория выгрузки.
+    :param columns: Загружаемые столбцы (по умолчанию – все).
+    :param batch_size: Количество строк, читаемых за один раз.
+    :param filter: Условие отбора ``pyarrow.dataset.Expression``.
+    :return:
+    """
+
+    batches = dataset(directory).to_batches(
+        columns=columns, filter=filter, batch_size=batch_size
+    )
+    for batch in batches:
+        yield from batch.to_pylist()
+
+
+def load(
+    directory: str,
+    columns: Optional[List[str]] = None,
+    filter: Any = None,
+) -> Any:
+    """
+    Загрузка выгрузки вакансий с отбором столбцов и разделов.
+
+    Пример – зарплаты и навыки вакансий Москвы за ноябрь 2022 г.::
+
+        import pyarrow.dataset as ds
+
+        load(
+            "vacancies.parquet",
+            columns=["id", "salary", "key_skills"],
+            filter=(ds.field("published_month") == "2022-11")
+            & (ds.field("region_id") == "1"),
+        )
+
+    :param directory: Директория выгрузки.
+    :param columns: Загружаемые столбцы (по умолчанию – все).
+    :param filter: Условие отбора ``pyarrow.dataset.Expression``; условия
+        на столбцы разделов исключают чтение файлов других разделов.
+    :return: Таблица ``pyarrow.Table``.
+    """
+
+    return dataset(directory).to_table(columns=columns, filter=filter)
@@ -0,0 +1,215 @@
+import json
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from scrapy import Request, Spider, signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Response
+from scrapy.utils.project import data_path
+from twisted.internet import reactor, task
+from twisted.web.resource import Resource
+from twisted.web.server import Site
+
+from vacancies.vacancies.metrics import (
+    DOWNLOAD_LATENCY,
+    PAYLOAD_SIZE,
+    PIPELINE_TIME,
+    CrawlMetrics,
+    memory_usage,
+)
+
+
+def callback_name(request: Request) -> str:
+    """
+    Название метода паука, обрабатывающего ответ на запрос.
+
+    :param request: Запрос.
+    :return:
+    """
+
+    return getattr(request.callback, "__name__", None) or "parse"
+
+
+class _PrometheusResource(Resource):
+    """
+    Страница показателей в текстовом формате Prometheus.
+    """
+
+    isLeaf = True
+
+    def __init__(self, metrics: CrawlMetrics) -> None:
+        super().__init__()  # type: ignore[no-untyped-call]
+        self.metrics = metrics
+
+    def render_GET(self, request: Any) -> bytes:
+        request.setHeader(b"Content-Type", b"text/plain; version=0.0.4; charset=utf-8")
+        return self.metrics.prometheus().encode()
+
+
+class MetricsExtension:
+    """
+    Показатели производительности парсинга по методам паука.
+
+    По сигналам Scrapy для каждого метода паука собираются гистограммы задержки
+    загрузки, размера ответа и времени прохождения элементов через конвейеры,
+    а ``MetricsMiddleware`` добавляет процессорное время метода и количество
+    полученных элементов. Глубина очередей и объем памяти записываются
+    во временной ряд. Снимки показателей периодически дописываются в файл
+    JSON Lines; при заданном порте показатели доступны в формате Prometheus.
+    """
+
+    def __init__(
+        self,
+        crawler: Crawler,
+        metrics: CrawlMetrics,
+        path: str,
+        interval: float = 60.0,
+        sample_interval: float = 5.0,
+        prometheus_port: int = 0,
+        prometheus_host: str = "127.0.0.1",
+        profile_path: Optional[str] = None,
+    ) -> None:
+        self.crawler = crawler
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.sample_interval = sample_interval
+        self.prometheus_port = prometheus_port
+        self.prometheus_host = prometheus_host
+        self.profile_path = profile_path
+        # элементы, проходящие через конвейеры: метод паука и время получения
+        self._pending: Dict[int, Tuple[str, float]] = {}
+        self._timers: Dict[str, task.LoopingCall] = {}
+        self._port: Any = None
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "MetricsExtension":
+        settings = crawler.settings
+        if not settings.getbool("METRICS_ENABLED"):
+            raise NotConfigured
+
+        profile_rate = settings.getfloat("METRICS_PROFILE_RATE", 0.0)
+        extension = cls(
+            crawler,
+            CrawlMetrics(
+                profile_rate=profile_rate,
+                profile_callbacks=settings.getlist(
+                    "METRICS_PROFILE_CALLBACKS",
+                    ["parse_pages", "parse_items", "parse_detail"],
+                ),
+            ),
+            path=data_path(settings.get("METRICS_FILE", "metrics.jsonl")),
+            interval=settings.getfloat("METRICS_INTERVAL", 60.0),
+            sample_interval=settings.getfloat("METRICS_SAMPLE_INTERVAL", 5.0),
+            prometheus_port=settings.getint("METRICS_PROMETHEUS_PORT", 0),
+            prometheus_host=settings.get("METRICS_PROMETHEUS_HOST", "127.0.0.1"),
+            profile_path=data_path(
+                settings.get("METRICS_PROFILE_FILE", "profile.pstats")
+            )
+            if profile_rate > 0
+            else None,
+        )
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(
+            extension.response_received, signal=signals.response_received
+        )
+        crawler.signals.connect(extension.item_done, signal=signals.item_scraped)
+        crawler.signals.connect(extension.item_done, signal=signals.item_dropped)
+        crawler.signals.connect(extension.item_done, signal=signals.item_error)
+
+        return extension
+
+    def spider_opened(self, spider: Spider) -> None:
+        if self.sample_interval > 0:
+            self._timers["sample"] = task.LoopingCall(self.sample)
+            self._timers["sample"].start(self.sample_interval, now=False)
+        if self.interval > 0:
+            self._timers["snapshot"] = task.LoopingCall(self.write_snapshot)
+            self._timers["snapshot"].start(self.interval, now=False)
+        if self.prometheus_port:
+            self._port = reactor.listenTCP(  # type: ignore[attr-defined]
+                self.prometheus_port,
+                Site(_PrometheusResource(self.metrics)),  # type: ignore[no-untyped-call]
+                interface=self.prometheus_host,
+            )
+            spider.logger.info(
+                f"Metrics are available at "
+                f"http://{self.prometheus_host}:{self.prometheus_port}/metrics"
+            )
+
+    def spider_closed(self, spider: Spider, reason: str) -> None:
+        for timer in self._timers.values():
+            if timer.running:
+                timer.stop()
+        if self._port is not None:
+            self._port.stopListening()
+
+        self.sample()
+        self.write_snapshot()
+
+    def response_received(
+        self, response: Response, request: Request, spider: Spider
+    ) -> None:
+        callback = callback_name(request)
+        latency = request.meta.get("download_latency")
+        if latency is not None:
+            self.metrics.observe(callback, DOWNLOAD_LATENCY, latency * 1000)
+        self.metrics.observe(callback, PAYLOAD_SIZE, len(response.body))
+
+    def item_emitted(self, item: Any, callback: str) -> None:
+        """
+        Отметка о получении элемента методом паука (из ``MetricsMiddleware``).
+
+        :param item: Элемент.
+        :param callback: Название метода паука.
+        :return:
+        """
+
+        self._pending[id(item)] = (callback, time.perf_counter())
+
+    def item_done(self, item: Any, **kwargs: Any) -> None:
+        pending = self._pending.pop(id(item), None)
+        if pending is not None:
+            callback, started_at = pending
+            self.metrics.observe(
+                callback, PIPELINE_TIME, (time.perf_counter() - started_at) * 1000
+            )
+
+    def sample(self) -> None:
+        """
+        Запись глубины очередей и объема памяти во временной ряд.
+
+        :return:
+        """
+
+        engine = self.crawler.engine
+        slot = getattr(engine, "slot", None)
+        scheduler = getattr(slot, "scheduler", None)
+        scraper_slot = getattr(getattr(engine, "scraper", None), "slot", None)
+        self.metrics.sample(
+            scheduler_queue=len(scheduler) if scheduler is not None else 0,
+            downloader_active=len(
+                getattr(getattr(engine, "downloader", None), "active", ())
+            ),
+            scraper_active=len(getattr(scraper_slot, "active", ())),
+            pipeline_items=len(self._pending),
+            memory_rss_bytes=memory_usage(),
+        )
+
+    def write_snapshot(self) -> None:
+        """
+        Дописывание снимка показателей в файл и сохранение профиля.
+
+        :return:
+        """
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(self.metrics.snapshot()) + "\n")
+        if self.profile_path:
+            self.metrics.dump_profile(self.profile_path)
@@ -0,0 +1,274 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# запрос запланирован, но еще не обработан
+SCHEDULED = 0
+# запрос обработан, все порожденные им запросы запланированы
+COMPLETED = 1
+
+
+class CrawlState:
+    """
+    Хранилище состояния парсинга в файле SQLite.
+
+    Хранит запланированные и обработанные запросы, что позволяет продолжить
+    прерванный парсинг с места остановки. Записи накапливаются в буфере
+    и сохраняются одной транзакцией при достижении размера буфера или по времени,
+    поэтому зафиксированное состояние всегда соответствует префиксу операций.
+    Прогресс по регионам считается при открытии файла и далее обновляется
+    по зафиксированным операциям, без запросов к базе данных.
+    """
+
+    def __init__(
+        self, path: str, buffer_size: int = 1000, commit_interval: float = 5.0
+    ) -> None:
+        """
+        :param path: Путь к файлу базы данных.
+        :param buffer_size: Количество операций, после которого выполняется фиксация.
+        :param commit_interval: Максимальный интервал между фиксациями (в секундах).
+        """
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.buffer_size = buffer_size
+        self.commit_interval = commit_interval
+
+        # операция, ее параметры, регион и счетчик прогресса (0 – обработанные, 1 – все)
+        self._buffer: List[Tuple[str, tuple, Optional[str], int]] = []
+        self._committed_at = time.monotonic()
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS requests (
+                url TEXT PRIMARY KEY,
+                callback TEXT NOT NULL,
+                area TEXT,
+                cb_kwargs TEXT,
+                state INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS requests_state ON requests (state)"
+        )
+        self._connection.commit()
+        self._progress: Dict[str, List[int]] = {
+            area: [int(done), int(total)]
+            for area, done, total in self._connection.execute(
+                "SELECT area, SUM(state), COUNT(*) FROM requests "
+                "WHERE area IS NOT NULL GROUP BY area"
+            )
+        }
+
+    def schedule(
+        self,
+        url: str,
+        callback: str,
+        area: Optional[str] = None,
+        cb_kwargs: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Запись запланированного запроса.
+
+        :param url: Ссылка запроса.
+        :param callback: Название метода паука, обрабатывающего ответ.
+        :param area: Идентификатор региона, к которому относится запрос.
+        :param cb_kwargs: Аргументы метода обработки ответа.
+        :return:
+        """
+
+        self._push(
+            "INSERT OR IGNORE INTO requests (url, callback, area, cb_kwargs) "
+            "VALUES (?, ?, ?, ?)",
+            (url, callback, area, json.dumps(cb_kwargs) if cb_kwargs else None),
+            area,
+            1,
+        )
+
+    def complete(self, url: str, area: Optional[str] = None) -> None:
+        """
+        Отметка об обработке запроса.
+
+        :param url: Ссылка запроса.
+        :param area: Идентификатор региона, к которому относится запрос.
+        :return:
+        """
+
+        self._push(
+            "UPDATE requests SET state = ? WHERE url = ? AND state = ?",
+            (COMPLETED, url, SCHEDULED),
+            area,
+            0,
+        )
+
+    def pending(self) -> Iterator[Tuple[str, str, Optional[str], Dict[str, Any]]]:
+        """
+        Запланированные, но не обработанные запросы.
+
+        :return: Ссылка, название метода обработки, регион и аргументы метода.
+        """
+
+        self.commit()
+        cursor = self._connection.execute(
+            "SELECT url, callback, area, cb_kwargs FROM requests WHERE state = ?",
+            (SCHEDULED,),
+        )
+        for url, callback, area, cb_kwargs in cursor:
+            yield url, callback, area, json.loads(cb_kwargs) if cb_kwargs else {}
+
+    def progress(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Прогресс парсинга по регионам.
+
+        Учитываются только зафиксированные операции.
+
+        :return: Словарь "регион" – "количество обработанных и всех запросов".
+        """
+
+        return {area: (done, total) for area, (done, total) in self._progress.items()}
+
+    def commit(self) -> None:
+        """
+        Фиксация накопленных операций одной транзакцией.
+
+        :return:
+        """
+
+        if self._buffer:
+            changed: List[Tuple[str, int]] = []
+            with self._connection:
+                for statement, params, area, counter in self._buffer:
+                    cursor = self._connection.execute(statement, params)
+                    # повторно запланированные и обработанные запросы не учитываются
+                    if area is not None and cursor.rowcount > 0:
+                        changed.append((area, counter))
+            for area, counter in changed:
+                self._progress.setdefault(area, [0, 0])[counter] += 1
+            self._buffer = []
+        self._committed_at = time.monotonic()
+
+    def clear(self) -> None:
+        """
+        Удаление состояния (после успешного завершения парсинга).
+
+        :return:
+        """
+
+        self._buffer = []
+        self._progress = {}
+        with self._connection:
+            self._connection.execute("DELETE FROM requests")
+
+    def close(self) -> None:
+        self.commit()
+        self._connection.close()
+
+    def __len__(self) -> int:
+        self.commit()
+        (count,) = self._connection.execute("SELECT COUNT(*) FROM requests").fetchone()
+
+        return int(count)
+
+    def _push(
+        self, statement: str, params: tuple, area: Optional[str], counter: int
+    ) -> None:
+        self._buffer.append((statement, params, area, counter))
+        if (
+            len(self._buffer) >= self.buffer_size
+            or time.monotonic() - self._committed_at >= self.commit_interval
+        ):
+            self.commit()
+
+
+class AreaQueue:
+    """
+    Очередь запросов на диске, сгруппированных по регионам.
+
+    Хранит запросы регионов, парсинг которых еще не начат, чтобы они
+    не занимали память. Регионы извлекаются целиком в порядке добавления.
+    Содержимое очереди временное: при открытии файл очищается.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: Путь к файлу базы данных.
+        """
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self._size = 0
+        self._connection = sqlite3.connect(path)
+        # очередь не нужна после остановки, надежность записи не требуется
+        self._connection.execute("PRAGMA journal_mode=MEMORY")
+        self._connection.execute("PRAGMA synchronous=OFF")
+        self._connection.execute("DROP TABLE IF EXISTS queue")
+        self._connection.execute(
+            """
+            CREATE TABLE queue (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                area TEXT NOT NULL,
+                data BLOB NOT NULL
+            )
+            """
+        )
+        self._connection.execute("CREATE INDEX queue_area ON queue (area)")
+        self._connection.commit()
+
+    def push(self, area: str, data: bytes) -> None:
+        """
+        Добавление запроса в очередь.
+
+        :param area: Идентификатор региона.
+        :param data: Сериализованный запрос.
+        :return:
+        """
+
+        self._connection.execute(
+            "INSERT INTO queue (area, data) VALUES (?, ?)", (area, data)
+        )
+        self._size += 1
+
+    def pop_area(self) -> Tuple[Optional[str], List[bytes]]:
+        """
+        Извлечение всех запросов региона, добавленного первым.
+
+        :return: Идентификатор региона и сериализованные запросы в порядке добавления.
+        """
+
+        row = self._connection.execute(
+            "SELECT area FROM queue ORDER BY seq LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None, []
+
+        (area,) = row
+        with self._connection:
+            records = [
+                data
+                for (data,) in self._connection.execute(
+                    "SELECT data FROM queue WHERE area = ? ORDER BY seq", (area,)
+                )
+            ]
+            self._connection.execute("DELETE FROM queue WHERE area = ?", (area,))
+        self._size -= len(records)
+
+        return area, records
+
+    def close(self) -> None:
+        self._connection.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __len__(self) -> int:
+        return self._size
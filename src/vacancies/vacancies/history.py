@@ -0,0 +1,191 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo.collection import Collection
+
+from vacancies.vacancies.changes import FIELD_HASHES_FIELD, HASH_FIELD
+from vacancies.vacancies.items import DERIVED_FIELDS
+
+# служебные поля документа вакансии, не входящие в историю
+SERVICE_FIELDS = ("_id", HASH_FIELD, FIELD_HASHES_FIELD)
+
+# поля, не входящие в историю: служебные и добавленные при обработке
+# (история хранит только изменения данных API)
+EXCLUDED_FIELDS = (*SERVICE_FIELDS, *DERIVED_FIELDS)
+
+
+def created_entry(vacancy_id: str, at: int) -> Dict[str, Any]:
+    """
+    Запись истории о первом сохранении вакансии.
+
+    :param vacancy_id: Идентификатор вакансии.
+    :param at: Время сохранения (время Unix).
+    :return:
+    """
+
+    return {"vacancy_id": vacancy_id, "at": at, "created": True}
+
+
+def changed_entry(
+    vacancy_id: str,
+    at: int,
+    stored: Dict[str, Any],
+    document: Dict[str, Any],
+    fields: Optional[Iterable[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Запись истории об изменении вакансии (обратная дельта).
+
+    Запись содержит предыдущие значения измененных и удаленных полей
+    и названия добавленных полей, то есть позволяет получить предыдущую версию
+    документа из следующей. Поля, добавленные при обработке (``DERIVED_FIELDS``),
+    в историю не входят.
+
+    :param vacancy_id: Идентификатор вакансии.
+    :param at: Время изменения (время Unix).
+    :param stored: Сохраненная версия документа (достаточно изменившихся полей).
+    :param document: Новая версия документа.
+    :param fields: Изменившиеся поля (по умолчанию сравниваются все поля).
+    :return:
+    """
+
+    names = (set(fields) if fields is not None else {*stored, *document}).difference(
+        EXCLUDED_FIELDS
+    )
+    previous = {
+        name: stored[name]
+        for name in names
+        if name in stored and (name not in document or stored[name] != document[name])
+    }
+
+    return {
+        "vacancy_id": vacancy_id,
+        "at": at,
+        "previous": previous,
+        "added": sorted(
+            name for name in names if name in document and name not in stored
+        ),
+    }
+
+
+def revert(document: Dict[str, Any], entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Получение предыдущей версии документа по записи истории.
+
+    :param document: Версия документа после изменения.
+    :param entry: Запись истории об изменении.
+    :return: Новый документ.
+    """
+
+    result = {
+        name: value for name, value in document.items() if name not in entry["added"]
+    }
+    result.update(entry["previous"])
+
+    return result
+
+
+class VacancyHistory:
+    """
+    История изменений вакансий.
+
+    Текущая версия вакансии хранится в коллекции вакансий, а в коллекции
+    истории – обратные дельты: при каждом изменении записываются только
+    предыдущие значения изменившихся полей. Поэтому объем истории близок
+    к объему изменений, а версия на заданный момент времени восстанавливается
+    из текущей версии и изменений, сделанных после этого момента (один запрос
+    по индексу ``vacancy_id, at``).
+
+    История содержит только данные API, поэтому версии вакансии возвращаются
+    без полей, добавленных при обработке (``DERIVED_FIELDS``).
+    """
+
+    def __init__(self, vacancies: Collection, history: Collection) -> None:
+        """
+        :param vacancies: Коллекция вакансий.
+        :param history: Коллекция истории изменений.
+        """
+
+        self.vacancies = vacancies
+        self.history = history
+
+    def at(self, vacancy_id: str, moment: float) -> Optional[Dict[str, Any]]:
+        """
+        Восстановление версии вакансии на момент времени.
+
+        :param vacancy_id: Идентификатор вакансии.
+        :param moment: Время Unix.
+        :return: Документ вакансии или None, если на этот момент
+            вакансия еще не была сохранена.
+        """
+
+        document = self._current(vacancy_id)
+        if document is None:
+            return None
+
+        for entry in self._entries(vacancy_id, after=moment):
+            if entry.get("created"):
+                return None
+            document = revert(document, entry)
+
+        return document
+
+    def versions(self, vacancy_id: str) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Все сохраненные версии вакансии.
+
+        :param vacancy_id: Идентификатор вакансии.
+        :return: Пары "время появления версии" – "документ" в порядке
+            от первой версии к текущей.
+        """
+
+        document = self._current(vacancy_id)
+        if document is None:
+            return []
+
+        versions = []
+        for entry in self._entries(vacancy_id):
+            versions.append((entry["at"], document))
+            if entry.get("created"):
+                break
+            document = revert(document, entry)
+
+        return versions[::-1]
+
+    def field(self, vacancy_id: str, name: str) -> List[Tuple[int, Any]]:
+        """
+        Изменения значения поля вакансии (например, ``salary``).
+
+        :param vacancy_id: Идентификатор вакансии.
+        :param name: Название поля.
+        :return: Пары "время" – "значение поля" при каждом его изменении.
+        """
+
+        changes: List[Tuple[int, Any]] = []
+        for at, document in self.versions(vacancy_id):
+            value = document.get(name)
+            if not changes or changes[-1][1] != value:
+                changes.append((at, value))
+
+        return changes
+
+    def _current(self, vacancy_id: str) -> Optional[Dict[str, Any]]:
+        return self.vacancies.find_one(
+            {"id": vacancy_id}, {name: False for name in EXCLUDED_FIELDS}
+        )
+
+    def _entries(
+        self, vacancy_id: str, after: Optional[float] = None
+    ) -> Iterable[Dict[str, Any]]:
+        """
+        Записи истории вакансии от последней к первой.
+
+        :param vacancy_id: Идентификатор вакансии.
+        :param after: Время Unix, после которого сделаны изменения.
+        :return:
+        """
+
+        query: Dict[str, Any] = {"vacancy_id": vacancy_id}
+        if after is not None:
+            query["at"] = {"$gt": after}
+
+        return self.history.find(query, {"_id": False}, sort=[("at", -1), ("_id", -1)])
@@ -0,0 +1,261 @@
+import json
+import os
+import re
+import sqlite3
+import time
+import zlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from scrapy import Spider
+from scrapy.downloadermiddlewares.httpcache import HttpCacheMiddleware
+from scrapy.http import Request, Response
+from scrapy.http.headers import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.settings import BaseSettings
+from scrapy.utils.project import data_path
+from w3lib.url import canonicalize_url
+
+# классы адресов API с разным сроком хранения ответов
+REFERENCE, LIST, DETAIL = "reference", "list", "detail"
+REFERENCE_ENDPOINTS = ("/areas", "/dictionaries", "/professional_roles")
+DETAIL_PATH = re.compile(r"^/vacancies/\d+$")
+# заголовки сохраненного ответа, обновляемые ответом 304 (RFC 7232, 4.1)
+REVALIDATED_HEADERS = ("Date", "ETag", "Last-Modified", "Expires", "Cache-Control")
+
+
+def endpoint_class(url: str) -> str:
+    """
+    Класс адреса API: справочник, список вакансий или вакансия.
+
+    :param url: Адрес запроса.
+    :return:
+    """
+
+    path = urlparse(url).path.rstrip("/")
+    if path.startswith(REFERENCE_ENDPOINTS):
+        return REFERENCE
+    if DETAIL_PATH.match(path):
+        return DETAIL
+
+    return LIST
+
+
+class ApiCachePolicy:
+    """
+    Политика кэширования ответов api.hh.ru.
+
+    Срок хранения зависит от класса адреса: справочники хранятся долго
+    (``HTTPCACHE_REFERENCE_TTL``, как и в ``ReferenceCache``), страницы поиска – недолго
+    (``HTTPCACHE_LIST_TTL``), вакансии – не дольше ``HTTPCACHE_DETAIL_TTL``.
+    Если паук передал дату публикации вакансии из списка (``meta["published_at"]``),
+    ответ с другой датой не используется (сравнивает хранилище), но и при
+    совпадении даты срок хранения ограничен: изменение вакансии не всегда
+    меняет дату публикации.
+    Устаревший ответ проверяется условным запросом (``If-None-Match``
+    и ``If-Modified-Since``); при ответе 304 или ошибке сервера используется
+    сохраненный ответ.
+    """
+
+    def __init__(self, settings: BaseSettings) -> None:
+        self.ttl = {
+            REFERENCE: settings.getfloat("HTTPCACHE_REFERENCE_TTL", 24 * 60 * 60),
+            LIST: settings.getfloat("HTTPCACHE_LIST_TTL", 60 * 60),
+            DETAIL: settings.getfloat("HTTPCACHE_DETAIL_TTL", 24 * 60 * 60),
+        }
+
+    def should_cache_request(self, request: Request) -> bool:
+        return request.method == "GET"
+
+    def should_cache_response(self, response: Response, request: Request) -> bool:
+        return response.status == 200
+
+    def is_cached_response_fresh(
+        self, cachedresponse: Response, request: Request
+    ) -> bool:
+        kind = endpoint_class(request.url)
+        date = cachedresponse.headers.get("Date")
+        try:
+            stored_at = parsedate_to_datetime(date.decode("latin-1")).timestamp()
+        except (AttributeError, TypeError, ValueError):
+            stored_at = 0.0
+        if time.time() - stored_at < self.ttl[kind]:
+            return True
+
+        etag = cachedresponse.headers.get("ETag")
+        if etag:
+            request.headers["If-None-Match"] = etag
+        modified = cachedresponse.headers.get("Last-Modified") or date
+        if modified:
+            request.headers["If-Modified-Since"] = modified
+
+        return False
+
+    def is_cached_response_valid(
+        self, cachedresponse: Response, response: Response, request: Request
+    ) -> bool:
+        return response.status == 304 or response.status >= 500
+
+
+class ApiCacheMiddleware(HttpCacheMiddleware):
+    """
+    Кэш ответов API с обновлением сохраненного ответа после проверки.
+
+    Ответ 304 подтверждает сохраненный ответ: его дата и валидаторы
+    обновляются в хранилище, иначе ответ считался бы устаревшим и проверялся
+    бы при каждом следующем запросе.
+    """
+
+    def process_response(
+        self, request: Request, response: Response, spider: Spider
+    ) -> Response:
+        cachedresponse = request.meta.get("cached_response")
+        result = super().process_response(request, response, spider)
+        if result is cachedresponse and response.status == 304:
+            for name in REVALIDATED_HEADERS:
+                value = response.headers.get(name)
+                if value is not None:
+                    cachedresponse.headers[name] = value
+            self.storage.store_response(spider, request, cachedresponse)
+
+        return result
+
+
+class SQLiteCacheStorage:
+    """
+    Хранилище кэша ответов в одном файле SQLite.
+
+    Ответы хранятся по каноническому адресу запроса, тело сжимается ``zlib``.
+    Вместе с ответом вакансии сохраняется дата публикации из запроса: если
+    дата в новом запросе другая, сохраненный ответ не используется.
+    Записи накапливаются в буфере и фиксируются пакетами в короткой
+    транзакции, поэтому файл может использоваться несколькими процессами
+    парсинга.
+
+    Ответы, которые не сохранялись и не проверялись дольше
+    ``HTTPCACHE_EXPIRATION_SECS``, не используются и удаляются из файла
+    при открытии паука (освободившиеся страницы файла используются повторно).
+    """
+
+    def __init__(self, settings: BaseSettings) -> None:
+        self.cachedir = data_path(settings["HTTPCACHE_DIR"], createdir=True)
+        self.buffer_size = settings.getint("HTTPCACHE_BUFFER_SIZE", 100)
+        self.compression_level = settings.getint("HTTPCACHE_COMPRESSION_LEVEL", 6)
+        self.expiration_secs = settings.getfloat("HTTPCACHE_EXPIRATION_SECS")
+        self._buffer: Dict[str, Tuple[Any, ...]] = {}
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def open_spider(self, spider: Spider) -> None:
+        path = os.path.join(self.cachedir, f"{spider.name}.sqlite")
+        self._connection = sqlite3.connect(path, timeout=60)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                published_at TEXT,
+                stored_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_stored_at ON responses (stored_at)"
+        )
+        self._connection.commit()
+        spider.logger.debug(f"Using SQLite cache storage in {path}")
+        if self.expiration_secs > 0:
+            self.prune(time.time() - self.expiration_secs)
+
+    def prune(self, before: float) -> int:
+        """
+        Удаление ответов, сохраненных раньше указанного времени.
+
+        :param before: Время (timestamp).
+        :return: Количество удаленных ответов.
+        """
+
+        assert self._connection is not None
+        cursor = self._connection.execute(
+            "DELETE FROM responses WHERE stored_at < ?", (before,)
+        )
+        self._connection.commit()
+
+        return int(cursor.rowcount)
+
+    def close_spider(self, spider: Spider) -> None:
+        if self._connection is not None:
+            self.commit()
+            self._connection.close()
+            self._connection = None
+
+    def commit(self) -> None:
+        """
+        Сохранение буфера.
+
+        :return:
+        """
+
+        if self._buffer and self._connection is not None:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO responses "
+                "(url, status, headers, body, published_at, stored_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                self._buffer.values(),
+            )
+            self._connection.commit()
+            self._buffer = {}
+
+    def retrieve_response(self, spider: Spider, request: Request) -> Optional[Response]:
+        assert self._connection is not None
+        url = canonicalize_url(request.url)
+        row = self._buffer.get(url)
+        if row is None:
+            row = self._connection.execute(
+                "SELECT url, status, headers, body, published_at, stored_at "
+                "FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+
+        status, headers, body, published_at, stored_at = row[1:6]
+        if 0 < self.expiration_secs < time.time() - stored_at:
+            return None
+        expected = request.meta.get("published_at")
+        if expected and expected != published_at:
+            return None
+
+        headers = Headers(json.loads(headers))
+        body = zlib.decompress(body)
+        response_class = responsetypes.from_args(
+            headers=headers, url=request.url, body=body
+        )
+
+        return response_class(
+            url=request.url, status=status, headers=headers, body=body
+        )
+
+    def store_response(
+        self, spider: Spider, request: Request, response: Response
+    ) -> None:
+        headers = {
+            key.decode("latin-1"): [value.decode("latin-1") for value in values]
+            for key, values in response.headers.items()
+        }
+        headers.setdefault("Date", [formatdate(usegmt=True)])
+        url = canonicalize_url(request.url)
+        self._buffer[url] = (
+            url,
+            response.status,
+            json.dumps(headers),
+            zlib.compress(response.body, self.compression_level),
+            request.meta.get("published_at"),
+            time.time(),
+        )
+        if len(self._buffer) >= self.buffer_size:
+            self.commit()
@@ -0,0 +1,95 @@
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from pymongo.collection import Collection
+
+# формат даты в ответах api.hh.ru (например, 2022-11-10T12:34:56+0300)
+DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
+
+
+def to_timestamp(value: Optional[str]) -> Optional[int]:
+    """
+    Преобразование даты из ответа api.hh.ru во время Unix.
+
+    :param value: Дата в формате api.hh.ru.
+    :return: Количество секунд с начала эпохи или None, если дату не удалось разобрать.
+    """
+
+    if not value:
+        return None
+
+    try:
+        return int(datetime.strptime(value, DATETIME_FORMAT).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+class KnownVacancies:
+    """
+    Компактный индекс сохраненных вакансий для инкрементального парсинга.
+
+    Идентификаторы и время публикации хранятся в отсортированных массивах
+    (16 байт на вакансию), поиск выполняется бинарным поиском.
+    """
+
+    def __init__(self, records: Iterable[Tuple[int, int]]) -> None:
+        """
+        :param records: Пары "идентификатор вакансии" – "время публикации".
+        """
+
+        ordered: List[Tuple[int, int]] = sorted(records)
+        self._ids = array("q", (vacancy_id for vacancy_id, _ in ordered))
+        self._published = array("q", (published for _, published in ordered))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @classmethod
+    def from_collection(cls, collection: Collection) -> "KnownVacancies":
+        """
+        Загрузка индекса из коллекции вакансий.
+
+        :param collection: Коллекция MongoDB с вакансиями.
+        :return:
+        """
+
+        def records() -> Iterable[Tuple[int, int]]:
+            cursor = collection.find(
+                {}, {"_id": False, "id": True, "published_at": True}, batch_size=10000
+            )
+            for document in cursor:
+                published = to_timestamp(document.get("published_at"))
+                if document.get("id") and published is not None:
+                    yield int(document["id"]), published
+
+        return cls(records())
+
+    @property
+    def last_published(self) -> Optional[int]:
+        """
+        Время публикации самой свежей из сохраненных вакансий.
+
+        :return:
+        """
+
+        return max(self._published) if self._published else None
+
+    def is_changed(self, vacancy_id: str, published_at: Optional[str]) -> bool:
+        """
+        Проверка, требуется ли загрузка детальной информации о вакансии.
+
+        :param vacancy_id: Идентификатор вакансии.
+        :param published_at: Время публикации вакансии из списка вакансий.
+        :return: True, если вакансия новая или была опубликована повторно.
+        """
+
+        key = int(vacancy_id)
+        position = bisect_left(self._ids, key)
+        if position == len(self._ids) or self._ids[position] != key:
+            return True
+
+        published = to_timestamp(published_at)
+
+        return published is None or published > self._published[position]
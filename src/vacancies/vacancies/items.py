@@ -1,138 +1,110 @@
-from scrapy import Field, Item
-
-
-class IdName(Item):
-    """
-    Общая модель с идентификатором и наименованием.
-    """
-
-    id = Field()
-    name = Field()
-
-
-class AreaType(IdName):
-    """
-    Информация о регионе.
-    """
-
-    url = Field()
-
-
-class Metro(Item):
-    """
-    Информация о ближайшей станции метро.
-    """
-
-    station_name = Field()
-    line_name = Field()
-    station_id = Field()
-    line_id = Field()
-    lat = Field()
-    lng = Field()
-
-
-class Address(Item):
-    """
-    Адрес места работы.
-    """
-
-    city = Field()
-    street = Field()
-    building = Field()
-    description = Field()
-    lat = Field()
-    lng = Field()
-    raw = Field()
-    metro = Field(serializer=Metro)
-    metro_stations = Field(serializer=Metro)
-
-
-class KeySkill(Item):
-    """
-    Ключевой навык.
-    """
-
-    name = Field()
-
-
-class Specialization(IdName):
-    """
-    Специализация.
-    """
-
-    profarea_id = Field()
-    profarea_name = Field()
-
-
-class LogoUrls(Item):
-    """
-    Ссылка на логотип компании.
-    """
-
-    original = Field()
-
-
-class Employer(IdName):
-    """
-    Данные о работодателе.
-    """
-
-    url = Field()
-    alternate_url = Field()
-    logo_urls = Field(serializer=LogoUrls)
-    vacancies_url = Field()
-    trusted = Field()
-
-
-class VacancyItem(Item):
-    """
-    Данные вакансии.
-    """
-
-    id = Field()
-    premium = Field()
-    billing_type = Field(serializer=IdName)
-    relations = Field()
-    name = Field()
-    insider_interview = Field()
-    response_letter_required = Field()
-    area = Field(serializer=AreaType)
-    salary = Field()
-    type = Field(serializer=IdName)
-    address = Field(serializer=Address)
-    allow_messages = Field()
-    experience = Field(serializer=IdName)
-    schedule = Field(serializer=IdName)
-    employment = Field(serializer=IdName)
-    department = Field(serializer=IdName)
-    contacts = Field()
-    description = Field()
-    branded_description = Field()
-    vacancy_constructor_template = Field()
-    key_skills = Field()
-    accept_handicapped = Field()
-    accept_kids = Field()
-    archived = Field()
-    response_url = Field()
-    specializations = Field()
-    professional_roles = Field()
-    code = Field()
-    hidden = Field()
-    quick_responses_allowed = Field()
-    driver_license_types = Field()
-    accept_incomplete_resumes = Field()
-    employer = Field(serializer=Employer)
-    published_at = Field()
-    created_at = Field()
-    initial_created_at = Field()
-    negotiations_url = Field()
-    suitable_resumes_url = Field()
-    apply_alternate_url = Field()
-    has_test = Field()
-    test = Field()
-    alternate_url = Field()
-    working_days = Field()
-    working_time_intervals = Field()
-    working_time_modes = Field()
-    accept_temporary = Field()
-    languages = Field()
+from vacancies.vacancies.mapping import ANY, NUMBER, ListOf, Reference, Schema
+
+# Общая модель с идентификатором и наименованием.
+IdName = Schema(id=str, name=str)
+
+# Информация о ближайшей станции метро.
+Metro = Schema(
+    station_name=ANY,
+    line_name=ANY,
+    station_id=str,
+    line_id=str,
+    lat=NUMBER,
+    lng=NUMBER,
+)
+
+# Адрес места работы.
+Address = Schema(
+    city=ANY,
+    street=ANY,
+    building=ANY,
+    description=ANY,
+    lat=NUMBER,
+    lng=NUMBER,
+    raw=ANY,
+    metro=Metro,
+    metro_stations=ListOf(Metro),
+)
+
+# Ключевой навык.
+KeySkill = Schema(name=str)
+
+# Специализация.
+Specialization = IdName.extend(profarea_id=str, profarea_name=ANY)
+
+# Данные о работодателе.
+Employer = IdName.extend(
+    url=ANY,
+    alternate_url=ANY,
+    logo_urls=ANY,
+    vacancies_url=ANY,
+    trusted=bool,
+)
+
+# Данные вакансии (значения справочников сохраняются только идентификаторами).
+VacancyItem = Schema(
+    id=str,
+    premium=bool,
+    billing_type=Reference("vacancy_billing_type"),
+    relations=ANY,
+    name=str,
+    insider_interview=ANY,
+    response_letter_required=bool,
+    area=Reference("areas"),
+    salary=ANY,
+    type=Reference("vacancy_type"),
+    address=Address,
+    allow_messages=bool,
+    experience=Reference("experience"),
+    schedule=Reference("schedule"),
+    employment=Reference("employment"),
+    department=IdName,
+    contacts=ANY,
+    description=str,
+    # branded_description содержит исходный код с текстом из description
+    vacancy_constructor_template=ANY,
+    key_skills=ListOf(KeySkill),
+    accept_handicapped=bool,
+    accept_kids=bool,
+    archived=bool,
+    response_url=ANY,
+    specializations=ListOf(Specialization),
+    professional_roles=ListOf(Reference("professional_roles")),
+    code=ANY,
+    hidden=bool,
+    quick_responses_allowed=bool,
+    driver_license_types=ANY,
+    accept_incomplete_resumes=bool,
+    employer=Employer,
+    published_at=str,
+    created_at=str,
+    initial_created_at=str,
+    negotiations_url=ANY,
+    suitable_resumes_url=ANY,
+    apply_alternate_url=ANY,
+    has_test=bool,
+    test=ANY,
+    alternate_url=ANY,
+    working_days=ANY,
+    working_time_intervals=ANY,
+    working_time_modes=ANY,
+    accept_temporary=bool,
+    languages=ANY,
+)
+
+# Вакансия в MongoDB: данные из API и поля, добавленные при обработке
+# (зарплата в рублях "на руки" за месяц, см. SalaryPipeline; текст описания
+# без разметки и его токены, см. TextPipeline; кластер дубликатов,
+# см. DuplicatesPipeline).
+StoredVacancy = VacancyItem.extend(
+    salary_rub=ANY,
+    description_text=str,
+    description_tokens=ANY,
+    duplicate_cluster=str,
+)
+
+# поля, добавленные при обработке: не входят в хэши содержимого, поэтому
+# изменение курсов валют или обработки текста не считается изменением вакансии
+DERIVED_FIELDS = tuple(
+    name for name in StoredVacancy.fields if name not in VacancyItem.fields
+)
@@ -0,0 +1,149 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
+
+# произвольное значение JSON, копируется без проверки
+ANY = object()
+# число в ответе api.hh.ru может быть целым или дробным
+NUMBER = (int, float)
+
+Converter = Callable[[Any, str], Any]
+
+
+class SchemaError(ValueError):
+    """
+    Данные не соответствуют схеме.
+    """
+
+
+class Reference:
+    """
+    Значение из справочника api.hh.ru (регион, опыт работы, график и т.п.).
+
+    Сохраняется только идентификатор значения (``{"id": ...}``), остальные
+    поля восстанавливаются по справочнику при выгрузке данных.
+    """
+
+    __slots__ = ("dictionary",)
+
+    def __init__(self, dictionary: str) -> None:
+        """
+        :param dictionary: Название справочника.
+        """
+
+        self.dictionary = dictionary
+
+    def __call__(self, data: Any, path: str = "") -> Optional[Dict[str, str]]:
+        if not data:
+            return None
+        if not isinstance(data, dict) or not isinstance(data.get("id"), str):
+            raise SchemaError(
+                f"{path.rstrip('.') or '<root>'}: {self.dictionary} reference expected"
+            )
+
+        return {"id": data["id"]}
+
+
+class ListOf:
+    """
+    Список значений, описанных схемой или ссылкой на справочник.
+
+    Пустой список, как и отсутствующее значение, преобразуется в None.
+    """
+
+    __slots__ = ("schema",)
+
+    def __init__(self, schema: Union["Schema", Reference]) -> None:
+        self.schema = schema
+
+
+Spec = Union[object, Type, Tuple[Type, ...], "Schema", Reference, ListOf]
+
+
+class Schema:
+    """
+    Декларативное описание документа, сохраняемого из ответа api.hh.ru.
+
+    Поля описываются именованными аргументами: ``ANY`` – значение копируется
+    как есть, тип или кортеж типов – значение проверяется (None допустим),
+    вложенная ``Schema`` или ``ListOf`` – значение преобразуется рекурсивно,
+    ``Reference`` – сохраняется только идентификатор значения справочника.
+    Преобразование выполняется за один проход без промежуточных объектов:
+    результат – словарь, готовый к записи в MongoDB.
+    """
+
+    __slots__ = ("fields", "_copied", "_typed", "_nested")
+
+    def __init__(self, **fields: Spec) -> None:
+        self.fields: Dict[str, Spec] = fields
+        self._copied: Tuple[str, ...] = tuple(
+            name for name, spec in fields.items() if spec is ANY
+        )
+        self._typed: Tuple[Tuple[str, Any], ...] = tuple(
+            (name, spec)
+            for name, spec in fields.items()
+            if isinstance(spec, (type, tuple))
+        )
+        self._nested: Tuple[Tuple[str, Converter], ...] = tuple(
+            (name, self._converter(spec))
+            for name, spec in fields.items()
+            if isinstance(spec, (Schema, Reference, ListOf))
+        )
+
+    def extend(self, **fields: Spec) -> "Schema":
+        """
+        Создание схемы с дополнительными полями.
+
+        :param fields: Дополнительные поля.
+        :return:
+        """
+
+        return Schema(**self.fields, **fields)
+
+    def __call__(self, data: Any, path: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Преобразование данных по схеме.
+
+        :param data: Объект из ответа api.hh.ru.
+        :param path: Путь к объекту (для сообщений об ошибках).
+        :return: Документ или None, если объект пуст.
+        """
+
+        if not data:
+            return None
+        if not isinstance(data, dict):
+            raise SchemaError(
+                f"{path.rstrip('.') or '<root>'}: object expected, "
+                f"got {type(data).__name__}"
+            )
+
+        get = data.get
+        result = {name: get(name) for name in self._copied}
+        for name, types in self._typed:
+            value = get(name)
+            if value is not None and not isinstance(value, types):
+                raise SchemaError(
+                    f"{path}{name}: unexpected type {type(value).__name__}"
+                )
+            result[name] = value
+        for name, convert in self._nested:
+            result[name] = convert(get(name), f"{path}{name}.")
+
+        return result
+
+    @staticmethod
+    def _converter(spec: Union["Schema", Reference, ListOf]) -> Converter:
+        if isinstance(spec, (Schema, Reference)):
+            return spec
+
+        schema = spec.schema
+
+        def convert_list(value: Any, path: str) -> Optional[List[Any]]:
+            if not value:
+                return None
+            if not isinstance(value, list):
+                raise SchemaError(
+                    f"{path.rstrip('.')}: list expected, got {type(value).__name__}"
+                )
+
+            return [schema(item, path) for item in value]
+
+        return convert_list
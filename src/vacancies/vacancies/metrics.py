@@ -0,0 +1,253 @@
+import cProfile
+import os
+import resource
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from vacancies.vacancies.aggregates import bucket, bucket_value
+
+# показатели обработки ответов по методам паука
+DOWNLOAD_LATENCY = "download_latency_ms"
+PARSE_CPU = "parse_cpu_ms"
+PAYLOAD_SIZE = "payload_bytes"
+ITEMS_EMITTED = "items_emitted"
+PIPELINE_TIME = "pipeline_ms"
+METRICS = {
+    DOWNLOAD_LATENCY: "Download latency of the callback responses, ms",
+    PARSE_CPU: "CPU time of the callback per response, ms",
+    PAYLOAD_SIZE: "Body size of the callback responses, bytes",
+    ITEMS_EMITTED: "Items emitted by the callback per response",
+    PIPELINE_TIME: "Time from emitting an item to the end of the pipelines, ms",
+}
+# уровни квантилей в снимках и в формате Prometheus
+LEVELS = (0.5, 0.9, 0.99)
+
+
+def memory_usage() -> int:
+    """
+    Текущий объем резидентной памяти процесса.
+
+    :return: Объем в байтах (если ``/proc`` недоступен – пиковый объем).
+    """
+
+    try:
+        with open("/proc/self/statm", encoding="ascii") as file:
+            pages = int(file.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # на Linux ru_maxrss указывается в килобайтах, на macOS – в байтах
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Histogram:
+    """
+    Гистограмма неотрицательных значений с логарифмическими корзинами.
+
+    Используются корзины гистограмм зарплат (``aggregates.bucket``), поэтому
+    квантили восстанавливаются с относительной ошибкой не более 1%
+    при небольшом количестве корзин. Нулевые значения учитываются отдельно.
+    """
+
+    def __init__(self) -> None:
+        self.buckets: Dict[int, int] = defaultdict(int)
+        self.zeros = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        if value > 0:
+            self.buckets[bucket(value)] += 1
+        else:
+            self.zeros += 1
+
+    def quantiles(self, levels: Iterable[float]) -> List[Optional[float]]:
+        """
+        Квантили значений.
+
+        :param levels: Уровни квантилей (от 0 до 1).
+        :return: Значения квантилей (None, если значений нет).
+        """
+
+        counts = sorted(self.buckets.items())
+        result: List[Optional[float]] = []
+        for level in levels:
+            if not self.count:
+                result.append(None)
+                continue
+
+            rank = level * (self.count - 1)
+            seen = self.zeros
+            value = 0.0
+            if seen <= rank:
+                for index, count in counts:
+                    seen += count
+                    if seen > rank:
+                        value = min(bucket_value(index), self.max)
+                        break
+            result.append(round(value, 3))
+
+        return result
+
+    def summary(self) -> Dict[str, Any]:
+        p50, p90, p99 = self.quantiles(LEVELS)
+
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "mean": round(self.total / self.count, 3) if self.count else None,
+            "p50": p50,
+            "p90": p90,
+            "p99": p99,
+            "max": round(self.max, 3),
+        }
+
+
+class CrawlMetrics:
+    """
+    Показатели парсинга: гистограммы по методам паука и временной ряд
+    глубины очередей и объема памяти.
+
+    Выборочное профилирование: при ``profile_rate`` больше нуля доля вызовов
+    методов ``profile_callbacks`` выполняется под ``cProfile``, результаты
+    накапливаются в одном профиле.
+    """
+
+    def __init__(
+        self,
+        profile_rate: float = 0.0,
+        profile_callbacks: Iterable[str] = (),
+    ) -> None:
+        """
+        :param profile_rate: Доля профилируемых вызовов (от 0 до 1).
+        :param profile_callbacks: Названия профилируемых методов паука.
+        """
+
+        self.histograms: Dict[Tuple[str, str], Histogram] = defaultdict(Histogram)
+        self.samples: List[Dict[str, Any]] = []
+        # последняя точка временного ряда сохраняется и после очистки ряда
+        self.last_sample: Optional[Dict[str, Any]] = None
+        self.profile_rate = profile_rate
+        self.profile_callbacks = set(profile_callbacks)
+        self.profiler: Optional[cProfile.Profile] = (
+            cProfile.Profile() if profile_rate > 0 else None
+        )
+        self.profiled = 0
+        self.started_at = time.time()
+
+    def observe(self, callback: str, metric: str, value: float) -> None:
+        """
+        Добавление значения показателя метода паука.
+
+        :param callback: Название метода паука.
+        :param metric: Показатель (``METRICS``).
+        :param value: Значение.
+        :return:
+        """
+
+        self.histograms[(callback, metric)].add(value)
+
+    def sample(self, **values: float) -> None:
+        """
+        Добавление точки временного ряда.
+
+        :param values: Значения (глубина очередей, объем памяти и т.п.).
+        :return:
+        """
+
+        self.last_sample = {"time": round(time.time(), 3), **values}
+        self.samples.append(self.last_sample)
+
+    def snapshot(self, reset_samples: bool = True) -> Dict[str, Any]:
+        """
+        Снимок показателей для сохранения в JSON.
+
+        :param reset_samples: Очистить временной ряд после снимка (в следующий
+            снимок попадут только новые точки).
+        :return:
+        """
+
+        callbacks: Dict[str, Dict[str, Any]] = defaultdict(dict)
+        for (callback, metric), histogram in sorted(self.histograms.items()):
+            callbacks[callback][metric] = histogram.summary()
+        result = {
+            "time": round(time.time(), 3),
+            "elapsed_s": round(time.time() - self.started_at, 3),
+            "callbacks": dict(callbacks),
+            "samples": self.samples,
+            "profiled_calls": self.profiled,
+        }
+        if reset_samples:
+            self.samples = []
+
+        return result
+
+    def prometheus(self, prefix: str = "vacancies") -> str:
+        """
+        Показатели в текстовом формате Prometheus.
+
+        Гистограммы выводятся как ``summary`` (квантили, сумма и количество),
+        последняя точка временного ряда – как ``gauge``.
+
+        :param prefix: Префикс названий показателей.
+        :return:
+        """
+
+        lines = []
+        for metric, description in METRICS.items():
+            name = f"{prefix}_callback_{metric}"
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} summary")
+            for (callback, key), histogram in sorted(self.histograms.items()):
+                if key != metric:
+                    continue
+                labels = f'callback="{callback}"'
+                for level, value in zip(LEVELS, histogram.quantiles(LEVELS)):
+                    lines.append(f'{name}{{{labels},quantile="{level}"}} {value}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.total}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+        if self.last_sample is not None:
+            for key, value in self.last_sample.items():
+                if key == "time":
+                    continue
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.append(f"{prefix}_{key} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def profiling(self, callback: str, draw: float) -> bool:
+        """
+        Проверка, что вызов метода паука нужно профилировать.
+
+        :param callback: Название метода паука.
+        :param draw: Случайное число от 0 до 1.
+        :return:
+        """
+
+        return (
+            self.profiler is not None
+            and callback in self.profile_callbacks
+            and draw < self.profile_rate
+        )
+
+    def dump_profile(self, path: str) -> None:
+        """
+        Сохранение накопленного профиля в файл ``pstats``.
+
+        :param path: Путь к файлу.
+        :return:
+        """
+
+        if self.profiler is None or not self.profiled:
+            return
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.profiler.dump_stats(f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
@@ -2,11 +2,26 @@
 #
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-from typing import Generator, Iterable
+import random
+import time
+from typing import Dict, Generator, Iterable, Optional, Set, Tuple, Union
+from urllib.parse import urlparse
 
 from scrapy import Request, Spider, signals
 from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
 from scrapy.http import Response
+from scrapy.statscollectors import StatsCollector
+from scrapy.utils.project import data_path
+from twisted.internet import reactor, task
+from twisted.internet.defer import Deferred
+
+from vacancies.vacancies.archive import ResponseArchive
+from vacancies.vacancies.extensions import MetricsExtension, callback_name
+from vacancies.vacancies.frontier import CrawlState
+from vacancies.vacancies.metrics import ITEMS_EMITTED, PARSE_CPU
+from vacancies.vacancies.ratelimit import TokenBucket, parse_retry_after
+from vacancies.vacancies.signals import item_stored
 
 
 class VacanciesSpiderMiddleware:
@@ -116,3 +131,366 @@ class VacanciesDownloaderMiddleware:
 
     def spider_opened(self, spider: Spider) -> None:
         spider.logger.info(f"Spider opened: {spider.name}")
+
+
+class CrawlStateMiddleware:
+    """
+    Сохранение состояния парсинга для продолжения после остановки.
+
+    Каждый запрос, сформированный пауком, записывается как запланированный,
+    а после полной обработки ответа отмечается как обработанный. Если при запуске
+    в хранилище есть необработанные запросы, парсинг продолжается с них
+    вместо стартовых запросов. После успешного завершения состояние очищается.
+
+    Ответ считается обработанным, когда записаны все порожденные им запросы
+    и сохранены все его вакансии: запись вакансии подтверждается сигналом
+    ``item_stored`` (см. ``MongoDBPipeline``) или отбрасыванием элемента.
+    Если при сохранении вакансии произошла ошибка, запрос остается
+    необработанным и будет выполнен повторно при продолжении парсинга.
+    Элемент должен проходить через конвейер без замены другим объектом.
+    """
+
+    def __init__(
+        self, state: CrawlState, stats: StatsCollector, log_interval: float = 60.0
+    ) -> None:
+        self.state = state
+        self.stats = stats
+        self.log_interval = log_interval
+        self._timer: Optional[task.LoopingCall] = None
+        # запрос (ссылка и регион) – количество ожидаемых подтверждений
+        self._waiting: Dict[Tuple[str, Optional[str]], int] = {}
+        # идентификатор элемента – элемент и его запрос
+        self._items: Dict[int, Tuple[dict, Tuple[str, Optional[str]]]] = {}
+        # запросы, вакансии которых не удалось сохранить
+        self._failed: Set[Tuple[str, Optional[str]]] = set()
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "CrawlStateMiddleware":
+        settings = crawler.settings
+        if not settings.getbool("CRAWL_STATE_ENABLED"):
+            raise NotConfigured
+
+        state = CrawlState(
+            data_path(settings.get("CRAWL_STATE_FILE", "crawl_state.sqlite")),
+            buffer_size=settings.getint("CRAWL_STATE_BUFFER_SIZE", 1000),
+            commit_interval=settings.getfloat("CRAWL_STATE_COMMIT_INTERVAL", 5.0),
+        )
+        middleware = cls(
+            state,
+            stats=crawler.stats,
+            log_interval=settings.getfloat("CRAWL_STATE_LOG_INTERVAL", 60.0),
+        )
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(middleware.item_stored, signal=item_stored)
+        crawler.signals.connect(middleware.item_stored, signal=signals.item_dropped)
+        crawler.signals.connect(middleware.item_error, signal=signals.item_error)
+
+        return middleware
+
+    def process_start_requests(
+        self, start_requests: Iterable, spider: Spider
+    ) -> Generator:
+        pending = list(self.state.pending())
+        if pending:
+            spider.logger.info(f"Resuming crawl: {len(pending)} pending requests.")
+            self.stats.set_value("crawl_state/resumed", len(pending), spider=spider)
+            priorities = getattr(spider, "request_priorities", {})
+            for url, callback, area, cb_kwargs in pending:
+                yield Request(
+                    url,
+                    callback=getattr(spider, callback),
+                    cb_kwargs=cb_kwargs,
+                    meta={"crawl_area": area},
+                    priority=priorities.get(callback, 0),
+                    dont_filter=True,
+                )
+            return
+
+        for request in start_requests:
+            self._schedule(request, None)
+            yield request
+
+    def process_spider_output(
+        self, response: Response, result: Iterable, spider: Spider
+    ) -> Generator:
+        area = response.meta.get("crawl_area")
+        key = (response.request.url, area)
+        # обработка ответа – первое из ожидаемых подтверждений
+        self._waiting[key] = 1
+        for entry in result:
+            if isinstance(entry, Request):
+                self._schedule(entry, area)
+            elif isinstance(entry, dict):
+                self._waiting[key] += 1
+                self._items[id(entry)] = (entry, key)
+            yield entry
+
+        # все порожденные запросы записаны
+        self._acknowledge(key)
+
+    def item_stored(self, item: dict, spider: Spider) -> None:
+        _, key = self._items.pop(id(item), (None, None))
+        if key is not None:
+            self._acknowledge(key)
+
+    def item_error(self, item: dict, spider: Spider) -> None:
+        _, key = self._items.pop(id(item), (None, None))
+        if key is not None:
+            self._failed.add(key)
+            self._acknowledge(key)
+
+    def _acknowledge(self, key: Tuple[str, Optional[str]]) -> None:
+        """
+        Учет подтверждения: после последнего запрос отмечается как обработанный.
+
+        :param key: Ссылка и регион запроса.
+        :return:
+        """
+
+        self._waiting[key] -= 1
+        if self._waiting[key] > 0:
+            return None
+
+        del self._waiting[key]
+        if key in self._failed:
+            self._failed.discard(key)
+        else:
+            self.state.complete(*key)
+
+        return None
+
+    def _schedule(self, request: Request, area: Optional[str]) -> None:
+        area = request.cb_kwargs.get("query", {}).get("area") or area
+        request.meta["crawl_area"] = area
+        self.state.schedule(
+            request.url,
+            callback=getattr(request.callback, "__name__", "parse"),
+            area=area,
+            cb_kwargs=request.cb_kwargs,
+        )
+
+    def log_progress(self, spider: Spider) -> None:
+        progress = self.state.progress()
+        areas_done = sum(1 for done, total in progress.values() if done == total)
+        requests_done = sum(done for done, _ in progress.values())
+        requests_total = sum(total for _, total in progress.values())
+
+        self.stats.set_value("crawl_state/areas_done", areas_done, spider=spider)
+        self.stats.set_value("crawl_state/areas_total", len(progress), spider=spider)
+        spider.logger.info(
+            f"Crawl progress: areas {areas_done}/{len(progress)}, "
+            f"requests {requests_done}/{requests_total}."
+        )
+        for area, (done, total) in sorted(progress.items()):
+            spider.logger.debug(f"Area {area}: {done}/{total} requests processed.")
+
+    def spider_opened(self, spider: Spider) -> None:
+        if self.log_interval > 0:
+            self._timer = task.LoopingCall(self.log_progress, spider)
+            self._timer.start(self.log_interval, now=False)
+
+    def spider_closed(self, spider: Spider, reason: str) -> None:
+        if self._timer is not None and self._timer.running:
+            self._timer.stop()
+
+        self.log_progress(spider)
+        if reason == "finished":
+            self.state.clear()
+        self.state.close()
+
+
+class ResponseArchiveMiddleware:
+    """
+    Сохранение исходных ответов api.hh.ru в архив для повторной обработки без сети.
+    """
+
+    def __init__(self, archive: ResponseArchive) -> None:
+        self.archive = archive
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "ResponseArchiveMiddleware":
+        settings = crawler.settings
+        if not settings.getbool("ARCHIVE_ENABLED"):
+            raise NotConfigured
+
+        archive = ResponseArchive(
+            data_path(settings.get("ARCHIVE_DIR", "archive")),
+            segment_size=settings.getint("ARCHIVE_SEGMENT_SIZE", 256 * 1024 * 1024),
+        )
+        middleware = cls(archive)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+
+        return middleware
+
+    def process_spider_input(self, response: Response, spider: Spider) -> None:
+        if response.status != 200:
+            return None
+
+        self.archive.write(
+            {
+                "url": response.url,
+                "fetched_at": time.time(),
+                "callback": getattr(response.request.callback, "__name__", "parse"),
+                "cb_kwargs": response.request.cb_kwargs,
+                "body": response.body.decode("utf-8"),
+            }
+        )
+
+        return None
+
+    def spider_closed(self, spider: Spider) -> None:
+        self.archive.close()
+
+
+class MetricsMiddleware:
+    """
+    Процессорное время методов паука и количество полученных элементов
+    для ``MetricsExtension``.
+
+    Промежуточный слой должен быть ближайшим к пауку: время измеряется
+    на каждом шаге генератора метода, поэтому в него не попадает обработка
+    результатов другими промежуточными слоями. При включенном выборочном
+    профилировании шаги отобранных вызовов выполняются под ``cProfile``.
+    """
+
+    def __init__(self, extension: MetricsExtension) -> None:
+        self.extension = extension
+        self.metrics = extension.metrics
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "MetricsMiddleware":
+        for extension in crawler.extensions.middlewares:
+            if isinstance(extension, MetricsExtension):
+                return cls(extension)
+
+        raise NotConfigured
+
+    def process_spider_output(
+        self, response: Response, result: Iterable, spider: Spider
+    ) -> Generator:
+        callback = callback_name(response.request)
+        profiler = (
+            self.metrics.profiler
+            if self.metrics.profiling(callback, random.random())
+            else None
+        )
+        cpu_time = 0.0
+        items = 0
+        entries = iter(result)
+        while True:
+            started_at = time.thread_time()
+            if profiler is not None:
+                profiler.enable()
+            try:
+                entry = next(entries)
+            except StopIteration:
+                break
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                cpu_time += time.thread_time() - started_at
+
+            if not isinstance(entry, Request):
+                items += 1
+                self.extension.item_emitted(entry, callback)
+            yield entry
+
+        self.metrics.observe(callback, PARSE_CPU, cpu_time * 1000)
+        self.metrics.observe(callback, ITEMS_EMITTED, items)
+        if profiler is not None:
+            self.metrics.profiled += 1
+
+
+class RateLimitMiddleware:
+    """
+    Ограничение частоты запросов к api.hh.ru.
+
+    Для каждой пары "хост" – "токен API" (заголовок ``Authorization``) ведется
+    отдельная корзина токенов. Ответы с кодами ``RATELIMIT_HTTP_CODES``
+    или требованием капчи замедляют корзину с учетом ``Retry-After`` и повторяются,
+    успешные ответы постепенно возвращают скорость к ``RATELIMIT_RATE``.
+    """
+
+    def __init__(self, crawler: Crawler) -> None:
+        settings = crawler.settings
+        self.stats = crawler.stats
+        self.http_codes = set(settings.getlist("RATELIMIT_HTTP_CODES", [429, 403]))
+        self.max_retries = settings.getint("RATELIMIT_MAX_RETRIES", 5)
+        self.bucket_options = {
+            "max_rate": settings.getfloat("RATELIMIT_RATE", 4.0),
+            "burst": settings.getfloat("RATELIMIT_BURST", 4.0),
+            "min_rate": settings.getfloat("RATELIMIT_MIN_RATE", 0.2),
+            "backoff_factor": settings.getfloat("RATELIMIT_BACKOFF_FACTOR", 0.5),
+            "backoff_delay": settings.getfloat("RATELIMIT_BACKOFF_DELAY", 5.0),
+            "max_backoff_delay": settings.getfloat(
+                "RATELIMIT_MAX_BACKOFF_DELAY", 300.0
+            ),
+            "recovery_step": settings.getfloat("RATELIMIT_RECOVERY_STEP", 0.25),
+            "recovery_window": settings.getint("RATELIMIT_RECOVERY_WINDOW", 5),
+        }
+        self.buckets: Dict[Tuple[str, str], TokenBucket] = {}
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "RateLimitMiddleware":
+        if not crawler.settings.getbool("RATELIMIT_ENABLED"):
+            raise NotConfigured
+
+        return cls(crawler)
+
+    def _bucket(self, request: Request) -> Tuple[str, TokenBucket]:
+        host = urlparse(request.url).netloc
+        token = request.headers.get("Authorization", b"").decode("latin-1")
+        key = (host, token)
+        if key not in self.buckets:
+            self.buckets[key] = TokenBucket(**self.bucket_options)
+
+        return host, self.buckets[key]
+
+    def process_request(self, request: Request, spider: Spider) -> Optional[Deferred]:
+        _, bucket = self._bucket(request)
+        delay = bucket.reserve()
+        if delay <= 0:
+            return None
+
+        self.stats.inc_value("ratelimit/delayed", spider=spider)
+        self.stats.inc_value(
+            "ratelimit/delay_total_ms", int(delay * 1000), spider=spider
+        )
+
+        return task.deferLater(reactor, delay, lambda: None)  # type: ignore[arg-type]
+
+    def process_response(
+        self, request: Request, response: Response, spider: Spider
+    ) -> Union[Request, Response]:
+        host, bucket = self._bucket(request)
+        # требование капчи приходит в теле ответа с ошибкой
+        captcha = response.status >= 400 and b"captcha" in response.body
+        if response.status not in self.http_codes and not captcha:
+            bucket.success()
+            self.stats.set_value(
+                f"ratelimit/rate/{host}", round(bucket.rate, 3), spider=spider
+            )
+            return response
+
+        delay = bucket.backoff(parse_retry_after(response.headers.get("Retry-After")))
+        self.stats.inc_value("ratelimit/backoffs", spider=spider)
+        self.stats.inc_value(f"ratelimit/backoffs/{response.status}", spider=spider)
+        self.stats.set_value(
+            f"ratelimit/rate/{host}", round(bucket.rate, 3), spider=spider
+        )
+        spider.logger.warning(
+            f"Rate limited by {host} ({response.status}): "
+            f"pause {delay:.1f}s, rate {bucket.rate:.2f} req/s."
+        )
+
+        retries = request.meta.get("ratelimit_retries", 0)
+        if retries >= self.max_retries:
+            self.stats.inc_value("ratelimit/gave_up", spider=spider)
+            return response
+
+        self.stats.inc_value("ratelimit/retries", spider=spider)
+        retry = request.replace(dont_filter=True)
+        retry.meta["ratelimit_retries"] = retries + 1
+
+        return retry
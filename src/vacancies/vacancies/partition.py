@@ -0,0 +1,246 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from vacancies.vacancies.incremental import DATETIME_FORMAT
+
+# максимальное количество результатов, доступных по одному поисковому запросу
+SEARCH_LIMIT = 2000
+# период, за который api.hh.ru выполняет поиск вакансий
+SEARCH_PERIOD = timedelta(days=30)
+# количество вакансий на странице результатов
+PER_PAGE = 100
+
+Query = Dict[str, str]
+
+
+def query_url(query: Query, page: int = 0, api_url: str = "https://api.hh.ru") -> str:
+    """
+    Формирование ссылки на страницу результатов поискового запроса.
+
+    :param query: Параметры поискового запроса.
+    :param page: Номер страницы (начиная с нуля).
+    :param api_url: Адрес API.
+    :return:
+    """
+
+    params = dict(query, per_page=str(PER_PAGE))
+    if page:
+        params["page"] = str(page)
+
+    return f"{api_url}/vacancies?{urlencode(params)}"
+
+
+def _format(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime(DATETIME_FORMAT)
+
+
+def _parse(value: str) -> datetime:
+    try:
+        return datetime.strptime(value, DATETIME_FORMAT)
+    except ValueError:
+        return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+
+
+class QueryPartitioner:
+    """
+    Разбиение поисковых запросов на запросы, результаты которых укладываются
+    в ограничение api.hh.ru в 2000 вакансий.
+
+    Запрос, по которому найдено больше вакансий, делится пополам по интервалу даты
+    публикации (``date_from``/``date_to``), а после достижения минимального интервала –
+    по профессиональным ролям. Размер интервала, при котором результаты регионов
+    уложились в ограничение, и интервалы, которые пришлось разбить по ролям,
+    сохраняются в файл, чтобы при следующем запуске сразу формировать запросы
+    нужного размера.
+    """
+
+    def __init__(
+        self,
+        cache_path: Optional[str] = None,
+        min_window: timedelta = timedelta(hours=1),
+    ) -> None:
+        """
+        :param cache_path: Путь к файлу с сохраненными разбиениями.
+        :param min_window: Минимальный интервал даты публикации.
+        """
+
+        self.cache_path = cache_path
+        self.min_window = min_window
+        self.roles: List[str] = []
+        # регион – размер интервала (в секундах)
+        self.splits: Dict[str, Dict[str, int]] = {}
+        # регион – интервалы даты публикации, разбитые по профессиональным ролям
+        self.role_windows: Dict[str, List[List[str]]] = {}
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, encoding="utf-8") as file:
+                cache = json.load(file)
+            self.splits = cache.get("splits", {})
+            self.roles = cache.get("roles", [])
+            self.role_windows = cache.get("role_windows", {})
+
+    def save(self) -> None:
+        """
+        Сохранение разбиений и списка профессиональных ролей в файл.
+
+        :return:
+        """
+
+        if not self.cache_path:
+            return None
+
+        # файл может сохраняться одновременно несколькими процессами парсинга
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        temp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "splits": self.splits,
+                    "roles": self.roles,
+                    "role_windows": self.role_windows,
+                },
+                file,
+            )
+        os.replace(temp_path, self.cache_path)
+
+        return None
+
+    def initial(
+        self,
+        area_id: str,
+        date_from: Optional[str] = None,
+        now: Optional[datetime] = None,
+    ) -> List[Query]:
+        """
+        Формирование начальных запросов для региона с учетом сохраненных разбиений.
+
+        :param area_id: Идентификатор региона.
+        :param date_from: Нижняя граница даты публикации.
+        :param now: Текущее время.
+        :return:
+        """
+
+        query: Query = {"area": area_id}
+        if date_from:
+            query["date_from"] = date_from
+
+        split = self.splits.get(area_id)
+        if not split:
+            return [query]
+
+        queries: List[Query] = []
+        overflowed = self._role_windows(area_id, now)
+        for window in self._windows(query, timedelta(seconds=split["window"]), now):
+            start, end = self._bounds(window)
+            if self.roles and any(
+                start < upper and lower < end for lower, upper in overflowed
+            ):
+                # по ролям разбиваются только интервалы, не уложившиеся в ограничение
+                queries.extend(
+                    dict(window, professional_role=role) for role in self.roles
+                )
+            else:
+                queries.append(window)
+
+        return queries
+
+    def split(self, query: Query, now: Optional[datetime] = None) -> List[Query]:
+        """
+        Разбиение запроса, результаты которого не укладываются в ограничение.
+
+        :param query: Параметры поискового запроса.
+        :param now: Текущее время.
+        :return: Запросы, объединение результатов которых равно результатам исходного,
+            или пустой список, если запрос разбить нельзя.
+        """
+
+        date_from, date_to = self._bounds(query, now)
+        if date_to - date_from > self.min_window:
+            middle = date_from + (date_to - date_from) / 2
+            return [
+                dict(query, date_from=_format(date_from), date_to=_format(middle)),
+                dict(query, date_from=_format(middle), date_to=_format(date_to)),
+            ]
+
+        if "professional_role" not in query and self.roles:
+            return [dict(query, professional_role=role) for role in self.roles]
+
+        return []
+
+    def learn(self, query: Query) -> None:
+        """
+        Запоминание размера интервала запроса, результаты которого уложились в ограничение.
+
+        :param query: Параметры поискового запроса.
+        :return:
+        """
+
+        if "date_to" not in query:
+            return None
+
+        date_from, date_to = self._bounds(query)
+        window = int((date_to - date_from).total_seconds())
+        split = self.splits.setdefault(query["area"], {"window": window})
+        split["window"] = min(split["window"], window)
+        if "professional_role" in query:
+            bounds = [query["date_from"], query["date_to"]]
+            windows = self.role_windows.setdefault(query["area"], [])
+            if bounds not in windows:
+                windows.append(bounds)
+
+        return None
+
+    def _role_windows(
+        self, area_id: str, now: Optional[datetime] = None
+    ) -> List[Tuple[datetime, datetime]]:
+        """
+        Интервалы региона, разбитые по ролям, в пределах периода поиска.
+
+        Интервалы, вышедшие за период поиска, удаляются.
+
+        :param area_id: Идентификатор региона.
+        :param now: Текущее время.
+        :return:
+        """
+
+        start = (now or datetime.now(timezone.utc)) - SEARCH_PERIOD
+        windows = [
+            (_parse(lower), _parse(upper))
+            for lower, upper in self.role_windows.get(area_id, [])
+        ]
+        windows = [(lower, upper) for lower, upper in windows if upper > start]
+        if area_id in self.role_windows:
+            self.role_windows[area_id] = [
+                [_format(lower), _format(upper)] for lower, upper in windows
+            ]
+
+        return windows
+
+    def _bounds(
+        self, query: Query, now: Optional[datetime] = None
+    ) -> Tuple[datetime, datetime]:
+        date_to = _parse(query["date_to"]) if "date_to" in query else None
+        date_to = date_to or now or datetime.now(timezone.utc)
+        if "date_from" in query:
+            date_from = _parse(query["date_from"])
+        else:
+            date_from = date_to - SEARCH_PERIOD
+
+        return date_from, date_to
+
+    def _windows(
+        self, query: Query, window: timedelta, now: Optional[datetime] = None
+    ) -> List[Query]:
+        date_from, date_to = self._bounds(query, now)
+        window = max(window, self.min_window)
+        queries = []
+        while date_from < date_to:
+            upper = min(date_from + window, date_to)
+            queries.append(
+                dict(query, date_from=_format(date_from), date_to=_format(upper))
+            )
+            date_from = upper
+
+        return queries
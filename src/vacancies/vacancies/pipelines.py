@@ -2,52 +2,1149 @@
 #
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
+import multiprocessing
 import os
 import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 import pymongo
+from pymongo import InsertOne, ReplaceOne, UpdateOne
 from pymongo.database import Database
-from scrapy import Item, Spider
+from scrapy import Spider
 from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+from scrapy.signalmanager import SignalManager
+from scrapy.statscollectors import StatsCollector
+from scrapy.utils.project import data_path
+from twisted.internet import reactor, threads
+from twisted.internet.defer import Deferred, DeferredList, succeed
 
-from vacancies.vacancies.items import VacancyItem
+from vacancies.vacancies.aggregates import AGGREGATED_FIELDS, AggregatesBuffer
+from vacancies.vacancies.changes import (
+    FIELD_HASHES_FIELD,
+    HASH_FIELD,
+    ContentHashes,
+    api_field_hashes,
+    content_hash,
+    diff,
+)
+from vacancies.vacancies.duplicates import DuplicateIndex, MinHash, shingles
+from vacancies.vacancies.history import SERVICE_FIELDS, changed_entry, created_entry
+from vacancies.vacancies.items import DERIVED_FIELDS
+from vacancies.vacancies.references import ReferenceCache
+from vacancies.vacancies.salary import normalize
+from vacancies.vacancies.schema import (
+    AGGREGATES_INDEXES,
+    HISTORY_INDEXES,
+    VACANCIES_INDEXES,
+    IndexSpec,
+    check_indexes,
+)
+from vacancies.vacancies.search import SearchIndex
+from vacancies.vacancies.signals import (
+    clusters_relabeled,
+    item_stored,
+    items_flush_requested,
+    vacancies_listed,
+)
+from vacancies.vacancies.storage import BulkWriter
+from vacancies.vacancies.text import (
+    TextCache,
+    cached_process,
+    content_key,
+    html_to_text,
+    words,
+)
+
+# максимальное количество хэшей вакансий, прочитанных заранее и еще не обработанных
+PREFETCH_BUFFER_SIZE = 10000
+
+
+class SalaryPipeline:
+    """
+    Приведение зарплаты вакансии к рублям "на руки" за месяц.
+
+    В элемент добавляется поле ``salary_rub`` с границами вилки ``from`` и ``to``
+    (см. ``normalize``). Курс валюты берется из истории курсов справочника
+    ``/dictionaries`` на дату публикации вакансии.
+    """
+
+    def __init__(self, references_dir: str) -> None:
+        self.references_dir = references_dir
+        self.references: ReferenceCache
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "SalaryPipeline":
+        if not crawler.settings.getbool("SALARY_ENABLED", True):
+            raise NotConfigured
+
+        return cls(data_path(crawler.settings.get("REFERENCES_DIR", "references")))
+
+    def open_spider(self, spider: Spider) -> None:
+        # справочники паука обновляются при парсинге, вместе с ними – курсы валют
+        references = getattr(spider, "references", None)
+        self.references = (
+            references
+            if isinstance(references, ReferenceCache)
+            else ReferenceCache(self.references_dir)
+        )
+
+    def process_item(self, item: dict, spider: Spider) -> dict:
+        rates = self.references.currency_rates().at(item.get("published_at") or "")
+        item["salary_rub"] = normalize(item.get("salary"), rates)
+
+        return item
+
+
+class TextPipeline:
+    """
+    Получение текста и токенов из HTML-описания вакансии.
+
+    В элемент добавляются поля ``description_text`` (текст без разметки)
+    и ``description_tokens`` (леммы без стоп-слов). Описания обрабатываются
+    в пуле процессов (``TEXT_WORKERS``, 0 – в пуле потоков реактора), поэтому
+    поток реактора не блокируется. Результаты сохраняются в кэш по хэшу
+    описания, и неизмененное описание повторно не обрабатывается: кэш
+    проверяется в том же пуле перед обработкой, а сохраняется в пуле потоков.
+    """
+
+    def __init__(
+        self, stats: StatsCollector, cache_path: str, workers: int = 2
+    ) -> None:
+        self.stats = stats
+        self.cache_path = cache_path
+        self.workers = workers
+
+        self.cache: TextCache
+        self.executor: Optional[ProcessPoolExecutor] = None
+        # фиксации буфера кэша выполняются последовательно
+        self._committed: Deferred = succeed(None)
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "TextPipeline":
+        if not crawler.settings.getbool("TEXT_ENABLED", True):
+            raise NotConfigured
+
+        return cls(
+            stats=crawler.stats,
+            cache_path=data_path(
+                crawler.settings.get("TEXT_CACHE_FILE", "text_cache.sqlite")
+            ),
+            workers=crawler.settings.getint("TEXT_WORKERS", 2),
+        )
+
+    def open_spider(self, spider: Spider) -> None:
+        self.cache = TextCache(self.cache_path)
+        if self.workers > 0:
+            # новые процессы не наследуют потоки и состояние реактора
+            self.executor = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+
+    def close_spider(self, spider: Spider) -> Deferred:
+        if self.executor is not None:
+            self.executor.shutdown()
+        self._in_thread(self.cache.close, spider)
+
+        return self._committed
+
+    def process_item(self, item: dict, spider: Spider) -> Union[dict, Deferred]:
+        description = item.get("description")
+        if not description:
+            item["description_text"], item["description_tokens"] = None, None
+            return item
+
+        key = content_key(description)
+        cached = self.cache.buffered(key)
+        if cached is not None:
+            self.stats.inc_value("text/cached", spider=spider)
+            item["description_text"], item["description_tokens"] = cached
+            return item
+
+        processed = self._submit(key, description)
+        processed.addCallback(self._processed, item, key, spider)
+
+        return processed
+
+    def _submit(self, key: bytes, description: str) -> Deferred:
+        """
+        Поиск в кэше и обработка описания в пуле.
+
+        :param key: Ключ описания.
+        :param description: HTML-описание вакансии.
+        :return: ``Deferred`` с текстом, токенами и признаком получения из кэша.
+        """
+
+        if self.executor is None:
+            return threads.deferToThread(  # type: ignore[no-untyped-call]
+                cached_process, self.cache_path, key, description
+            )
+
+        deferred: Deferred = Deferred()
+
+        def fire(future: Future) -> None:
+            error = future.exception()
+            if error is not None:
+                deferred.errback(error)
+            else:
+                deferred.callback(future.result())
+
+        self.executor.submit(
+            cached_process, self.cache_path, key, description
+        ).add_done_callback(
+            lambda future: reactor.callFromThread(  # type: ignore[attr-defined]
+                fire, future
+            )
+        )
+
+        return deferred
+
+    def _processed(
+        self,
+        result: Tuple[str, List[str], bool],
+        item: dict,
+        key: bytes,
+        spider: Spider,
+    ) -> dict:
+        text, tokens, cached = result
+        if cached:
+            self.stats.inc_value("text/cached", spider=spider)
+        else:
+            self.stats.inc_value("text/processed", spider=spider)
+            if self.cache.put(key, text, tokens):
+                self._in_thread(self.cache.commit, spider)
+        item["description_text"], item["description_tokens"] = text, tokens
+
+        return item
+
+    def _in_thread(self, function: Callable[[], None], spider: Spider) -> None:
+        """
+        Фиксация (закрытие) кэша в пуле потоков после предыдущих фиксаций.
+
+        :param function: Метод кэша.
+        :param spider: Паук.
+        :return:
+        """
+
+        def failed(failure: Any) -> None:
+            spider.logger.error(
+                f"Text cache commit failed: {failure.getErrorMessage()}"
+            )
+
+        self._committed.addCallback(
+            lambda _: threads.deferToThread(function)  # type: ignore[no-untyped-call]
+        )
+        self._committed.addErrback(failed)
+
+
+class DuplicatesPipeline:
+    """
+    Поиск почти одинаковых вакансий (MinHash LSH).
+
+    По шинглам токенов описания (``description_tokens``, без них – слов текста
+    описания) вычисляется сигнатура MinHash, которая добавляется в индекс
+    ``DuplicateIndex``. В элемент записывается идентификатор кластера дубликатов
+    ``duplicate_cluster``: у уникальной вакансии – ее собственный идентификатор,
+    у дубликата – идентификатор первой вакансии кластера. О переименованных
+    кластерах других вакансий сообщается сигналом ``clusters_relabeled``.
+
+    Сигнатура вычисляется и индекс обновляется в пуле потоков реактора.
+    """
+
+    def __init__(
+        self,
+        stats: StatsCollector,
+        path: str,
+        threshold: float = 0.8,
+        buffer_size: int = 500,
+        signals: Optional[SignalManager] = None,
+    ) -> None:
+        self.stats = stats
+        self.path = path
+        self.threshold = threshold
+        self.buffer_size = buffer_size
+        self.signals = signals
+
+        self.minhash = MinHash()
+        self.index: DuplicateIndex
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "DuplicatesPipeline":
+        if not crawler.settings.getbool("DUPLICATES_ENABLED", True):
+            raise NotConfigured
+
+        return cls(
+            stats=crawler.stats,
+            path=data_path(
+                crawler.settings.get("DUPLICATES_FILE", "duplicates.sqlite")
+            ),
+            threshold=crawler.settings.getfloat("DUPLICATES_THRESHOLD", 0.8),
+            buffer_size=crawler.settings.getint("DUPLICATES_BUFFER_SIZE", 500),
+            signals=crawler.signals,
+        )
+
+    def open_spider(self, spider: Spider) -> None:
+        self.index = DuplicateIndex(
+            self.path, threshold=self.threshold, buffer_size=self.buffer_size
+        )
+
+    def close_spider(self, spider: Spider) -> Deferred:
+        return threads.deferToThread(self.index.close)  # type: ignore[no-untyped-call]
+
+    def process_item(self, item: dict, spider: Spider) -> Union[dict, Deferred]:
+        tokens = item.get("description_tokens")
+        if tokens is None:
+            tokens = words(html_to_text(item.get("description") or ""))
+        hashes = shingles(tokens)
+        if not hashes:
+            item["duplicate_cluster"] = None
+            return item
+
+        added: Deferred = threads.deferToThread(  # type: ignore[no-untyped-call]
+            self._add, item["id"], hashes
+        )
+        added.addCallback(self._added, item, spider)
+
+        return added
+
+    def _add(self, vacancy_id: str, hashes: List[int]) -> Tuple[str, Dict[str, str]]:
+        """
+        Добавление вакансии в индекс (выполняется вне потока реактора).
+
+        :param vacancy_id: Идентификатор вакансии.
+        :param hashes: Хэши шинглов описания.
+        :return: Кластер вакансии и переименованные кластеры других вакансий.
+        """
+
+        return self.index.add(vacancy_id, self.minhash.signature(hashes))
+
+    def _added(
+        self, result: Tuple[str, Dict[str, str]], item: dict, spider: Spider
+    ) -> Union[dict, Deferred]:
+        cluster, relabeled = result
+        if cluster != item["id"]:
+            self.stats.inc_value("duplicates/found", spider=spider)
+        item["duplicate_cluster"] = cluster
+        if relabeled:
+            self.stats.inc_value("duplicates/relabeled", len(relabeled), spider=spider)
+            if self.signals is not None:
+                # элемент ожидает передачи новых кластеров на запись
+                sent = self.signals.send_catch_log_deferred(
+                    clusters_relabeled, clusters=relabeled, spider=spider
+                )
+                sent.addCallback(lambda _: item)
+                return sent
+
+        return item
 
 
 class MongoDBPipeline:
     """
     Сохранение информации в базе данных MongoDB.
+
+    При включенной настройке ``MONGODB_SKIP_UNCHANGED`` в документе сохраняются
+    хэш содержимого и хэши полей. Неизмененные вакансии не записываются,
+    у измененных записываются только измененные поля (``$set``/``$unset``),
+    новые сохраняются целиком. Хэшируются только данные API, без полей,
+    добавленных при обработке (``DERIVED_FIELDS``): они перезаписываются вместе
+    с изменившейся вакансией. Хэши недавних вакансий хранятся в кэше
+    ``ContentHashes``, при промахе хэши читаются из сохраненных документов
+    одним запросом на страницу результатов поиска (сигнал ``vacancies_listed``).
+
+    Если задана коллекция истории (``MONGODB_HISTORY_COLLECTION``), при каждом
+    изменении в нее записываются предыдущие значения изменившихся полей
+    (см. ``VacancyHistory``). Запись истории выполняется первой, а операция записи
+    вакансии передается в буфер только после ее подтверждения. Поэтому при ошибке
+    записи истории вакансия не обновляется (и будет записана при следующем
+    парсинге), а при ошибке записи вакансии в истории остается запись
+    с неизменившимися значениями, которая не влияет на восстановление версий.
+
+    Если задана коллекция агрегатов (``MONGODB_AGGREGATES_COLLECTION``),
+    новые вакансии и изменения навыков, зарплаты, региона и профессиональных
+    ролей учитываются в агрегатах (см. ``Aggregates``): вклад предыдущей
+    версии вычитается, вклад новой прибавляется. Изменения агрегатов учитываются
+    только после подтверждения записи вакансии и записываются пакетами, поэтому
+    при аварийном завершении теряются изменения последнего пакета; после сбоя
+    агрегаты пересчитываются командой ``scrapy aggregates --rebuild``.
+
+    Пока запись вакансии не подтверждена, следующая версия той же вакансии
+    ожидает ее: иначе чтение сохраненной версии не увидит записи в буфере,
+    и вакансия будет повторно учтена как новая.
+
+    Когда MongoDB подтверждает запись вакансии (или запись не нужна, так как
+    вакансия не изменилась), отправляется сигнал ``item_stored``: по нему
+    ``CrawlStateMiddleware`` отмечает запрос вакансии обработанным.
     """
 
     # название коллекции в БД MongoDB
     collection = "vacancies"
 
-    def __init__(self, mongodb_uri: str, mongodb_db: str) -> None:
+    def __init__(
+        self,
+        mongodb_uri: str,
+        mongodb_db: str,
+        stats: StatsCollector,
+        bulk_size: int = 500,
+        bulk_interval: float = 5.0,
+        bulk_max_pending: int = 2,
+        check_indexes: bool = True,
+        skip_unchanged: bool = True,
+        hash_cache_size: int = 100000,
+        history_collection: Optional[str] = None,
+        aggregates_collection: Optional[str] = None,
+        signals: Optional[SignalManager] = None,
+    ) -> None:
         self.mongodb_uri = os.getenv("MONGODB_URI", mongodb_uri)
         self.mongodb_db = os.getenv("MONGODB_DATABASE", mongodb_db)
         if not self.mongodb_uri:
             sys.exit("You need to provide a Connection String.")
 
+        self.stats = stats
+        self.bulk_size = bulk_size
+        self.bulk_interval = bulk_interval
+        self.bulk_max_pending = bulk_max_pending
+        self.check_indexes = check_indexes
+        self.skip_unchanged = skip_unchanged
+        self.hash_cache_size = hash_cache_size
+        # история изменений определяется по хэшам содержимого
+        self.history_collection = history_collection if skip_unchanged else None
+        self.aggregates_collection = aggregates_collection if skip_unchanged else None
+        self.signals = signals
+
         self.client: pymongo.MongoClient
         self.database: Database
+        self.writer: BulkWriter
+        self.hashes: Optional[ContentHashes] = None
+        self.history_writer: Optional[BulkWriter] = None
+        self.aggregates: Optional[AggregatesBuffer] = None
+        self.aggregates_writer: Optional[BulkWriter] = None
+        self._aggregated_at = time.monotonic()
+        # хэши, прочитанные заранее, и вакансии, ожидающие их чтения
+        self._prefetched: "OrderedDict[str, Optional[Dict[str, Any]]]" = OrderedDict()
+        self._waiting: Dict[str, List[Deferred]] = {}
+        # вакансии с неподтвержденной записью и ожидающие их следующие версии
+        self._writing: Dict[str, List[Deferred]] = {}
 
     @classmethod
     def from_crawler(cls, crawler: Crawler) -> "MongoDBPipeline":
-        return cls(
+        pipeline = cls(
             mongodb_uri=crawler.settings.get("MONGODB_URI"),
             mongodb_db=crawler.settings.get("MONGODB_DATABASE", "items"),
+            stats=crawler.stats,
+            bulk_size=crawler.settings.getint("MONGODB_BULK_SIZE", 500),
+            bulk_interval=crawler.settings.getfloat("MONGODB_BULK_INTERVAL", 5.0),
+            bulk_max_pending=crawler.settings.getint("MONGODB_BULK_MAX_PENDING", 2),
+            check_indexes=crawler.settings.getbool("MONGODB_CHECK_INDEXES", True),
+            skip_unchanged=crawler.settings.getbool("MONGODB_SKIP_UNCHANGED", True),
+            hash_cache_size=crawler.settings.getint("MONGODB_HASH_CACHE_SIZE", 100000),
+            history_collection=crawler.settings.get("MONGODB_HISTORY_COLLECTION")
+            or None,
+            aggregates_collection=crawler.settings.get("MONGODB_AGGREGATES_COLLECTION")
+            or None,
+            signals=crawler.signals,
         )
+        crawler.signals.connect(pipeline.prefetch, signal=vacancies_listed)
+        crawler.signals.connect(pipeline.relabel, signal=clusters_relabeled)
+        crawler.signals.connect(pipeline.flush, signal=items_flush_requested)
+
+        return pipeline
 
     def open_spider(self, spider: Spider) -> None:
         self.client = pymongo.MongoClient(self.mongodb_uri)
         self.database = self.client[self.mongodb_db]
+        if self.check_indexes:
+            self._check_indexes(self.collection, VACANCIES_INDEXES, spider)
+        if self.skip_unchanged:
+            self.hashes = ContentHashes(self.hash_cache_size)
+            self.hashes.warm(self.database[self.collection])
+        self.writer = BulkWriter(
+            self.database[self.collection],
+            stats=self.stats,
+            spider=spider,
+            batch_size=self.bulk_size,
+            flush_interval=self.bulk_interval,
+            max_pending=self.bulk_max_pending,
+        )
+        self.writer.start()
+        if self.history_collection:
+            history = self.database[self.history_collection]
+            if self.check_indexes:
+                self._check_indexes(self.history_collection, HISTORY_INDEXES, spider)
+            self.history_writer = BulkWriter(
+                history,
+                stats=self.stats,
+                spider=spider,
+                batch_size=self.bulk_size,
+                flush_interval=self.bulk_interval,
+                max_pending=self.bulk_max_pending,
+                stats_prefix="mongodb/history",
+            )
+            self.history_writer.start()
+        if self.aggregates_collection:
+            aggregates = self.database[self.aggregates_collection]
+            if self.check_indexes:
+                self._check_indexes(
+                    self.aggregates_collection, AGGREGATES_INDEXES, spider
+                )
+            self.aggregates = AggregatesBuffer()
+            self.aggregates_writer = BulkWriter(
+                aggregates,
+                stats=self.stats,
+                spider=spider,
+                batch_size=self.bulk_size,
+                flush_interval=self.bulk_interval,
+                max_pending=self.bulk_max_pending,
+                stats_prefix="mongodb/aggregates",
+            )
+            self.aggregates_writer.start()
+
+    def _check_indexes(
+        self, collection: str, schema: List[IndexSpec], spider: Spider
+    ) -> None:
+        """
+        Проверка индексов коллекции на соответствие схеме.
+
+        Индексы не создаются: построение индекса на большой коллекции блокирует
+        запуск паука, поэтому расхождения устраняются командой ``scrapy indexes``.
+
+        :param collection: Название коллекции.
+        :param schema: Объявленные индексы.
+        :param spider: Паук.
+        :return:
+        """
+
+        drift = check_indexes(self.database[collection], schema)
+        if drift.missing or drift.mismatched:
+            spider.logger.warning(
+                f"Indexes of the {collection} collection do not match the schema "
+                f"(missing: {len(drift.missing)}, mismatched: {len(drift.mismatched)}), "
+                f'run "scrapy indexes --apply".'
+            )
+
+    def close_spider(self, spider: Spider) -> Deferred:
+        # операции записи вакансий добавляются после подтверждения записи истории,
+        # поэтому буфер вакансий закрывается после буфера истории
+        closed = (
+            self.history_writer.close()
+            if self.history_writer is not None
+            else succeed(None)
+        )
+        closed.addCallback(lambda _: self.writer.close())
+        if self.aggregates_writer is not None:
+            # изменения агрегатов учитываются при подтверждении записи вакансий
+            aggregates_writer = self.aggregates_writer
+            closed.addCallback(lambda _: self._flush_aggregates(force=True))
+            closed.addCallback(lambda _: aggregates_writer.close())
+        closed.addBoth(lambda _: self.client.close())
+
+        return closed
+
+    def flush(self, spider: Spider) -> Deferred:
+        """
+        Запись буферизированных вакансий (сигнал ``items_flush_requested``).
+
+        :param spider: Паук.
+        :return: ``Deferred``, срабатывающий после подтверждения записи.
+        """
+
+        # операции записи вакансий добавляются после подтверждения записи истории
+        flushed = (
+            self.history_writer.drain()
+            if self.history_writer is not None
+            else succeed(None)
+        )
+        flushed.addCallback(lambda _: self.writer.drain())
+
+        return flushed
+
+    def process_item(self, item: dict, spider: Spider) -> Union[dict, Deferred]:
+        data = dict(item)
+        if self.hashes is None:
+            return self._write(
+                item, spider, ReplaceOne({"id": data["id"]}, data, upsert=True)
+            )
+
+        vacancy_id = data["id"]
+        if vacancy_id in self._writing:
+            # запись предыдущей версии вакансии еще не подтверждена
+            waiter: Deferred = Deferred()
+            waiter.addCallback(lambda _: self._process(item, data, spider))
+            self._writing[vacancy_id].append(waiter)
+            return waiter
+
+        self._writing[vacancy_id] = []
+
+        return self._process(item, data, spider)
+
+    def _process(
+        self, item: dict, data: Dict[str, Any], spider: Spider
+    ) -> Union[dict, Deferred]:
+        """
+        Сравнение вакансии с сохраненной версией и запись изменений.
+
+        :param item: Обрабатываемый элемент.
+        :param data: Документ вакансии.
+        :param spider: Паук.
+        :return:
+        """
 
-    def close_spider(self, spider: Spider) -> None:
-        self.client.close()
+        assert self.hashes is not None
+        vacancy_id = data["id"]
+        # хэшируются только данные API, без полей, добавленных при обработке
+        hashes = api_field_hashes(data)
+        digest = content_hash(hashes)
+        if self.hashes.get(vacancy_id) == digest:
+            self._prefetched.pop(vacancy_id, None)
+            self._count("skipped", spider)
+            self._release(vacancy_id)
+            self._stored(item, spider)
+            return item
 
-    def process_item(self, item: Item, spider: Spider) -> Item:
-        data = dict(VacancyItem(item))
-        self.database[self.collection].replace_one(
-            {"id": data["id"]}, data, upsert=True
+        stored = self._lookup(vacancy_id)
+        stored.addCallback(self._save, data, hashes, digest, item, spider)
+        stored.addErrback(self._not_written, vacancy_id)
+
+        return stored
+
+    def _release(self, vacancy_id: str) -> None:
+        """
+        Завершение обработки версии вакансии: обработка следующей версии.
+
+        :param vacancy_id: Идентификатор вакансии.
+        :return:
+        """
+
+        waiters = self._writing.pop(vacancy_id, [])
+        if waiters:
+            self._writing[vacancy_id] = waiters[1:]
+            waiters[0].callback(None)
+
+    def _not_written(self, failure: Any, vacancy_id: str) -> Any:
+        self._release(vacancy_id)
+
+        return failure
+
+    def prefetch(self, vacancy_ids: List[str], spider: Spider) -> None:
+        """
+        Чтение хэшей сохраненных версий вакансий страницы одним запросом (``$in``).
+
+        Вызывается по сигналу ``vacancies_listed`` до загрузки детальной
+        информации о вакансиях, поэтому при обработке вакансии хэши, как правило,
+        уже прочитаны, и вакансия не требует отдельного обращения к MongoDB.
+
+        :param vacancy_ids: Идентификаторы вакансий.
+        :param spider: Паук.
+        :return:
+        """
+
+        if self.hashes is None:
+            return None
+
+        batch = [
+            vacancy_id
+            for vacancy_id in dict.fromkeys(vacancy_ids)
+            if vacancy_id not in self._prefetched and vacancy_id not in self._waiting
+        ]
+        if not batch:
+            return None
+
+        for vacancy_id in batch:
+            self._waiting[vacancy_id] = []
+        self.stats.inc_value("mongodb/hashes/prefetched", len(batch), spider=spider)
+        loaded: Deferred = threads.deferToThread(  # type: ignore[no-untyped-call]
+            self._stored_hashes, batch
+        )
+        loaded.addCallbacks(
+            self._prefetched_hashes,
+            self._prefetch_failed,
+            callbackArgs=(batch,),
+            errbackArgs=(batch, spider),
+        )
+
+        return None
+
+    def relabel(self, clusters: Dict[str, str], spider: Spider) -> Optional[Deferred]:
+        """
+        Запись новых кластеров дубликатов вакансий (сигнал ``clusters_relabeled``).
+
+        Кластер дубликатов не входит в хэши содержимого, поэтому хэши
+        не изменяются, а записанный кластер не исправляется при следующем парсинге
+        неизменившейся вакансии. Поэтому кластер вакансии с неподтвержденной
+        записью изменяется только после ее подтверждения: иначе операция записи
+        вакансии может быть выполнена позже (в другом пакете или после записи
+        истории) и вернуть прежний кластер.
+
+        :param clusters: Словарь "идентификатор вакансии" – "кластер".
+        :param spider: Паук.
+        :return: ``Deferred``, если нужно дождаться свободного места.
+        """
+
+        added = [
+            self._relabel(vacancy_id, cluster)
+            for vacancy_id, cluster in clusters.items()
+        ]
+        waiting = [deferred for deferred in added if deferred is not None]
+
+        return DeferredList(waiting) if waiting else None
+
+    def _relabel(self, vacancy_id: str, cluster: str) -> Optional[Deferred]:
+        """
+        Добавление операции изменения кластера вакансии в буфер.
+
+        :param vacancy_id: Идентификатор вакансии.
+        :param cluster: Новый кластер.
+        :return: ``Deferred``, если нужно дождаться свободного места.
+        """
+
+        operation = UpdateOne(
+            {"id": vacancy_id}, {"$set": {"duplicate_cluster": cluster}}
+        )
+        if vacancy_id not in self._writing:
+            return self.writer.add(operation)
+
+        def release() -> None:
+            self._release(vacancy_id)
+
+        # изменение кластера ожидает подтверждения записи вакансии,
+        # а следующая версия вакансии – подтверждения изменения кластера
+        waiter: Deferred = Deferred()
+        waiter.addCallback(lambda _: self.writer.add(operation, release, release))
+        self._writing[vacancy_id].append(waiter)
+
+        return None
+
+    def _lookup(self, vacancy_id: str) -> Deferred:
+        """
+        Получение хэшей сохраненной версии вакансии.
+
+        Хэши берутся из прочитанных заранее (см. ``prefetch``), иначе читаются
+        отдельным запросом.
+
+        :param vacancy_id: Идентификатор вакансии.
+        :return: ``Deferred`` с хэшами документа или None, если вакансия не сохранялась.
+        """
+
+        if vacancy_id in self._prefetched:
+            return succeed(self._prefetched.pop(vacancy_id))
+        if vacancy_id in self._waiting:
+            waiter: Deferred = Deferred()
+            self._waiting[vacancy_id].append(waiter)
+            return waiter
+
+        self.stats.inc_value("mongodb/hashes/lookups")
+        stored: Deferred = threads.deferToThread(  # type: ignore[no-untyped-call]
+            self._stored_hashes, [vacancy_id]
+        )
+        stored.addCallback(lambda found: found.get(vacancy_id))
+
+        return stored
+
+    def _stored_hashes(self, vacancy_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Чтение хэшей сохраненных версий вакансий (выполняется вне потока реактора).
+
+        :param vacancy_ids: Идентификаторы вакансий.
+        :return: Словарь "идентификатор" – "хэши документа" (только сохраненные).
+        """
+
+        cursor = self.database[self.collection].find(
+            {"id": {"$in": vacancy_ids}},
+            {"_id": False, "id": True, HASH_FIELD: True, FIELD_HASHES_FIELD: True},
+        )
+
+        return {document.pop("id"): document for document in cursor}
+
+    def _prefetched_hashes(
+        self, found: Dict[str, Dict[str, Any]], batch: List[str]
+    ) -> None:
+        for vacancy_id in batch:
+            stored = found.get(vacancy_id)
+            waiters = self._waiting.pop(vacancy_id, [])
+            if waiters:
+                for waiter in waiters:
+                    waiter.callback(stored)
+                continue
+            # вакансия еще не обработана: хэши ждут ее в ограниченном буфере
+            self._prefetched[vacancy_id] = stored
+            while len(self._prefetched) > PREFETCH_BUFFER_SIZE:
+                self._prefetched.popitem(last=False)
+
+    def _prefetch_failed(self, failure: Any, batch: List[str], spider: Spider) -> None:
+        spider.logger.warning(
+            f"Failed to prefetch content hashes: {failure.getErrorMessage()}"
+        )
+        # ожидающие вакансии читаются по одной
+        for vacancy_id in batch:
+            for waiter in self._waiting.pop(vacancy_id, []):
+                self._lookup(vacancy_id).chainDeferred(waiter)
+
+    def _save(
+        self,
+        stored: Optional[Dict[str, Any]],
+        data: Dict[str, Any],
+        hashes: Dict[str, str],
+        digest: str,
+        item: dict,
+        spider: Spider,
+    ) -> Union[dict, Deferred]:
+        """
+        Запись новой или измененной вакансии.
+
+        Хэш содержимого попадает в кэш только после подтверждения записи.
+
+        :param stored: Хэши сохраненной версии вакансии.
+        :param data: Документ вакансии.
+        :param hashes: Хэши полей документа (без полей, добавленных при обработке).
+        :param digest: Хэш содержимого документа.
+        :param item: Обрабатываемый элемент.
+        :param spider: Паук.
+        :return:
+        """
+
+        vacancy_id = data["id"]
+        at = int(time.time())
+        document = dict(data, **{HASH_FIELD: digest, FIELD_HASHES_FIELD: hashes})
+        if stored is not None and stored.get(HASH_FIELD) == digest:
+            if self.hashes is not None:
+                self.hashes.put(vacancy_id, digest)
+            self._count("skipped", spider)
+            self._release(vacancy_id)
+            self._stored(item, spider)
+            return item
+        if stored is None:
+            self._count("new", spider)
+            return self._write(
+                item,
+                spider,
+                ReplaceOne({"id": vacancy_id}, document, upsert=True),
+                created_entry(vacancy_id, at),
+                digest,
+                {} if self.aggregates is not None else None,
+            )
+
+        # хэши полей, добавленных при обработке, в документах, сохраненных
+        # до их исключения из хэшей, не учитываются
+        previous = {
+            name: value
+            for name, value in (stored.get(FIELD_HASHES_FIELD) or {}).items()
+            if name not in DERIVED_FIELDS
+        }
+        derived = {name: data[name] for name in DERIVED_FIELDS if name in data}
+        if previous:
+            changed, removed = diff(data, hashes, previous)
+            if not changed and not removed:
+                # данные API не изменились, обновляются только хэши
+                self._count("rehashed", spider)
+                rehashed = {HASH_FIELD: digest, FIELD_HASHES_FIELD: hashes}
+                return self._write(
+                    item,
+                    spider,
+                    UpdateOne({"id": vacancy_id}, {"$set": dict(derived, **rehashed)}),
+                    None,
+                    digest,
+                )
+
+        self._count("changed", spider)
+        fields: Optional[List[str]] = None
+        if previous:
+            # поля, добавленные при обработке, пересчитываются вместе с данными API
+            update: Dict[str, Any] = {
+                "$set": dict(
+                    changed,
+                    **derived,
+                    **{HASH_FIELD: digest, FIELD_HASHES_FIELD: hashes},
+                )
+            }
+            if removed:
+                update["$unset"] = removed
+            operation: Any = UpdateOne({"id": vacancy_id}, update, upsert=True)
+            fields = [*changed, *removed]
+        else:
+            # документ без хэшей полей (сохранен до их появления) заменяется целиком
+            operation = ReplaceOne({"id": vacancy_id}, document, upsert=True)
+        aggregated = self.aggregates is not None and (
+            fields is None or any(name in AGGREGATED_FIELDS for name in fields)
+        )
+        if self.history_writer is None and not aggregated:
+            return self._write(item, spider, operation, None, digest)
+
+        # для истории нужны предыдущие значения изменившихся полей,
+        # для агрегатов – предыдущие значения полей, от которых они зависят
+        names: Optional[List[str]] = None
+        if fields is not None:
+            names = list(fields) if self.history_writer is not None else []
+            if aggregated:
+                names.extend(name for name in AGGREGATED_FIELDS if name not in names)
+        values: Deferred = threads.deferToThread(  # type: ignore[no-untyped-call]
+            self._stored_values, vacancy_id, names
+        )
+        values.addCallback(
+            self._changed, item, spider, operation, data, digest, at, fields, aggregated
+        )
+
+        return values
+
+    def _changed(
+        self,
+        stored: Optional[Dict[str, Any]],
+        item: dict,
+        spider: Spider,
+        operation: Any,
+        data: Dict[str, Any],
+        digest: str,
+        at: int,
+        fields: Optional[List[str]],
+        aggregated: bool,
+    ) -> Union[dict, Deferred]:
+        """
+        Запись измененной вакансии с учетом ее предыдущей версии.
+
+        :param stored: Поля сохраненной версии вакансии.
+        :param item: Обрабатываемый элемент.
+        :param spider: Паук.
+        :param operation: Операция записи вакансии.
+        :param data: Документ вакансии.
+        :param digest: Хэш содержимого документа.
+        :param at: Время изменения (время Unix).
+        :param fields: Изменившиеся поля (None – неизвестны).
+        :param aggregated: Признак изменения полей, от которых зависят агрегаты.
+        :return:
+        """
+
+        stored = stored or {}
+        entry = None
+        if self.history_writer is not None:
+            entry = changed_entry(data["id"], at, stored, data, fields)
+
+        return self._write(
+            item,
+            spider,
+            operation,
+            entry,
+            digest,
+            stored if aggregated and self.aggregates is not None else None,
+        )
+
+    def _stored_values(
+        self, vacancy_id: str, fields: Optional[List[str]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Чтение полей сохраненной версии вакансии (выполняется вне потока реактора).
+
+        :param vacancy_id: Идентификатор вакансии.
+        :param fields: Названия полей (по умолчанию – все поля, кроме служебных).
+        :return:
+        """
+
+        projection: Dict[str, bool] = (
+            {"_id": False, **{name: True for name in fields}}
+            if fields is not None
+            else {name: False for name in SERVICE_FIELDS}
         )
 
+        return self.database[self.collection].find_one({"id": vacancy_id}, projection)
+
+    def _write(
+        self,
+        item: dict,
+        spider: Spider,
+        operation: Any,
+        entry: Optional[Dict[str, Any]] = None,
+        digest: Optional[str] = None,
+        previous: Optional[Dict[str, Any]] = None,
+    ) -> Union[dict, Deferred]:
+        """
+        Добавление операций записи вакансии и ее истории в буферы.
+
+        Операция записи вакансии с записью истории передается в буфер только после
+        подтверждения записи истории. После подтверждения записи вакансии ее хэш
+        содержимого сохраняется в кэше, учитываются изменения агрегатов
+        и отправляется сигнал ``item_stored``.
+
+        :param item: Обрабатываемый элемент.
+        :param spider: Паук.
+        :param operation: Операция записи вакансии.
+        :param entry: Запись истории изменений.
+        :param digest: Хэш содержимого документа.
+        :param previous: Значения сохраненной версии для агрегатов
+            (пустой словарь – новая вакансия, None – агрегаты не изменяются).
+        :return: Элемент или ``Deferred``, если нужно дождаться свободного места
+            (с записью истории – и подтверждения записи истории).
+        """
+
+        def acknowledged() -> None:
+            self._acknowledged(item, spider, digest, previous)
+
+        def failed() -> None:
+            self._release(item["id"])
+
+        if entry is not None and self.history_writer is not None:
+            # элемент ожидает и места в буфере вакансий: иначе при записи истории
+            # ограничение очереди записи вакансий не действует
+            vacancy_added: Deferred = Deferred()
+
+            def history_acknowledged() -> None:
+                waiting = self.writer.add(operation, acknowledged, failed)
+                if waiting is None:
+                    vacancy_added.callback(None)
+                else:
+                    waiting.addBoth(vacancy_added.callback)
+
+            def history_failed() -> None:
+                failed()
+                vacancy_added.callback(None)
+
+            added = [
+                self.history_writer.add(
+                    InsertOne(entry), history_acknowledged, history_failed
+                ),
+                vacancy_added,
+            ]
+        else:
+            added = [self.writer.add(operation, acknowledged, failed)]
+        added.extend(self._flush_aggregates())
+        waiting = [deferred for deferred in added if deferred is not None]
+        if waiting:
+            # ожидание свободного места для записи пакета (ограничение очереди)
+            blocked = DeferredList(waiting)
+            blocked.addCallback(lambda _: item)
+            return blocked
+
         return item
+
+    def _flush_aggregates(self, force: bool = False) -> List[Optional[Deferred]]:
+        """
+        Передача накопленных изменений агрегатов на запись.
+
+        Изменения передаются после учета ``MONGODB_BULK_SIZE`` вакансий
+        или по истечении ``MONGODB_BULK_INTERVAL`` секунд.
+
+        :param force: Передать изменения независимо от размера буфера.
+        :return: Результаты добавления операций в буфер записи.
+        """
+
+        if self.aggregates is None or self.aggregates_writer is None:
+            return []
+        if not force and (
+            self.aggregates.vacancies < self.bulk_size
+            and time.monotonic() - self._aggregated_at < self.bulk_interval
+        ):
+            return []
+
+        self._aggregated_at = time.monotonic()
+
+        return [
+            self.aggregates_writer.add(operation)
+            for operation in self.aggregates.operations()
+        ]
+
+    def _acknowledged(
+        self,
+        item: dict,
+        spider: Spider,
+        digest: Optional[str],
+        previous: Optional[Dict[str, Any]],
+    ) -> None:
+        if self.aggregates is not None and previous is not None:
+            if previous:
+                self.aggregates.add(previous, sign=-1)
+            self.aggregates.add(dict(item))
+        if self.hashes is not None and digest is not None:
+            self.hashes.put(item["id"], digest)
+        self._release(item["id"])
+        self._stored(item, spider)
+
+    def _stored(self, item: dict, spider: Spider) -> None:
+        """
+        Уведомление о сохранении вакансии (сигнал ``item_stored``).
+
+        :param item: Обрабатываемый элемент.
+        :param spider: Паук.
+        :return:
+        """
+
+        if self.signals is not None:
+            self.signals.send_catch_log(item_stored, item=item, spider=spider)
+
+    def _count(self, outcome: str, spider: Spider) -> None:
+        self.stats.inc_value(f"mongodb/items/{outcome}", spider=spider)
+
+
+class SearchPipeline:
+    """
+    Добавление вакансии в локальный поисковый индекс (см. ``SearchIndex``).
+
+    Индекс обновляется по одной вакансии, записи фиксируются пакетами
+    по ``SEARCH_BUFFER_SIZE`` вакансий в пуле потоков, поэтому транзакция
+    полнотекстового индекса не блокирует поток реактора. Регион под страной
+    для фасета определяется по справочнику регионов паука.
+    """
+
+    def __init__(
+        self, stats: StatsCollector, path: str, references_dir: str, buffer_size: int
+    ) -> None:
+        self.stats = stats
+        self.path = path
+        self.references_dir = references_dir
+        self.buffer_size = buffer_size
+        self.index: SearchIndex
+        # записи пакетов выполняются последовательно
+        self._committed: Deferred = succeed(None)
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "SearchPipeline":
+        if not crawler.settings.getbool("SEARCH_ENABLED", True):
+            raise NotConfigured
+
+        return cls(
+            stats=crawler.stats,
+            path=data_path(crawler.settings.get("SEARCH_FILE", "search.sqlite")),
+            references_dir=data_path(
+                crawler.settings.get("REFERENCES_DIR", "references")
+            ),
+            buffer_size=crawler.settings.getint("SEARCH_BUFFER_SIZE", 500),
+        )
+
+    def open_spider(self, spider: Spider) -> None:
+        references = getattr(spider, "references", None)
+        self.index = SearchIndex(
+            self.path,
+            references=references
+            if isinstance(references, ReferenceCache)
+            else ReferenceCache(self.references_dir),
+            buffer_size=self.buffer_size,
+        )
+
+    def close_spider(self, spider: Spider) -> Deferred:
+        self._in_thread(self.index.close, spider)
+
+        return self._committed
+
+    def process_item(self, item: dict, spider: Spider) -> dict:
+        if self.index.add(dict(item)):
+            self._in_thread(self.index.commit, spider)
+        self.stats.inc_value("search/indexed", spider=spider)
+
+        return item
+
+    def _in_thread(self, function: Callable[[], None], spider: Spider) -> None:
+        """
+        Запись (закрытие) индекса в пуле потоков после предыдущих записей.
+
+        :param function: Метод индекса.
+        :param spider: Паук.
+        :return:
+        """
+
+        def failed(failure: Any) -> None:
+            spider.logger.error(
+                f"Search index commit failed: {failure.getErrorMessage()}"
+            )
+
+        self._committed.addCallback(
+            lambda _: threads.deferToThread(function)  # type: ignore[no-untyped-call]
+        )
+        self._committed.addErrback(failed)
@@ -0,0 +1,157 @@
+import time
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+
+def parse_retry_after(
+    value: Optional[bytes], now: Optional[float] = None
+) -> Optional[float]:
+    """
+    Разбор заголовка ``Retry-After``.
+
+    :param value: Значение заголовка: количество секунд или дата HTTP.
+    :param now: Текущее время Unix.
+    :return: Пауза (в секундах) или None, если заголовок отсутствует или некорректен.
+    """
+
+    if not value:
+        return None
+
+    text = value.decode("latin-1").strip()
+    if text.isdigit():
+        return float(text)
+
+    try:
+        moment = parsedate_to_datetime(text)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    current = now if now is not None else time.time()
+
+    return max(0.0, moment.timestamp() - current)
+
+
+class TokenBucket:
+    """
+    Ограничение частоты запросов алгоритмом "корзины токенов"
+    с мультипликативным замедлением и аддитивным восстановлением.
+
+    При ответе-отказе скорость уменьшается в ``backoff_factor`` раз, а выдача
+    токенов приостанавливается на время из ``Retry-After`` или на экспоненциально
+    растущую паузу. Отказы, полученные до окончания паузы, относятся к тому же
+    событию перегрузки (это ответы на запросы, отправленные до нее): они только
+    продлевают паузу по ``Retry-After``. После каждых ``recovery_window`` успешных
+    ответов скорость увеличивается на ``recovery_step``, но не выше ``max_rate``.
+    """
+
+    def __init__(
+        self,
+        max_rate: float,
+        burst: float = 1.0,
+        min_rate: float = 0.1,
+        backoff_factor: float = 0.5,
+        backoff_delay: float = 5.0,
+        max_backoff_delay: float = 300.0,
+        recovery_step: float = 0.25,
+        recovery_window: int = 5,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        :param max_rate: Максимальная скорость (запросов в секунду).
+        :param burst: Емкость корзины (допустимое количество запросов подряд).
+        :param min_rate: Минимальная скорость при замедлении.
+        :param backoff_factor: Множитель скорости при отказе.
+        :param backoff_delay: Начальная пауза после отказа (в секундах).
+        :param max_backoff_delay: Максимальная пауза после отказа (в секундах).
+        :param recovery_step: Прибавка скорости при восстановлении (запросов в секунду).
+        :param recovery_window: Количество успешных ответов для увеличения скорости.
+        :param clock: Источник времени.
+        """
+
+        self.max_rate = max_rate
+        self.rate = max_rate
+        self.burst = max(1.0, burst)
+        self.min_rate = min(min_rate, max_rate)
+        self.backoff_factor = backoff_factor
+        self.backoff_delay = backoff_delay
+        self.max_backoff_delay = max_backoff_delay
+        self.recovery_step = recovery_step
+        self.recovery_window = recovery_window
+        self.clock = clock
+
+        self.tokens = self.burst
+        self.backoffs = 0
+        self.paused_until = 0.0
+        self._updated = clock()
+        self._successes = 0
+
+    def reserve(self) -> float:
+        """
+        Резервирование токена для запроса.
+
+        Токен резервируется сразу, даже если он станет доступен только в будущем,
+        поэтому одновременные запросы распределяются во времени равномерно.
+
+        :return: Время ожидания до отправки запроса (в секундах).
+        """
+
+        now = self.clock()
+        self._refill(now)
+        self.tokens -= 1.0
+
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+        return max(wait, self.paused_until - now)
+
+    def success(self) -> None:
+        """
+        Учет успешного ответа.
+
+        :return:
+        """
+
+        self.backoffs = 0
+        self._successes += 1
+        if self._successes >= self.recovery_window and self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.recovery_step)
+            self._successes = 0
+
+    def backoff(self, retry_after: Optional[float] = None) -> float:
+        """
+        Учет отказа сервера: замедление и пауза.
+
+        :param retry_after: Пауза, запрошенная сервером (в секундах).
+        :return: Оставшаяся пауза (в секундах).
+        """
+
+        now = self.clock()
+        if now < self.paused_until:
+            # отказ относится к текущему событию перегрузки
+            if retry_after is not None and now + retry_after > self.paused_until:
+                # запросы, зарезервированные на время после паузы, сдвигаются
+                self._updated += now + retry_after - self.paused_until
+                self.paused_until = now + retry_after
+            return self.paused_until - now
+
+        delay = min(self.max_backoff_delay, self.backoff_delay * 2**self.backoffs)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+
+        self._refill(now)
+        self.backoffs += 1
+        self._successes = 0
+        self.rate = max(self.min_rate, self.rate * self.backoff_factor)
+        self.paused_until = max(self.paused_until, now + delay)
+        # токены не накапливаются до конца паузы: запросы, зарезервированные
+        # во время паузы, распределяются равномерно после ее окончания
+        self.tokens = min(self.tokens, 0.0)
+        self._updated = self.paused_until
+
+        return delay
+
+    def _refill(self, now: float) -> None:
+        # во время паузы прошедшее время отрицательно и увеличивает ожидание
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
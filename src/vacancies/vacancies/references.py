@@ -0,0 +1,245 @@
+import json
+import os
+import time
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional
+
+from vacancies.vacancies.mapping import ListOf, Reference, Schema
+from vacancies.vacancies.salary import CurrencyRates
+
+# справочники api.hh.ru, которые хранятся в кэше, в порядке загрузки
+ENDPOINTS = ("professional_roles", "areas", "dictionaries")
+
+
+def _walk_areas(areas: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    for area in areas:
+        yield area
+        yield from _walk_areas(area.get("areas") or [])
+
+
+class ReferenceCache:
+    """
+    Кэш справочников api.hh.ru на диске.
+
+    Каждый справочник хранится в отдельном файле JSON вместе с заголовком ``ETag``
+    и временем загрузки. Справочник считается актуальным в течение ``ttl`` секунд,
+    после чего загружается заново условным запросом (``If-None-Match``): если
+    справочник не изменился, сервер отвечает кодом 304 без тела.
+
+    Курсы валют из ``/dictionaries`` дополнительно сохраняются в историю
+    по датам загрузки (``currency_rates``).
+    """
+
+    def __init__(self, directory: str, ttl: float = 24 * 60 * 60) -> None:
+        """
+        :param directory: Директория кэша.
+        :param ttl: Время актуальности справочника (в секундах).
+        """
+
+        self.directory = directory
+        self.ttl = ttl
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._indexes: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._rates = CurrencyRates(os.path.join(directory, "currency_rates.json"))
+
+    def get(self, endpoint: str) -> Optional[Any]:
+        """
+        Получение сохраненного справочника (в том числе устаревшего).
+
+        :param endpoint: Название справочника (``areas``, ``dictionaries``,
+            ``professional_roles``).
+        :return: Данные справочника или None, если он не загружался.
+        """
+
+        entry = self._entry(endpoint)
+
+        return entry["data"] if entry is not None else None
+
+    def etag(self, endpoint: str) -> Optional[str]:
+        """
+        Значение заголовка ``ETag`` сохраненного справочника.
+
+        :param endpoint: Название справочника.
+        :return:
+        """
+
+        entry = self._entry(endpoint)
+
+        return entry.get("etag") if entry is not None else None
+
+    def is_fresh(self, endpoint: str, now: Optional[float] = None) -> bool:
+        """
+        Проверка актуальности сохраненного справочника.
+
+        :param endpoint: Название справочника.
+        :param now: Текущее время Unix.
+        :return:
+        """
+
+        entry = self._entry(endpoint)
+        current = now if now is not None else time.time()
+
+        return entry is not None and current - entry["fetched_at"] < self.ttl
+
+    def store(self, endpoint: str, data: Any, etag: Optional[str] = None) -> None:
+        """
+        Сохранение загруженного справочника.
+
+        :param endpoint: Название справочника.
+        :param data: Данные справочника.
+        :param etag: Значение заголовка ``ETag`` ответа.
+        :return:
+        """
+
+        self._write(endpoint, {"etag": etag, "fetched_at": time.time(), "data": data})
+        self._indexes.clear()
+        if endpoint == "dictionaries":
+            self._record_rates()
+
+    def touch(self, endpoint: str) -> None:
+        """
+        Продление актуальности справочника, который не изменился на сервере.
+
+        :param endpoint: Название справочника.
+        :return:
+        """
+
+        entry = self._entry(endpoint)
+        if entry is not None:
+            self._write(endpoint, dict(entry, fetched_at=time.time()))
+            if endpoint == "dictionaries":
+                self._record_rates()
+
+    def currency_rates(self) -> CurrencyRates:
+        """
+        История курсов валют.
+
+        Если история пуста (кэш справочников создан до ее появления),
+        в нее записываются курсы сохраненного справочника ``/dictionaries``.
+
+        :return:
+        """
+
+        if not self._rates:
+            self._record_rates()
+
+        return self._rates
+
+    def _record_rates(self) -> None:
+        entry = self._entry("dictionaries")
+        if entry is not None:
+            self._rates.record(
+                (entry["data"] or {}).get("currency") or [],
+                date.fromtimestamp(entry["fetched_at"]),
+            )
+
+    def dictionary(self, name: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Значения справочника по идентификаторам.
+
+        :param name: Название справочника: ``areas`` (все уровни дерева регионов),
+            ``professional_roles`` или ключ ``/dictionaries`` (``experience``,
+            ``schedule``, ``currency`` и т.п.).
+        :return:
+        """
+
+        index = self._indexes.get(name)
+        if index is not None:
+            return index
+
+        if name == "areas":
+            values = list(_walk_areas(self.get("areas") or []))
+        elif name == "professional_roles":
+            values = [
+                role
+                for category in (self.get("professional_roles") or {}).get(
+                    "categories", []
+                )
+                for role in category.get("roles", [])
+            ]
+        else:
+            values = (self.get("dictionaries") or {}).get(name) or []
+
+        # у валют вместо идентификатора – код
+        index = self._indexes[name] = {
+            str(value.get("id", value.get("code"))): {
+                key: item for key, item in value.items() if key != "areas"
+            }
+            for value in values
+        }
+
+        return index
+
+    def region(self, area_id: str) -> str:
+        """
+        Регион (уровень дерева под страной), к которому относится регион вакансии.
+
+        :param area_id: Идентификатор региона вакансии.
+        :return: Идентификатор региона (без справочника – исходный идентификатор).
+        """
+
+        areas = self.dictionary("areas")
+        chain = [area_id]
+        while areas.get(chain[-1], {}).get("parent_id"):
+            chain.append(str(areas[chain[-1]]["parent_id"]))
+
+        # последний элемент цепочки – страна
+        return chain[-2] if len(chain) > 1 else chain[0]
+
+    def denormalize(self, document: Dict[str, Any], schema: Schema) -> Dict[str, Any]:
+        """
+        Восстановление значений справочников в документе, сохраненном по схеме.
+
+        Ссылки на справочники (``{"id": ...}``) заменяются полными значениями;
+        ссылки на отсутствующие в справочнике значения остаются без изменений.
+
+        :param document: Документ из MongoDB.
+        :param schema: Схема, по которой документ был сохранен.
+        :return: Новый документ.
+        """
+
+        result = dict(document)
+        for name, spec in schema.fields.items():
+            value = result.get(name)
+            if not value:
+                continue
+            if isinstance(spec, ListOf) and isinstance(value, list):
+                result[name] = [self._expand(item, spec.schema) for item in value]
+            elif isinstance(spec, (Schema, Reference)):
+                result[name] = self._expand(value, spec)
+
+        return result
+
+    def _expand(self, value: Any, spec: Any) -> Any:
+        if not isinstance(value, dict):
+            return value
+        if isinstance(spec, Schema):
+            return self.denormalize(value, spec)
+        if isinstance(spec, Reference):
+            return self.dictionary(spec.dictionary).get(str(value.get("id")), value)
+
+        return value
+
+    def _entry(self, endpoint: str) -> Optional[Dict[str, Any]]:
+        if endpoint not in self._entries:
+            path = self._path(endpoint)
+            if not os.path.exists(path):
+                return None
+            with open(path, encoding="utf-8") as file:
+                self._entries[endpoint] = json.load(file)
+
+        return self._entries[endpoint]
+
+    def _write(self, endpoint: str, entry: Dict[str, Any]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        # запись через временный файл, чтобы кэш не повредился при остановке;
+        # файл может сохраняться одновременно несколькими процессами парсинга
+        path = self._path(endpoint)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(entry, file, ensure_ascii=False)
+        os.replace(temp_path, path)
+        self._entries[endpoint] = entry
+
+    def _path(self, endpoint: str) -> str:
+        return os.path.join(self.directory, f"{endpoint}.json")
@@ -0,0 +1,223 @@
+import bisect
+import json
+import os
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+
+# валюта, к которой приводятся зарплаты
+BASE_CURRENCY = "RUR"
+# налог на доходы физических лиц (зарплата "до вычета налогов" – gross)
+INCOME_TAX = 0.13
+# количество периодов оплаты в месяце (по умолчанию зарплата указывается за месяц)
+PERIODS_PER_MONTH = {"MONTH": 1.0, "HOUR": 164.4, "SHIFT": 21.0, "DAY": 21.0}
+
+
+class CurrencyRates:
+    """
+    История курсов валют из справочника ``/dictionaries`` по датам.
+
+    Курс ``rate`` в справочнике – количество единиц валюты за один рубль.
+    Курсы сохраняются в файл JSON при каждой загрузке справочника, поэтому
+    зарплата вакансии пересчитывается по курсу на дату ее публикации
+    (последнему известному на эту дату, для более ранних дат – по самому
+    раннему сохраненному курсу).
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: Путь к файлу истории курсов.
+        """
+
+        self.path = path
+        self._rates: Optional[Dict[str, Dict[str, float]]] = None
+        self._days: List[str] = []
+
+    @property
+    def rates(self) -> Dict[str, Dict[str, float]]:
+        """
+        Курсы валют по датам (``YYYY-MM-DD``).
+
+        :return:
+        """
+
+        if self._rates is None:
+            rates: Dict[str, Dict[str, float]] = {}
+            if os.path.exists(self.path):
+                with open(self.path, encoding="utf-8") as file:
+                    rates = json.load(file)
+            self._rates, self._days = rates, sorted(rates)
+
+        return self._rates
+
+    def record(self, currencies: Iterable[Dict[str, Any]], day: date) -> None:
+        """
+        Сохранение курсов валют из справочника ``/dictionaries``.
+
+        :param currencies: Значения справочника ``currency``.
+        :param day: Дата курсов.
+        :return:
+        """
+
+        rates = {
+            str(currency["code"]): float(currency["rate"])
+            for currency in currencies
+            if currency.get("code") and currency.get("rate")
+        }
+        key = day.isoformat()
+        if not rates or self.rates.get(key) == rates:
+            return
+
+        self.rates[key] = rates
+        self._days = sorted(self.rates)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # файл может сохраняться одновременно несколькими процессами парсинга
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self.rates, file, ensure_ascii=False, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+    def at(self, day: str) -> Dict[str, float]:
+        """
+        Курсы валют на дату.
+
+        :param day: Дата (``YYYY-MM-DD``, допускается дата и время ISO 8601).
+        :return: Словарь "код валюты" – "курс" (пустой, если курсы неизвестны).
+        """
+
+        rates = self.rates
+        if not self._days:
+            return {}
+
+        index = max(bisect.bisect_right(self._days, day[:10]) - 1, 0)
+
+        return rates[self._days[index]]
+
+    def __bool__(self) -> bool:
+        return bool(self.rates)
+
+    def table(self) -> Tuple[List[str], List[str], Any]:
+        """
+        Курсы валют в виде матрицы для векторного пересчета.
+
+        :return: Даты (по возрастанию), коды валют и матрица ``numpy``
+            "дата – валюта" (``nan`` – курс неизвестен).
+        """
+
+        days = list(self._days) if self.rates else []
+        codes = sorted({code for day in days for code in self.rates[day]})
+        matrix = np.full((len(days), len(codes)), np.nan)
+        for row, day in enumerate(days):
+            for column, code in enumerate(codes):
+                matrix[row, column] = self.rates[day].get(code, np.nan)
+
+        return days, codes, matrix
+
+
+def _currency(code: Any) -> Any:
+    # в старых версиях справочника рубль обозначается RUB
+    return BASE_CURRENCY if code == "RUB" else code
+
+
+def normalize(
+    salary: Any, rates: Dict[str, float], mode: Optional[str] = None
+) -> Optional[Dict[str, Optional[float]]]:
+    """
+    Приведение зарплаты вакансии к рублям "на руки" за месяц.
+
+    :param salary: Объект ``salary`` вакансии.
+    :param rates: Курсы валют на дату публикации вакансии (``CurrencyRates.at``).
+    :param mode: Период оплаты (``MONTH``, ``HOUR``, ``SHIFT``; по умолчанию – месяц).
+    :return: Границы вилки ``from`` и ``to`` или None, если зарплата
+        не указана или курс валюты неизвестен.
+    """
+
+    if not isinstance(salary, dict):
+        return None
+
+    currency = _currency(salary.get("currency"))
+    rate = 1.0 if currency == BASE_CURRENCY else rates.get(currency)
+    bounds = {
+        key: value
+        for key in ("from", "to")
+        if isinstance((value := salary.get(key)), (int, float)) and value > 0
+    }
+    if not rate or not bounds:
+        return None
+
+    factor = PERIODS_PER_MONTH.get(mode or "MONTH", 1.0) / rate
+    if salary.get("gross"):
+        factor *= 1 - INCOME_TAX
+
+    return {
+        key: round(bounds[key] * factor, 2) if key in bounds else None
+        for key in ("from", "to")
+    }
+
+
+def normalize_columns(
+    salary_from: Any,
+    salary_to: Any,
+    currency: Any,
+    gross: Any,
+    published_at: Any,
+    rates: CurrencyRates,
+    mode: Any = None,
+) -> Tuple[Any, Any]:
+    """
+    Приведение столбцов зарплаты к рублям "на руки" за месяц (``numpy``).
+
+    Курс каждой строки выбирается по дате публикации бинарным поиском
+    в матрице курсов ``CurrencyRates.table``, коды валют – по индексу
+    уникальных значений, поэтому пересчет выполняется без цикла по строкам.
+
+    :param salary_from: Нижние границы вилки (``nan`` – не указана).
+    :param salary_to: Верхние границы вилки.
+    :param currency: Коды валют (строки или None).
+    :param gross: Признаки зарплаты до вычета налогов (без пропусков).
+    :param published_at: Даты публикации (строки ISO 8601 или ``datetime64``).
+    :param rates: История курсов валют.
+    :param mode: Периоды оплаты (по умолчанию – месяц).
+    :return: Нижние и верхние границы вилки (``nan`` – не указана
+        или курс валюты неизвестен).
+    """
+
+    values_from = np.asarray(salary_from, dtype=np.float64)
+    values_to = np.asarray(salary_to, dtype=np.float64)
+
+    # курс строки – курс ее валюты в последний известный на дату публикации день
+    unique, inverse = np.unique(np.asarray(currency, dtype=str), return_inverse=True)
+    unique = np.array([_currency(code) for code in unique])
+    codes = unique[inverse]
+    days, known, matrix = rates.table()
+    factor = np.full(len(values_from), np.nan)
+    if days:
+        dates = np.asarray(published_at)
+        if np.issubdtype(dates.dtype, np.datetime64):
+            dates = np.datetime_as_string(dates, unit="D")
+        rows = np.searchsorted(np.array(days), dates.astype("U10"), side="right") - 1
+        columns = np.array(
+            [known.index(code) if code in known else -1 for code in unique]
+        )
+        columns = columns[inverse]
+        found = columns >= 0
+        factor[found] = 1 / matrix[np.clip(rows, 0, None)[found], columns[found]]
+    factor[codes == BASE_CURRENCY] = 1.0
+
+    if mode is not None:
+        periods, inverse = np.unique(np.asarray(mode, dtype=str), return_inverse=True)
+        factor *= np.array([PERIODS_PER_MONTH.get(value, 1.0) for value in periods])[
+            inverse
+        ]
+    factor[np.asarray(gross, dtype=bool)] *= 1 - INCOME_TAX
+
+    values_from = np.where(values_from > 0, values_from * factor, np.nan)
+    values_to = np.where(values_to > 0, values_to * factor, np.nan)
+
+    return np.round(values_from, 2), np.round(values_to, 2)
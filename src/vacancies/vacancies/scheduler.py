@@ -0,0 +1,165 @@
+import pickle
+from collections import Counter
+from typing import Any, Optional, Set
+
+from scrapy import Request, Spider
+from scrapy.core.scheduler import Scheduler
+from scrapy.crawler import Crawler
+from scrapy.utils.project import data_path
+from scrapy.utils.request import request_from_dict
+from twisted.internet.defer import Deferred
+
+from vacancies.vacancies.frontier import AreaQueue
+
+
+class AreaScheduler(Scheduler):
+    """
+    Планировщик с ограничением количества одновременно обрабатываемых регионов.
+
+    Регион считается обрабатываемым, пока в очереди планировщика, в загрузчике
+    или в обработке есть его запросы (регион запроса указывается
+    в ``meta["crawl_area"]``). Запросы новых регионов
+    сверх ограничения ``SCHEDULER_MAX_AREAS`` откладываются в очередь на диске
+    и переносятся в очередь планировщика, когда запросы одного из регионов
+    закончатся. Вместе с приоритетами запросов паука (сначала детальная
+    информация, затем страницы результатов) это ограничивает размер очереди
+    в памяти независимо от количества вакансий.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        max_areas: int = 0,
+        overflow_path: Optional[str] = None,
+        **kwargs: Any,
+    ) -> None:
+        """
+        :param max_areas: Максимальное количество одновременно обрабатываемых
+            регионов (0 – без ограничения).
+        :param overflow_path: Путь к файлу очереди отложенных регионов.
+        """
+
+        super().__init__(*args, **kwargs)
+        self.max_areas = max_areas
+        self.overflow_path = overflow_path
+        self.overflow: Optional[AreaQueue] = None
+        # регионы, запросы которых уже допущены в очередь планировщика
+        self._admitted: Set[str] = set()
+        # регион – количество его запросов в очереди планировщика
+        self._queued: Counter[str] = Counter()
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "AreaScheduler":
+        scheduler = super().from_crawler(crawler)
+        scheduler.max_areas = crawler.settings.getint("SCHEDULER_MAX_AREAS", 0)
+        scheduler.overflow_path = data_path(
+            crawler.settings.get("SCHEDULER_OVERFLOW_FILE", "overflow.sqlite")
+        )
+
+        return scheduler
+
+    def open(self, spider: Spider) -> Optional[Deferred]:
+        if self.max_areas > 0 and self.overflow_path:
+            self.overflow = AreaQueue(self.overflow_path)
+
+        return super().open(spider)
+
+    def close(self, reason: str) -> Optional[Deferred]:
+        if self.overflow is not None:
+            self.overflow.close()
+
+        return super().close(reason)
+
+    def enqueue_request(self, request: Request) -> bool:
+        area = request.meta.get("crawl_area")
+        if (
+            self.overflow is not None
+            and area is not None
+            and area not in self._admitted
+            and len(self._active_areas()) >= self.max_areas
+        ):
+            data = pickle.dumps(request.to_dict(spider=self.spider), protocol=4)
+            self.overflow.push(area, data)
+            self._stats("scheduler/overflow/requests")
+            return True
+
+        return self._enqueue(request)
+
+    def next_request(self) -> Optional[Request]:
+        request = super().next_request()
+        if request is None:
+            self._release()
+            request = super().next_request()
+
+        area = request.meta.get("crawl_area") if request is not None else None
+        if area is not None:
+            self._queued[area] -= 1
+            if self._queued[area] <= 0:
+                del self._queued[area]
+        if len(self._queued) < self.max_areas:
+            self._release()
+
+        return request
+
+    def __len__(self) -> int:
+        overflow = len(self.overflow) if self.overflow is not None else 0
+
+        return super().__len__() + overflow
+
+    def _enqueue(self, request: Request) -> bool:
+        if not super().enqueue_request(request):
+            return False
+
+        area = request.meta.get("crawl_area")
+        if area is not None:
+            self._admitted.add(area)
+            self._queued[area] += 1
+
+        return True
+
+    def _release(self) -> None:
+        """
+        Перенос запросов отложенных регионов в очередь планировщика
+        при наличии свободных мест.
+
+        :return:
+        """
+
+        if self.overflow is None or not len(self.overflow):
+            return None
+
+        active = self._active_areas()
+        while len(active) < self.max_areas:
+            area, records = self.overflow.pop_area()
+            if area is None:
+                break
+
+            self._stats("scheduler/overflow/areas")
+            self._admitted.add(area)
+            active.add(area)
+            for data in records:
+                self._enqueue(request_from_dict(pickle.loads(data), spider=self.spider))
+
+        return None
+
+    def _active_areas(self) -> Set[str]:
+        """
+        Регионы, запросы которых находятся в очереди, в загрузчике или в обработке.
+
+        :return:
+        """
+
+        active = set(self._queued)
+        engine = self.crawler.engine if self.crawler is not None else None
+        if engine is not None:
+            scraping = engine.scraper.slot.active if engine.scraper.slot else ()
+            for request in (*engine.downloader.active, *scraping):
+                area = request.meta.get("crawl_area")
+                if area is not None:
+                    active.add(area)
+
+        return active
+
+    def _stats(self, key: str) -> None:
+        if self.stats is not None:
+            self.stats.inc_value(key, spider=self.spider)
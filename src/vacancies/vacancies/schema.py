@@ -0,0 +1,178 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import pymongo
+from pymongo import IndexModel
+from pymongo.collection import Collection
+from pymongo.errors import DuplicateKeyError
+
+IndexKey = Tuple[Tuple[str, Union[int, str]], ...]
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """
+    Описание индекса коллекции.
+    """
+
+    keys: IndexKey
+    unique: bool = False
+
+    @property
+    def name(self) -> str:
+        """
+        Название индекса в формате MongoDB по умолчанию (например, ``id_1``).
+
+        :return:
+        """
+
+        return "_".join(f"{key}_{direction}" for key, direction in self.keys)
+
+    def to_model(self) -> IndexModel:
+        return IndexModel(list(self.keys), name=self.name, unique=self.unique)
+
+
+@dataclass
+class IndexDrift:
+    """
+    Расхождение индексов коллекции с объявленной схемой.
+    """
+
+    missing: List[IndexSpec] = field(default_factory=list)
+    mismatched: List[IndexSpec] = field(default_factory=list)
+    extra: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.missing or self.mismatched or self.extra)
+
+
+# схема индексов коллекции вакансий
+VACANCIES_INDEXES: List[IndexSpec] = [
+    IndexSpec(keys=(("id", pymongo.ASCENDING),), unique=True),
+    IndexSpec(keys=(("published_at", pymongo.DESCENDING),)),
+    IndexSpec(keys=(("area.id", pymongo.ASCENDING),)),
+    IndexSpec(keys=(("employer.id", pymongo.ASCENDING),)),
+    IndexSpec(keys=(("professional_roles.id", pymongo.ASCENDING),)),
+    IndexSpec(keys=(("key_skills.name", pymongo.ASCENDING),)),
+]
+
+# схема индексов коллекции истории изменений вакансий
+HISTORY_INDEXES: List[IndexSpec] = [
+    IndexSpec(keys=(("vacancy_id", pymongo.ASCENDING), ("at", pymongo.DESCENDING))),
+]
+
+# схема индексов коллекции агрегатов
+AGGREGATES_INDEXES: List[IndexSpec] = [
+    IndexSpec(keys=(("kind", pymongo.ASCENDING), ("count", pymongo.DESCENDING))),
+]
+
+
+def _live_indexes(collection: Collection) -> Dict[IndexKey, Tuple[str, bool]]:
+    """
+    Получение индексов коллекции.
+
+    :param collection: Коллекция MongoDB.
+    :return: Словарь "ключи индекса" – "название и признак уникальности".
+    """
+
+    return {
+        tuple(
+            (key, int(direction) if isinstance(direction, (int, float)) else direction)
+            for key, direction in info["key"]
+        ): (name, bool(info.get("unique", False)))
+        for name, info in collection.index_information().items()
+        if name != "_id_"
+    }
+
+
+def check_indexes(collection: Collection, schema: List[IndexSpec]) -> IndexDrift:
+    """
+    Сравнение индексов коллекции с объявленной схемой.
+
+    :param collection: Коллекция MongoDB.
+    :param schema: Объявленные индексы.
+    :return: Расхождения со схемой.
+    """
+
+    live = _live_indexes(collection)
+    drift = IndexDrift()
+    for spec in schema:
+        if spec.keys not in live:
+            drift.missing.append(spec)
+        elif live[spec.keys][1] != spec.unique:
+            drift.mismatched.append(spec)
+
+    declared = {spec.keys for spec in schema}
+    drift.extra = [name for keys, (name, _) in live.items() if keys not in declared]
+
+    return drift
+
+
+def find_duplicate(collection: Collection, spec: IndexSpec) -> Optional[List[Any]]:
+    """
+    Поиск значений ключей индекса, встречающихся в нескольких документах.
+
+    :param collection: Коллекция MongoDB.
+    :param spec: Описание индекса.
+    :return: Повторяющиеся значения ключей или ``None``, если повторов нет.
+    """
+
+    duplicates = collection.aggregate(
+        [
+            {
+                "$group": {
+                    "_id": [f"${key}" for key, _ in spec.keys],
+                    "count": {"$sum": 1},
+                }
+            },
+            {"$match": {"count": {"$gt": 1}}},
+            {"$limit": 1},
+        ],
+        allowDiskUse=True,
+    )
+    for duplicate in duplicates:
+        return list(duplicate["_id"])
+
+    return None
+
+
+def ensure_indexes(
+    collection: Collection, schema: List[IndexSpec], drop_extra: bool = False
+) -> IndexDrift:
+    """
+    Приведение индексов коллекции в соответствие со схемой.
+
+    Недостающие индексы создаются, индексы с отличающимися параметрами пересоздаются.
+    Лишние индексы удаляются только при ``drop_extra=True``.
+
+    Перед удалением индексов проверяется, что в коллекции нет повторов ключей
+    создаваемых уникальных индексов: иначе после удаления старого индекса новый
+    не был бы построен и коллекция осталась бы без индекса.
+
+    :param collection: Коллекция MongoDB.
+    :param schema: Объявленные индексы.
+    :param drop_extra: Удалять индексы, не описанные в схеме.
+    :return: Расхождения, найденные до приведения.
+    :raises DuplicateKeyError: В коллекции есть повторы ключей уникального индекса.
+    """
+
+    drift = check_indexes(collection, schema)
+    to_create = drift.missing + drift.mismatched
+    for spec in to_create:
+        duplicate = find_duplicate(collection, spec) if spec.unique else None
+        if duplicate is not None:
+            raise DuplicateKeyError(
+                f"{spec.name} has duplicate keys {duplicate}", code=11000
+            )
+
+    live = _live_indexes(collection)
+    for spec in drift.mismatched:
+        collection.drop_index(live[spec.keys][0])
+    if drop_extra:
+        for name in drift.extra:
+            collection.drop_index(name)
+
+    if to_create:
+        collection.create_indexes([spec.to_model() for spec in to_create])
+
+    return drift
@@ -0,0 +1,556 @@
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from vacancies.vacancies.aggregates import salary_value
+from vacancies.vacancies.changes import content_hash, field_hashes
+from vacancies.vacancies.incremental import to_timestamp
+from vacancies.vacancies.references import ReferenceCache
+from vacancies.vacancies.text import Lemmatizer, html_to_text, tokenize, words
+
+# поля вакансии, от которых зависит запись индекса
+INDEXED_FIELDS = (
+    "name",
+    "description_tokens",
+    "area",
+    "professional_roles",
+    "experience",
+    "key_skills",
+    "salary",
+    "salary_rub",
+    "published_at",
+)
+# фасеты: регион вакансии, регион под страной, роль, опыт, навык, зарплата
+AREA, REGION, ROLE, EXPERIENCE, SKILL, SALARY = (
+    "area",
+    "region",
+    "role",
+    "experience",
+    "skill",
+    "salary",
+)
+FACETS = (AREA, REGION, ROLE, EXPERIENCE, SKILL, SALARY)
+# границы диапазонов зарплаты (в рублях "на руки" за месяц) для фасета
+SALARY_RANGES = (50000, 100000, 150000, 200000, 300000, 500000)
+
+# символы, входящие в токены (C++, C#, .NET, node.js, CI-CD)
+_TOKENIZER = "unicode61 remove_diacritics 0 tokenchars '+#.-'"
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS vacancies (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    name TEXT,
+    area_id TEXT,
+    region_id TEXT,
+    experience TEXT,
+    salary REAL,
+    published_at INTEGER,
+    content_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vacancy_roles (
+    role TEXT NOT NULL,
+    vacancy INTEGER NOT NULL,
+    PRIMARY KEY (role, vacancy)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS vacancy_skills (
+    skill TEXT NOT NULL COLLATE NOCASE,
+    vacancy INTEGER NOT NULL,
+    PRIMARY KEY (skill, vacancy)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS search_text USING fts5(
+    name, skills, description, tokenize="{_TOKENIZER}"
+);
+"""
+# вторичные индексы создаются после массовой загрузки
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS vacancies_area ON vacancies (area_id);
+CREATE INDEX IF NOT EXISTS vacancies_region ON vacancies (region_id);
+CREATE INDEX IF NOT EXISTS vacancies_experience ON vacancies (experience);
+CREATE INDEX IF NOT EXISTS vacancies_salary ON vacancies (salary);
+CREATE INDEX IF NOT EXISTS vacancies_published ON vacancies (published_at);
+CREATE INDEX IF NOT EXISTS vacancy_roles_vacancy ON vacancy_roles (vacancy);
+CREATE INDEX IF NOT EXISTS vacancy_skills_vacancy ON vacancy_skills (vacancy);
+"""
+
+
+@dataclass
+class SearchResult:
+    """
+    Результат поиска вакансий.
+    """
+
+    # количество найденных вакансий
+    total: int
+    # идентификаторы вакансий страницы результатов
+    ids: List[str]
+    # значения фасетов с количеством вакансий (по убыванию количества)
+    facets: Dict[str, List[Tuple[str, int]]] = field(default_factory=dict)
+    # время выполнения запроса (в миллисекундах)
+    elapsed_ms: float = 0.0
+
+
+def _reference_id(value: Any) -> Optional[str]:
+    return str(value["id"]) if isinstance(value, dict) and value.get("id") else None
+
+
+def _published(value: Any) -> Optional[int]:
+    # в выгрузке Parquet дата публикации – datetime, в MongoDB – строка
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+
+    return to_timestamp(value)
+
+
+def salary_ranges() -> List[str]:
+    """
+    Диапазоны зарплаты для фасета.
+
+    :return: Диапазоны вида ``100000-150000`` (``500000+`` – выше последней границы).
+    """
+
+    lower = [0, *SALARY_RANGES]
+
+    return [f"{start}-{end}" for start, end in zip(lower, SALARY_RANGES)] + [
+        f"{SALARY_RANGES[-1]}+"
+    ]
+
+
+# номер диапазона зарплаты для фасета
+_SALARY_RANGE = (
+    "CASE "
+    + " ".join(
+        f"WHEN v.salary < {upper} THEN {number}"
+        for number, upper in enumerate(SALARY_RANGES)
+    )
+    + f" ELSE {len(SALARY_RANGES)} END"
+)
+
+
+class SearchIndex:
+    """
+    Локальный полнотекстовый индекс вакансий с фасетами (SQLite FTS5).
+
+    Индексируются токены названия, навыков и описания (``description_tokens``
+    из ``TextPipeline``, поэтому запросы на русском находят все формы слова).
+    Регион, регион под страной, опыт и зарплата хранятся в столбцах с индексами,
+    роли и навыки – в отдельных таблицах, поэтому отбор по ним и подсчет
+    фасетов выполняются по индексам без просмотра всех вакансий.
+
+    Вакансии добавляются по одной (``add``) в буфер и записываются пакетами
+    (``commit`` можно выполнять в пуле потоков); неизменившиеся вакансии
+    не переиндексируются. Индекс целиком
+    пересобирается из выгрузки или коллекции методом ``rebuild``.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        references: Optional[ReferenceCache] = None,
+        buffer_size: int = 500,
+    ) -> None:
+        """
+        :param path: Путь к файлу базы данных.
+        :param references: Кэш справочников (регион под страной для фасета).
+        :param buffer_size: Количество вакансий, после которого нужна запись.
+        """
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.references = references
+        self.buffer_size = buffer_size
+        self._buffer: Dict[str, Dict[str, Any]] = {}
+        self._lemmatizer: Optional[Lemmatizer] = None
+        self._lock = threading.Lock()
+        self._connection = self._connect(path)
+        self._connection.executescript(_SCHEMA + _INDEXES)
+        self._connection.commit()
+
+    @staticmethod
+    def _connect(path: str) -> sqlite3.Connection:
+        # запись выполняется в потоках пула, поэтому соединение не привязано к потоку
+        connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+
+        return connection
+
+    @property
+    def lemmatizer(self) -> Lemmatizer:
+        if self._lemmatizer is None:
+            self._lemmatizer = Lemmatizer()
+
+        return self._lemmatizer
+
+    def add(self, document: Dict[str, Any]) -> bool:
+        """
+        Добавление (обновление) вакансии в буфер индекса.
+
+        :param document: Документ вакансии.
+        :return: Признак заполнения буфера (нужно выполнить ``commit``).
+        """
+
+        with self._lock:
+            self._buffer[str(document["id"])] = document
+
+            return len(self._buffer) >= self.buffer_size
+
+    def commit(self) -> None:
+        """
+        Запись буфера вакансий в одной транзакции.
+
+        :return:
+        """
+
+        with self._lock:
+            buffer, self._buffer = self._buffer, {}
+        if not buffer:
+            return
+
+        rows = [self._row(document) for document in buffer.values()]
+        with self._lock, self._connection:
+            stored = dict(
+                self._connection.execute(
+                    "SELECT id, content_hash FROM vacancies WHERE id IN "
+                    f"({', '.join('?' for _ in rows)})",
+                    [row["id"] for row in rows],
+                ).fetchall()
+            )
+            changed = [row for row in rows if stored.get(row["id"]) != row["hash"]]
+            for row in changed:
+                if row["id"] in stored:
+                    self._delete(row["id"])
+            self._insert(changed)
+
+    def rebuild(
+        self, documents: Iterable[Dict[str, Any]], batch_size: int = 10000
+    ) -> int:
+        """
+        Пересборка индекса в массовом режиме.
+
+        Индекс строится в новом файле без журнала и вторичных индексов, которые
+        создаются после загрузки всех вакансий, затем файл заменяет текущий.
+        Индекс не должен использоваться другими процессами во время пересборки.
+
+        :param documents: Документы вакансий (из выгрузки или коллекции).
+        :param batch_size: Количество вакансий в одной транзакции.
+        :return: Количество вакансий в индексе.
+        """
+
+        self.commit()
+        self._connection.close()
+
+        temp_path = f"{self.path}.rebuild"
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(temp_path + suffix):
+                os.remove(temp_path + suffix)
+        connection = sqlite3.connect(temp_path)
+        connection.execute("PRAGMA journal_mode=OFF")
+        connection.execute("PRAGMA synchronous=OFF")
+        connection.executescript(_SCHEMA)
+        self._connection = connection
+
+        count = 0
+        rows: List[Dict[str, Any]] = []
+        for document in documents:
+            rows.append(self._row(document))
+            if len(rows) >= batch_size:
+                with connection:
+                    self._insert(rows)
+                count += len(rows)
+                rows = []
+        with connection:
+            self._insert(rows)
+        count += len(rows)
+
+        connection.executescript(_INDEXES)
+        connection.execute("INSERT INTO search_text (search_text) VALUES ('optimize')")
+        connection.execute("ANALYZE")
+        connection.commit()
+        connection.close()
+
+        os.replace(temp_path, self.path)
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+        self._connection = self._connect(self.path)
+
+        return count
+
+    def search(
+        self,
+        text: Optional[str] = None,
+        areas: Sequence[str] = (),
+        roles: Sequence[str] = (),
+        experience: Sequence[str] = (),
+        skills: Sequence[str] = (),
+        salary_min: Optional[float] = None,
+        salary_max: Optional[float] = None,
+        limit: int = 20,
+        offset: int = 0,
+        facets: Sequence[str] = FACETS,
+        facet_limit: int = 10,
+    ) -> SearchResult:
+        """
+        Поиск вакансий.
+
+        :param text: Слова, которые должны встречаться в названии, навыках
+            или описании (приводятся к леммам, как токены описания).
+        :param areas: Регионы (регион вакансии или регион под страной – любой из).
+        :param roles: Профессиональные роли (любая из).
+        :param experience: Значения справочника опыта работы (любое из).
+        :param skills: Навыки (все).
+        :param salary_min: Нижняя граница зарплаты (``aggregates.salary_value``).
+        :param salary_max: Верхняя граница зарплаты.
+        :param limit: Количество вакансий на странице результатов.
+        :param offset: Смещение страницы результатов.
+        :param facets: Подсчитываемые фасеты (``FACETS``).
+        :param facet_limit: Количество значений каждого фасета.
+        :return: Вакансии по релевантности (без текста – по дате публикации).
+        """
+
+        started_at = time.perf_counter()
+        self.commit()
+
+        conditions: List[str] = []
+        params: List[Any] = []
+        if areas:
+            placeholders = ", ".join("?" for _ in areas)
+            conditions.append(
+                f"(v.area_id IN ({placeholders}) OR v.region_id IN ({placeholders}))"
+            )
+            params.extend([*areas, *areas])
+        if experience:
+            conditions.append(f"v.experience IN ({', '.join('?' for _ in experience)})")
+            params.extend(experience)
+        if salary_min is not None:
+            conditions.append("v.salary >= ?")
+            params.append(salary_min)
+        if salary_max is not None:
+            conditions.append("v.salary <= ?")
+            params.append(salary_max)
+        if roles:
+            conditions.append(
+                "v.rowid IN (SELECT vacancy FROM vacancy_roles WHERE role IN "
+                f"({', '.join('?' for _ in roles)}))"
+            )
+            params.extend(roles)
+        for skill in skills:
+            conditions.append(
+                "v.rowid IN (SELECT vacancy FROM vacancy_skills WHERE skill = ?)"
+            )
+            params.append(skill)
+
+        terms = tokenize(text, self.lemmatizer) if text else []
+        if terms:
+            source = "search_text JOIN vacancies v ON v.rowid = search_text.rowid"
+            conditions.insert(0, "search_text MATCH ?")
+            params.insert(0, " ".join(f'"{term}"' for term in terms))
+            rank = "bm25(search_text, 5.0, 3.0, 1.0)"
+        else:
+            source = "vacancies v"
+            rank = "-v.published_at"
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        connection = self._connection
+        if not conditions:
+            # без условий фасеты считаются по индексам всех вакансий
+            (total,) = connection.execute("SELECT COUNT(*) FROM vacancies").fetchone()
+            ids = connection.execute(
+                "SELECT id FROM vacancies ORDER BY published_at DESC LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+        else:
+            connection.execute("DROP TABLE IF EXISTS temp.hits")
+            connection.execute(
+                "CREATE TEMP TABLE hits (vacancy INTEGER PRIMARY KEY, rank REAL, "
+                "area_id TEXT, region_id TEXT, experience TEXT, salary REAL)"
+            )
+            # столбцы фасетов копируются, чтобы не читать вакансии повторно
+            connection.execute(
+                f"INSERT INTO hits SELECT v.rowid, {rank}, v.area_id, v.region_id, "
+                f"v.experience, v.salary FROM {source} {where}",
+                params,
+            )
+            (total,) = connection.execute("SELECT COUNT(*) FROM hits").fetchone()
+            ids = connection.execute(
+                "SELECT v.id FROM hits CROSS JOIN vacancies v "
+                "ON v.rowid = hits.vacancy ORDER BY hits.rank LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+
+        result = SearchResult(
+            total=int(total), ids=[str(vacancy_id) for vacancy_id, in ids]
+        )
+        for facet in facets:
+            result.facets[facet] = self._facet(facet, facet_limit, bool(conditions))
+        if conditions:
+            connection.execute("DROP TABLE temp.hits")
+        result.elapsed_ms = round((time.perf_counter() - started_at) * 1000, 2)
+
+        return result
+
+    def _facet(self, facet: str, limit: int, filtered: bool) -> List[Tuple[str, int]]:
+        """
+        Значения фасета с количеством найденных вакансий.
+
+        :param facet: Фасет (``FACETS``).
+        :param limit: Количество значений.
+        :param filtered: Найденные вакансии – в таблице ``hits`` (иначе – все).
+        :return:
+        """
+
+        if facet in (ROLE, SKILL):
+            table, column = (
+                ("vacancy_roles", "role")
+                if facet == ROLE
+                else ("vacancy_skills", "skill")
+            )
+            value = column = f"t.{column}"
+            source = (
+                f"hits CROSS JOIN {table} t ON t.vacancy = hits.vacancy"
+                if filtered
+                else f"{table} t"
+            )
+        else:
+            value = {
+                AREA: "v.area_id",
+                REGION: "v.region_id",
+                EXPERIENCE: "v.experience",
+                SALARY: _SALARY_RANGE,
+            }[facet]
+            source = "hits v" if filtered else "vacancies v"
+            column = "v.salary" if facet == SALARY else value
+        query = (
+            f"SELECT {value}, COUNT(*) FROM {source} "
+            f"WHERE {column} IS NOT NULL GROUP BY 1"
+        )
+        if facet == SALARY:
+            # диапазоны зарплаты – по возрастанию
+            ranges = salary_ranges()
+            return [
+                (ranges[number], int(count))
+                for number, count in self._connection.execute(f"{query} ORDER BY 1")
+            ]
+
+        return [
+            (str(value), int(count))
+            for value, count in self._connection.execute(
+                f"{query} ORDER BY 2 DESC LIMIT ?", (limit,)
+            )
+        ]
+
+    def _row(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Запись индекса для вакансии.
+
+        :param document: Документ вакансии.
+        :return:
+        """
+
+        values = {name: document.get(name) for name in INDEXED_FIELDS}
+        name = document.get("name") or ""
+        tokens = document.get("description_tokens")
+        if tokens is None:
+            tokens = words(html_to_text(document.get("description") or ""))
+        skills = [
+            str(skill["name"])
+            for skill in document.get("key_skills") or []
+            if isinstance(skill, dict) and skill.get("name")
+        ]
+        area_id = _reference_id(document.get("area"))
+        # в выгрузке Parquet регион под страной – столбец разбиения
+        region_id = document.get("region_id")
+        if region_id is not None:
+            region_id = str(region_id)
+        elif area_id is not None:
+            region_id = (
+                self.references.region(area_id)
+                if self.references is not None
+                else area_id
+            )
+
+        return {
+            "id": str(document["id"]),
+            "hash": content_hash(field_hashes(values)),
+            "name": name,
+            "area_id": area_id,
+            "region_id": region_id,
+            "experience": _reference_id(document.get("experience")),
+            "salary": salary_value(document),
+            "published_at": _published(document.get("published_at")),
+            "roles": {
+                role
+                for role in map(_reference_id, document.get("professional_roles") or [])
+                if role
+            },
+            "skills": set(skills),
+            "text": (
+                " ".join(tokenize(name, self.lemmatizer)),
+                " ".join(skill.lower() for skill in skills),
+                " ".join(tokens),
+            ),
+        }
+
+    def _insert(self, rows: List[Dict[str, Any]]) -> None:
+        connection = self._connection
+        for row in rows:
+            cursor = connection.execute(
+                "INSERT INTO vacancies (id, name, area_id, region_id, experience, "
+                "salary, published_at, content_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    row["id"],
+                    row["name"],
+                    row["area_id"],
+                    row["region_id"],
+                    row["experience"],
+                    row["salary"],
+                    row["published_at"],
+                    row["hash"],
+                ),
+            )
+            rowid = cursor.lastrowid
+            connection.execute(
+                "INSERT INTO search_text (rowid, name, skills, description) "
+                "VALUES (?, ?, ?, ?)",
+                (rowid, *row["text"]),
+            )
+            connection.executemany(
+                "INSERT OR IGNORE INTO vacancy_roles (role, vacancy) VALUES (?, ?)",
+                ((role, rowid) for role in row["roles"]),
+            )
+            connection.executemany(
+                "INSERT OR IGNORE INTO vacancy_skills (skill, vacancy) VALUES (?, ?)",
+                ((skill, rowid) for skill in row["skills"]),
+            )
+
+    def _delete(self, vacancy_id: str) -> None:
+        connection = self._connection
+        (rowid,) = connection.execute(
+            "SELECT rowid FROM vacancies WHERE id = ?", (vacancy_id,)
+        ).fetchone()
+        connection.execute("DELETE FROM search_text WHERE rowid = ?", (rowid,))
+        connection.execute("DELETE FROM vacancy_roles WHERE vacancy = ?", (rowid,))
+        connection.execute("DELETE FROM vacancy_skills WHERE vacancy = ?", (rowid,))
+        connection.execute("DELETE FROM vacancies WHERE rowid = ?", (rowid,))
+
+    def close(self) -> None:
+        self.commit()
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self) -> int:
+        self.commit()
+        with self._lock:
+            (count,) = self._connection.execute(
+                "SELECT COUNT(*) FROM vacancies"
+            ).fetchone()
+
+        return int(count)
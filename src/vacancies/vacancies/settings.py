@@ -11,6 +11,10 @@ BOT_NAME = "vacancies"
 
 SPIDER_MODULES = ["vacancies.vacancies.spiders"]
 NEWSPIDER_MODULE = "vacancies.vacancies.spiders"
+COMMANDS_MODULE = "vacancies.vacancies.commands"
+
+# Base URL of the hh.ru API (override to crawl a local stand-in)
+HH_API_URL = "https://api.hh.ru"
 
 
 # Crawl responsibly by identifying yourself (and your website) on the user-agent
@@ -20,14 +24,15 @@ NEWSPIDER_MODULE = "vacancies.vacancies.spiders"
 ROBOTSTXT_OBEY = True
 
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
-# CONCURRENT_REQUESTS = 32
+CONCURRENT_REQUESTS = 16
 
 # Configure a delay for requests for the same website (default: 0)
 # See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
 # See also autothrottle settings and docs
-DOWNLOAD_DELAY = 0.75
+# The request rate is controlled by RateLimitMiddleware (see RATELIMIT_* below)
+DOWNLOAD_DELAY = 0
 # The download delay setting will honor only one of:
-# CONCURRENT_REQUESTS_PER_DOMAIN = 16
+CONCURRENT_REQUESTS_PER_DOMAIN = 16
 # CONCURRENT_REQUESTS_PER_IP = 16
 
 # Disable cookies (enabled by default)
@@ -44,32 +49,185 @@ DOWNLOAD_DELAY = 0.75
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-# SPIDER_MIDDLEWARES = {
-#    'vacancies.middlewares.VacanciesSpiderMiddleware': 543,
-# }
+SPIDER_MIDDLEWARES = {
+    "vacancies.vacancies.middlewares.CrawlStateMiddleware": 900,
+    "vacancies.vacancies.middlewares.ResponseArchiveMiddleware": 950,
+    "vacancies.vacancies.middlewares.MetricsMiddleware": 990,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 DOWNLOADER_MIDDLEWARES = {
     "scrapy.downloadermiddlewares.useragent.UserAgentMiddleware": None,
     "scrapy_user_agents.middlewares.RandomUserAgentMiddleware": 400,
+    # cached responses are served before the rate limiter takes a token
+    "scrapy.downloadermiddlewares.httpcache.HttpCacheMiddleware": None,
+    "vacancies.vacancies.httpcache.ApiCacheMiddleware": 560,
+    "vacancies.vacancies.middlewares.RateLimitMiddleware": 580,
 }
 
+# Token bucket per host and API token: the maximum safe rate (requests per
+# second) and burst; on 429/403/captcha responses the rate is multiplied by
+# the backoff factor and requests pause for Retry-After or an exponentially
+# growing delay (rejections received during the pause only extend it), then the
+# rate is raised by the recovery step after every window of successes
+RATELIMIT_ENABLED = True
+RATELIMIT_RATE = 4.0
+RATELIMIT_BURST = 4.0
+RATELIMIT_MIN_RATE = 0.2
+RATELIMIT_BACKOFF_FACTOR = 0.5
+RATELIMIT_BACKOFF_DELAY = 5.0
+RATELIMIT_MAX_BACKOFF_DELAY = 300.0
+RATELIMIT_RECOVERY_STEP = 0.25
+RATELIMIT_RECOVERY_WINDOW = 5
+RATELIMIT_HTTP_CODES = [429, 403]
+RATELIMIT_MAX_RETRIES = 5
+
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
 # EXTENSIONS = {
 #    'scrapy.extensions.telnet.TelnetConsole': None,
 # }
+EXTENSIONS = {
+    "vacancies.vacancies.extensions.MetricsExtension": 500,
+}
+
+# Per-callback histograms of download latency, parse CPU time, payload size,
+# items emitted and pipeline time, plus queue depth and memory sampled over
+# time; snapshots are appended to a JSON Lines file in the project data
+# directory and, when the port is set, served in the Prometheus text format.
+# A share of the listed callbacks' calls can be run under cProfile (the
+# accumulated profile is saved in pstats format next to the snapshots)
+METRICS_ENABLED = True
+METRICS_FILE = "metrics.jsonl"
+METRICS_INTERVAL = 60.0
+METRICS_SAMPLE_INTERVAL = 5.0
+METRICS_PROMETHEUS_PORT = 0
+METRICS_PROMETHEUS_HOST = "127.0.0.1"
+METRICS_PROFILE_RATE = 0.0
+METRICS_PROFILE_CALLBACKS = ["parse_pages", "parse_items", "parse_detail"]
+METRICS_PROFILE_FILE = "profile.pstats"
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 ITEM_PIPELINES = {
-    "vacancies.pipelines.MongoDBPipeline": 300,
+    "vacancies.vacancies.pipelines.SalaryPipeline": 100,
+    "vacancies.vacancies.pipelines.TextPipeline": 200,
+    "vacancies.vacancies.pipelines.DuplicatesPipeline": 250,
+    "vacancies.vacancies.pipelines.MongoDBPipeline": 300,
+    "vacancies.vacancies.pipelines.SearchPipeline": 400,
 }
 
+# Salary converted to net monthly RUB (salary_rub) by the currency rates of
+# the /dictionaries reference on the publication date
+SALARY_ENABLED = True
+
+# Clean text and lemmatized tokens of vacancy descriptions, processed in a pool
+# of worker processes (0 to use the reactor thread pool); the results are
+# cached by the description hash in this file of the project data directory
+TEXT_ENABLED = True
+TEXT_WORKERS = 2
+TEXT_CACHE_FILE = "text_cache.sqlite"
+
+# Near-duplicate vacancies: MinHash signatures of description shingles are kept
+# in an LSH index (SQLite file in the project data directory); vacancies with
+# an estimated Jaccard similarity of at least the threshold share
+# duplicate_cluster (rebuild the index with "scrapy duplicates --rebuild");
+# index writes are committed after this number of vacancies
+DUPLICATES_ENABLED = True
+DUPLICATES_FILE = "duplicates.sqlite"
+DUPLICATES_THRESHOLD = 0.8
+DUPLICATES_BUFFER_SIZE = 500
+
+# Local full-text and faceted search index (SQLite FTS5 file in the project
+# data directory) updated per vacancy; index writes are committed after this
+# number of vacancies (query it with "scrapy search", rebuild it from
+# the export or the collection with "scrapy search --rebuild")
+SEARCH_ENABLED = True
+SEARCH_FILE = "search.sqlite"
+SEARCH_BUFFER_SIZE = 500
+
+# Batched MongoDB writes: the number of upserts in one bulk_write call,
+# the interval (in seconds) for flushing an incomplete batch and
+# the number of batches being written at the same time
+MONGODB_BULK_SIZE = 500
+MONGODB_BULK_INTERVAL = 5.0
+MONGODB_BULK_MAX_PENDING = 2
+# Check the indexes of the vacancies, history and aggregates collections against
+# the schema when the spider is opened and warn about drift; indexes are created
+# and rebuilt by "scrapy indexes --apply" only
+MONGODB_CHECK_INDEXES = True
+# Store content hashes in the documents and skip unchanged vacancies; changed
+# ones are written as field-level $set/$unset updates. Hashes of the most
+# recently published vacancies are kept in an in-memory LRU cache of this size
+MONGODB_SKIP_UNCHANGED = True
+MONGODB_HASH_CACHE_SIZE = 100000
+# Collection of vacancy changes (previous values of the changed fields, see
+# VacancyHistory); requires MONGODB_SKIP_UNCHANGED, empty to disable
+MONGODB_HISTORY_COLLECTION = "vacancies_history"
+# Collection of incrementally maintained aggregates: vacancy counts, salary
+# histograms per skill, area and professional role and skill co-occurrence
+# (see Aggregates); requires MONGODB_SKIP_UNCHANGED, empty to disable. Rebuild
+# it with "scrapy aggregates --rebuild" after enabling it on existing data
+MONGODB_AGGREGATES_COLLECTION = "aggregates"
+
+# Incremental crawl (scrapy crawl vacancies -a incremental=1): when date_from
+# is not given, parse vacancies published since the latest stored one minus
+# this overlap (in hours)
+INCREMENTAL_OVERLAP_HOURS = 24
+
+# Search queries with more than 2000 results are split by publication date
+# windows down to this size (in minutes) and then by professional roles;
+# the learned splits are cached in this file of the project data directory
+PARTITIONS_MIN_WINDOW_MINUTES = 60
+PARTITIONS_CACHE_FILE = "partitions.json"
+
+# Cache of the /areas, /dictionaries and /professional_roles references in the
+# project data directory; stale references are revalidated with If-None-Match
+REFERENCES_DIR = "references"
+REFERENCES_TTL_HOURS = 24
+
+# Crawl state store (SQLite file in the project data directory): scheduled and
+# processed requests are recorded so an interrupted crawl resumes where it
+# stopped; the state is cleared when the crawl finishes
+CRAWL_STATE_ENABLED = True
+CRAWL_STATE_FILE = "crawl_state.sqlite"
+CRAWL_STATE_BUFFER_SIZE = 1000
+CRAWL_STATE_COMMIT_INTERVAL = 5.0
+CRAWL_STATE_LOG_INTERVAL = 60.0
+
+# Scheduler limiting the number of areas crawled at once: requests of further
+# areas wait in a temporary SQLite queue in the project data directory
+SCHEDULER = "vacancies.vacancies.scheduler.AreaScheduler"
+SCHEDULER_MAX_AREAS = 8
+SCHEDULER_OVERFLOW_FILE = "overflow.sqlite"
+
+# Sharded crawl ("scrapy shards" or scrapy crawl vacancies -a shards=1): the
+# Russian areas of a run are leased to crawling processes through a table in
+# SQLite (a file in the project data directory, processes of one node) or
+# MongoDB (processes of several nodes); a process leases this number of areas
+# at once and renews the leases, the areas of a stopped process are leased
+# again after the lease time (in seconds) expires
+SHARDS_BACKEND = "sqlite"
+SHARDS_FILE = "shards.sqlite"
+SHARDS_COLLECTION = "shards"
+SHARDS_LEASE_SECONDS = 300
+SHARDS_CONCURRENT = 4
+
+# Archive of raw API responses (gzip JSONL segments in the project data
+# directory) for offline re-parsing with "scrapy replay"
+ARCHIVE_ENABLED = False
+ARCHIVE_DIR = "archive"
+ARCHIVE_SEGMENT_SIZE = 256 * 1024 * 1024
+
+# JSON decoder for API responses: "msgspec", "orjson", "json" or "auto"
+# (the fastest installed one)
+JSON_DECODER = "auto"
+
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
-AUTOTHROTTLE_ENABLED = True
+# (disabled in favour of RateLimitMiddleware)
+AUTOTHROTTLE_ENABLED = False
 # The initial download delay
 AUTOTHROTTLE_START_DELAY = 5
 # The maximum download delay to be set in case of high latencies
@@ -82,8 +240,20 @@ AUTOTHROTTLE_DEBUG = True
 
 # Enable and configure HTTP caching (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
-# HTTPCACHE_ENABLED = True
-# HTTPCACHE_EXPIRATION_SECS = 0
-# HTTPCACHE_DIR = 'httpcache'
-# HTTPCACHE_IGNORE_HTTP_CODES = []
-# HTTPCACHE_STORAGE = 'scrapy.extensions.httpcache.FilesystemCacheStorage'
+# API responses are cached compressed in a single SQLite file in the project
+# data directory; stale ones are revalidated with If-None-Match and
+# If-Modified-Since. References are kept as long as REFERENCES_TTL_HOURS,
+# search pages briefly and vacancies while the published_at from the search
+# results is unchanged, but no longer than HTTPCACHE_DETAIL_TTL (the TTLs are
+# in seconds). Responses not stored or revalidated for HTTPCACHE_EXPIRATION_SECS
+# are removed from the file when the spider opens
+HTTPCACHE_ENABLED = True
+HTTPCACHE_DIR = "httpcache"
+HTTPCACHE_STORAGE = "vacancies.vacancies.httpcache.SQLiteCacheStorage"
+HTTPCACHE_POLICY = "vacancies.vacancies.httpcache.ApiCachePolicy"
+HTTPCACHE_REFERENCE_TTL = 24 * 60 * 60
+HTTPCACHE_LIST_TTL = 60 * 60
+HTTPCACHE_DETAIL_TTL = 24 * 60 * 60
+HTTPCACHE_EXPIRATION_SECS = 7 * 24 * 60 * 60
+HTTPCACHE_BUFFER_SIZE = 100
+HTTPCACHE_COMPRESSION_LEVEL = 6
@@ -0,0 +1,482 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import MongoClient, ReturnDocument, UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError
+from scrapy.exceptions import NotConfigured
+from scrapy.settings import BaseSettings
+from scrapy.utils.project import data_path
+
+from vacancies.vacancies.storage import connect
+
+# состояния шарда: ожидает обработки, захвачен процессом, обработан
+PENDING, LEASED, DONE = "pending", "leased", "done"
+
+
+def worker_name() -> str:
+    """
+    Имя процесса парсинга для таблицы аренд: узел и идентификатор процесса.
+
+    :return:
+    """
+
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def open_leases(settings: BaseSettings) -> "ShardLeases":
+    """
+    Открытие таблицы аренд по настройке ``SHARDS_BACKEND``.
+
+    :param settings: Настройки Scrapy.
+    :return:
+    """
+
+    backend = settings.get("SHARDS_BACKEND", "sqlite")
+    if backend == "sqlite":
+        return SQLiteShardLeases(
+            data_path(settings.get("SHARDS_FILE", "shards.sqlite"))
+        )
+    if backend == "mongodb":
+        client, mongodb_db = connect(settings)
+        collection = settings.get("SHARDS_COLLECTION", "shards")
+        return MongoShardLeases(
+            client[mongodb_db][collection],
+            client[mongodb_db][f"{collection}_vacancies"],
+            client=client,
+        )
+
+    raise NotConfigured(f"Unknown shards backend: {backend}.")
+
+
+class ShardLeases(ABC):
+    """
+    Таблица аренд шардов (регионов) для распределенного парсинга.
+
+    Координатор (первый запущенный процесс) записывает шарды запуска,
+    процессы парсинга захватывают их в аренду на ``ttl`` секунд и продлевают
+    аренду, пока обрабатывают шард. Аренда процесса, который остановился
+    аварийно, истекает, и шард захватывает другой процесс.
+
+    Идентификаторы вакансий, детальная информация о которых уже запрошена,
+    фиксируются для запуска, чтобы одна вакансия не загружалась в разных шардах.
+
+    Методы выполняют блокирующие обращения к хранилищу, поэтому паук вызывает
+    их в пуле потоков реактора.
+    """
+
+    @abstractmethod
+    def seed(self, run: str, shards: Iterable[str]) -> int:
+        """
+        Запись шардов запуска (существующие шарды не изменяются).
+
+        :param run: Идентификатор запуска.
+        :param shards: Идентификаторы шардов.
+        :return: Количество добавленных шардов.
+        """
+
+    @abstractmethod
+    def claim(self, run: str, owner: str, ttl: float, count: int = 1) -> List[str]:
+        """
+        Захват свободных шардов или шардов с истекшей арендой.
+
+        :param run: Идентификатор запуска.
+        :param owner: Имя процесса.
+        :param ttl: Срок аренды (в секундах).
+        :param count: Максимальное количество шардов.
+        :return: Идентификаторы захваченных шардов.
+        """
+
+    @abstractmethod
+    def renew(self, run: str, owner: str, ttl: float) -> int:
+        """
+        Продление аренды шардов процесса.
+
+        :param run: Идентификатор запуска.
+        :param owner: Имя процесса.
+        :param ttl: Срок аренды (в секундах).
+        :return: Количество шардов, аренда которых продлена.
+        """
+
+    @abstractmethod
+    def complete(self, run: str, owner: str, shards: Iterable[str]) -> None:
+        """
+        Отметка об обработке шардов.
+
+        :param run: Идентификатор запуска.
+        :param owner: Имя процесса.
+        :param shards: Идентификаторы шардов.
+        :return:
+        """
+
+    @abstractmethod
+    def release(self, run: str, owner: str) -> None:
+        """
+        Возврат необработанных шардов процесса (при остановке парсинга).
+
+        :param run: Идентификатор запуска.
+        :param owner: Имя процесса.
+        :return:
+        """
+
+    @abstractmethod
+    def progress(self, run: str) -> Dict[str, int]:
+        """
+        Количество шардов запуска по состояниям.
+
+        :param run: Идентификатор запуска.
+        :return:
+        """
+
+    @abstractmethod
+    def claim_vacancies(
+        self, run: str, shard: str, vacancy_ids: List[str]
+    ) -> List[str]:
+        """
+        Фиксация вакансий за шардом.
+
+        Вакансия достается шарду, который зафиксировал ее первым; при повторной
+        обработке шарда (после истечения аренды) его вакансии снова доступны.
+
+        :param run: Идентификатор запуска.
+        :param shard: Идентификатор шарда.
+        :param vacancy_ids: Идентификаторы вакансий.
+        :return: Идентификаторы вакансий, закрепленных за шардом.
+        """
+
+    @abstractmethod
+    def finish(self, run: str) -> None:
+        """
+        Удаление зафиксированных вакансий завершенного запуска.
+
+        :param run: Идентификатор запуска.
+        :return:
+        """
+
+    @abstractmethod
+    def reset(self, run: str) -> None:
+        """
+        Удаление шардов и вакансий запуска.
+
+        :param run: Идентификатор запуска.
+        :return:
+        """
+
+    def close(self) -> None:
+        pass
+
+
+class MongoShardLeases(ShardLeases):
+    """
+    Таблица аренд в MongoDB: процессы могут работать на разных узлах.
+
+    Захват шарда – атомарная операция ``find_one_and_update``.
+    """
+
+    def __init__(
+        self,
+        leases: Collection,
+        claims: Collection,
+        client: Optional[MongoClient] = None,
+    ) -> None:
+        """
+        :param leases: Коллекция шардов.
+        :param claims: Коллекция зафиксированных вакансий.
+        :param client: Клиент MongoDB, закрываемый вместе с таблицей.
+        """
+
+        self.leases = leases
+        self.claims = claims
+        self.client = client
+        self.leases.create_index([("run", 1), ("state", 1)])
+        self.claims.create_index("run")
+
+    def seed(self, run: str, shards: Iterable[str]) -> int:
+        operations = [
+            UpdateOne(
+                {"_id": f"{run}:{shard}"},
+                {
+                    "$setOnInsert": {
+                        "run": run,
+                        "shard": shard,
+                        "state": PENDING,
+                        "owner": None,
+                        "expires_at": 0.0,
+                    }
+                },
+                upsert=True,
+            )
+            for shard in shards
+        ]
+        if not operations:
+            return 0
+
+        return self.leases.bulk_write(operations, ordered=False).upserted_count
+
+    def claim(self, run: str, owner: str, ttl: float, count: int = 1) -> List[str]:
+        claimed = []
+        for _ in range(count):
+            now = time.time()
+            document = self.leases.find_one_and_update(
+                {
+                    "run": run,
+                    "$or": [
+                        {"state": PENDING},
+                        {"state": LEASED, "expires_at": {"$lt": now}},
+                    ],
+                },
+                {"$set": {"state": LEASED, "owner": owner, "expires_at": now + ttl}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if document is None:
+                break
+            claimed.append(document["shard"])
+
+        return claimed
+
+    def renew(self, run: str, owner: str, ttl: float) -> int:
+        result = self.leases.update_many(
+            {"run": run, "owner": owner, "state": LEASED},
+            {"$set": {"expires_at": time.time() + ttl}},
+        )
+
+        return result.modified_count
+
+    def complete(self, run: str, owner: str, shards: Iterable[str]) -> None:
+        self.leases.update_many(
+            {"run": run, "owner": owner, "shard": {"$in": list(shards)}},
+            {"$set": {"state": DONE}},
+        )
+
+    def release(self, run: str, owner: str) -> None:
+        self.leases.update_many(
+            {"run": run, "owner": owner, "state": LEASED},
+            {"$set": {"state": PENDING, "owner": None, "expires_at": 0.0}},
+        )
+
+    def progress(self, run: str) -> Dict[str, int]:
+        counts = {PENDING: 0, LEASED: 0, DONE: 0}
+        for document in self.leases.find({"run": run}, {"state": True}):
+            counts[document["state"]] += 1
+
+        return counts
+
+    def claim_vacancies(
+        self, run: str, shard: str, vacancy_ids: List[str]
+    ) -> List[str]:
+        if not vacancy_ids:
+            return []
+
+        documents = [
+            {"_id": f"{run}:{vacancy_id}", "run": run, "shard": shard}
+            for vacancy_id in vacancy_ids
+        ]
+        try:
+            self.claims.insert_many(documents, ordered=False)
+            return list(vacancy_ids)
+        except BulkWriteError as exc:
+            taken = {
+                documents[error["index"]]["_id"] for error in exc.details["writeErrors"]
+            }
+
+        # вакансии, зафиксированные этим же шардом при предыдущей обработке
+        own = {
+            document["_id"]
+            for document in self.claims.find(
+                {"_id": {"$in": list(taken)}, "shard": shard}, {"_id": True}
+            )
+        }
+
+        return [
+            vacancy_id
+            for vacancy_id, document in zip(vacancy_ids, documents)
+            if document["_id"] not in taken or document["_id"] in own
+        ]
+
+    def finish(self, run: str) -> None:
+        self.claims.delete_many({"run": run})
+
+    def reset(self, run: str) -> None:
+        self.leases.delete_many({"run": run})
+        self.finish(run)
+
+    def close(self) -> None:
+        if self.client is not None:
+            self.client.close()
+
+
+class SQLiteShardLeases(ShardLeases):
+    """
+    Таблица аренд в файле SQLite: процессы работают на одном узле.
+
+    Захват шарда выполняется в транзакции ``BEGIN IMMEDIATE``, которая
+    блокирует запись другим процессам. Соединение используется из разных потоков
+    пула реактора, обращения к нему выполняются под блокировкой.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: Путь к файлу базы данных.
+        """
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS leases (
+                run TEXT NOT NULL,
+                shard TEXT NOT NULL,
+                state TEXT NOT NULL,
+                owner TEXT,
+                expires_at REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (run, shard)
+            );
+            CREATE TABLE IF NOT EXISTS claims (
+                run TEXT NOT NULL,
+                vacancy_id TEXT NOT NULL,
+                shard TEXT NOT NULL,
+                PRIMARY KEY (run, vacancy_id)
+            ) WITHOUT ROWID;
+            """
+        )
+
+    def seed(self, run: str, shards: Iterable[str]) -> int:
+        with self._transaction():
+            before = self._connection.total_changes
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO leases (run, shard, state) VALUES (?, ?, ?)",
+                ((run, shard, PENDING) for shard in shards),
+            )
+            return self._connection.total_changes - before
+
+    def claim(self, run: str, owner: str, ttl: float, count: int = 1) -> List[str]:
+        with self._transaction():
+            now = time.time()
+            shards = [
+                shard
+                for shard, in self._connection.execute(
+                    "SELECT shard FROM leases WHERE run = ? AND (state = ? "
+                    "OR (state = ? AND expires_at < ?)) LIMIT ?",
+                    (run, PENDING, LEASED, now, count),
+                )
+            ]
+            self._connection.executemany(
+                "UPDATE leases SET state = ?, owner = ?, expires_at = ? "
+                "WHERE run = ? AND shard = ?",
+                ((LEASED, owner, now + ttl, run, shard) for shard in shards),
+            )
+
+        return shards
+
+    def renew(self, run: str, owner: str, ttl: float) -> int:
+        with self._transaction():
+            cursor = self._connection.execute(
+                "UPDATE leases SET expires_at = ? WHERE run = ? AND owner = ? "
+                "AND state = ?",
+                (time.time() + ttl, run, owner, LEASED),
+            )
+            return int(cursor.rowcount)
+
+    def complete(self, run: str, owner: str, shards: Iterable[str]) -> None:
+        with self._transaction():
+            self._connection.executemany(
+                "UPDATE leases SET state = ? WHERE run = ? AND owner = ? AND shard = ?",
+                ((DONE, run, owner, shard) for shard in shards),
+            )
+
+    def release(self, run: str, owner: str) -> None:
+        with self._transaction():
+            self._connection.execute(
+                "UPDATE leases SET state = ?, owner = NULL, expires_at = 0 "
+                "WHERE run = ? AND owner = ? AND state = ?",
+                (PENDING, run, owner, LEASED),
+            )
+
+    def progress(self, run: str) -> Dict[str, int]:
+        counts = {PENDING: 0, LEASED: 0, DONE: 0}
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT state, COUNT(*) FROM leases WHERE run = ? GROUP BY state",
+                (run,),
+            ).fetchall()
+        for state, count in rows:
+            counts[state] = int(count)
+
+        return counts
+
+    def claim_vacancies(
+        self, run: str, shard: str, vacancy_ids: List[str]
+    ) -> List[str]:
+        if not vacancy_ids:
+            return []
+
+        with self._transaction():
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO claims (run, vacancy_id, shard) VALUES (?, ?, ?)",
+                ((run, vacancy_id, shard) for vacancy_id in vacancy_ids),
+            )
+            placeholders = ", ".join("?" for _ in vacancy_ids)
+            own = {
+                vacancy_id
+                for vacancy_id, in self._connection.execute(
+                    f"SELECT vacancy_id FROM claims WHERE run = ? AND shard = ? "
+                    f"AND vacancy_id IN ({placeholders})",
+                    (run, shard, *vacancy_ids),
+                )
+            }
+
+        return [vacancy_id for vacancy_id in vacancy_ids if vacancy_id in own]
+
+    def finish(self, run: str) -> None:
+        with self._transaction():
+            self._connection.execute("DELETE FROM claims WHERE run = ?", (run,))
+
+    def reset(self, run: str) -> None:
+        with self._transaction():
+            self._connection.execute("DELETE FROM leases WHERE run = ?", (run,))
+            self._connection.execute("DELETE FROM claims WHERE run = ?", (run,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _transaction(self) -> "_Transaction":
+        return _Transaction(self._connection, self._lock)
+
+
+class _Transaction:
+    """
+    Транзакция SQLite с блокировкой записи на время выполнения.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, lock: threading.Lock) -> None:
+        self.connection = connection
+        self.lock = lock
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.lock.acquire()
+        try:
+            self.connection.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self.lock.release()
+            raise
+        return self.connection
+
+    def __exit__(self, exc_type: Optional[type], *args: object) -> None:
+        try:
+            self.connection.execute("ROLLBACK" if exc_type is not None else "COMMIT")
+        finally:
+            self.lock.release()
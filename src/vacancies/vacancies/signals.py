@@ -0,0 +1,18 @@
+# Сигналы проекта (в дополнение к сигналам Scrapy)
+
+# вакансия сохранена: MongoDB подтвердила запись элемента или запись не требуется,
+# так как вакансия не изменилась; аргументы – item, spider
+item_stored = object()
+
+# найдены вакансии, детальная информация о которых будет загружена (страница
+# результатов поиска); аргументы – vacancy_ids, spider
+vacancies_listed = object()
+
+# кластеры дубликатов других вакансий переименованы (вакансия, по которой был
+# назван кластер, перешла в другой кластер); аргументы – clusters, spider
+clusters_relabeled = object()
+
+# запрошена запись буферизированных вакансий (например, перед отметкой
+# об обработке шардов); обработчики возвращают Deferred, срабатывающий после
+# подтверждения записи; аргументы – spider
+items_flush_requested = object()
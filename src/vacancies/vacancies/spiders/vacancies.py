@@ -1,21 +1,49 @@
-import json
 import random
-from json import JSONDecodeError
-from typing import Any, Generator, List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Union,
+)
 
-from scrapy.http import TextResponse
+from scrapy import signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import DontCloseSpider
+from scrapy.http import Request, TextResponse
 from scrapy.spiders import Spider
-
-from vacancies.vacancies.items import (
-    Address,
-    AreaType,
-    Employer,
-    IdName,
-    KeySkill,
-    Metro,
-    Specialization,
-    VacancyItem,
+from scrapy.utils.project import data_path
+from twisted.internet import defer, task, threads
+
+from vacancies.vacancies.decoders import get_decoder
+from vacancies.vacancies.incremental import KnownVacancies
+from vacancies.vacancies.items import VacancyItem
+from vacancies.vacancies.mapping import SchemaError
+from vacancies.vacancies.partition import (
+    SEARCH_LIMIT,
+    Query,
+    QueryPartitioner,
+    query_url,
+)
+from vacancies.vacancies.pipelines import MongoDBPipeline
+from vacancies.vacancies.references import ENDPOINTS, ReferenceCache
+from vacancies.vacancies.sharding import (
+    DONE,
+    ShardLeases,
+    open_leases,
+    worker_name,
 )
+from vacancies.vacancies.signals import items_flush_requested, vacancies_listed
+from vacancies.vacancies.storage import connect
+
+# результат обработки списка вакансий: запросы или Deferred, срабатывающий
+# с запросами после фиксации вакансий за регионом
+Requests = Union[List[Request], defer.Deferred, None]
 
 
 class VacanciesSpider(Spider):
@@ -24,60 +52,415 @@ class VacanciesSpider(Spider):
     """
 
     name = "vacancies"
-    start_urls = ["https://api.hh.ru/areas"]
+    # адрес API (настройка HH_API_URL)
+    api_url = "https://api.hh.ru"
+    # приоритеты запросов по методам обработки: сначала загружается детальная
+    # информация о найденных вакансиях, затем следующие страницы результатов,
+    # и только затем выполняются новые поисковые запросы
+    request_priorities = {"parse_detail": 30, "parse_items": 20, "parse_pages": 10}
+
+    def __init__(
+        self,
+        *args: Any,
+        incremental: Optional[str] = None,
+        date_from: Optional[str] = None,
+        shards: Optional[str] = None,
+        run: Optional[str] = None,
+        **kwargs: Any,
+    ) -> None:
+        """
+        :param incremental: Загружать детальную информацию только о новых
+            и измененных вакансиях (``-a incremental=1``).
+        :param date_from: Нижняя граница даты публикации вакансий
+            (``-a date_from=2022-11-01``).
+        :param shards: Распределенный парсинг: регионы захватываются в аренду
+            через таблицу ``SHARDS_BACKEND`` (``-a shards=1``).
+        :param run: Идентификатор распределенного запуска, общий для всех
+            процессов (по умолчанию – текущая дата UTC).
+        """
 
-    @staticmethod
-    def _load_json(response: TextResponse) -> Optional[dict]:
+        super().__init__(*args, **kwargs)
+        self.incremental = str(incremental).lower() in {"1", "true", "yes"}
+        self.date_from = date_from
+        self.sharded = str(shards).lower() in {"1", "true", "yes"}
+        self.run = run or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        self.leases: Optional[ShardLeases] = None
+        # регионы, арендованные процессом и обрабатываемые в данный момент
+        self.shards: List[str] = []
+        self._owner = worker_name()
+        self._renewal: Optional[task.LoopingCall] = None
+        # выполняющаяся смена арендованных регионов
+        self._rotation: Optional[defer.Deferred] = None
+        self.known: Optional[KnownVacancies] = None
+        self.partitioner: QueryPartitioner
+        self.references: ReferenceCache
+        self.json_loads = get_decoder()
+        # справочники, загрузка которых уже запрашивалась в этом запуске
+        self._requested: Set[str] = set()
+
+    @classmethod
+    def from_crawler(
+        cls, crawler: Crawler, *args: Any, **kwargs: Any
+    ) -> "VacanciesSpider":
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        spider.json_loads = get_decoder(crawler.settings.get("JSON_DECODER"))
+        spider.api_url = crawler.settings.get("HH_API_URL", cls.api_url).rstrip("/")
+        spider.partitioner = QueryPartitioner(
+            cache_path=data_path(
+                crawler.settings.get("PARTITIONS_CACHE_FILE", "partitions.json")
+            ),
+            min_window=timedelta(
+                minutes=crawler.settings.getint("PARTITIONS_MIN_WINDOW_MINUTES", 60)
+            ),
+        )
+        spider.references = ReferenceCache(
+            data_path(crawler.settings.get("REFERENCES_DIR", "references")),
+            ttl=crawler.settings.getfloat("REFERENCES_TTL_HOURS", 24) * 60 * 60,
+        )
+        if spider.incremental:
+            spider.load_known()
+        if spider.sharded:
+            spider.leases = open_leases(crawler.settings)
+            crawler.signals.connect(spider.spider_opened, signal=signals.spider_opened)
+            crawler.signals.connect(spider.spider_idle, signal=signals.spider_idle)
+
+        return spider
+
+    def closed(self, reason: str) -> Optional[defer.Deferred]:
+        self.partitioner.save()
+        if self.leases is None:
+            return None
+
+        if self._renewal is not None and self._renewal.running:
+            self._renewal.stop()
+        leases = self.leases
+        # необработанные регионы сразу становятся доступны другим процессам
+        released = self._rotation or defer.succeed(None)
+        released.addCallback(
+            lambda _: threads.deferToThread(  # type: ignore[no-untyped-call]
+                leases.release, self.run, self._owner
+            )
+        )
+        released.addErrback(self._leases_failed, "release")
+        released.addBoth(lambda _: leases.close())
+
+        return released
+
+    def spider_opened(self, spider: Spider) -> None:
+        self._renewal = task.LoopingCall(self._renew_leases)
+        self._renewal.start(self._lease_seconds / 3, now=False)
+
+    def spider_idle(self, spider: Spider) -> None:
         """
-        Обработка ответа от сервера.
+        Завершение обработанных регионов и аренда следующих.
 
-        :param response: Ответ от сервера.
+        Паук простаивает, когда все запросы арендованных регионов обработаны.
+        Обращения к таблице аренд выполняются в пуле потоков, поэтому паук
+        не завершается, пока выполняется смена регионов: по ее окончании паук
+        либо продолжает работу с новыми регионами, либо завершается, если все
+        регионы запуска обработаны. Пока в запуске остаются регионы, арендованные
+        другими процессами, паук не завершается: аренда остановившегося процесса
+        истечет, и его регионы будут обработаны повторно.
+
+        :param spider: Паук.
+        :return:
+        """
+
+        if self.leases is None:
+            return
+
+        self._rotate()
+
+        raise DontCloseSpider
+
+    @property
+    def _lease_seconds(self) -> float:
+        return self.settings.getfloat("SHARDS_LEASE_SECONDS", 300)
+
+    def _renew_leases(self) -> Optional[defer.Deferred]:
+        if self.leases is None or not self.shards:
+            return None
+
+        renewed: defer.Deferred = threads.deferToThread(  # type: ignore[no-untyped-call]
+            self.leases.renew, self.run, self._owner, self._lease_seconds
+        )
+        renewed.addErrback(self._leases_failed, "renewal")
+
+        return renewed
+
+    def _leases_failed(self, failure: Any, action: str) -> None:
+        self.logger.error(f"Shard leases {action} failed: {failure.getErrorMessage()}")
+
+    def _rotate(self, areas: Optional[List[str]] = None) -> None:
+        """
+        Запуск смены арендованных регионов, если она еще не выполняется.
+
+        :param areas: Регионы запуска для записи в таблицу аренд.
+        :return:
+        """
+
+        if self._rotation is not None:
+            return
+
+        def finished(result: Any) -> None:
+            self._rotation = None
+
+        self._rotation = self._rotate_shards(areas)
+        self._rotation.addErrback(self._leases_failed, "rotation")
+        self._rotation.addBoth(finished)
+
+    @defer.inlineCallbacks
+    def _rotate_shards(
+        self, areas: Optional[List[str]] = None
+    ) -> Generator[defer.Deferred, Any, None]:
+        """
+        Завершение обработанных регионов, аренда следующих и формирование
+        их поисковых запросов.
+
+        Регион отмечается обработанным только после подтверждения записи
+        его вакансий (сигнал ``items_flush_requested``): иначе при аварийном
+        завершении процесса вакансии из буфера записи будут потеряны, а регион
+        не будет обработан повторно.
+
+        :param areas: Регионы запуска для записи в таблицу аренд.
         :return:
         """
 
+        leases = self.leases
+        assert leases is not None
+        if areas:
+            seeded = yield threads.deferToThread(  # type: ignore[no-untyped-call]
+                leases.seed, self.run, areas
+            )
+            self.logger.info(f"Run {self.run}: {seeded} areas added to the shards.")
+
+        if self.shards:
+            shards = list(self.shards)
+            yield self.crawler.signals.send_catch_log_deferred(
+                items_flush_requested, spider=self
+            )
+            yield threads.deferToThread(  # type: ignore[no-untyped-call]
+                leases.complete, self.run, self._owner, shards
+            )
+            self.crawler.stats.inc_value("shards/completed", len(shards), spider=self)
+            self.shards = [shard for shard in self.shards if shard not in shards]
+
+        claimed = []
+        count = self.settings.getint("SHARDS_CONCURRENT", 4) - len(self.shards)
+        if count > 0:
+            claimed = yield threads.deferToThread(  # type: ignore[no-untyped-call]
+                leases.claim, self.run, self._owner, self._lease_seconds, count
+            )
+        if claimed:
+            self.logger.info(f"Areas leased in run {self.run}: {', '.join(claimed)}.")
+            self.crawler.stats.inc_value("shards/leased", len(claimed), spider=self)
+            self.shards.extend(claimed)
+            for area_id in claimed:
+                for query in self.partitioner.initial(area_id, self.date_from):
+                    self.crawler.engine.crawl(self._follow_query(query))
+            return
+
+        progress = yield threads.deferToThread(  # type: ignore[no-untyped-call]
+            leases.progress, self.run
+        )
+        if self.shards or progress[DONE] < sum(progress.values()):
+            return
+
+        # все регионы запуска обработаны
+        yield threads.deferToThread(  # type: ignore[no-untyped-call]
+            leases.finish, self.run
+        )
+        self.crawler.engine.close_spider(self, "finished")
+
+    def load_known(self) -> None:
+        """
+        Загрузка индекса сохраненных вакансий для инкрементального парсинга.
+
+        Если нижняя граница даты публикации не задана, она вычисляется
+        по самой свежей сохраненной вакансии с запасом ``INCREMENTAL_OVERLAP_HOURS``.
+
+        :return:
+        """
+
+        client, mongodb_db = connect(self.settings)
         try:
-            result = json.loads(response.body)
-        except (TypeError, JSONDecodeError):
-            result = None
+            self.known = KnownVacancies.from_collection(
+                client[mongodb_db][MongoDBPipeline.collection]
+            )
+        finally:
+            client.close()
+
+        self.logger.info(f"Known vacancies count – {len(self.known)}.")
+        last_published = self.known.last_published
+        if not self.date_from and last_published is not None:
+            overlap = timedelta(
+                hours=self.settings.getint("INCREMENTAL_OVERLAP_HOURS", 24)
+            )
+            since = datetime.fromtimestamp(last_published, tz=timezone.utc) - overlap
+            self.date_from = since.strftime("%Y-%m-%d")
+            self.logger.info(
+                f"Vacancies published since {self.date_from} will be parsed."
+            )
 
-        return result
+    def start_requests(self) -> Iterable[Request]:
+        # справочники нужны для формирования и разбиения поисковых запросов
+        yield from self._follow_references()
+
+    def _follow_references(self) -> Iterable[Request]:
+        """
+        Загрузка устаревших справочников и запуск парсинга регионов.
+
+        Справочники загружаются по одному; актуальные справочники берутся из кэша
+        без обращения к API. Когда все справочники получены, формируются поисковые
+        запросы по регионам.
 
-    def parse(self, response: TextResponse, **kwargs: Any) -> Optional[Generator]:
+        :return:
         """
-        Парсинг данных о регионах.
+
+        for endpoint in ENDPOINTS:
+            if endpoint in self._requested or self.references.is_fresh(endpoint):
+                continue
+
+            self._requested.add(endpoint)
+            etag = self.references.etag(endpoint)
+            yield Request(
+                f"{self.api_url}/{endpoint}",
+                callback=self.parse_reference,
+                cb_kwargs={"endpoint": endpoint},
+                headers={"If-None-Match": etag} if etag else None,
+                meta={"handle_httpstatus_all": True},
+                dont_filter=True,
+            )
+            return
+
+        yield from self._follow_areas()
+
+    def parse_reference(
+        self, response: TextResponse, endpoint: str, **kwargs: Any
+    ) -> Optional[Generator]:
+        """
+        Сохранение справочника в кэш.
 
         :param response: Ответ от сервера.
+        :param endpoint: Название справочника.
         :param kwargs:
         :return:
         """
 
-        json_res = self._load_json(response)
-        if not isinstance(json_res, list) or len(json_res) < 1:
-            return None
+        json_res = self._load_json(response) if response.status == 200 else None
+        if response.status == 304:
+            self.references.touch(endpoint)
+            self.crawler.stats.inc_value("references/not_modified", spider=self)
+        elif json_res:
+            etag = response.headers.get("ETag")
+            self.references.store(
+                endpoint, json_res, etag.decode("latin-1") if etag else None
+            )
+            self.crawler.stats.inc_value("references/downloaded", spider=self)
+        else:
+            self.logger.warning(
+                f"Reference {endpoint} is not available (status {response.status}), "
+                "the cached version will be used."
+            )
+
+        yield from self._follow_references()
+
+        return None
+
+    def _follow_areas(self) -> Iterable[Request]:
+        """
+        Формирование поисковых запросов по регионам России.
+
+        :return:
+        """
+
+        roles = sorted(self.references.dictionary("professional_roles"))
+        if roles:
+            self.partitioner.roles = roles
+            # список ролей нужен и при продолжении прерванного парсинга
+            self.partitioner.save()
+        self.logger.info(f"Professional roles count – {len(self.partitioner.roles)}.")
 
         areas_ru: List = []
         area_ru_id = "113"  # Russia
-        for item in json_res:
+        for item in self.references.get("areas") or []:
             if item["id"] == area_ru_id:
                 areas_ru = item["areas"]
                 break
 
         if not areas_ru:
+            self.logger.error("Areas reference is not available.")
             return None
 
         areas_to_parse = list({area["id"] for area in areas_ru})
         random.shuffle(areas_to_parse)
         self.logger.info(f"Area IDs count – {len(areas_to_parse)}.")
 
+        if self.leases is not None:
+            # регионы арендуются в пуле потоков, их запросы добавляются
+            # в планировщик по окончании аренды
+            self._rotate(areas_to_parse)
+            return None
+
         # &industry=7&specialization=1
         # page = random.randint(0, 10)
         for area_id in areas_to_parse:
-            next_url = f"https://api.hh.ru/vacancies?per_page=100&area={area_id}"
-            yield response.follow(next_url, callback=self.parse_pages)
+            for query in self.partitioner.initial(area_id, self.date_from):
+                yield self._follow_query(query)
 
         return None
 
-    def parse_pages(self, response: TextResponse, **kwargs: Any) -> Optional[Generator]:
+    def _load_json(self, response: TextResponse) -> Optional[dict]:
+        """
+        Обработка ответа от сервера.
+
+        Тело ответа разбирается без преобразования в строку
+        реализацией, заданной настройкой ``JSON_DECODER``.
+
+        :param response: Ответ от сервера.
+        :return:
+        """
+
+        try:
+            result = self.json_loads(response.body)
+        except (TypeError, ValueError):
+            result = None
+
+        return result
+
+    def _follow(
+        self, url: str, callback: Callable, area: Optional[str], **kwargs: Any
+    ) -> Request:
+        """
+        Формирование запроса с приоритетом метода обработки.
+
+        Регион запроса (``meta["crawl_area"]``) используется планировщиком
+        для ограничения количества одновременно обрабатываемых регионов.
+
+        :param url: Ссылка запроса.
+        :param callback: Метод обработки ответа.
+        :param area: Идентификатор региона.
+        :param kwargs: Дополнительные параметры запроса.
+        :return:
+        """
+
+        return Request(
+            url,
+            callback=callback,
+            priority=self.request_priorities.get(callback.__name__, 0),
+            meta={"crawl_area": area},
+            **kwargs,
+        )
+
+    def _follow_query(self, query: Query) -> Request:
+        return self._follow(
+            query_url(query, api_url=self.api_url),
+            self.parse_pages,
+            query["area"],
+            cb_kwargs={"query": query},
+        )
+
+    def parse_pages(self, response: TextResponse, **kwargs: Any) -> Requests:
         """
         Парсинг списка вакансий в указанном регионе с пагинацией.
 
@@ -94,22 +477,36 @@ class VacanciesSpider(Spider):
         if not isinstance(json_res, dict) or pages < 1:
             return None
 
-        if len(json_res["items"]):
-            for item in json_res["items"]:
-                next_url = f"https://api.hh.ru/vacancies/{item['id']}"
-                yield response.follow(next_url, callback=self.parse_detail)
-
-        request_url = response.request.url
-        if not request_url:
-            return None
+        query: Optional[Query] = kwargs.get("query")
+        if query is not None:
+            if int(json_res["found"]) > SEARCH_LIMIT:
+                queries = self.partitioner.split(query)
+                if queries:
+                    self.crawler.stats.inc_value("partition/splits", spider=self)
+                    return [self._follow_query(sub_query) for sub_query in queries]
+
+                self.crawler.stats.inc_value("partition/truncated", spider=self)
+                self.logger.warning(
+                    f"Query {query} is truncated: {json_res['found']} vacancies found."
+                )
+            else:
+                self.partitioner.learn(query)
+
+        # нумерация страниц начинается с нуля, первая страница уже обработана
+        next_pages = [
+            self._follow(
+                query_url(query, page, self.api_url)
+                if query is not None
+                else f"{response.request.url}&page={page}",
+                self.parse_items,
+                response.meta.get("crawl_area"),
+            )
+            for page in range(1, pages)
+        ]
 
-        for page in range(1, pages + 1):
-            next_url = f"{request_url}&page={page}"
-            yield response.follow(next_url, callback=self.parse_items)
+        return self._follow_details(response, json_res["items"], next_pages)
 
-        return None
-
-    def parse_items(self, response: TextResponse, **kwargs: Any) -> Optional[Generator]:
+    def parse_items(self, response: TextResponse, **kwargs: Any) -> Requests:
         """
         Парсинг ссылок на вакансии с детальным описанием.
 
@@ -122,11 +519,91 @@ class VacanciesSpider(Spider):
         if not isinstance(json_res, dict) or len(json_res["items"]) < 1:
             return None
 
-        for item in json_res["items"]:
-            next_url = f"https://api.hh.ru/vacancies/{item['id']}"
-            yield response.follow(next_url, callback=self.parse_detail)
+        return self._follow_details(response, json_res["items"])
 
-        return None
+    def _follow_details(
+        self,
+        response: TextResponse,
+        items: List[dict],
+        following: Optional[List[Request]] = None,
+    ) -> Requests:
+        """
+        Формирование запросов детальной информации о вакансиях из списка.
+
+        В инкрементальном режиме пропускаются сохраненные и неизмененные вакансии.
+        При распределенном парсинге пропускаются вакансии, которые уже
+        запрошены при обработке других регионов (вакансия может быть найдена
+        в нескольких регионах): вакансии фиксируются за регионом в пуле потоков,
+        и метод возвращает ``Deferred``, срабатывающий со списком запросов.
+
+        :param response: Ответ от сервера со списком вакансий.
+        :param items: Вакансии из списка.
+        :param following: Запросы, добавляемые после запросов вакансий
+            (следующие страницы списка).
+        :return:
+        """
+
+        area = response.meta.get("crawl_area")
+        # дата публикации позволяет кэшу HTTP использовать сохраненный ответ,
+        # пока вакансия не изменилась
+        published = {}
+        for item in items or []:
+            if self.known is not None and not self.known.is_changed(
+                item["id"], item.get("published_at")
+            ):
+                self.crawler.stats.inc_value("incremental/skipped", spider=self)
+                continue
+            published[str(item["id"])] = item.get("published_at")
+        vacancy_ids = list(published)
+
+        if self.leases is not None and vacancy_ids:
+            claimed: defer.Deferred = threads.deferToThread(  # type: ignore[no-untyped-call]
+                self.leases.claim_vacancies, self.run, str(area), vacancy_ids
+            )
+            claimed.addCallback(self._claimed, vacancy_ids)
+            claimed.addCallback(self._detail_requests, area, published, following)
+            return claimed
+
+        return self._detail_requests(vacancy_ids, area, published, following)
+
+    def _claimed(self, claimed: List[str], vacancy_ids: List[str]) -> List[str]:
+        if len(claimed) < len(vacancy_ids):
+            self.crawler.stats.inc_value(
+                "shards/duplicates", len(vacancy_ids) - len(claimed), spider=self
+            )
+
+        return claimed
+
+    def _detail_requests(
+        self,
+        vacancy_ids: List[str],
+        area: Optional[str],
+        published: Dict[str, Optional[str]],
+        following: Optional[List[Request]] = None,
+    ) -> List[Request]:
+        """
+        Формирование запросов детальной информации о вакансиях.
+
+        :param vacancy_ids: Идентификаторы вакансий.
+        :param area: Идентификатор региона.
+        :param published: Даты публикации вакансий.
+        :param following: Запросы, добавляемые после запросов вакансий.
+        :return:
+        """
+
+        if vacancy_ids:
+            # хэши сохраненных версий вакансий страницы читаются одним запросом
+            self.crawler.signals.send_catch_log(
+                vacancies_listed, vacancy_ids=vacancy_ids, spider=self
+            )
+        requests = []
+        for vacancy_id in vacancy_ids:
+            next_url = f"{self.api_url}/vacancies/{vacancy_id}"
+            request = self._follow(next_url, self.parse_detail, area)
+            request.meta["published_at"] = published[vacancy_id]
+            requests.append(request)
+
+        return requests + (following or [])
 
     def parse_detail(
         self, response: TextResponse, **kwargs: Any
@@ -134,198 +611,27 @@ class VacanciesSpider(Spider):
         """
         Парсинг детальной информации о конкретной вакансии.
 
+        Ответ преобразуется в документ по схеме ``VacancyItem`` за один проход;
+        вакансии, не соответствующие схеме, пропускаются.
+
         :param response: Ответ от сервера.
         :param kwargs:
         :return:
         """
 
         json_res = self._load_json(response)
-        if not json_res:
+        if not isinstance(json_res, dict) or not json_res:
             return None
 
-        vacancy = VacancyItem()
-
-        keys = {
-            "id",
-            "premium",
-            "relations",
-            "name",
-            "insider_interview",
-            "response_letter_required",
-            "salary",
-            "allow_messages",
-            "contacts",
-            "description",
-            "accept_handicapped",
-            "accept_kids",
-            "archived",
-            "response_url",
-            "code",
-            "hidden",
-            "quick_responses_allowed",
-            "driver_license_types",
-            "accept_incomplete_resumes",
-            "published_at",
-            "created_at",
-            "initial_created_at",
-            "negotiations_url",
-            "suitable_resumes_url",
-            "apply_alternate_url",
-            "has_test",
-            "test",
-            "alternate_url",
-            "working_days",
-            "working_time_intervals",
-            "working_time_modes",
-            "accept_temporary",
-            "languages",
-        }
-
-        for key in keys:
-            vacancy[key] = json_res.get(key)
-
-        vacancy["billing_type"] = (
-            IdName(
-                id=json_res["billing_type"]["id"],
-                name=json_res["billing_type"]["name"],
-            )
-            if json_res["billing_type"]
-            else None
-        )
-        vacancy["area"] = (
-            AreaType(
-                id=json_res["area"]["id"],
-                name=json_res["area"]["name"],
-                url=json_res["area"]["url"],
-            )
-            if json_res["area"]
-            else None
-        )
-        vacancy["type"] = (
-            IdName(
-                id=json_res["type"]["id"],
-                name=json_res["type"]["name"],
-            )
-            if json_res["type"]
-            else None
-        )
-        vacancy["address"] = (
-            Address(
-                city=json_res["address"]["city"],
-                street=json_res["address"]["street"],
-                building=json_res["address"]["building"],
-                description=json_res["address"]["description"],
-                lat=json_res["address"]["lat"],
-                lng=json_res["address"]["lng"],
-                raw=json_res["address"]["raw"],
-                metro=Metro(
-                    station_name=json_res["address"]["metro"]["station_name"],
-                    line_name=json_res["address"]["metro"]["line_name"],
-                    station_id=json_res["address"]["metro"]["station_id"],
-                    line_id=json_res["address"]["metro"]["line_id"],
-                    lat=json_res["address"]["metro"]["lat"],
-                    lng=json_res["address"]["metro"]["lng"],
-                )
-                if json_res["address"]["metro"]
-                else None,
-                metro_stations=[
-                    Metro(
-                        station_name=metro["station_name"],
-                        line_name=metro["line_name"],
-                        station_id=metro["station_id"],
-                        line_id=metro["line_id"],
-                        lat=metro["lat"],
-                        lng=metro["lng"],
-                    )
-                    for metro in json_res["address"]["metro_stations"]
-                    if json_res["address"]["metro_stations"]
-                ]
-                if json_res["address"]["metro_stations"]
-                else None,
-            )
-            if json_res["address"]
-            else None
-        )
-        vacancy["experience"] = (
-            IdName(
-                id=json_res["experience"]["id"],
-                name=json_res["experience"]["name"],
-            )
-            if json_res["experience"]
-            else None
-        )
-        vacancy["schedule"] = (
-            IdName(
-                id=json_res["schedule"]["id"],
-                name=json_res["schedule"]["name"],
-            )
-            if json_res["schedule"]
-            else None
-        )
-        vacancy["employment"] = (
-            IdName(
-                id=json_res["employment"]["id"],
-                name=json_res["employment"]["name"],
-            )
-            if json_res["employment"]
-            else None
-        )
-        vacancy["department"] = (
-            IdName(
-                id=json_res["department"]["id"],
-                name=json_res["department"]["name"],
-            )
-            if json_res["department"]
-            else None
-        )
-
-        # содержит исходный код с текстом из description
-        # vacancy["branded_description"] = json_res["branded_description"]
-
-        vacancy["vacancy_constructor_template"] = json_res[
-            "vacancy_constructor_template"
-        ]
-        vacancy["key_skills"] = (
-            [KeySkill(name=skill["name"]) for skill in json_res["key_skills"]]
-            if json_res["key_skills"]
-            else None
-        )
-        vacancy["specializations"] = (
-            [
-                Specialization(
-                    id=specialization["id"],
-                    name=specialization["name"],
-                    profarea_id=specialization["profarea_id"],
-                    profarea_name=specialization["profarea_name"],
-                )
-                for specialization in json_res["specializations"]
-            ]
-            if json_res["specializations"]
-            else None
-        )
-        vacancy["professional_roles"] = (
-            [
-                IdName(
-                    id=role["id"],
-                    name=role["name"],
-                )
-                for role in json_res["professional_roles"]
-            ]
-            if json_res["professional_roles"]
-            else None
-        )
-        vacancy["employer"] = (
-            Employer(
-                id=json_res["employer"].get("id"),
-                name=json_res["employer"].get("name"),
-                url=json_res["employer"].get("url"),
-                alternate_url=json_res["employer"].get("alternate_url"),
-                logo_urls=json_res["employer"].get("logo_urls"),
-                vacancies_url=json_res["employer"].get("vacancies_url"),
-                trusted=json_res["employer"].get("trusted"),
+        try:
+            vacancy = VacancyItem(json_res)
+        except SchemaError as exc:
+            self.crawler.stats.inc_value("schema/invalid", spider=self)
+            self.logger.warning(
+                f"Vacancy {response.url} does not match the schema: {exc}"
             )
-            if json_res["employer"]
-            else None
-        )
+            return None
 
         yield vacancy
+
+        return None
@@ -0,0 +1,280 @@
+import os
+import time
+from typing import Any, Callable, List, Optional, Set, Tuple
+
+import pymongo
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError, PyMongoError
+from pymongo.results import BulkWriteResult
+from scrapy import Spider
+from scrapy.exceptions import NotConfigured
+from scrapy.settings import BaseSettings
+from scrapy.statscollectors import StatsCollector
+from twisted.internet import defer, task, threads
+
+# функции подтверждения записи операции и ошибки ее записи
+Callbacks = Tuple[Optional[Callable[[], Any]], Optional[Callable[[], Any]]]
+
+
+def connect(settings: BaseSettings) -> Tuple[pymongo.MongoClient, str]:
+    """
+    Подключение к MongoDB по настройкам проекта.
+
+    Значения переменных окружения ``MONGODB_URI`` и ``MONGODB_DATABASE``
+    имеют приоритет над настройками.
+
+    :param settings: Настройки Scrapy.
+    :return: Клиент MongoDB и название базы данных.
+    """
+
+    mongodb_uri = os.getenv("MONGODB_URI", settings.get("MONGODB_URI"))
+    mongodb_db = os.getenv(
+        "MONGODB_DATABASE", settings.get("MONGODB_DATABASE", "items")
+    )
+    if not mongodb_uri:
+        raise NotConfigured("You need to provide a Connection String.")
+
+    return pymongo.MongoClient(mongodb_uri), mongodb_db
+
+
+class BulkWriter:
+    """
+    Буферизированная запись операций в коллекцию MongoDB.
+
+    Операции накапливаются в буфере и отправляются неупорядоченными пакетами
+    (``bulk_write(ordered=False)``) при достижении размера пакета или по таймеру.
+    Запись выполняется в пуле потоков реактора, а количество одновременно
+    записываемых пакетов ограничено: при его превышении добавление операции
+    возвращает ``Deferred``, который сработает после освобождения места.
+
+    Для операции можно передать функцию подтверждения: она вызывается в потоке
+    реактора после того, как MongoDB подтвердила запись операции, и не вызывается,
+    если операция не записана. В этом случае вызывается функция ошибки записи.
+    """
+
+    def __init__(
+        self,
+        collection: Collection,
+        stats: StatsCollector,
+        spider: Spider,
+        batch_size: int = 500,
+        flush_interval: float = 5.0,
+        max_pending: int = 2,
+        stats_prefix: str = "mongodb",
+    ) -> None:
+        """
+        :param collection: Коллекция для записи.
+        :param stats: Сборщик статистики Scrapy.
+        :param spider: Паук, для которого выполняется запись.
+        :param batch_size: Количество операций в одном пакете.
+        :param flush_interval: Интервал принудительной отправки буфера (в секундах).
+        :param max_pending: Максимальное количество одновременно записываемых пакетов.
+        :param stats_prefix: Префикс ключей статистики.
+        """
+
+        self.collection = collection
+        self.stats = stats
+        self.spider = spider
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.stats_prefix = stats_prefix
+
+        self._buffer: List[Any] = []
+        self._callbacks: List[Callbacks] = []
+        self._semaphore = defer.DeferredSemaphore(max(1, max_pending))
+        self._pending: List[defer.Deferred] = []
+        self._timer: Optional[task.LoopingCall] = None
+
+    def start(self) -> None:
+        """
+        Запуск таймера периодической отправки буфера.
+        """
+
+        if self.flush_interval > 0:
+            self._timer = task.LoopingCall(self.flush)
+            self._timer.start(self.flush_interval, now=False)
+
+    def add(
+        self,
+        operation: Any,
+        acknowledged: Optional[Callable[[], Any]] = None,
+        failed: Optional[Callable[[], Any]] = None,
+    ) -> Optional[defer.Deferred]:
+        """
+        Добавление операции в буфер.
+
+        :param operation: Операция записи (``ReplaceOne``, ``UpdateOne`` и т.п.).
+        :param acknowledged: Функция, вызываемая после подтверждения записи операции.
+        :param failed: Функция, вызываемая, если операция не записана.
+        :return: ``Deferred``, если пакет отправлен и нужно дождаться свободного места.
+        """
+
+        self._buffer.append(operation)
+        self._callbacks.append((acknowledged, failed))
+        if len(self._buffer) >= self.batch_size:
+            return self.flush()
+
+        return None
+
+    def flush(self) -> Optional[defer.Deferred]:
+        """
+        Отправка накопленного буфера на запись.
+
+        :return: ``Deferred``, срабатывающий после начала записи пакета.
+        """
+
+        if not self._buffer:
+            return None
+
+        operations, self._buffer = self._buffer, []
+        callbacks, self._callbacks = self._callbacks, []
+        started = self._semaphore.acquire()
+        started.addCallback(self._start_write, operations, callbacks)
+
+        return started
+
+    def drain(self) -> defer.Deferred:
+        """
+        Отправка буфера и ожидание завершения записи всех отправленных пакетов.
+
+        :return: ``Deferred``, срабатывающий после записи всех пакетов.
+        """
+
+        started = self.flush() or defer.succeed(None)
+        started.addCallback(lambda _: defer.DeferredList(list(self._pending)))
+
+        return started
+
+    def close(self) -> defer.Deferred:
+        """
+        Остановка таймера, отправка остатка буфера и ожидание завершения записи.
+
+        :return: ``Deferred``, срабатывающий после записи всех пакетов.
+        """
+
+        if self._timer is not None and self._timer.running:
+            self._timer.stop()
+
+        return self.drain()
+
+    def _start_write(
+        self,
+        _: Any,
+        operations: List[Any],
+        callbacks: List[Callbacks],
+    ) -> None:
+        """
+        Запуск записи пакета в пуле потоков.
+
+        :param _: Результат захвата семафора.
+        :param operations: Операции пакета.
+        :param callbacks: Функции подтверждения и ошибки записи операций пакета.
+        :return:
+        """
+
+        write = threads.deferToThread(  # type: ignore[no-untyped-call]
+            self._write, operations
+        )
+        write.addCallbacks(
+            self._on_written,
+            self._on_failed,
+            callbackArgs=(callbacks,),
+            errbackArgs=(callbacks,),
+        )
+        write.addBoth(self._release, write)
+        self._pending.append(write)
+
+    def _write(
+        self, operations: List[Any]
+    ) -> Tuple[float, Optional[BulkWriteResult], Set[int]]:
+        """
+        Запись пакета в коллекцию (выполняется вне потока реактора).
+
+        :param operations: Операции пакета.
+        :return: Время записи (в секундах), результат записи и номера
+            незаписанных операций.
+        """
+
+        start = time.perf_counter()
+        try:
+            result = self.collection.bulk_write(operations, ordered=False)
+            failed: Set[int] = set()
+        except BulkWriteError as exc:
+            result = None
+            failed = {error["index"] for error in exc.details.get("writeErrors", [])}
+            if not failed:
+                # ошибка подтверждения записи (write concern) относится ко всему пакету
+                failed = set(range(len(operations)))
+
+        return time.perf_counter() - start, result, failed
+
+    def _on_written(
+        self,
+        outcome: Tuple[float, Optional[BulkWriteResult], Set[int]],
+        callbacks: List[Callbacks],
+    ) -> None:
+        latency, result, failed = outcome
+        errors = len(failed)
+        latency_ms = int(latency * 1000)
+        prefix = self.stats_prefix
+
+        self.stats.inc_value(f"{prefix}/batches", spider=self.spider)
+        self.stats.inc_value(
+            f"{prefix}/batch_latency_total_ms", latency_ms, spider=self.spider
+        )
+        self.stats.max_value(
+            f"{prefix}/batch_latency_max_ms", latency_ms, spider=self.spider
+        )
+        if result is not None:
+            self.stats.inc_value(
+                f"{prefix}/upserted", result.upserted_count, spider=self.spider
+            )
+            self.stats.inc_value(
+                f"{prefix}/modified", result.modified_count, spider=self.spider
+            )
+        if errors:
+            self.stats.inc_value(f"{prefix}/write_errors", errors, spider=self.spider)
+            self.spider.logger.warning(
+                f"MongoDB bulk write finished with {errors} errors."
+            )
+        for index, (acknowledged, not_written) in enumerate(callbacks):
+            self._call(not_written if index in failed else acknowledged)
+
+    def _on_failed(self, failure: Any, callbacks: List[Callbacks]) -> None:
+        if not failure.check(PyMongoError):
+            failure.raiseException()
+
+        self.stats.inc_value(f"{self.stats_prefix}/batch_errors", spider=self.spider)
+        self.stats.inc_value(
+            f"{self.stats_prefix}/write_errors", len(callbacks), spider=self.spider
+        )
+        self.spider.logger.error(
+            f"MongoDB bulk write failed: {failure.getErrorMessage()}"
+        )
+        for _, not_written in callbacks:
+            self._call(not_written)
+
+    def _call(self, callback: Optional[Callable[[], Any]]) -> None:
+        """
+        Вызов функции подтверждения или ошибки записи операции.
+
+        Ошибка функции записывается в журнал и не мешает вызову функций
+        остальных операций пакета.
+
+        :param callback: Функция подтверждения или ошибки записи.
+        :return:
+        """
+
+        if callback is None:
+            return
+        try:
+            callback()
+        except Exception:
+            self.spider.logger.exception("MongoDB write callback failed.")
+
+    def _release(self, result: Any, write: defer.Deferred) -> Any:
+        self._semaphore.release()
+        if write in self._pending:
+            self._pending.remove(write)
+
+        return result
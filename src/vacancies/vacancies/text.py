@@ -0,0 +1,370 @@
+import hashlib
+import html
+import json
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import pymorphy3 as pymorphy
+except ImportError:  # pragma: no cover
+    try:
+        import pymorphy2 as pymorphy
+    except ImportError:
+        pymorphy = None
+
+# теги, разделяющие блоки текста (заменяются переводом строки)
+BLOCK_TAGS = frozenset(
+    {
+        "address",
+        "article",
+        "blockquote",
+        "br",
+        "dd",
+        "div",
+        "dl",
+        "dt",
+        "h1",
+        "h2",
+        "h3",
+        "h4",
+        "h5",
+        "h6",
+        "hr",
+        "li",
+        "ol",
+        "p",
+        "pre",
+        "section",
+        "table",
+        "td",
+        "th",
+        "tr",
+        "ul",
+    }
+)
+# теги, содержимое которых не является текстом
+SKIPPED_TAGS = frozenset({"script", "style", "template"})
+
+# тег, комментарий или фрагмент текста между тегами
+_MARKUP = re.compile(
+    r"<!--.*?-->|<(/?)([a-zA-Z][a-zA-Z0-9]*)\b[^>]*>|([^<]+|<)", re.DOTALL
+)
+_SPACES = re.compile(r"[^\S\n]+")
+_LINES = re.compile(r"\s*\n\s*")
+# слово, в том числе с символами названий технологий (c++, c#, .net, node.js)
+_WORD = re.compile(r"\.?[^\W_]+(?:[+#]+|(?:[.\-][^\W_]+)+)?")
+_CYRILLIC = re.compile(r"[а-яё]")
+
+STOPWORDS_RU = frozenset(
+    """
+    а без более бы был была были было быть в вам вас весь во вот все всего всех
+    вы где да даже для до его ее ей ему если есть еще же за здесь и из или им их
+    к как ко когда кто ли либо мне может мы на над надо наш не него нее нет ни
+    них но ну о об однако он она они оно от очень по под при с со так также
+    такой там те тем то того тоже той только том ты у уже хотя чего чей чем что
+    чтобы чье чья эта эти это этот я свой который наш ваш мочь весь другой
+    один себя сам этот тот какой каждый также либо
+    """.split()
+)
+STOPWORDS_EN = frozenset(
+    """
+    a about above after again against all am an and any are as at be because
+    been before being below between both but by can could did do does doing
+    down during each few for from further had has have having he her here hers
+    herself him himself his how i if in into is it its itself just me more most
+    my myself no nor not now of off on once only or other our ours ourselves out
+    over own same she should so some such than that the their theirs them
+    themselves then there these they this those through to too under until up
+    very was we were what when where which while who whom why will with would
+    you your yours yourself yourselves
+    """.split()
+)
+STOPWORDS = STOPWORDS_RU | STOPWORDS_EN
+
+
+def html_to_text(markup: str) -> str:
+    """
+    Получение текста из HTML-описания вакансии.
+
+    Разметка разбирается за один проход регулярным выражением без построения
+    дерева: блочные теги заменяются переводами строк, содержимое ``script``
+    и ``style`` пропускается, ссылки на символы (``&nbsp;`` и т.п.)
+    заменяются символами.
+
+    :param markup: HTML-фрагмент.
+    :return: Текст без разметки.
+    """
+
+    parts: List[str] = []
+    skipped: Optional[str] = None
+    for match in _MARKUP.finditer(markup):
+        closing, tag, text = match.groups()
+        if text is not None:
+            if skipped is None:
+                parts.append(text)
+        elif tag is not None:
+            tag = tag.lower()
+            if skipped is not None:
+                if closing and tag == skipped:
+                    skipped = None
+            elif tag in SKIPPED_TAGS and not closing:
+                skipped = tag
+            elif tag in BLOCK_TAGS:
+                parts.append("\n")
+
+    text = _SPACES.sub(" ", html.unescape("".join(parts)))
+
+    return _LINES.sub("\n", text).strip()
+
+
+class Lemmatizer:
+    """
+    Приведение слов к начальной форме с кэшированием результатов.
+
+    Русские слова лемматизируются pymorphy (если он установлен), остальные
+    только приводятся к нижнему регистру. Словарь вакансий ограничен,
+    поэтому почти все слова берутся из кэша.
+    """
+
+    def __init__(self, cache_size: int = 200000) -> None:
+        """
+        :param cache_size: Максимальное количество слов в кэше.
+        """
+
+        self.morph = pymorphy.MorphAnalyzer() if pymorphy is not None else None
+        self.lemma: Callable[[str], str] = lru_cache(maxsize=cache_size)(self._lemma)
+
+    def _lemma(self, word: str) -> str:
+        if self.morph is not None and _CYRILLIC.search(word):
+            return str(self.morph.parse(word)[0].normal_form)
+
+        return word
+
+
+def tokenize(text: str, lemmatizer: Lemmatizer) -> List[str]:
+    """
+    Получение нормализованных токенов текста.
+
+    :param text: Текст.
+    :param lemmatizer: Лемматизатор.
+    :return: Леммы слов в нижнем регистре без стоп-слов и чисел.
+    """
+
+    lemma = lemmatizer.lemma
+    tokens = []
+    for match in _WORD.finditer(text.lower()):
+        word = match.group().replace("ё", "е")
+        if word.isdigit() or word in STOPWORDS:
+            continue
+        word = lemma(word)
+        if word not in STOPWORDS:
+            tokens.append(word)
+
+    return tokens
+
+
+def words(text: str) -> List[str]:
+    """
+    Слова текста в нижнем регистре без лемматизации и удаления стоп-слов.
+
+    :param text: Текст.
+    :return:
+    """
+
+    return [match.group().replace("ё", "е") for match in _WORD.finditer(text.lower())]
+
+
+# лемматизатор процесса (создается при первой обработке)
+_lemmatizer: Optional[Lemmatizer] = None
+
+
+def process(description: str) -> Tuple[str, List[str]]:
+    """
+    Обработка описания вакансии: текст без разметки и токены.
+
+    Выполняется в процессах пула обработчиков, поэтому лемматизатор
+    и его кэш создаются один раз на процесс.
+
+    :param description: HTML-описание вакансии.
+    :return: Текст и токены.
+    """
+
+    global _lemmatizer
+    if _lemmatizer is None:
+        _lemmatizer = Lemmatizer()
+
+    text = html_to_text(description)
+
+    return text, tokenize(text, _lemmatizer)
+
+
+def content_key(description: str) -> bytes:
+    """
+    Ключ кэша обработанного описания (хэш содержимого).
+
+    :param description: HTML-описание вакансии.
+    :return:
+    """
+
+    return hashlib.blake2b(description.encode("utf-8"), digest_size=16).digest()
+
+
+class TextCache:
+    """
+    Кэш обработанных описаний в файле SQLite.
+
+    Ключ – хэш HTML-описания, значение – текст и токены, сжатые zlib.
+    Записи накапливаются в буфере и сохраняются одной транзакцией
+    (``commit`` можно выполнять в пуле потоков). Поиск в файле выполняется
+    в пуле обработчиков (см. ``cached_process``), а в потоке реактора
+    проверяется только буфер.
+    """
+
+    def __init__(
+        self, path: str, buffer_size: int = 500, timeout: float = 60.0
+    ) -> None:
+        """
+        :param path: Путь к файлу базы данных.
+        :param buffer_size: Количество записей, после которого нужна фиксация.
+        :param timeout: Время ожидания блокировки файла другими процессами (в секундах).
+        """
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.buffer_size = buffer_size
+        self._buffer: Dict[bytes, bytes] = {}
+        self._lock = threading.Lock()
+        # фиксация выполняется в потоках пула, поэтому соединение не привязано к потоку
+        self._connection = sqlite3.connect(
+            path, timeout=timeout, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS texts (key BLOB PRIMARY KEY, value BLOB NOT NULL)"
+        )
+        self._connection.commit()
+
+    def buffered(self, key: bytes) -> Optional[Tuple[str, List[str]]]:
+        """
+        Получение обработанного описания из буфера (без обращения к файлу).
+
+        :param key: Ключ описания (``content_key``).
+        :return: Текст и токены или None, если описания нет в буфере.
+        """
+
+        with self._lock:
+            value = self._buffer.get(key)
+
+        return _decode(value) if value is not None else None
+
+    def get(self, key: bytes) -> Optional[Tuple[str, List[str]]]:
+        """
+        Получение обработанного описания.
+
+        :param key: Ключ описания (``content_key``).
+        :return: Текст и токены или None, если описание не обрабатывалось.
+        """
+
+        cached = self.buffered(key)
+        if cached is not None:
+            return cached
+
+        row = self._connection.execute(
+            "SELECT value FROM texts WHERE key = ?", (key,)
+        ).fetchone()
+
+        return _decode(row[0]) if row is not None else None
+
+    def put(self, key: bytes, text: str, tokens: List[str]) -> bool:
+        """
+        Сохранение обработанного описания в буфер.
+
+        :param key: Ключ описания.
+        :param text: Текст.
+        :param tokens: Токены.
+        :return: Признак заполнения буфера (нужно выполнить ``commit``).
+        """
+
+        value = zlib.compress(json.dumps([text, tokens], ensure_ascii=False).encode())
+        with self._lock:
+            self._buffer[key] = value
+
+            return len(self._buffer) >= self.buffer_size
+
+    def commit(self) -> None:
+        """
+        Сохранение буфера.
+
+        :return:
+        """
+
+        with self._lock:
+            buffer, self._buffer = self._buffer, {}
+        if buffer:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO texts (key, value) VALUES (?, ?)",
+                buffer.items(),
+            )
+            self._connection.commit()
+
+    def close(self) -> None:
+        self.commit()
+        self._connection.close()
+
+    def __len__(self) -> int:
+        (count,) = self._connection.execute("SELECT COUNT(*) FROM texts").fetchone()
+
+        return int(count) + len(self._buffer)
+
+
+def _decode(value: bytes) -> Tuple[str, List[str]]:
+    text, tokens = json.loads(zlib.decompress(value))
+
+    return text, tokens
+
+
+# соединения с файлами кэша обработанных описаний в потоках и процессах пула
+_readers = threading.local()
+
+
+def cached_process(
+    path: str, key: bytes, description: str, timeout: float = 60.0
+) -> Tuple[str, List[str], bool]:
+    """
+    Получение обработанного описания из кэша или обработка описания.
+
+    Выполняется в пуле обработчиков, поэтому чтение файла кэша (который может
+    быть заблокирован записью других процессов) не блокирует поток реактора.
+    Соединение с файлом открывается один раз на поток.
+
+    :param path: Путь к файлу кэша (``TextCache``).
+    :param key: Ключ описания (``content_key``).
+    :param description: HTML-описание вакансии.
+    :param timeout: Время ожидания блокировки файла (в секундах).
+    :return: Текст, токены и признак получения из кэша.
+    """
+
+    connections: Dict[str, sqlite3.Connection] = _readers.__dict__.setdefault(
+        "connections", {}
+    )
+    connection = connections.get(path)
+    if connection is None:
+        connection = connections[path] = sqlite3.connect(path, timeout=timeout)
+
+    row = connection.execute("SELECT value FROM texts WHERE key = ?", (key,)).fetchone()
+    if row is not None:
+        text, tokens = _decode(row[0])
+        return text, tokens, True
+
+    text, tokens = process(description)
+
+    return text, tokens, False